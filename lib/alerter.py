@@ -1,16 +1,43 @@
-from typing import Any, Protocol, TypeVar
+from typing import Any, Optional, Protocol, TypeVar
 
+from lib.correlation import Incident
+from lib.deadline import Deadline
+from lib.digest import DigestGroup
 from lib.log_processor import ProcessedLogEntry
 
 Alert = TypeVar("Alert")
+CreatedAlert = TypeVar("CreatedAlert", covariant=True)
 
 
-class Alerter(Protocol[Alert]):
-    def send_alert(self, message: Alert) -> None:
+class AlertFactory(Protocol[CreatedAlert]):
+    def create_raw_alert(self, raw: Any) -> CreatedAlert:
         raise NotImplementedError()
 
-    def create_raw_alert(self, raw: Any) -> Alert:
+    # project_name overrides the alerter's own project in the alert's links, for
+    # alerts about another project which share its settings.
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> CreatedAlert:
         raise NotImplementedError()
 
-    def create_alert(self, entry: ProcessedLogEntry) -> Alert:
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> CreatedAlert:
+        raise NotImplementedError()
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> CreatedAlert:
+        raise NotImplementedError()
+
+
+class Alerter(AlertFactory[Alert], Protocol[Alert]):
+    def send_alert(self, message: Alert, deadline: Optional[Deadline] = None) -> None:
+        raise NotImplementedError()
+
+
+class AsyncAlerter(AlertFactory[Alert], Protocol[Alert]):
+    async def send_alert(
+        self, message: Alert, deadline: Optional[Deadline] = None
+    ) -> None:
         raise NotImplementedError()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Set
+
+from lib.alerter import AsyncAlerter
+from lib.cloud_logging import InternTable
+from lib.cloud_run_revision import PayloadSizeLimit
+from lib.correlation import IncidentCorrelator
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.deduplication import SeenMessageIds
+from lib.digest import DigestBuffer
+from lib.log_processor import CreateAppLogPayloadFromLogEntry
+from lib.sampling import AlertSampler
+from lib.send_alerts import (
+    MessageInFlight,
+    PreparedAlert,
+    prepare_alert,
+    release_message_id,
+    remember_message_id,
+    settle_sampled_alert,
+)
+from lib.shadow_filters import ShadowFilterEvaluator
+from lib.tenancy import ProjectConfigs
+
+DEFERRED = "Alert deferred (deadline)"
+IN_FLIGHT = "Alert deferred (in flight)"
+
+
+async def async_send_alerts(
+    events: List[dict],
+    alerter: AsyncAlerter,
+    app_log_payload_factories: List[CreateAppLogPayloadFromLogEntry],
+    seen_message_ids: Optional[SeenMessageIds] = None,
+    digest_buffer: Optional[DigestBuffer] = None,
+    incident_correlator: Optional[IncidentCorrelator] = None,
+    size_limit: Optional[PayloadSizeLimit] = None,
+    deadline: Optional[Deadline] = None,
+    sampler: Optional[AlertSampler] = None,
+    shadow_filters: Optional[ShadowFilterEvaluator] = None,
+    project_configs: Optional[ProjectConfigs] = None,
+) -> List[str]:
+    """
+    Send alerts for a batch of PubSub events.
+
+    Decoding, filtering and formatting run inline, one event at a time. The
+    resulting Slack sends run concurrently, bounded by the alerter, so a slow
+    webhook response does not hold up the rest of the batch. A failed send is
+    logged and reported as "Alert failed" without affecting the other events.
+
+    Once the deadline has passed no further events are taken from the batch;
+    they, and sends which cannot finish in time, are reported as "Alert
+    deferred (deadline)" and are not remembered as seen, so they can be
+    redelivered. So are redeliveries of messages which are still being handled,
+    reported as "Alert deferred (in flight)".
+    """
+    # The entries of a batch are held until their sends finish, so metadata
+    # which repeats between them is interned for the length of the batch.
+    intern_table = InternTable()
+    batch_message_ids: Set[str] = set()
+    prepared_alerts: List[PreparedAlert[Any]] = []
+    try:
+        for event in events:
+            if deadline is not None and deadline.expired():
+                prepared_alerts.append(PreparedAlert(result=DEFERRED))
+                continue
+
+            try:
+                prepared: PreparedAlert[Any] = prepare_alert(
+                    event,
+                    alerter,
+                    app_log_payload_factories,
+                    seen_message_ids,
+                    digest_buffer,
+                    incident_correlator,
+                    size_limit,
+                    sampler,
+                    intern_table,
+                    shadow_filters,
+                    project_configs,
+                )
+            except MessageInFlight:
+                prepared_alerts.append(PreparedAlert(result=IN_FLIGHT))
+                continue
+            message_id = prepared.message_id
+            if message_id is not None:
+                if message_id in batch_message_ids:
+                    settle_sampled_alert(prepared, sampler, sent=False)
+                    prepared = PreparedAlert(result="Alert skipped (duplicate)")
+                else:
+                    batch_message_ids.add(message_id)
+            prepared_alerts.append(prepared)
+    except Exception:
+        # Nothing from the batch is sent, so it can all be redelivered.
+        for prepared in prepared_alerts:
+            settle_sampled_alert(prepared, sampler, sent=False)
+            release_message_id(prepared, seen_message_ids)
+        raise
+
+    return list(
+        await asyncio.gather(
+            *(
+                _send(prepared, alerter, seen_message_ids, deadline, sampler)
+                for prepared in prepared_alerts
+            )
+        )
+    )
+
+
+async def _send(
+    prepared: PreparedAlert,
+    alerter: AsyncAlerter,
+    seen_message_ids: Optional[SeenMessageIds],
+    deadline: Optional[Deadline],
+    sampler: Optional[AlertSampler],
+) -> str:
+    if prepared.alert is not None:
+        try:
+            await alerter.send_alert(prepared.alert, deadline)
+        except DeadlineExceeded as err:
+            settle_sampled_alert(prepared, sampler, sent=False)
+            release_message_id(prepared, seen_message_ids)
+            logging.warning(
+                "Alert not sent before the deadline", extra=dict(textPayload=str(err))
+            )
+            return DEFERRED
+        except Exception as err:
+            settle_sampled_alert(prepared, sampler, sent=False)
+            release_message_id(prepared, seen_message_ids)
+            logging.error(
+                "Failed to send alert to Slack", extra=dict(textPayload=repr(err))
+            )
+            return "Alert failed"
+        settle_sampled_alert(prepared, sampler, sent=True)
+
+    remember_message_id(prepared, seen_message_ids)
+    return prepared.result
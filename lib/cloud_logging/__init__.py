@@ -1,2 +1,9 @@
+from lib.cloud_logging.intern_table import InternTable  # noqa: F401
 from lib.cloud_logging.log_entry import LogEntry, PayloadType  # noqa: F401
+from lib.cloud_logging.log_name import (  # noqa: F401
+    Environment,
+    LogName,
+    parse_log_name,
+)
 from lib.cloud_logging.parse_log_entry import parse_log_entry  # noqa: F401
+from lib.cloud_logging.severity import severity_rank  # noqa: F401
@@ -0,0 +1,45 @@
+from typing import Any, Dict, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class InternTable:
+    """
+    Bounded table of canonical strings for log metadata.
+
+    Log names, severities, resource types and label values repeat across the
+    entries of a batch, but decoding JSON creates a new string for each one.
+    Passing them through intern returns the first equal string seen instead,
+    so repeated values share storage and compare equal by identity.
+
+    The table is emptied once it holds max_size strings, so unique values such
+    as execution IDs cannot grow it without limit or crowd out the values which
+    repeat; those are added again as soon as they are next seen.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._max_size = max_size
+        self._strings: Dict[str, str] = {}
+
+    def intern(self, value: T) -> T:
+        if not isinstance(value, str):
+            return value
+
+        canonical = self._strings.get(value)
+        if canonical is None:
+            if len(self._strings) >= self._max_size:
+                self._strings.clear()
+            canonical = self._strings[value] = value
+        return cast(T, canonical)
+
+    def intern_values(self, values: Any) -> Any:
+        """Intern the keys and values of a dict, such as resource labels."""
+        if type(values) is not dict:
+            return values
+        return {self.intern(key): self.intern(value) for key, value in values.items()}
+
+    def __len__(self) -> int:
+        return len(self._strings)
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import unquote
+
+
+class Environment(Enum):
+    SANDBOX = "sandbox"
+    DEV = "dev"
+    TRAINING = "training"
+    PREPROD = "preprod"
+    PROD = "prod"
+
+
+# Any other project is a sandbox.
+FORMAL_ENVIRONMENTS = {
+    "ons-blaise-v2-dev": Environment.DEV,
+    "ons-blaise-v2-dev-training": Environment.TRAINING,
+    "ons-blaise-v2-preprod": Environment.PREPROD,
+    "ons-blaise-v2-prod": Environment.PROD,
+}
+
+
+@dataclass(frozen=True)
+class LogName:
+    project_id: Optional[str]
+    log_id: str
+    environment: Environment
+
+
+@lru_cache(maxsize=1024)
+def parse_log_name(log_name: str) -> LogName:
+    """
+    Split a logName of the form projects/[PROJECT_ID]/logs/[LOG_ID] into the
+    project ID, the URL-decoded log ID and the project's environment.
+
+    Names which are not in that form are still parsed: the log ID is whatever
+    follows "logs/", or the whole name when there is no such part, and the
+    project ID is None unless the name starts with projects/[PROJECT_ID].
+    """
+    parent, separator, log_id = log_name.partition("/logs/")
+    if not separator:
+        if log_name.startswith("logs/"):
+            parent, log_id = "", log_name[len("logs/") :]
+        else:
+            parent, log_id = "", log_name
+
+    parent_type, _, parent_id = parent.partition("/")
+    project_id = parent_id if parent_type == "projects" and parent_id else None
+    return LogName(
+        project_id=project_id,
+        log_id=unquote(log_id),
+        environment=FORMAL_ENVIRONMENTS.get(project_id or "", Environment.SANDBOX),
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 from urllib.parse import quote
 
 
@@ -8,14 +8,24 @@ def create_log_query_link(
     severities: List[str],
     cursor_timestamp: datetime,
     project_name: str,
+    end_timestamp: Optional[datetime] = None,
 ) -> str:
     fields_query = " ".join([f'{name}:"{value}"' for name, value in fields.items()])
     severity_query = f"severity=({' OR '.join(severities)})" if severities else ""
     query = f"{fields_query} {severity_query}".strip()
-    time_stamp = cursor_timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    time_stamp = _format_timestamp(cursor_timestamp)
+    time_range = (
+        f"{time_stamp}%2F{_format_timestamp(end_timestamp)}"
+        if end_timestamp is not None
+        else f"{time_stamp}%2F{time_stamp}--PT1M"
+    )
     return (
         f"https://console.cloud.google.com/logs/query;"
         f"query={quote(query, safe='/@:')};"
-        f"timeRange={time_stamp}%2F{time_stamp}--PT1M"
+        f"timeRange={time_range}"
         f"?referrer=search&project={project_name}"
     )
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
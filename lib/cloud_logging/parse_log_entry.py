@@ -1,9 +1,16 @@
 from typing import Any, Dict, Optional, Tuple, Union
 
+from lib.cloud_logging.intern_table import InternTable
 from lib.cloud_logging.log_entry import LogEntry, PayloadType
 
 
-def parse_log_entry(raw: Dict[str, Any]) -> LogEntry:
+def parse_log_entry(
+    raw: Dict[str, Any], intern_table: Optional[InternTable] = None
+) -> LogEntry:
+    """
+    Parse a log entry. When an intern table is given, the metadata which
+    repeats between entries is replaced by the table's canonical strings.
+    """
     payload_type, payload = parse_payload(raw)
 
     resource_type, resource_labels = parse_resource(raw)
@@ -12,13 +19,22 @@ def parse_log_entry(raw: Dict[str, Any]) -> LogEntry:
     if type(labels) is not dict:
         labels = dict()
 
+    severity = raw.get("severity")
+    log_name = raw.get("logName")
+    if intern_table is not None:
+        resource_type = intern_table.intern(resource_type)
+        resource_labels = intern_table.intern_values(resource_labels)
+        labels = intern_table.intern_values(labels)
+        severity = intern_table.intern(severity)
+        log_name = intern_table.intern(log_name)
+
     return LogEntry(
         resource_type=resource_type,
         resource_labels=resource_labels,
         payload_type=payload_type,
         payload=payload,
-        severity=raw.get("severity"),
-        log_name=raw.get("logName"),
+        severity=severity,
+        log_name=log_name,
         timestamp=raw.get("receiveTimestamp"),
         labels=labels,
     )
@@ -0,0 +1,20 @@
+from typing import Optional
+
+# Numeric values of google.logging.type.LogSeverity
+SEVERITY_RANKS = {
+    "DEFAULT": 0,
+    "DEBUG": 100,
+    "INFO": 200,
+    "NOTICE": 300,
+    "WARNING": 400,
+    "ERROR": 500,
+    "CRITICAL": 600,
+    "ALERT": 700,
+    "EMERGENCY": 800,
+}
+
+
+def severity_rank(severity: Optional[str]) -> Optional[int]:
+    if severity is None:
+        return None
+    return SEVERITY_RANKS.get(severity.upper())
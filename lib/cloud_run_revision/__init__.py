@@ -3,3 +3,4 @@ from lib.cloud_run_revision.invalid_cloud_run_revision_event import (  # noqa: F
     InvalidCloudRunRevisionEvent,
 )
 from lib.cloud_run_revision.parse_event import parse_event  # noqa: F401
+from lib.cloud_run_revision.payload_size_limit import PayloadSizeLimit  # noqa: F401
@@ -1,7 +1,11 @@
-from dataclasses import dataclass
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
 
 
 @dataclass(frozen=True)
 class Event:
     data: Dict[str, Any]
+    message_id: Optional[str] = field(default=None)
+    publish_time: Optional[str] = field(default=None)
+    attributes: Dict[str, str] = field(default_factory=dict)
+    truncated: bool = field(default=False)
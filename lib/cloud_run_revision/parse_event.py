@@ -1,11 +1,15 @@
 import base64
 import binascii
 import json
+import logging
+from typing import Dict, Optional
 
 from lib.cloud_run_revision.event import Event
 from lib.cloud_run_revision.invalid_cloud_run_revision_event import (
     InvalidCloudRunRevisionEvent,
 )
+from lib.cloud_run_revision.payload_size_limit import PayloadSizeLimit
+from lib.utilities import json_codec
 
 
 def assert_field_in_event(field_name: str, event: dict) -> None:
@@ -13,11 +17,12 @@ def assert_field_in_event(field_name: str, event: dict) -> None:
         raise InvalidCloudRunRevisionEvent(f"Field '{field_name}' is missing.")
 
 
-def parse_event(event: dict) -> Event:
+def parse_event(event: dict, size_limit: Optional[PayloadSizeLimit] = None) -> Event:
     assert_field_in_event("data", event)
 
     try:
-        return Event(data=json.loads(base64.b64decode(event["data"])))
+        raw_data = base64.b64decode(event["data"])
+        data = json_codec.loads(raw_data)
     except binascii.Error as err:
         raise InvalidCloudRunRevisionEvent(
             f"Field 'data' does not contain valid base64 encoded content. {str(err)}."
@@ -26,3 +31,43 @@ def parse_event(event: dict) -> Event:
         raise InvalidCloudRunRevisionEvent(
             f"Field 'data' does not contain valid JSON. {str(err)}."
         )
+
+    message_id = _get_envelope_string(event, "messageId", "message_id")
+    truncated = False
+    if size_limit is not None and size_limit.exceeded_by(len(raw_data)):
+        data = size_limit.shrink(data)
+        truncated = True
+        logging.warning(
+            "PubSub message data is oversized, only the fields used for alerting were kept",
+            extra=dict(
+                json_fields=dict(
+                    messageId=message_id,
+                    data_bytes=len(raw_data),
+                    max_data_bytes=size_limit.max_data_bytes,
+                    oversized_count=size_limit.oversized_count,
+                )
+            ),
+        )
+
+    return Event(
+        data=data,
+        message_id=message_id,
+        publish_time=_get_envelope_string(event, "publishTime", "publish_time"),
+        attributes=_get_attributes(event),
+        truncated=truncated,
+    )
+
+
+def _get_envelope_string(event: dict, *field_names: str) -> Optional[str]:
+    for field_name in field_names:
+        value = event.get(field_name)
+        if isinstance(value, str) and value != "":
+            return value
+    return None
+
+
+def _get_attributes(event: dict) -> Dict[str, str]:
+    attributes = event.get("attributes")
+    if not isinstance(attributes, dict):
+        return dict()
+    return attributes
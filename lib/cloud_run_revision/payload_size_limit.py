@@ -0,0 +1,121 @@
+from typing import Any, Dict, Optional
+
+# Top level log entry fields read by the pipeline. Everything else is dropped
+# from oversized entries, and only the payload fields are shrunk.
+KEPT_LOG_ENTRY_FIELDS = [
+    "resource",
+    "severity",
+    "logName",
+    "timestamp",
+    "receiveTimestamp",
+    "labels",
+    "insertId",
+]
+PAYLOAD_FIELDS = ["textPayload", "jsonPayload", "protoPayload"]
+
+# AuditLog fields read by the alert and the filters, with None for fields kept
+# whole. The rest, such as request and response bodies, is dropped from
+# oversized entries before they are shrunk.
+AUDIT_LOG_TYPE = "type.googleapis.com/google.cloud.audit.AuditLog"
+AUDIT_LOG_FIELDS: Dict[str, Any] = {
+    "@type": None,
+    "serviceName": None,
+    "methodName": None,
+    "resourceName": None,
+    "status": None,
+    "authenticationInfo": None,
+    "requestMetadata": None,
+    "request": {"httpRequest": None},
+}
+
+TRUNCATED = "[truncated]"
+
+
+class PayloadSizeLimit:
+    """
+    Size limit for the decoded data of a PubSub message.
+
+    Log entries larger than max_data_bytes, such as AuditLog entries with large
+    request or response bodies, are shrunk before they reach the rest of the
+    pipeline: only the top level fields it reads are kept, AuditLog payloads
+    are cut to the fields alerts are built from, and within the payload long
+    strings are cut to max_string_chars, lists to max_list_items, objects to
+    max_dict_keys and nesting to max_depth.
+    oversized_count records how many entries have been shrunk.
+    """
+
+    def __init__(
+        self,
+        max_data_bytes: int = 64 * 1024,
+        max_string_chars: int = 2000,
+        max_list_items: int = 20,
+        max_dict_keys: int = 50,
+        max_depth: int = 8,
+    ):
+        if max_data_bytes < 1:
+            raise ValueError("max_data_bytes must be at least 1")
+
+        self.max_data_bytes = max_data_bytes
+        self.oversized_count = 0
+        self._max_string_chars = max_string_chars
+        self._max_list_items = max_list_items
+        self._max_dict_keys = max_dict_keys
+        self._max_depth = max_depth
+
+    def exceeded_by(self, data_bytes: int) -> bool:
+        return data_bytes > self.max_data_bytes
+
+    def shrink(self, data: Any) -> Any:
+        self.oversized_count += 1
+        if not isinstance(data, dict):
+            return self._shrink_value(data, depth=0)
+
+        shrunk = {name: data[name] for name in KEPT_LOG_ENTRY_FIELDS if name in data}
+        for name in PAYLOAD_FIELDS:
+            if name in data:
+                payload = data[name]
+                if isinstance(payload, dict) and payload.get("@type") == AUDIT_LOG_TYPE:
+                    payload = _pick(payload, AUDIT_LOG_FIELDS)
+                shrunk[name] = self._shrink_value(payload, depth=1)
+        return shrunk
+
+    def _shrink_value(self, value: Any, depth: int) -> Any:
+        if isinstance(value, str):
+            if len(value) > self._max_string_chars:
+                return f"{value[:self._max_string_chars]}...{TRUNCATED}"
+            return value
+
+        if not isinstance(value, (dict, list)):
+            return value
+
+        if depth >= self._max_depth:
+            return TRUNCATED
+
+        if isinstance(value, dict):
+            fields: Dict[str, Any] = {}
+            for name, item in value.items():
+                if len(fields) >= self._max_dict_keys:
+                    fields[TRUNCATED] = f"{len(value) - len(fields)} more fields"
+                    break
+                fields[name] = self._shrink_value(item, depth + 1)
+            return fields
+
+        items = [
+            self._shrink_value(item, depth + 1)
+            for item in value[: self._max_list_items]
+        ]
+        if len(value) > self._max_list_items:
+            items.append(TRUNCATED)
+        return items
+
+
+def _pick(value: Any, fields: Optional[Dict[str, Any]]) -> Any:
+    if fields is None or not isinstance(value, dict):
+        return value
+    picked: Dict[str, Any] = {}
+    for name, nested_fields in fields.items():
+        if name in value:
+            item = _pick(value[name], nested_fields)
+            if item != {}:
+                picked[name] = item
+    return picked
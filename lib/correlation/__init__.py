@@ -0,0 +1,4 @@
+from lib.correlation.incident_correlator import (  # noqa: F401
+    Incident,
+    IncidentCorrelator,
+)
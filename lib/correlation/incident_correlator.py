@@ -0,0 +1,363 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from lib.cloud_logging import severity_rank
+from lib.log_processor import ProcessedLogEntry
+
+# Log query fields which identify the resource an entry came from, in order of
+# preference.
+RESOURCE_FIELDS = [
+    "resource.labels.instance_id",
+    "resource.labels.service_name",
+    "resource.labels.module_id",
+]
+
+MAX_INCIDENT_MESSAGES = 5
+
+ResourceKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Incident:
+    resource_field: str
+    resource: str
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+    severity: Optional[str]
+    platform: Optional[str]
+    applications: List[str]
+    messages: List[str]
+    # The project named in the opening entry's logName, if any.
+    project_id: Optional[str] = field(default=None)
+    # The playbook the opening entry was classified under, so the summary is
+    # routed as that entry was.
+    classification: Optional[str] = field(default=None)
+
+    @property
+    def resource_type(self) -> str:
+        return self.resource_field.rsplit(".", 1)[-1]
+
+    @property
+    def log_query(self) -> Dict[str, str]:
+        return {self.resource_field: self.resource}
+
+
+# The columns of open_incidents and closed_incidents which hold an incident.
+_INCIDENT_COLUMNS = (
+    "project_id, resource_field, resource, count, first_seen, last_seen, "
+    "severity, platform, applications, messages, classification"
+)
+
+
+class IncidentCorrelator:
+    """
+    Merge alerts for the same resource into incidents.
+
+    When a resource fails it usually produces errors from several agents and
+    applications within seconds. The first alert for a resource is sent as
+    normal and opens an incident; alerts for the same resource within
+    window_seconds of the previous one are merged into it instead of being sent,
+    unless they are more severe than the alert which opened it. Such an alert
+    closes the incident and opens a new one. Once an incident has been quiet for
+    window_seconds, or has been open for max_incident_seconds, it is closed and,
+    if anything was merged into it, a summary is returned from take_closed.
+
+    Incidents are kept in the SQLite database at path, so a correlator on the
+    same file in another process, such as the scheduled flush, sees them too.
+    At most max_incidents are kept open; the least recently active incident is
+    closed early when that is exceeded. It is safe to share between threads.
+
+    Each incident keeps the classification, from classify, of its opening
+    entry.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 60,
+        max_incident_seconds: float = 3600,
+        max_incidents: int = 1000,
+        path: str = ":memory:",
+        classify: Optional[Callable[[ProcessedLogEntry], Optional[str]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        if max_incidents < 1:
+            raise ValueError("max_incidents must be at least 1")
+
+        self._window_seconds = window_seconds
+        self._max_incident_seconds = max_incident_seconds
+        self._max_incidents = max_incidents
+        self._classify = classify
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Transactions are begun explicitly, so that reading and updating an
+        # incident is not interleaved with another process doing the same.
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS open_incidents ("
+            "project_id TEXT NOT NULL, "
+            "resource_field TEXT NOT NULL, "
+            "resource TEXT NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "first_seen REAL NOT NULL, "
+            "last_seen REAL NOT NULL, "
+            "severity TEXT, "
+            "platform TEXT, "
+            "applications TEXT NOT NULL, "
+            "messages TEXT NOT NULL, "
+            "classification TEXT, "
+            "opened_at REAL NOT NULL, "
+            "last_activity REAL NOT NULL, "
+            "activity_order INTEGER NOT NULL, "
+            "PRIMARY KEY (project_id, resource_field, resource))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS open_incidents_activity "
+            "ON open_incidents (activity_order)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS closed_incidents ("
+            "closed_order INTEGER PRIMARY KEY, "
+            "project_id TEXT NOT NULL, "
+            "resource_field TEXT NOT NULL, "
+            "resource TEXT NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "first_seen REAL NOT NULL, "
+            "last_seen REAL NOT NULL, "
+            "severity TEXT, "
+            "platform TEXT, "
+            "applications TEXT NOT NULL, "
+            "messages TEXT NOT NULL, "
+            "classification TEXT)"
+        )
+
+    def correlate(self, processed_log_entry: ProcessedLogEntry) -> bool:
+        """
+        Record an alert, returning True when it was merged into an open incident
+        and should not be sent.
+        """
+        with self._transaction():
+            return self._correlate(processed_log_entry)
+
+    def take_closed(self) -> List[Incident]:
+        """Remove and return the closed incidents which had alerts merged."""
+        with self._transaction():
+            self._close_expired(self._clock())
+            rows = self._connection.execute(
+                f"SELECT {_INCIDENT_COLUMNS} FROM closed_incidents "
+                "ORDER BY closed_order"
+            ).fetchall()
+            self._connection.execute("DELETE FROM closed_incidents")
+        return [_create_incident(row) for row in rows]
+
+    def restore(self, incident: Incident) -> None:
+        """Put back a closed incident which was taken but could not be sent."""
+        with self._transaction():
+            self._connection.execute(
+                f"INSERT INTO closed_incidents ({_INCIDENT_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    incident.project_id or "",
+                    incident.resource_field,
+                    incident.resource,
+                    incident.count,
+                    incident.first_seen.timestamp(),
+                    incident.last_seen.timestamp(),
+                    incident.severity,
+                    incident.platform,
+                    json.dumps(incident.applications),
+                    json.dumps(incident.messages),
+                    incident.classification,
+                ),
+            )
+
+    def _correlate(self, processed_log_entry: ProcessedLogEntry) -> bool:
+        now = self._clock()
+        self._close_expired(now)
+
+        resource_key = resource_key_for(processed_log_entry)
+        if resource_key is None:
+            return False
+        # Resources are named within a project, so incidents are kept by both.
+        # Entries without a project are stored with an empty one, as a primary
+        # key column cannot hold NULLs which compare equal.
+        key = (processed_log_entry.project_id or "",) + resource_key
+
+        seen_at = (
+            processed_log_entry.timestamp.timestamp()
+            if processed_log_entry.timestamp is not None
+            else now
+        )
+        message = (processed_log_entry.message or "").split("\n", 1)[0]
+        application = processed_log_entry.application or "[unknown]"
+
+        row = self._connection.execute(
+            "SELECT count, first_seen, last_seen, severity, applications, "
+            "messages, opened_at FROM open_incidents "
+            "WHERE project_id = ? AND resource_field = ? AND resource = ?",
+            key,
+        ).fetchone()
+        if row is not None:
+            (
+                count,
+                first_seen,
+                last_seen,
+                severity,
+                applications,
+                messages,
+                opened_at,
+            ) = row
+            # An alert more severe than the one which opened the incident is
+            # sent rather than being hidden in its summary.
+            if now - opened_at < self._max_incident_seconds and (
+                severity_rank(processed_log_entry.severity) or 0
+            ) <= (severity_rank(severity) or 0):
+                self._connection.execute(
+                    "UPDATE open_incidents SET "
+                    "count = ?, first_seen = ?, last_seen = ?, applications = ?, "
+                    "messages = ?, last_activity = ?, activity_order = ? "
+                    "WHERE project_id = ? AND resource_field = ? AND resource = ?",
+                    (
+                        count + 1,
+                        min(first_seen, seen_at),
+                        max(last_seen, seen_at),
+                        _with(applications, application),
+                        _with(messages, message, MAX_INCIDENT_MESSAGES),
+                        now,
+                        self._next_activity_order(),
+                    )
+                    + key,
+                )
+                return True
+            self._close(key)
+
+        self._connection.execute(
+            "INSERT INTO open_incidents VALUES "
+            "(?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            key
+            + (
+                seen_at,
+                seen_at,
+                processed_log_entry.severity,
+                processed_log_entry.platform,
+                json.dumps([application]),
+                json.dumps([message]),
+                (
+                    self._classify(processed_log_entry)
+                    if self._classify is not None
+                    else None
+                ),
+                now,
+                now,
+                self._next_activity_order(),
+            ),
+        )
+        if len(self) > self._max_incidents:
+            (least_recent,) = self._connection.execute(
+                "SELECT project_id, resource_field, resource FROM open_incidents "
+                "ORDER BY activity_order LIMIT 1"
+            ).fetchall()
+            self._close(least_recent)
+        return False
+
+    def _close_expired(self, now: float) -> None:
+        expired = self._connection.execute(
+            "SELECT project_id, resource_field, resource FROM open_incidents "
+            "WHERE last_activity <= ? ORDER BY activity_order",
+            (now - self._window_seconds,),
+        ).fetchall()
+        for key in expired:
+            self._close(key)
+
+    def _close(self, key: Tuple[str, str, str]) -> None:
+        # Incidents without merged alerts have nothing to summarise.
+        self._connection.execute(
+            f"INSERT INTO closed_incidents ({_INCIDENT_COLUMNS}) "
+            f"SELECT {_INCIDENT_COLUMNS} FROM open_incidents "
+            "WHERE project_id = ? AND resource_field = ? AND resource = ? "
+            "AND count > 1",
+            key,
+        )
+        self._connection.execute(
+            "DELETE FROM open_incidents "
+            "WHERE project_id = ? AND resource_field = ? AND resource = ?",
+            key,
+        )
+
+    def _next_activity_order(self) -> int:
+        # Worked out in the database, so processes sharing it agree on it.
+        (order,) = self._connection.execute(
+            "SELECT COALESCE(MAX(activity_order), 0) + 1 FROM open_incidents"
+        ).fetchone()
+        return order
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def __len__(self) -> int:
+        (count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM open_incidents"
+        ).fetchone()
+        return count
+
+
+def _with(encoded: str, value: str, limit: Optional[int] = None) -> str:
+    values: List[str] = json.loads(encoded)
+    if value not in values and (limit is None or len(values) < limit):
+        values.append(value)
+    return json.dumps(values)
+
+
+def _create_incident(row: tuple) -> Incident:
+    (
+        project_id,
+        resource_field,
+        resource,
+        count,
+        first_seen,
+        last_seen,
+        severity,
+        platform,
+        applications,
+        messages,
+        classification,
+    ) = row
+    return Incident(
+        resource_field=resource_field,
+        resource=resource,
+        count=count,
+        first_seen=datetime.fromtimestamp(first_seen, timezone.utc),
+        last_seen=datetime.fromtimestamp(last_seen, timezone.utc),
+        severity=severity,
+        platform=platform,
+        applications=json.loads(applications),
+        messages=json.loads(messages),
+        project_id=project_id or None,
+        classification=classification,
+    )
+
+
+def resource_key_for(processed_log_entry: ProcessedLogEntry) -> Optional[ResourceKey]:
+    for resource_field in RESOURCE_FIELDS:
+        resource = processed_log_entry.log_query.get(resource_field)
+        if resource:
+            return resource_field, resource
+    return None
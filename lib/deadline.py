@@ -0,0 +1,39 @@
+import time
+from typing import Callable, Tuple
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class Deadline:
+    """
+    Time budget for handling one invocation.
+
+    Work which cannot finish within the budget should be spooled or left for
+    PubSub to redeliver rather than running past the function timeout, which
+    would lead to the message being redelivered and handled twice.
+    """
+
+    def __init__(
+        self,
+        budget_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.budget_seconds = budget_seconds
+        self._clock = clock
+        self._expires_at = clock() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def limit_timeout(self, timeout: Tuple[float, float]) -> Tuple[float, float]:
+        """Shorten a (connect, read) timeout so it ends by the deadline."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("The deadline for this invocation has passed")
+        connect_timeout, read_timeout = timeout
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
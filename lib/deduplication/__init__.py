@@ -0,0 +1,7 @@
+from lib.deduplication.seen_message_ids import (  # noqa: F401
+    InMemorySeenMessageIds,
+    SeenMessageIds,
+)
+from lib.deduplication.sqlite_seen_message_ids import (  # noqa: F401
+    SqliteSeenMessageIds,
+)
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Protocol, Set
+
+
+class SeenMessageIds(Protocol):
+    def contains(self, message_id: str) -> bool:
+        raise NotImplementedError()
+
+    def reserve(self, message_id: str) -> bool:
+        """
+        Reserve a message ID for handling, unless it has been seen or is
+        already reserved. Returns whether it was reserved. The reservation ends
+        with add once the message is handled, or release if it was not.
+        """
+        raise NotImplementedError()
+
+    def release(self, message_id: str) -> None:
+        raise NotImplementedError()
+
+    def add(self, message_id: str) -> None:
+        raise NotImplementedError()
+
+
+class InMemorySeenMessageIds:
+    """
+    Bounded record of PubSub message IDs which have already been handled.
+
+    PubSub delivers at-least-once, so a message may arrive again after a slow or
+    failed acknowledgement, even while the first delivery is still being
+    handled. The oldest IDs are evicted once max_size is reached.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._max_size = max_size
+        self._message_ids: OrderedDict[str, None] = OrderedDict()
+        self._reserved: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def contains(self, message_id: str) -> bool:
+        return message_id in self._message_ids
+
+    def reserve(self, message_id: str) -> bool:
+        with self._lock:
+            if message_id in self._message_ids or message_id in self._reserved:
+                return False
+            self._reserved.add(message_id)
+            return True
+
+    def release(self, message_id: str) -> None:
+        with self._lock:
+            self._reserved.discard(message_id)
+
+    def add(self, message_id: str) -> None:
+        with self._lock:
+            self._reserved.discard(message_id)
+            if message_id in self._message_ids:
+                self._message_ids.move_to_end(message_id)
+                return
+
+            self._message_ids[message_id] = None
+            if len(self._message_ids) > self._max_size:
+                self._message_ids.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._message_ids)
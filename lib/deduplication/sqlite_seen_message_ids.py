@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+from typing import Set
+
+
+class SqliteSeenMessageIds:
+    """
+    Bounded record of handled PubSub message IDs, persisted in a local SQLite file
+    so that it survives restarts of the process.
+
+    The oldest IDs are evicted once max_size is reached. Reservations are kept
+    in memory only, so a message whose handling was cut short by a restart is
+    handled again when it is redelivered. Like the reservations, the order of
+    IDs is kept by the process, so one file must not be shared by several.
+    """
+
+    def __init__(self, path: str, max_size: int = 10000):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._max_size = max_size
+        self._reserved: Set[str] = set()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen_message_ids "
+            "(message_id TEXT PRIMARY KEY, seen_order INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS seen_message_ids_order "
+            "ON seen_message_ids (seen_order)"
+        )
+        self._connection.commit()
+        self._next_order = self._load_next_order()
+
+    def contains(self, message_id: str) -> bool:
+        with self._lock:
+            return self._contains(message_id)
+
+    def reserve(self, message_id: str) -> bool:
+        with self._lock:
+            if message_id in self._reserved or self._contains(message_id):
+                return False
+            self._reserved.add(message_id)
+            return True
+
+    def release(self, message_id: str) -> None:
+        with self._lock:
+            self._reserved.discard(message_id)
+
+    def add(self, message_id: str) -> None:
+        with self._lock:
+            self._reserved.discard(message_id)
+            order = self._next_order
+            self._next_order += 1
+            self._connection.execute(
+                "INSERT OR REPLACE INTO seen_message_ids (message_id, seen_order) "
+                "VALUES (?, ?)",
+                (message_id, order),
+            )
+            self._connection.execute(
+                "DELETE FROM seen_message_ids WHERE seen_order <= ?",
+                (order - self._max_size,),
+            )
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM seen_message_ids"
+            ).fetchone()
+        return count
+
+    def _contains(self, message_id: str) -> bool:
+        row = self._connection.execute(
+            "SELECT 1 FROM seen_message_ids WHERE message_id = ?", (message_id,)
+        ).fetchone()
+        return row is not None
+
+    def _load_next_order(self) -> int:
+        (max_order,) = self._connection.execute(
+            "SELECT MAX(seen_order) FROM seen_message_ids"
+        ).fetchone()
+        return 0 if max_order is None else max_order + 1
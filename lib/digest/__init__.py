@@ -0,0 +1 @@
+from lib.digest.digest_buffer import DigestBuffer, DigestGroup  # noqa: F401
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from lib.cloud_logging import severity_rank
+from lib.log_processor import ProcessedLogEntry, fingerprint
+
+
+@dataclass(frozen=True)
+class DigestGroup:
+    application: str
+    fingerprint: str
+    window_start: datetime
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+    severity: Optional[str]
+    platform: Optional[str]
+    message: str
+    log_query: Dict[str, str]
+    # The project named in the entries' logName, if any.
+    project_id: Optional[str] = field(default=None)
+    # The playbook the first entry was classified under, so the digest is
+    # routed as its entries would have been.
+    classification: Optional[str] = field(default=None)
+
+
+class DigestBuffer:
+    """
+    Local buffer of low-severity alerts to be sent as periodic digests.
+
+    Entries with a severity below below_severity are grouped by project,
+    application and fingerprint within fixed windows of window_seconds. Only one row is kept
+    per group, so the buffer grows with the number of distinct problems rather
+    than the number of entries.
+
+    Each group keeps the classification, from classify, of its first entry.
+
+    Instances only share a buffer when path is on storage they all mount; the
+    default, like a file under /tmp on Cloud Functions, is private to one.
+    """
+
+    def __init__(
+        self,
+        below_severity: str = "ERROR",
+        window_seconds: int = 900,
+        path: str = ":memory:",
+        classify: Optional[Callable[[ProcessedLogEntry], Optional[str]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        threshold = severity_rank(below_severity)
+        if threshold is None:
+            raise ValueError(f"Unknown severity '{below_severity}'")
+        if window_seconds < 1:
+            raise ValueError("window_seconds must be at least 1")
+
+        self._threshold = threshold
+        self._window_seconds = window_seconds
+        self._classify = classify
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS digest_groups ("
+            "project_id TEXT NOT NULL, "
+            "application TEXT NOT NULL, "
+            "fingerprint TEXT NOT NULL, "
+            "window_start INTEGER NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "first_seen REAL NOT NULL, "
+            "last_seen REAL NOT NULL, "
+            "severity TEXT, "
+            "platform TEXT, "
+            "message TEXT NOT NULL, "
+            "log_query TEXT NOT NULL, "
+            "classification TEXT, "
+            "PRIMARY KEY (project_id, application, fingerprint, window_start))"
+        )
+        self._connection.commit()
+
+    def should_defer(self, processed_log_entry: ProcessedLogEntry) -> bool:
+        rank = severity_rank(processed_log_entry.severity)
+        return rank is not None and rank < self._threshold
+
+    def add(self, processed_log_entry: ProcessedLogEntry) -> None:
+        now = self._clock()
+        window_start = int(now // self._window_seconds) * self._window_seconds
+        seen_at = (
+            processed_log_entry.timestamp.timestamp()
+            if processed_log_entry.timestamp is not None
+            else now
+        )
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO digest_groups VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, application, fingerprint, window_start) "
+                "DO UPDATE SET "
+                "count = count + 1, "
+                "first_seen = MIN(first_seen, excluded.first_seen), "
+                "last_seen = MAX(last_seen, excluded.last_seen)",
+                (
+                    processed_log_entry.project_id or "",
+                    processed_log_entry.application or "[unknown]",
+                    fingerprint(processed_log_entry),
+                    window_start,
+                    seen_at,
+                    seen_at,
+                    processed_log_entry.severity,
+                    processed_log_entry.platform,
+                    (processed_log_entry.message or "").split("\n", 1)[0],
+                    json.dumps(processed_log_entry.log_query),
+                    (
+                        self._classify(processed_log_entry)
+                        if self._classify is not None
+                        else None
+                    ),
+                ),
+            )
+            self._connection.commit()
+
+    def take_ready(self) -> List[DigestGroup]:
+        """Remove and return the groups whose window has ended."""
+        current_window_start = self._clock() - self._window_seconds
+        return self._take("WHERE window_start <= ?", (current_window_start,))
+
+    def take_all(self) -> List[DigestGroup]:
+        return self._take("", ())
+
+    def _take(self, where: str, parameters: tuple) -> List[DigestGroup]:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT * FROM digest_groups {where} "
+                "ORDER BY window_start, first_seen",
+                parameters,
+            ).fetchall()
+            self._connection.execute(f"DELETE FROM digest_groups {where}", parameters)
+            self._connection.commit()
+
+        return [_create_digest_group(row) for row in rows]
+
+    def restore(self, group: DigestGroup) -> None:
+        """
+        Put back a group which was taken but could not be sent, merging it with
+        any entries added to its window since.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO digest_groups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, application, fingerprint, window_start) "
+                "DO UPDATE SET "
+                "count = count + excluded.count, "
+                "first_seen = MIN(first_seen, excluded.first_seen), "
+                "last_seen = MAX(last_seen, excluded.last_seen)",
+                (
+                    group.project_id or "",
+                    group.application,
+                    group.fingerprint,
+                    int(group.window_start.timestamp()),
+                    group.count,
+                    group.first_seen.timestamp(),
+                    group.last_seen.timestamp(),
+                    group.severity,
+                    group.platform,
+                    group.message,
+                    json.dumps(group.log_query),
+                    group.classification,
+                ),
+            )
+            self._connection.commit()
+
+
+def _create_digest_group(row: tuple) -> DigestGroup:
+    (
+        project_id,
+        application,
+        group_fingerprint,
+        window_start,
+        count,
+        first_seen,
+        last_seen,
+        severity,
+        platform,
+        message,
+        log_query,
+        classification,
+    ) = row
+    return DigestGroup(
+        application=application,
+        fingerprint=group_fingerprint,
+        window_start=datetime.fromtimestamp(window_start, timezone.utc),
+        count=count,
+        first_seen=datetime.fromtimestamp(first_seen, timezone.utc),
+        last_seen=datetime.fromtimestamp(last_seen, timezone.utc),
+        severity=severity,
+        platform=platform,
+        message=message,
+        log_query=json.loads(log_query),
+        # Entries without a project are stored with an empty one, as a primary
+        # key column cannot hold NULLs which compare equal.
+        project_id=project_id or None,
+        classification=classification,
+    )
@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Mapping
 
 from lib.log_processor import ProcessedLogEntry
 
@@ -9,7 +10,7 @@ def agent_connect_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.platform != "gce_instance":
         return False
 
-    if not isinstance(entry_data, dict) or "description" not in entry_data:
+    if not isinstance(entry_data, Mapping) or "description" not in entry_data:
         return False
 
     if (
@@ -1,5 +1,6 @@
 import logging
 
+from lib.cloud_logging import Environment
 from lib.log_processor import ProcessedLogEntry
 
 
@@ -10,18 +11,6 @@ def _is_failed_to_install(log_entry: ProcessedLogEntry) -> bool:
     return False
 
 
-def _is_preprod(log_name: str) -> bool:
-    if "ons-blaise-v2-preprod" in log_name:
-        return True
-    return False
-
-
-def _is_training(log_name: str) -> bool:
-    if "ons-blaise-v2-dev-training" in log_name:
-        return True
-    return False
-
-
 def all_preprod_and_training_alerts_except_erroneous_questionnaire_filter(
     log_entry: ProcessedLogEntry,
 ) -> bool:
@@ -31,11 +20,13 @@ def all_preprod_and_training_alerts_except_erroneous_questionnaire_filter(
     if not log_entry.log_name:
         return False
 
-    if "ons-blaise-v2-prod" in log_entry.log_name:
+    log_name = log_entry.parsed_log_name
+    if log_name is None or log_name.environment is Environment.PROD:
         return False
 
-    if (
-        _is_preprod(log_entry.log_name) or _is_training(log_entry.log_name)
+    if log_name.environment in (
+        Environment.PREPROD,
+        Environment.TRAINING,
     ) and _is_failed_to_install(log_entry):
         return False
 
@@ -1,10 +1,11 @@
 import logging
+from collections.abc import Mapping
 
 from lib.log_processor import ProcessedLogEntry
 
 
 def auditlog_filter(log_entry: ProcessedLogEntry) -> bool:
-    if not isinstance(log_entry.data, dict):
+    if not isinstance(log_entry.data, Mapping):
         return False
 
     if log_entry.data.get("@type") != "type.googleapis.com/google.cloud.audit.AuditLog":
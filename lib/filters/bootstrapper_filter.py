@@ -17,12 +17,7 @@ def bootstrapper_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.platform != "gce_instance":
         return False
 
-    if (
-        "Failed to execute job MTLS_MDS_Credential_Boostrapper with error:"
-        not in log_entry.message
-        and "Failed to schedule job MTLS_MDS_Credential_Boostrapper with error:"
-        not in log_entry.message
-    ):
+    if "bootstrapper" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping bootstrapper alert")
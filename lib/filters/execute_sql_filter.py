@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Mapping
 
 from lib.log_processor import ProcessedLogEntry
 
@@ -16,7 +17,7 @@ def execute_sql_filter(log_entry: ProcessedLogEntry) -> bool:
 
     if (
         log_entry is None
-        or not isinstance(log_entry.data, dict)
+        or not isinstance(log_entry.data, Mapping)
         or log_entry.data.get("methodName") != "cloudsql.instances.executeSql"
     ):
         return False
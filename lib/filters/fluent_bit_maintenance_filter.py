@@ -1,16 +1,26 @@
 import logging
-from typing import Optional
+from typing import Optional, Sequence
 
 from lib.log_processor import ProcessedLogEntry
 from lib.utilities.log_validation import validate_log_entry_fields
-from lib.utilities.weekly_maintenance_window import is_in_friday_maintenance_window
+from lib.utilities.weekly_maintenance_window import (
+    FRIDAY_MAINTENANCE_WINDOW,
+    WeeklyMaintenanceWindow,
+    is_in_maintenance_window,
+)
 
 
-def fluent_bit_maintenance_filter(log_entry: Optional[ProcessedLogEntry]) -> bool:
+def fluent_bit_maintenance_filter(
+    log_entry: Optional[ProcessedLogEntry],
+    maintenance_windows: Sequence[WeeklyMaintenanceWindow] = (
+        FRIDAY_MAINTENANCE_WINDOW,
+    ),
+) -> bool:
     """
     Filter fluent-bit related errors during weekly maintenance windows.
     These errors are expected during VM maintenance when connections are disrupted.
-    Activates only on Fridays around 01:30 AM UTC (1:25-1:35 AM window).
+    Activates only in maintenance_windows, by default Fridays around 01:30 AM UTC
+    (1:25-1:35 AM window).
 
     Handles:
     - TLS/SSL connection errors to Google Cloud Logging
@@ -32,12 +42,13 @@ def fluent_bit_maintenance_filter(log_entry: Optional[ProcessedLogEntry]) -> boo
     if not isinstance(log_entry.severity, str) or log_entry.severity != "ERROR":
         return False
 
-    if not log_entry.timestamp or not is_in_friday_maintenance_window(
-        log_entry.timestamp
+    if not log_entry.timestamp or not is_in_maintenance_window(
+        log_entry.timestamp, maintenance_windows
     ):
         return False
 
-    if not (log_entry.log_name and "ops-agent-fluent-bit" in log_entry.log_name):
+    log_name = log_entry.parsed_log_name
+    if log_name is None or "ops-agent-fluent-bit" not in log_name.log_id:
         return False
 
     fluent_bit_maintenance_indicators = [
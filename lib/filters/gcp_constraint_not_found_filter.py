@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Mapping
 from typing import Optional
 
 from lib.log_processor import ProcessedLogEntry
@@ -22,7 +23,7 @@ def org_policy_constraint_not_found_filter(
     if not isinstance(log_entry.message, str):
         return False
 
-    if not isinstance(log_entry.data, dict) or not isinstance(
+    if not isinstance(log_entry.data, Mapping) or not isinstance(
         log_entry.data.get("serviceName"), str
     ):
         return False
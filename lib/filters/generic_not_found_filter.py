@@ -1,5 +1,4 @@
 import logging
-import re
 
 from lib.log_processor import ProcessedLogEntry
 
@@ -15,17 +14,7 @@ def generic_not_found_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.severity != "ERROR":
         return False
 
-    uuid_pattern = (
-        r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
-    )
-
-    if (
-        'generic::not_found: Failed to fetch "latest' not in log_entry.message
-        and 'generic::not_found: Failed to fetch "version_' not in log_entry.message
-        and not re.search(
-            rf'generic::not_found: Failed to fetch "{uuid_pattern}"', log_entry.message
-        )
-    ):
+    if "generic_not_found" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping generic not found alert")
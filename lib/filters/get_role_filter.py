@@ -14,7 +14,7 @@ def get_role_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.severity != "ERROR":
         return False
 
-    if "You don't have permission to get the role at" not in log_entry.message:
+    if "get_role" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping get role alert")
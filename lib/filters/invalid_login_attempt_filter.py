@@ -14,7 +14,7 @@ def invalid_login_attempt_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.severity != "ERROR":
         return False
 
-    if 'Required "container.clusters.list" permission(s)' not in log_entry.message:
+    if "invalid_login_attempt" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping invalid login attempt alert")
@@ -13,7 +13,7 @@ def ip_space_exhausted_filter(log_entry: ProcessedLogEntry) -> bool:
     if not isinstance(log_entry.message, str):
         return False
 
-    if ("IP_SPACE_EXHAUSTED" or "ip_space_exhausted") not in log_entry.message:
+    if "ip_space_exhausted" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping ip space exhausted alert")
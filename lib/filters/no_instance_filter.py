@@ -14,10 +14,7 @@ def no_instance_filter(log_entry: ProcessedLogEntry) -> bool:
     if not isinstance(log_entry.message, str):
         return False
 
-    if (
-        "The request was aborted because there was no available instance"
-        not in log_entry.message
-    ):
+    if "no_available_instance" not in log_entry.matched_message_patterns:
         return False
 
     if log_entry.application not in [
@@ -32,10 +29,11 @@ def no_instance_filter(log_entry: ProcessedLogEntry) -> bool:
     ]:
         return False
 
-    if not isinstance(log_entry.log_name, str):
+    log_name = log_entry.parsed_log_name
+    if log_name is None:
         return False
 
-    if "cloudfunctions" not in log_entry.log_name:
+    if "cloudfunctions" not in log_name.log_id:
         return False
 
     logging.info("Skipping no instance agent alert")
@@ -1,14 +1,25 @@
 import logging
+from typing import Sequence
 
 from lib.log_processor import ProcessedLogEntry
 from lib.utilities.log_validation import validate_log_entry_fields
-from lib.utilities.weekly_maintenance_window import is_in_friday_maintenance_window
-
-
-def os_patch_maintenance_filter(log_entry: ProcessedLogEntry) -> bool:
+from lib.utilities.weekly_maintenance_window import (
+    FRIDAY_MAINTENANCE_WINDOW,
+    WeeklyMaintenanceWindow,
+    is_in_maintenance_window,
+)
+
+
+def os_patch_maintenance_filter(
+    log_entry: ProcessedLogEntry,
+    maintenance_windows: Sequence[WeeklyMaintenanceWindow] = (
+        FRIDAY_MAINTENANCE_WINDOW,
+    ),
+) -> bool:
     """
     Filter harmless VM shutdown/restart logs during weekly OS patch jobs, which causes VMs to restart.
-    Activates only on Fridays around 01:30 AM UTC (1:25-1:35 AM window).
+    Activates only in maintenance_windows, by default Fridays around 01:30 AM UTC
+    (1:25-1:35 AM window).
 
     Handles:
     - VM service termination/restart logs (Google Compute Engine services)
@@ -24,8 +35,8 @@ def os_patch_maintenance_filter(log_entry: ProcessedLogEntry) -> bool:
     ):
         return False
 
-    if not log_entry.timestamp or not is_in_friday_maintenance_window(
-        log_entry.timestamp
+    if not log_entry.timestamp or not is_in_maintenance_window(
+        log_entry.timestamp, maintenance_windows
     ):
         return False
 
@@ -84,8 +95,9 @@ def _matches_pattern(log_entry: ProcessedLogEntry, pattern: dict) -> bool:
         indicator in log_entry.message for indicator in pattern["indicators"]
     )
 
+    log_name = log_entry.parsed_log_name
     log_name_match = bool(
-        log_entry.log_name and pattern["log_name_contains"] in log_entry.log_name
+        log_name is not None and pattern["log_name_contains"] in log_name.log_id
     )
 
     return message_match and log_name_match
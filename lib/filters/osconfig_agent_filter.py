@@ -13,15 +13,17 @@ def osconfig_agent_filter(log_entry: ProcessedLogEntry) -> bool:
     if not isinstance(log_entry.message, str):
         return False
 
-    if "unexpected end of JSON input" not in log_entry.message:
+    matched_patterns = log_entry.matched_message_patterns
+    if "unexpected_end_of_json" not in matched_patterns:
         return False
 
-    if not isinstance(log_entry.log_name, str):
+    log_name = log_entry.parsed_log_name
+    if log_name is None:
         return False
 
     if (
-        "OSConfigAgent Error" not in log_entry.message
-        and "OSConfigAgent" not in log_entry.log_name
+        "osconfig_agent_error" not in matched_patterns
+        and "OSConfigAgent" not in log_name.log_id
     ):
         return False
 
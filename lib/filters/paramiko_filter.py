@@ -17,10 +17,10 @@ def paramiko_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.platform != "cloud_run_revision":
         return False
 
-    if ("site-packages/paramiko/sftp_file.py") not in log_entry.message:
-        return False
-
-    if ("ValueError: I/O operation on closed file.") not in log_entry.message:
+    if (
+        not {"paramiko_sftp_file", "io_on_closed_file"}
+        <= log_entry.matched_message_patterns
+    ):
         return False
 
     logging.info("Skipping paramiko error alert")
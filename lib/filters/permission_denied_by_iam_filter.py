@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Mapping
 
 from lib.log_processor import ProcessedLogEntry
 
@@ -16,7 +17,7 @@ def permission_denied_by_iam_filter(log_entry: ProcessedLogEntry) -> bool:
 
     if (
         log_entry is None
-        or not isinstance(log_entry.data, dict)
+        or not isinstance(log_entry.data, Mapping)
         or not isinstance(log_entry.data.get("requestMetadata"), dict)
         or not isinstance(
             log_entry.data.get("requestMetadata", {}).get("callerSuppliedUserAgent"),
@@ -29,7 +30,7 @@ def permission_denied_by_iam_filter(log_entry: ProcessedLogEntry) -> bool:
     ):
         return False
 
-    if "[AuditLog] permission denied by IAM" not in log_entry.message:
+    if "permission_denied_by_iam" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping permission denied by IAM alert")
@@ -14,7 +14,7 @@ def requested_entity_was_not_found_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.severity != "ERROR":
         return False
 
-    if "generic::not_found: Requested entity was not found." not in log_entry.message:
+    if "requested_entity_was_not_found" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping requested entity was not found alert")
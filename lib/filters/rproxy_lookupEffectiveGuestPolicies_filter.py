@@ -20,8 +20,8 @@ def rproxy_lookupEffectiveGuestPolicies_filter(log_entry: ProcessedLogEntry) ->
         return False
 
     if (
-        'Error running LookupEffectiveGuestPolicies: error calling LookupEffectiveGuestPolicies: code: "NotFound", message: "Requested entity was not found.", details: []'
-        not in log_entry.message
+        "rproxy_lookup_effective_guest_policies"
+        not in log_entry.matched_message_patterns
     ):
         return False
 
@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Mapping
 from typing import Optional
 
 from lib.log_processor import ProcessedLogEntry
@@ -34,7 +35,7 @@ def scc_dormant_accounts_prod_alert_filter(
         return False
 
     if (
-        not isinstance(log_entry.data, dict)
+        not isinstance(log_entry.data, Mapping)
         or not isinstance(log_entry.data.get("authenticationInfo"), dict)
         or not isinstance(
             log_entry.data.get("authenticationInfo", {}).get("principalEmail"),
@@ -14,7 +14,7 @@ def socket_exception_filter(log_entry: ProcessedLogEntry) -> bool:
     if log_entry.severity != "ERROR":
         return False
 
-    if "Socket exception: Connection reset by peer (104)" not in log_entry.message:
+    if "socket_connection_reset" not in log_entry.matched_message_patterns:
         return False
 
     logging.info("Skipping socket exception alert")
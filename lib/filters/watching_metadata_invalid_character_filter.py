@@ -14,20 +14,15 @@ def watching_metadata_invalid_character_filter(log_entry: ProcessedLogEntry) ->
     if not isinstance(log_entry.message, str):
         return False
 
-    if not isinstance(log_entry.log_name, str):
+    log_name = log_entry.parsed_log_name
+    if log_name is None:
         return False
 
-    if (
-        "Error watching metadata: invalid character '<' looking for beginning of value"
-        not in log_entry.message
-    ):
+    if "watching_metadata_invalid_character" not in log_entry.matched_message_patterns:
         return False
 
     if log_entry.log_name:
-        if (
-            "/winevt.raw" not in log_entry.log_name
-            and "/GCEGuestAgent" not in log_entry.log_name
-        ):
+        if not log_name.log_id.startswith(("winevt.raw", "GCEGuestAgent")):
             return False
 
     logging.info("Skipping watching metadata invalid character alert")
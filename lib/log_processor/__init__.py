@@ -3,6 +3,7 @@ from lib.log_processor.app_log_payload_factories import (  # noqa: F401
     APP_LOG_PAYLOAD_FACTORIES,
     CreateAppLogPayloadFromLogEntry,
 )
+from lib.log_processor.fingerprint import fingerprint  # noqa: F401
 from lib.log_processor.process_log_entry import NoMatchingLogTypeFound  # noqa: F401
 from lib.log_processor.process_log_entry import process_log_entry  # noqa: F401
 from lib.log_processor.processed_log_entry import ProcessedLogEntry  # noqa: F401
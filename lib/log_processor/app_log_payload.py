@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 
 @dataclass(frozen=True)
 class AppLogPayload:
     message: str
-    data: str | Dict[str, Any]
+    data: str | Mapping[str, Any]
     platform: Optional[str]
     application: Optional[str]
     log_query: Dict[str, str] = field(default_factory=dict)
@@ -0,0 +1,31 @@
+import hashlib
+import re
+
+from lib.log_processor.processed_log_entry import ProcessedLogEntry
+
+_VARIABLE_PARTS = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+    r"|0x[0-9a-fA-F]+"
+    r"|\d+"
+)
+
+
+def fingerprint(processed_log_entry: ProcessedLogEntry) -> str:
+    """
+    Identify log entries which describe the same problem.
+
+    Entries share a fingerprint when they come from the same platform and
+    application, have the same severity and have the same first message line
+    once IDs and numbers are removed.
+    """
+    message = (processed_log_entry.message or "").split("\n", 1)[0]
+    normalised_message = _VARIABLE_PARTS.sub("#", message)
+    key = "\x1f".join(
+        [
+            processed_log_entry.platform or "",
+            processed_log_entry.application or "",
+            processed_log_entry.severity or "",
+            normalised_message,
+        ]
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
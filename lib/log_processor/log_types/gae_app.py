@@ -1,8 +1,8 @@
-from copy import copy
-from typing import Any, Dict, Optional, Union
+from typing import Any, List, Mapping, Optional, Union
 
 from lib.cloud_logging import LogEntry
 from lib.log_processor.app_log_payload import AppLogPayload
+from lib.utilities.key_excluding_view import KeyExcludingView
 
 
 def attempt_create(entry: LogEntry) -> Optional[AppLogPayload]:
@@ -10,17 +10,15 @@ def attempt_create(entry: LogEntry) -> Optional[AppLogPayload]:
         return None
 
     message = "Unknown error"
-    data: Union[str, Dict[str, Any]] = ""
+    data: Union[str, Mapping[str, Any]] = ""
 
     if isinstance(entry.payload, str):
         message = entry.payload
     else:
-        data = copy(entry.payload)
-
-        data.pop("moduleId", None)
+        hidden: List[str] = ["moduleId"]
 
         if "message" in entry.payload:
-            data.pop("message", None)
+            hidden.append("message")
             message = entry.payload["message"]
         elif (
             "line" in entry.payload
@@ -29,9 +27,11 @@ def attempt_create(entry: LogEntry) -> Optional[AppLogPayload]:
             and isinstance(entry.payload["line"][0], dict)
             and "logMessage" in entry.payload["line"][0]
         ):
-            data.pop("line", None)
+            hidden.append("line")
             message = entry.payload["line"][0]["logMessage"]
 
+        data = KeyExcludingView(entry.payload, hidden)
+
     application = entry.resource_labels.get("module_id", None)
 
     log_query = {"resource.type": "gae_app"}
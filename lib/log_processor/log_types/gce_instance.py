@@ -1,35 +1,34 @@
-from copy import copy
 from typing import Optional
 
 from lib.cloud_logging import LogEntry
 from lib.log_processor.app_log_payload import AppLogPayload
+from lib.utilities.key_excluding_view import KeyExcludingView
 
 
 def attempt_create(entry: LogEntry) -> Optional[AppLogPayload]:
     if entry.resource_type != "gce_instance":
         return None
 
+    log_query = {"resource.type": "gce_instance"}
+
+    if "instance_id" in entry.resource_labels:
+        log_query["resource.labels.instance_id"] = entry.resource_labels["instance_id"]
+
     if isinstance(entry.payload, str):
         return AppLogPayload(
             message=entry.payload,
             data="",
             platform="gce_instance",
             application="[unknown]",
+            log_query=log_query,
         )
 
     message = "Unknown Error"
 
-    log_query = {"resource.type": "gce_instance"}
-
-    if "instance_id" in entry.resource_labels:
-        log_query["resource.labels.instance_id"] = entry.resource_labels["instance_id"]
-
     if "message" in entry.payload:
         message = entry.payload["message"]
 
-    data = copy(entry.payload)
-    data.pop("message", None)
-    data.pop("computer_name", None)
+    data = KeyExcludingView(entry.payload, ["message", "computer_name"])
 
     return AppLogPayload(
         message=message,
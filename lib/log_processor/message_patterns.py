@@ -0,0 +1,126 @@
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+_UUID = r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+
+# Rule ID to the regex it finds in log messages, for the filters. Each pattern
+# must start with a literal character, see _compile, and have no alternation
+# outside a group, see _literal_prefix.
+MESSAGE_PATTERNS: Dict[str, str] = {
+    "generic_not_found": rf'generic::not_found: Failed to fetch "(?:latest|version_|{_UUID}")',
+    "bootstrapper": r"Failed to (?:execute|schedule) job MTLS_MDS_Credential_Boostrapper with error:",
+    "get_role": re.escape("You don't have permission to get the role at"),
+    "invalid_login_attempt": re.escape(
+        'Required "container.clusters.list" permission(s)'
+    ),
+    "ip_space_exhausted": re.escape("IP_SPACE_EXHAUSTED"),
+    "no_available_instance": re.escape(
+        "The request was aborted because there was no available instance"
+    ),
+    "unexpected_end_of_json": re.escape("unexpected end of JSON input"),
+    "osconfig_agent_error": re.escape("OSConfigAgent Error"),
+    "paramiko_sftp_file": re.escape("site-packages/paramiko/sftp_file.py"),
+    "io_on_closed_file": re.escape("ValueError: I/O operation on closed file."),
+    "permission_denied_by_iam": re.escape("[AuditLog] permission denied by IAM"),
+    "requested_entity_was_not_found": re.escape(
+        "generic::not_found: Requested entity was not found."
+    ),
+    "rproxy_lookup_effective_guest_policies": re.escape(
+        'Error running LookupEffectiveGuestPolicies: error calling LookupEffectiveGuestPolicies: code: "NotFound", message: "Requested entity was not found.", details: []'
+    ),
+    "socket_connection_reset": re.escape(
+        "Socket exception: Connection reset by peer (104)"
+    ),
+    "watching_metadata_invalid_character": re.escape(
+        "Error watching metadata: invalid character '<' looking for beginning of value"
+    ),
+}
+
+
+def _compile(patterns: Dict[str, str]) -> "re.Pattern[str]":
+    # Each alternative is a named group, so a match tells which rule it was
+    # for. The first character of each pattern is kept outside its group: re
+    # only skips ahead to possible starts of an alternation whose branches all
+    # begin with a literal, which makes one pass faster than a search per rule.
+    branches = []
+    for rule_id, pattern in patterns.items():
+        first, rest = _split_first_character(pattern)
+        branches.append(f"{first}(?P<{rule_id}>{rest})")
+    return re.compile("|".join(branches))
+
+
+def _split_first_character(pattern: str) -> Tuple[str, str]:
+    if pattern[:1] == "\\" and not pattern[1:2].isalnum():
+        return pattern[:2], pattern[2:]
+    if pattern[:1].isalnum() or pattern[:1] in "\"'<>:-_ /":
+        return pattern[:1], pattern[1:]
+    raise ValueError(f"Message pattern must start with a literal: {pattern}")
+
+
+def _literal_prefix(pattern: str) -> str:
+    # The text every match of pattern starts with, up to its first special
+    # character. A character made optional or repeated by a quantifier is not
+    # part of it.
+    literal: List[str] = []
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if character == "\\" and not pattern[index + 1 : index + 2].isalnum():
+            literal.append(pattern[index + 1 : index + 2])
+            index += 2
+        elif character in "\\.^$*+?{}[]|()":
+            if character in "*?{" and literal:
+                literal.pop()
+            break
+        else:
+            literal.append(character)
+            index += 1
+    return "".join(literal)
+
+
+_PROGRAM = _compile(MESSAGE_PATTERNS)
+
+# Messages longer than this are searched rule by rule, each behind an `in`
+# check of its literal prefix. The substring search skips through a long
+# message much faster than the combined program, which steps through it one
+# character at a time, while for short messages one pass is cheaper than a
+# check per rule; see scripts/benchmarks/message_patterns.py.
+LONG_MESSAGE_CHARS = 1024
+
+
+def _rule(pattern: str) -> Tuple[str, Optional["re.Pattern[str]"]]:
+    # A pattern which matches its own prefix is found wherever the prefix is,
+    # so needs no search of its own.
+    prefix = _literal_prefix(pattern)
+    if re.fullmatch(pattern, prefix):
+        return prefix, None
+    return prefix, re.compile(pattern)
+
+
+_RULES: List[Tuple[str, str, Optional["re.Pattern[str]"]]] = [
+    (rule_id, *_rule(pattern)) for rule_id, pattern in MESSAGE_PATTERNS.items()
+]
+
+
+def matched_message_patterns(message: str) -> FrozenSet[str]:
+    """
+    The IDs of the rules in MESSAGE_PATTERNS found in message.
+
+    A short message is matched in one pass of the combined program, in which
+    matches do not overlap, so a rule whose match would start inside another
+    rule's match is not reported; the patterns above are distinct enough for
+    that not to happen.
+
+    The filters use ProcessedLogEntry.matched_message_patterns, which calls
+    this once for each entry.
+    """
+    if len(message) > LONG_MESSAGE_CHARS:
+        return frozenset(
+            rule_id
+            for rule_id, prefix, program in _RULES
+            if prefix in message
+            and (program is None or program.search(message) is not None)
+        )
+    return frozenset(
+        match.lastgroup for match in _PROGRAM.finditer(message) if match.lastgroup
+    )
@@ -1,18 +1,30 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Union, cast
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    Optional,
+    Union,
+    cast,
+)
 
 from dateutil.parser import ParserError, parse
 
-from lib.cloud_logging import LogEntry
+from lib.cloud_logging import LogEntry, LogName, parse_log_name
 from lib.log_processor.app_log_payload import AppLogPayload
+from lib.log_processor.message_patterns import matched_message_patterns
 
 
 @dataclass(frozen=True)
 class ProcessedLogEntry:
     message: Optional[str]
-    data: Union[str, Dict[str, Any]] = field(
-        default_factory=cast(Callable[[], Dict[str, Any]], dict)
+    data: Union[str, Mapping[str, Any]] = field(
+        default_factory=cast(Callable[[], Mapping[str, Any]], dict)
     )
     severity: Optional[str] = field(default=None)
     platform: Optional[str] = field(default=None)
@@ -21,6 +33,33 @@ class ProcessedLogEntry:
     timestamp: Optional[datetime] = field(default=None)
     log_query: Dict[str, str] = field(default_factory=dict)
     most_important_values: Optional[List[str]] = field(default=None)
+    suppressed_count: int = field(default=0)
+
+    @property
+    def parsed_log_name(self) -> Optional[LogName]:
+        """
+        The project, log ID and environment from log_name, parsed once for each
+        distinct name and shared by every filter.
+        """
+        if not isinstance(self.log_name, str):
+            return None
+        return parse_log_name(self.log_name)
+
+    @property
+    def project_id(self) -> Optional[str]:
+        """The project named in log_name, if any."""
+        log_name = self.parsed_log_name
+        return log_name.project_id if log_name is not None else None
+
+    @cached_property
+    def matched_message_patterns(self) -> FrozenSet[str]:
+        """
+        The IDs of the message patterns found in message, worked out the first
+        time a filter asks and kept with the entry for the others.
+        """
+        if not isinstance(self.message, str):
+            return frozenset()
+        return matched_message_patterns(self.message)
 
 
 def create_processed_log_entry(
@@ -0,0 +1,6 @@
+from lib.profiling.invocation_profiler import InvocationProfiler  # noqa: F401
+from lib.profiling.memory_tracker import (  # noqa: F401
+    MemoryTracker,
+    memory_stage,
+    track_memory,
+)
@@ -0,0 +1,195 @@
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+FunctionKey = Tuple[str, int, str]
+
+
+class InvocationProfiler:
+    """
+    Profile a sample of invocations on production traffic.
+
+    Every every_n-th invocation runs under cProfile. Otherwise, when
+    slow_seconds is set, a background thread starts sampling the invoking
+    thread's stack once the invocation has run for slow_seconds, so only slow
+    invocations pay for it and the samples show where they spent their time.
+
+    Either way the top_n functions by cumulative time, or by the share of stack
+    samples they appear in, are logged as one structured "Invocation profile"
+    entry. Only one invocation is profiled with cProfile at a time.
+    """
+
+    def __init__(
+        self,
+        every_n: Optional[int] = None,
+        slow_seconds: Optional[float] = None,
+        top_n: int = 20,
+        sample_interval_seconds: float = 0.005,
+    ):
+        if every_n is not None and every_n < 1:
+            raise ValueError("every_n must be at least 1")
+
+        self._every_n = every_n
+        self._slow_seconds = slow_seconds
+        self._top_n = top_n
+        self._sample_interval_seconds = sample_interval_seconds
+        self._invocations = 0
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            self._invocations += 1
+            invocation = self._invocations
+
+        if (
+            self._every_n is not None
+            and invocation % self._every_n == 0
+            and self._cprofile_lock.acquire(blocking=False)
+        ):
+            try:
+                return self._run_with_cprofile(invocation, function, *args)
+            finally:
+                self._cprofile_lock.release()
+
+        if self._slow_seconds is not None:
+            return self._run_with_stack_sampler(invocation, function, *args)
+
+        return function(*args)
+
+    def _run_with_cprofile(
+        self, invocation: int, function: Callable[..., T], *args: Any
+    ) -> T:
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profile.runcall(function, *args)
+        finally:
+            duration = time.perf_counter() - started
+            _log_profile(
+                "cprofile", invocation, duration, _top_cumulative(profile, self._top_n)
+            )
+
+    def _run_with_stack_sampler(
+        self, invocation: int, function: Callable[..., T], *args: Any
+    ) -> T:
+        sampler = _StackSampler(
+            threading.get_ident(),
+            self._slow_seconds or 0,
+            self._sample_interval_seconds,
+        )
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            if sampler.samples > 0:
+                _log_profile(
+                    "stack_sampler",
+                    invocation,
+                    duration,
+                    sampler.top_cumulative(self._top_n),
+                )
+
+
+class _StackSampler:
+    def __init__(
+        self, thread_id: int, delay_seconds: float, interval_seconds: float
+    ) -> None:
+        self.samples = 0
+        self._thread_id = thread_id
+        self._delay_seconds = delay_seconds
+        self._interval_seconds = interval_seconds
+        self._counts: Counter[FunctionKey] = Counter()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._done.set()
+        self._thread.join()
+
+    def top_cumulative(self, top_n: int) -> List[Dict[str, Any]]:
+        return [
+            dict(
+                function=_describe(key),
+                samples=count,
+                share=round(count / self.samples, 3),
+            )
+            for key, count in self._counts.most_common(top_n)
+        ]
+
+    def _sample(self) -> None:
+        if self._done.wait(self._delay_seconds):
+            return
+        while not self._done.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                return
+            # Count each function once per sample, however deep it recurses.
+            seen: Set[FunctionKey] = set()
+            while frame is not None:
+                code = frame.f_code
+                seen.add((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self._counts.update(seen)
+            self.samples += 1
+            self._done.wait(self._interval_seconds)
+
+
+def _top_cumulative(profile: cProfile.Profile, top_n: int) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        dict(
+            function=_describe(key),
+            calls=calls,
+            total_seconds=round(total_seconds, 6),
+            cumulative_seconds=round(cumulative_seconds, 6),
+        )
+        for key, (_primitive, calls, total_seconds, cumulative_seconds, _) in rows[
+            :top_n
+        ]
+    ]
+
+
+def _describe(key: FunctionKey) -> str:
+    filename, line, name = key
+    if filename == "~":
+        return name
+    return f"{_short_path(filename)}:{line}({name})"
+
+
+def _short_path(filename: str) -> str:
+    cwd = os.getcwd()
+    if filename.startswith(cwd + os.sep):
+        return filename[len(cwd) + 1 :]
+    return os.sep.join(filename.split(os.sep)[-2:])
+
+
+def _log_profile(
+    mode: str, invocation: int, duration: float, top: List[Dict[str, Any]]
+) -> None:
+    logging.info(
+        "Invocation profile",
+        extra=dict(
+            json_fields=dict(
+                mode=mode,
+                invocation=invocation,
+                duration_seconds=round(duration, 6),
+                top=top,
+            )
+        ),
+    )
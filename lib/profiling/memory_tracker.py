@@ -0,0 +1,97 @@
+import contextlib
+import logging
+import threading
+import tracemalloc
+from contextvars import ContextVar
+from typing import ContextManager, Dict, Iterator, Optional
+
+_current_tracker: ContextVar[Optional["MemoryTracker"]] = ContextVar(
+    "memory_tracker", default=None
+)
+_tracking_lock = threading.Lock()
+_NOT_TRACKED: ContextManager[None] = contextlib.nullcontext()
+
+
+class MemoryTracker:
+    """
+    Peak memory allocated by one invocation, in total and by stage.
+
+    A stage's peak is the most memory allocated above the level at the start of
+    the stage, so it shows what the stage itself needed, such as the indented
+    JSON built while formatting a large log entry. Stages run one after the
+    other and must not be nested. A stage entered more than once keeps its
+    largest peak.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, int] = {}
+        self.peak_bytes = 0
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = self._checkpoint()
+        try:
+            yield
+        finally:
+            _current, peak = tracemalloc.get_traced_memory()
+            self.stages[name] = max(self.stages.get(name, 0), peak - start)
+
+    def finish(self) -> None:
+        self._checkpoint()
+
+    def _checkpoint(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak - self._baseline)
+        tracemalloc.reset_peak()
+        return current
+
+
+@contextlib.contextmanager
+def track_memory() -> Iterator[Optional[MemoryTracker]]:
+    """
+    Track the memory allocated by the code run in this context with
+    tracemalloc, and log its peaks as an "Invocation memory" entry.
+
+    tracemalloc counts allocations from every thread, so only one context is
+    tracked at a time; others yield None and run untracked.
+    """
+    if not _tracking_lock.acquire(blocking=False):
+        yield None
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        tracker = MemoryTracker()
+        token = _current_tracker.set(tracker)
+        try:
+            yield tracker
+        finally:
+            _current_tracker.reset(token)
+            tracker.finish()
+            logging.info(
+                "Invocation memory",
+                extra=dict(
+                    json_fields=dict(
+                        peak_bytes=tracker.peak_bytes, stages=tracker.stages
+                    )
+                ),
+            )
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _tracking_lock.release()
+
+
+def memory_stage(name: str) -> ContextManager[None]:
+    """
+    Record the peak memory of a stage of the pipeline when the current
+    invocation is being tracked; otherwise do nothing.
+    """
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return _NOT_TRACKED
+    return tracker.stage(name)
@@ -0,0 +1,100 @@
+import logging
+from typing import Callable, Mapping, Optional, Tuple
+
+from flask import Flask, request
+
+# PubSub messages are at most 10 MB, which is about 13.4 MB once base64 encoded
+# in a push request.
+MAX_PUSH_REQUEST_BYTES = 16 * 1024 * 1024
+
+HandlePubSubMessage = Callable[[dict], str]
+ScheduledTask = Callable[[], str]
+
+
+class InvalidPushRequest(ValueError):
+    pass
+
+
+class UnexpectedPushSubscription(InvalidPushRequest):
+    pass
+
+
+def create_app(
+    handle_message: HandlePubSubMessage,
+    subscription: Optional[str] = None,
+    tasks: Optional[Mapping[str, ScheduledTask]] = None,
+) -> Flask:
+    """
+    Create a WSGI app which accepts PubSub push requests and passes each
+    message to handle_message.
+
+    A 2xx response acknowledges the message. Requests which are not push
+    requests, or which come from a subscription other than subscription when
+    one is given, are rejected with a 4xx response. A message which fails to
+    be handled gets a 500 response so PubSub redelivers it.
+
+    Each of tasks is run by a post to /tasks/<name>, for a scheduler to
+    trigger, and answers with its result.
+    """
+    app = Flask(__name__)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_PUSH_REQUEST_BYTES
+
+    @app.post("/")
+    def receive_push() -> Tuple[str, int]:
+        try:
+            message = parse_push_request(request.get_json(silent=True), subscription)
+        except InvalidPushRequest as err:
+            logging.warning(
+                "Invalid PubSub push request", extra=dict(textPayload=str(err))
+            )
+            status = 403 if isinstance(err, UnexpectedPushSubscription) else 400
+            return str(err), status
+
+        try:
+            return handle_message(message), 200
+        except Exception as err:
+            logging.error(
+                "Failed to handle PubSub push message, left for redelivery",
+                extra=dict(textPayload=repr(err)),
+            )
+            return "Alert failed", 500
+
+    @app.post("/tasks/<name>")
+    def run_task(name: str) -> Tuple[str, int]:
+        task = (tasks or {}).get(name)
+        if task is None:
+            return f"No task named '{name}'", 404
+        try:
+            return task(), 200
+        except Exception as err:
+            logging.error(
+                "Failed to run scheduled task",
+                extra=dict(json_fields=dict(task=name, error=repr(err))),
+            )
+            return "Task failed", 500
+
+    return app
+
+
+def parse_push_request(body: object, subscription: Optional[str] = None) -> dict:
+    """
+    Return the message from a push request body of the form:
+
+    {
+      "message": {"data": "...", "messageId": "...", "attributes": {...}},
+      "subscription": "projects/example/subscriptions/example"
+    }
+    """
+    if not isinstance(body, dict):
+        raise InvalidPushRequest("Request body must be a JSON object.")
+
+    if subscription is not None and body.get("subscription") != subscription:
+        raise UnexpectedPushSubscription(
+            f"Push requests are only accepted from subscription '{subscription}'."
+        )
+
+    message = body.get("message")
+    if not isinstance(message, dict):
+        raise InvalidPushRequest("Field 'message' must be an object.")
+
+    return message
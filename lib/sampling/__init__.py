@@ -0,0 +1,6 @@
+from lib.sampling.alert_sampler import (  # noqa: F401
+    AlertSampler,
+    InvalidSamplingConfig,
+    SamplingRule,
+    parse_sampling_config,
+)
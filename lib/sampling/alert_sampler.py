@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Mapping, Optional
+
+from lib.log_processor import ProcessedLogEntry
+
+RULE_MATCH_FIELDS = ("platform", "application", "message_contains", "log_name_contains")
+
+
+class InvalidSamplingConfig(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SamplingRule:
+    """
+    Sends a sample of the alerts which match every field given: one in
+    one_in of them, and at most max_per_window within each window of
+    window_seconds. A match field left as None matches any value.
+    """
+
+    name: str
+    one_in: int = field(default=1)
+    max_per_window: Optional[int] = field(default=None)
+    window_seconds: int = field(default=3600)
+    platform: Optional[str] = field(default=None)
+    application: Optional[str] = field(default=None)
+    message_contains: Optional[str] = field(default=None)
+    log_name_contains: Optional[str] = field(default=None)
+
+    def matches(self, processed_log_entry: ProcessedLogEntry) -> bool:
+        if self.platform is not None and processed_log_entry.platform != self.platform:
+            return False
+        if (
+            self.application is not None
+            and processed_log_entry.application != self.application
+        ):
+            return False
+        if self.message_contains is not None and self.message_contains not in (
+            processed_log_entry.message or ""
+        ):
+            return False
+        if self.log_name_contains is not None and self.log_name_contains not in (
+            processed_log_entry.log_name or ""
+        ):
+            return False
+        return True
+
+
+class _RuleState:
+    def __init__(self) -> None:
+        self.sequence = 0
+        self.window_start = 0
+        self.sent_in_window = 0
+        self.suppressed = 0
+        # The part of suppressed carried by alerts which are still being sent.
+        self.carried = 0
+
+
+class AlertSampler:
+    """
+    Send only a sample of the alerts in high-volume categories.
+
+    Each alert is checked against the rules in order and the first which
+    matches decides. The one in N check hashes the PubSub message ID, so it
+    takes constant time and a redelivered message gets the same decision.
+    Alerts without a message ID are hashed by their position instead.
+
+    Every alert left out is counted against its rule, and the count is added
+    to the next alert sent for that rule as suppressed_count. The count is only
+    reset once that alert has been sent, and is carried by a later one if the
+    send fails. The counts are local to this instance, and shared safely
+    between its threads.
+    """
+
+    def __init__(
+        self, rules: List[SamplingRule], clock: Callable[[], float] = time.time
+    ):
+        self.rules = rules
+        self._clock = clock
+        self._states = [_RuleState() for _ in rules]
+        self._lock = threading.Lock()
+
+    def sample(
+        self, processed_log_entry: ProcessedLogEntry, message_id: Optional[str] = None
+    ) -> Optional[ProcessedLogEntry]:
+        """
+        Return the entry to send, carrying the number of alerts suppressed
+        since the last one, or None when the entry is left out of the sample.
+        """
+        for rule, state in zip(self.rules, self._states):
+            if rule.matches(processed_log_entry):
+                with self._lock:
+                    return self._apply(rule, state, processed_log_entry, message_id)
+        return processed_log_entry
+
+    def sent(self, processed_log_entry: ProcessedLogEntry) -> None:
+        """
+        Record that an entry returned by sample was sent, resetting the count
+        it carried.
+        """
+        self._settle(processed_log_entry, sent=True)
+
+    def failed(self, processed_log_entry: ProcessedLogEntry) -> None:
+        """
+        Record that an entry returned by sample was not sent, so the count it
+        carried is added to the next alert for the rule instead.
+        """
+        self._settle(processed_log_entry, sent=False)
+
+    def _settle(self, processed_log_entry: ProcessedLogEntry, sent: bool) -> None:
+        carried = processed_log_entry.suppressed_count
+        if carried == 0:
+            return
+        for rule, state in zip(self.rules, self._states):
+            if rule.matches(processed_log_entry):
+                with self._lock:
+                    state.carried -= carried
+                    if sent:
+                        state.suppressed -= carried
+                return
+
+    def _apply(
+        self,
+        rule: SamplingRule,
+        state: _RuleState,
+        processed_log_entry: ProcessedLogEntry,
+        message_id: Optional[str],
+    ) -> Optional[ProcessedLogEntry]:
+        state.sequence += 1
+        sample_key = message_id if message_id is not None else str(state.sequence)
+
+        window_start = int(self._clock() // rule.window_seconds)
+        if window_start != state.window_start:
+            state.window_start = window_start
+            state.sent_in_window = 0
+
+        if not _in_sample(sample_key, rule.one_in) or (
+            rule.max_per_window is not None
+            and state.sent_in_window >= rule.max_per_window
+        ):
+            state.suppressed += 1
+            logging.info(
+                "Alert suppressed by sampling rule",
+                extra=dict(
+                    json_fields=dict(rule=rule.name, suppressed=state.suppressed)
+                ),
+            )
+            return None
+
+        state.sent_in_window += 1
+        suppressed = state.suppressed - state.carried
+        if suppressed == 0:
+            return processed_log_entry
+        state.carried += suppressed
+        return replace(processed_log_entry, suppressed_count=suppressed)
+
+
+def _in_sample(sample_key: str, one_in: int) -> bool:
+    if one_in == 1:
+        return True
+    digest = hashlib.blake2b(sample_key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % one_in == 0
+
+
+def parse_sampling_config(config: Mapping) -> AlertSampler:
+    """
+    Parse a sampling config of the form:
+
+    {
+      "rules": [
+        {
+          "name": "no-instance-aborts",
+          "platform": "cloud_run_revision",
+          "message_contains": "no available instance",
+          "one_in": 100,
+          "max_per_window": 5,
+          "window_seconds": 3600
+        }
+      ]
+    }
+    """
+    raw_rules = config.get("rules")
+    if not isinstance(raw_rules, list) or not raw_rules:
+        raise InvalidSamplingConfig("Field 'rules' must be a non-empty list.")
+
+    return AlertSampler([_parse_rule(raw) for raw in raw_rules])
+
+
+def _parse_rule(raw: Mapping) -> SamplingRule:
+    if not isinstance(raw, dict):
+        raise InvalidSamplingConfig("Each sampling rule must be an object.")
+
+    unknown_fields = (
+        set(raw)
+        - set(RULE_MATCH_FIELDS)
+        - {"name", "one_in", "max_per_window", "window_seconds"}
+    )
+    if unknown_fields:
+        raise InvalidSamplingConfig(
+            f"Unknown sampling rule fields: {', '.join(sorted(unknown_fields))}."
+        )
+
+    name = raw.get("name")
+    if not isinstance(name, str) or name == "":
+        raise InvalidSamplingConfig("Each sampling rule must have a name.")
+    if not any(raw.get(match_field) for match_field in RULE_MATCH_FIELDS):
+        raise InvalidSamplingConfig(f"Sampling rule '{name}' matches every alert.")
+
+    one_in = int(raw.get("one_in", 1))
+    max_per_window = raw.get("max_per_window")
+    window_seconds = int(raw.get("window_seconds", 3600))
+    if one_in < 1:
+        raise InvalidSamplingConfig(
+            f"Sampling rule '{name}' needs one_in of 1 or more."
+        )
+    if max_per_window is not None and int(max_per_window) < 0:
+        raise InvalidSamplingConfig(
+            f"Sampling rule '{name}' needs max_per_window of 0 or more."
+        )
+    if window_seconds < 1:
+        raise InvalidSamplingConfig(
+            f"Sampling rule '{name}' needs window_seconds of 1 or more."
+        )
+
+    return SamplingRule(
+        name=name,
+        one_in=one_in,
+        max_per_window=int(max_per_window) if max_per_window is not None else None,
+        window_seconds=window_seconds,
+        **{match_field: raw.get(match_field) for match_field in RULE_MATCH_FIELDS},
+    )
@@ -1,10 +1,19 @@
 import json
 import logging
-from typing import List
+from dataclasses import dataclass
+from typing import Any, Generic, List, Optional
 
-from lib.alerter import Alerter
-from lib.cloud_logging import parse_log_entry
-from lib.cloud_run_revision import InvalidCloudRunRevisionEvent, parse_event
+from lib.alerter import Alert, Alerter, AlertFactory
+from lib.cloud_logging import InternTable, parse_log_entry
+from lib.cloud_run_revision import (
+    InvalidCloudRunRevisionEvent,
+    PayloadSizeLimit,
+    parse_event,
+)
+from lib.correlation import IncidentCorrelator
+from lib.deadline import Deadline
+from lib.deduplication import SeenMessageIds
+from lib.digest import DigestBuffer
 from lib.filters.agent_connect_filter import agent_connect_filter
 from lib.filters.all_preprod_and_training_alerts_except_erroneous_questionnaire_filter import (
     all_preprod_and_training_alerts_except_erroneous_questionnaire_filter,
@@ -45,70 +54,276 @@ from lib.log_processor import (
     ProcessedLogEntry,
     process_log_entry,
 )
+from lib.profiling import memory_stage
+from lib.sampling import AlertSampler
+from lib.shadow_filters import LogEntryFilter, ShadowFilterEvaluator
+from lib.tenancy import ProjectConfigs
+
+LIVE_FILTERS: List[LogEntryFilter] = [
+    sandbox_filter,
+    all_preprod_and_training_alerts_except_erroneous_questionnaire_filter,
+    os_patch_maintenance_filter,
+    fluent_bit_maintenance_filter,
+    osconfig_agent_filter,
+    auditlog_filter,
+    agent_connect_filter,
+    rproxy_lookupEffectiveGuestPolicies_filter,
+    watching_metadata_invalid_character_filter,
+    ip_space_exhausted_filter,
+    no_instance_filter,
+    invalid_login_attempt_filter,
+    requested_entity_was_not_found_filter,
+    execute_sql_filter,
+    paramiko_filter,
+    bootstrapper_filter,
+    generic_not_found_filter,
+    socket_exception_filter,
+    scc_dormant_accounts_prod_alert_filter,
+    permission_denied_by_iam_filter,
+    physical_zone_separation_constraint_filter,
+    service_account_hmac_key_constraint_filter,
+    get_role_filter,
+]
 
 
 def log_entry_skipped(log_entry: ProcessedLogEntry) -> bool:
-    filters = [
-        sandbox_filter,
-        all_preprod_and_training_alerts_except_erroneous_questionnaire_filter,
-        os_patch_maintenance_filter,
-        fluent_bit_maintenance_filter,
-        osconfig_agent_filter,
-        auditlog_filter,
-        agent_connect_filter,
-        rproxy_lookupEffectiveGuestPolicies_filter,
-        watching_metadata_invalid_character_filter,
-        ip_space_exhausted_filter,
-        no_instance_filter,
-        invalid_login_attempt_filter,
-        requested_entity_was_not_found_filter,
-        execute_sql_filter,
-        paramiko_filter,
-        bootstrapper_filter,
-        generic_not_found_filter,
-        socket_exception_filter,
-        scc_dormant_accounts_prod_alert_filter,
-        permission_denied_by_iam_filter,
-        physical_zone_separation_constraint_filter,
-        service_account_hmac_key_constraint_filter,
-        get_role_filter,
-    ]
-
-    for filter in filters:
+    return skipping_filter(log_entry) is not None
+
+
+def skipping_filter(
+    log_entry: ProcessedLogEntry, filters: Optional[List[LogEntryFilter]] = None
+) -> Optional[LogEntryFilter]:
+    for filter in LIVE_FILTERS if filters is None else filters:
         if filter(log_entry):
-            return True
+            return filter
+
+    return None
+
 
-    return False
+class MessageInFlight(RuntimeError):
+    """
+    Raised for a redelivery of a message which is still being handled, so it
+    is not acknowledged. The first delivery may yet fail, and PubSub then needs
+    this one to be redelivered again.
+    """
+
+
+@dataclass(frozen=True)
+class PreparedAlert(Generic[Alert]):
+    result: str
+    alert: Optional[Alert] = None
+    message_id: Optional[str] = None
+    # The entry the sampler let through, whose suppressed count is reset once
+    # the alert has been sent.
+    sampled_log_entry: Optional[ProcessedLogEntry] = None
 
 
 def send_alerts(
     event: dict,
     alerter: Alerter,
     app_log_payload_factories: List[CreateAppLogPayloadFromLogEntry],
+    seen_message_ids: Optional[SeenMessageIds] = None,
+    digest_buffer: Optional[DigestBuffer] = None,
+    incident_correlator: Optional[IncidentCorrelator] = None,
+    size_limit: Optional[PayloadSizeLimit] = None,
+    deadline: Optional[Deadline] = None,
+    sampler: Optional[AlertSampler] = None,
+    shadow_filters: Optional[ShadowFilterEvaluator] = None,
+    project_configs: Optional[ProjectConfigs] = None,
 ) -> str:
+    prepared = prepare_alert(
+        event,
+        alerter,
+        app_log_payload_factories,
+        seen_message_ids,
+        digest_buffer,
+        incident_correlator,
+        size_limit,
+        sampler,
+        shadow_filters=shadow_filters,
+        project_configs=project_configs,
+    )
+
+    if prepared.alert is not None:
+        try:
+            alerter.send_alert(prepared.alert, deadline)
+        except Exception:
+            settle_sampled_alert(prepared, sampler, sent=False)
+            release_message_id(prepared, seen_message_ids)
+            raise
+        settle_sampled_alert(prepared, sampler, sent=True)
+
+    remember_message_id(prepared, seen_message_ids)
+    return prepared.result
+
+
+def prepare_alert(
+    event: dict,
+    alerter: AlertFactory[Alert],
+    app_log_payload_factories: List[CreateAppLogPayloadFromLogEntry],
+    seen_message_ids: Optional[SeenMessageIds] = None,
+    digest_buffer: Optional[DigestBuffer] = None,
+    incident_correlator: Optional[IncidentCorrelator] = None,
+    size_limit: Optional[PayloadSizeLimit] = None,
+    sampler: Optional[AlertSampler] = None,
+    intern_table: Optional[InternTable] = None,
+    shadow_filters: Optional[ShadowFilterEvaluator] = None,
+    project_configs: Optional[ProjectConfigs] = None,
+) -> PreparedAlert[Alert]:
     try:
-        log_data = parse_event(event).data
+        with memory_stage("decode"):
+            parsed_event = parse_event(event, size_limit)
     except InvalidCloudRunRevisionEvent:
         logging.warning(
             "Invalid PubSub envelope: Field 'data' was missing.",
             extra=dict(textPayload=json.dumps(event)),
         )
         logging.info("Sending raw message to Slack")
-        alerter.send_alert(alerter.create_raw_alert(event))
-        return "Alert sent (invalid envelope)"
+        with memory_stage("format"):
+            raw_alert = alerter.create_raw_alert(event)
+        return PreparedAlert(result="Alert sent (invalid envelope)", alert=raw_alert)
 
-    if isinstance(log_data, str):
-        processed_log_entry = ProcessedLogEntry(message=log_data)
-    else:
-        log_entry = parse_log_entry(log_data)
-        processed_log_entry = process_log_entry(log_entry, app_log_payload_factories)
+    # The message ID is reserved rather than checked, so a redelivery which
+    # arrives while this one is being handled is not sent too. The reservation
+    # is released if the alert is not handled, so a later redelivery is sent.
+    message_id = parsed_event.message_id
+    if seen_message_ids is not None and message_id is not None:
+        if not seen_message_ids.reserve(message_id):
+            if not seen_message_ids.contains(message_id):
+                logging.info(
+                    "PubSub message is still being handled, left for redelivery",
+                    extra=dict(messageId=message_id),
+                )
+                raise MessageInFlight(message_id)
+            logging.info(
+                "Skipping redelivered PubSub message", extra=dict(messageId=message_id)
+            )
+            return PreparedAlert(result="Alert skipped (duplicate)")
+
+    try:
+        return _prepare_log_alert(
+            parsed_event.data,
+            message_id,
+            alerter,
+            app_log_payload_factories,
+            digest_buffer,
+            incident_correlator,
+            sampler,
+            intern_table,
+            shadow_filters,
+            project_configs,
+        )
+    except Exception:
+        if seen_message_ids is not None and message_id is not None:
+            seen_message_ids.release(message_id)
+        raise
 
-    if log_entry_skipped(processed_log_entry):
-        return "Alert skipped"
+
+def _prepare_log_alert(
+    log_data: Any,
+    message_id: Optional[str],
+    alerter: AlertFactory[Alert],
+    app_log_payload_factories: List[CreateAppLogPayloadFromLogEntry],
+    digest_buffer: Optional[DigestBuffer],
+    incident_correlator: Optional[IncidentCorrelator],
+    sampler: Optional[AlertSampler],
+    intern_table: Optional[InternTable],
+    shadow_filters: Optional[ShadowFilterEvaluator],
+    project_configs: Optional[ProjectConfigs],
+) -> PreparedAlert[Alert]:
+    processed_log_entry = _process_log_data(
+        log_data, app_log_payload_factories, intern_table
+    )
+
+    filters = LIVE_FILTERS
+    if project_configs is not None:
+        filters = project_configs.filters_for(
+            project_configs.project_id_for(processed_log_entry)
+        )
+
+    live_filter = skipping_filter(processed_log_entry, filters)
+    # Only the live filters' decision is acted on; a candidate set is compared
+    # with it for reporting. The candidate set is a change to the default
+    # filters, so projects with their own are left out.
+    if shadow_filters is not None and filters is LIVE_FILTERS:
+        shadow_filters.evaluate(processed_log_entry, live_filter)
+    if live_filter is not None:
+        return PreparedAlert(result="Alert skipped", message_id=message_id)
+
+    if digest_buffer is not None and digest_buffer.should_defer(processed_log_entry):
+        digest_buffer.add(processed_log_entry)
+        return PreparedAlert(result="Alert added to digest", message_id=message_id)
+
+    if incident_correlator is not None and incident_correlator.correlate(
+        processed_log_entry
+    ):
+        return PreparedAlert(result="Alert merged into incident", message_id=message_id)
+
+    # Sampling comes last, so the suppressed count is carried by an alert which
+    # is sent rather than one which is merged into a digest or an incident.
+    sampled_log_entry = None
+    if sampler is not None:
+        sampled_log_entry = sampler.sample(processed_log_entry, message_id)
+        if sampled_log_entry is None:
+            return PreparedAlert(
+                result="Alert suppressed (sampled)", message_id=message_id
+            )
+        processed_log_entry = sampled_log_entry
 
     logging.info(
         "Sending message to Slack", extra=dict(textPayload=processed_log_entry.message)
     )
-    alert = alerter.create_alert(processed_log_entry)
-    alerter.send_alert(alert)
-    return "Alert sent"
+    try:
+        with memory_stage("format"):
+            alert = alerter.create_alert(processed_log_entry)
+    except Exception:
+        if sampler is not None and sampled_log_entry is not None:
+            sampler.failed(sampled_log_entry)
+        raise
+    return PreparedAlert(
+        result="Alert sent",
+        alert=alert,
+        message_id=message_id,
+        sampled_log_entry=sampled_log_entry,
+    )
+
+
+def remember_message_id(
+    prepared: PreparedAlert, seen_message_ids: Optional[SeenMessageIds]
+) -> None:
+    if seen_message_ids is not None and prepared.message_id is not None:
+        seen_message_ids.add(prepared.message_id)
+
+
+def release_message_id(
+    prepared: PreparedAlert, seen_message_ids: Optional[SeenMessageIds]
+) -> None:
+    if seen_message_ids is not None and prepared.message_id is not None:
+        seen_message_ids.release(prepared.message_id)
+
+
+def settle_sampled_alert(
+    prepared: PreparedAlert,
+    sampler: Optional[AlertSampler],
+    sent: bool,
+) -> None:
+    if sampler is None or prepared.sampled_log_entry is None:
+        return
+    if sent:
+        sampler.sent(prepared.sampled_log_entry)
+    else:
+        sampler.failed(prepared.sampled_log_entry)
+
+
+def _process_log_data(
+    log_data: Any,
+    app_log_payload_factories: List[CreateAppLogPayloadFromLogEntry],
+    intern_table: Optional[InternTable] = None,
+) -> ProcessedLogEntry:
+    if isinstance(log_data, str):
+        return ProcessedLogEntry(message=log_data)
+
+    with memory_stage("parse"):
+        log_entry = parse_log_entry(log_data, intern_table)
+    with memory_stage("process"):
+        return process_log_entry(log_entry, app_log_payload_factories)
@@ -0,0 +1,35 @@
+import logging
+from typing import Optional
+
+from lib.alerter import Alerter
+from lib.deadline import Deadline
+from lib.digest import DigestBuffer
+
+
+def send_digests(
+    alerter: Alerter,
+    digest_buffer: DigestBuffer,
+    flush_all: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Send one digest alert for each group whose window has ended, or for every
+    group when flush_all is set. Groups which fail to send are put back to be
+    retried by the next call.
+    """
+    groups = digest_buffer.take_all() if flush_all else digest_buffer.take_ready()
+
+    failed = 0
+    for group in groups:
+        try:
+            alerter.send_alert(alerter.create_digest_alert(group), deadline)
+        except Exception as err:
+            failed += 1
+            digest_buffer.restore(group)
+            logging.error(
+                "Failed to send digest to Slack", extra=dict(textPayload=repr(err))
+            )
+
+    if failed:
+        return f"{len(groups) - failed} digests sent, {failed} failed"
+    return f"{len(groups)} digests sent"
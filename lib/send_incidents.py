@@ -0,0 +1,34 @@
+import logging
+from typing import Optional
+
+from lib.alerter import Alerter
+from lib.correlation import IncidentCorrelator
+from lib.deadline import Deadline
+
+
+def send_incidents(
+    alerter: Alerter,
+    incident_correlator: IncidentCorrelator,
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Send a summary alert for each closed incident which had alerts merged.
+    Incidents which fail to send are put back to be retried by the next call.
+    """
+    incidents = incident_correlator.take_closed()
+
+    failed = 0
+    for incident in incidents:
+        try:
+            alerter.send_alert(alerter.create_incident_alert(incident), deadline)
+        except Exception as err:
+            failed += 1
+            incident_correlator.restore(incident)
+            logging.error(
+                "Failed to send incident summary to Slack",
+                extra=dict(textPayload=repr(err)),
+            )
+
+    if failed:
+        return f"{len(incidents) - failed} incidents sent, {failed} failed"
+    return f"{len(incidents)} incidents sent"
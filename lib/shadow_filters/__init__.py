@@ -0,0 +1,6 @@
+from lib.shadow_filters.shadow_filter_evaluator import (  # noqa: F401
+    InvalidShadowFilterConfig,
+    LogEntryFilter,
+    ShadowFilterEvaluator,
+    parse_shadow_filters,
+)
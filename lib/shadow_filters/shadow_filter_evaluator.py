@@ -0,0 +1,222 @@
+import importlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from lib.log_processor import ProcessedLogEntry, fingerprint
+
+LogEntryFilter = Callable[[ProcessedLogEntry], bool]
+
+# Whether the candidate set's decision is already known from the live one, the
+# candidate filter which decided it, and otherwise the candidate filters to run.
+_Plan = Tuple[bool, Optional[LogEntryFilter], List[LogEntryFilter]]
+
+_FILTER_NAME = re.compile(r"^\w+(\.\w+)?$")
+
+_in_shadow: ContextVar[bool] = ContextVar("in_shadow", default=False)
+
+
+class InvalidShadowFilterConfig(ValueError):
+    pass
+
+
+class _DropShadowLogs(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not _in_shadow.get()
+
+
+_DROP_SHADOW_LOGS = _DropShadowLogs()
+
+
+class ShadowFilterEvaluator:
+    """
+    Run a candidate set of filters alongside the live set, without acting on
+    its decision, to see what enabling it would change.
+
+    Only the candidate filters whose result is not already known from the live
+    decision are run: live filters ahead of the one which matched, or all of
+    them when none matched, are known not to match. Evaluation stops once an
+    entry has used budget_seconds, checked between filters, and the entry is
+    counted as over budget instead of compared.
+
+    Disagreements are counted by direction, deciding filter and fingerprint,
+    and logged the 1st, 10th, 100th... time each is seen, with the count so
+    far. The candidate filters' own log messages are dropped while they run.
+    """
+
+    def __init__(
+        self,
+        live_filters: Sequence[LogEntryFilter],
+        candidate_filters: Sequence[LogEntryFilter],
+        budget_seconds: float = 0.002,
+        clock: Callable[[], float] = time.perf_counter,
+        max_tracked: int = 10000,
+    ):
+        self.candidate_filters = list(candidate_filters)
+        self.over_budget_count = 0
+        self._budget_seconds = budget_seconds
+        self._clock = clock
+        self._max_tracked = max_tracked
+        self._counts: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        self._plans = _create_plans(list(live_filters), self.candidate_filters)
+        logging.getLogger().addFilter(_DROP_SHADOW_LOGS)
+
+    def evaluate(
+        self, log_entry: ProcessedLogEntry, live_filter: Optional[LogEntryFilter]
+    ) -> None:
+        started = self._clock()
+        known, candidate_filter, to_run = self._plans[live_filter]
+        if not known:
+            try:
+                candidate_filter = self._run(log_entry, to_run, started)
+            except _OverBudget:
+                self._record_over_budget()
+                return
+            except Exception as err:
+                logging.warning(
+                    "Shadow filter failed", extra=dict(textPayload=repr(err))
+                )
+                return
+
+        if (live_filter is None) != (candidate_filter is None):
+            self._record_disagreement(log_entry, live_filter, candidate_filter)
+
+    def _run(
+        self,
+        log_entry: ProcessedLogEntry,
+        to_run: List[LogEntryFilter],
+        started: float,
+    ) -> Optional[LogEntryFilter]:
+        token = _in_shadow.set(True)
+        try:
+            for candidate_filter in to_run:
+                if self._clock() - started > self._budget_seconds:
+                    raise _OverBudget()
+                if candidate_filter(log_entry):
+                    return candidate_filter
+            return None
+        finally:
+            _in_shadow.reset(token)
+
+    def _record_over_budget(self) -> None:
+        with self._lock:
+            self.over_budget_count += 1
+            count = self.over_budget_count
+        if _is_power_of_ten(count):
+            logging.warning(
+                "Shadow filter evaluation over budget",
+                extra=dict(
+                    json_fields=dict(count=count, budget_seconds=self._budget_seconds)
+                ),
+            )
+
+    def _record_disagreement(
+        self,
+        log_entry: ProcessedLogEntry,
+        live_filter: Optional[LogEntryFilter],
+        candidate_filter: Optional[LogEntryFilter],
+    ) -> None:
+        if candidate_filter is not None:
+            key = ("candidate_skips", _name(candidate_filter), fingerprint(log_entry))
+        else:
+            key = ("candidate_alerts", _name(live_filter), fingerprint(log_entry))
+
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self._max_tracked:
+                self._counts.clear()
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+
+        if _is_power_of_ten(count):
+            logging.info(
+                "Shadow filter disagreement",
+                extra=dict(
+                    json_fields=dict(
+                        decision=key[0],
+                        filter=key[1],
+                        fingerprint=key[2],
+                        count=count,
+                    )
+                ),
+            )
+
+
+class _OverBudget(Exception):
+    pass
+
+
+def parse_shadow_filters(
+    config: str, live_filters: Sequence[LogEntryFilter]
+) -> List[LogEntryFilter]:
+    """
+    Build a candidate filter set from the live filters and a comma separated
+    list of changes. "-name" leaves out the live filter called name. "name"
+    or "+name" adds the filter called name from lib.filters.name, or
+    "module.name" the one from lib.filters.module.
+    """
+    candidate_filters = list(live_filters)
+    for change in (part.strip() for part in config.split(",")):
+        if not change:
+            continue
+        name = change.lstrip("+-")
+        if not _FILTER_NAME.match(name):
+            raise InvalidShadowFilterConfig(f"Invalid shadow filter name '{name}'")
+
+        if change.startswith("-"):
+            removed = [
+                live_filter
+                for live_filter in candidate_filters
+                if _name(live_filter) == name.rsplit(".", 1)[-1]
+            ]
+            if not removed:
+                raise InvalidShadowFilterConfig(f"No live filter named '{name}'")
+            for live_filter in removed:
+                candidate_filters.remove(live_filter)
+            continue
+
+        added = _import_filter(name)
+        if added not in candidate_filters:
+            candidate_filters.append(added)
+    return candidate_filters
+
+
+def _import_filter(name: str) -> LogEntryFilter:
+    module_name, _, function_name = name.partition(".")
+    try:
+        module = importlib.import_module(f"lib.filters.{module_name}")
+        return getattr(module, function_name or module_name)
+    except (ImportError, AttributeError):
+        raise InvalidShadowFilterConfig(f"No filter named '{name}'")
+
+
+def _create_plans(
+    live_filters: List[LogEntryFilter], candidate_filters: List[LogEntryFilter]
+) -> Dict[Optional[LogEntryFilter], _Plan]:
+    plans: Dict[Optional[LogEntryFilter], _Plan] = {
+        None: (False, None, [f for f in candidate_filters if f not in live_filters])
+    }
+    for index, live_filter in enumerate(live_filters):
+        if live_filter in candidate_filters:
+            plans[live_filter] = (True, live_filter, [])
+        else:
+            not_matched = live_filters[:index]
+            plans[live_filter] = (
+                False,
+                None,
+                [f for f in candidate_filters if f not in not_matched],
+            )
+    return plans
+
+
+def _name(log_entry_filter: Optional[LogEntryFilter]) -> str:
+    return getattr(log_entry_filter, "__name__", repr(log_entry_filter))
+
+
+def _is_power_of_ten(count: int) -> bool:
+    while count % 10 == 0:
+        count //= 10
+    return count == 1
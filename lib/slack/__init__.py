@@ -1,2 +1,7 @@
+from lib.slack.async_slack_alerter import AsyncSlackAlerter  # noqa: F401
+from lib.slack.circuit_breaker import CircuitBreaker  # noqa: F401
+from lib.slack.dead_letter_spool import DeadLetterSpool  # noqa: F401
+from lib.slack.rate_limiter import RateLimiter  # noqa: F401
 from lib.slack.slack_alerter import SlackAlerter  # noqa: F401
 from lib.slack.slack_message import SlackMessage  # noqa: F401
+from lib.slack.slack_web_api_alerter import SlackWebApiAlerter  # noqa: F401
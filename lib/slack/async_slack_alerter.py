@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from lib.correlation import Incident
+from lib.deadline import Deadline
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry
+from lib.slack.slack_alerter import SlackAlerter
+from lib.slack.slack_message import SlackMessage
+
+
+class AsyncSlackAlerter:
+    """
+    Async wrapper around a SlackAlerter.
+
+    Sends run in worker threads so several webhook requests can be in flight at
+    once. At most max_concurrent_sends requests are made to the destination at
+    the same time. Timeouts, the circuit breaker and the spool of the wrapped
+    alerter still apply.
+    """
+
+    def __init__(self, alerter: SlackAlerter, max_concurrent_sends: int = 4):
+        if max_concurrent_sends < 1:
+            raise ValueError("max_concurrent_sends must be at least 1")
+
+        self._alerter = alerter
+        self._max_concurrent_sends = max_concurrent_sends
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    async def send_alert(
+        self, message: SlackMessage, deadline: Optional[Deadline] = None
+    ) -> None:
+        async with self._semaphore():
+            await asyncio.to_thread(self._alerter.send_alert, message, deadline)
+
+    def create_raw_alert(self, raw: Any) -> SlackMessage:
+        return self._alerter.create_raw_alert(raw)
+
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return self._alerter.create_alert(entry, project_name)
+
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return self._alerter.create_digest_alert(group, project_name)
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return self._alerter.create_incident_alert(incident, project_name)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # A semaphore belongs to a single event loop.
+        loop = asyncio.get_running_loop()
+        for stale_loop in [other for other in self._semaphores if other.is_closed()]:
+            del self._semaphores[stale_loop]
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self._max_concurrent_sends)
+        return self._semaphores[loop]
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Callable
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency after failure_threshold consecutive
+    failures. While open, requests are refused until reset_timeout_seconds have
+    passed, after which a single probe request is allowed through (half-open).
+    A successful probe closes the circuit, a failed one opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout_seconds = reset_timeout_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state is CircuitState.CLOSED:
+                return True
+
+            if self._state is CircuitState.OPEN:
+                if self._clock() - self._opened_at < self._reset_timeout_seconds:
+                    return False
+                self._transition(CircuitState.HALF_OPEN)
+
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self._state is not CircuitState.CLOSED:
+                self._transition(CircuitState.CLOSED)
+
+    def release_probe(self) -> None:
+        """
+        End a request which neither succeeded nor failed, so a probe which was
+        never answered does not keep the circuit half-open for good.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if (
+                self._state is CircuitState.HALF_OPEN
+                or self._consecutive_failures >= self._failure_threshold
+            ):
+                self._opened_at = self._clock()
+                if self._state is not CircuitState.OPEN:
+                    self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        previous_state = self._state
+        self._state = state
+        logging.log(
+            logging.INFO if state is CircuitState.CLOSED else logging.WARNING,
+            f"Circuit breaker '{self._name}' is {state.value}",
+            extra=dict(
+                json_fields=dict(
+                    circuit=self._name,
+                    previous_state=previous_state.value,
+                    state=state.value,
+                    consecutive_failures=self._consecutive_failures,
+                )
+            ),
+        )
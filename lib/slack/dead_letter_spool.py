@@ -0,0 +1,212 @@
+import glob
+import json
+import logging
+import os
+import threading
+from typing import IO, Callable, List, Optional
+
+from lib.deadline import Deadline
+from lib.slack.rate_limiter import RateLimiter
+
+
+class DeadLetterSpool:
+    """
+    Append-only on-disk spool of formatted Slack payloads which could not be sent.
+
+    Payloads are written as JSON lines to the file at path. Each append is
+    flushed, and fsynced before it returns unless fsync_every allows several
+    appends per fsync, at the risk of losing those on a crash. Once the file reaches max_segment_bytes it is
+    sealed into a numbered segment, and only the newest max_segments segments are
+    kept. drain() replays the spooled payloads oldest first.
+
+    It is safe to share between threads, but not between processes: two
+    processes draining the same path would both replay its payloads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_segment_bytes: int = 1024 * 1024,
+        max_segments: int = 5,
+        fsync_every: int = 1,
+    ):
+        if max_segment_bytes < 1:
+            raise ValueError("max_segment_bytes must be at least 1")
+        if max_segments < 1:
+            raise ValueError("max_segments must be at least 1")
+        if fsync_every < 1:
+            raise ValueError("fsync_every must be at least 1")
+
+        self._path = path
+        self._max_segment_bytes = max_segment_bytes
+        self._max_segments = max_segments
+        self._fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._file: Optional[IO[bytes]] = None
+        self._unsynced = 0
+
+    def append(self, payload: dict) -> None:
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        with self._lock:
+            file = self._open()
+            file.write(line)
+            file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self._fsync_every:
+                self._sync()
+            if file.tell() >= self._max_segment_bytes:
+                self._seal()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def pending(self) -> int:
+        with self._lock:
+            self._sync()
+            paths = self._segments() + [self._path]
+        return sum(len(_read_lines(path)) for path in paths)
+
+    def drain(
+        self,
+        send: Callable[[dict], None],
+        rate_limiter: Optional[RateLimiter] = None,
+        max_items: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        is_rejection: Optional[Callable[[Exception], bool]] = None,
+    ) -> int:
+        """
+        Replay spooled payloads in the order they were spooled, removing each one
+        once send() returns. Replay stops at the first exception, which is
+        re-raised, after max_items payloads, or when the deadline passes before
+        the rate limiter allows the next one. A payload whose exception
+        is_rejection accepts would never be sent, so it is dropped instead and
+        replay carries on.
+        """
+        with self._drain_lock:
+            with self._lock:
+                self._seal()
+                segments = self._segments()
+
+            sent = 0
+            for segment in segments:
+                lines = _read_lines(segment)
+                for index, line in enumerate(lines):
+                    if (max_items is not None and sent >= max_items) or (
+                        deadline is not None and deadline.expired()
+                    ):
+                        _rewrite_lines(segment, lines[index:])
+                        return sent
+
+                    try:
+                        payload = json.loads(line)
+                    except json.decoder.JSONDecodeError:
+                        logging.warning("Discarding corrupt spooled Slack payload")
+                        continue
+
+                    if rate_limiter is not None and not rate_limiter.acquire(
+                        deadline.remaining() if deadline is not None else None
+                    ):
+                        _rewrite_lines(segment, lines[index:])
+                        return sent
+                    try:
+                        send(payload)
+                    except Exception as err:
+                        if is_rejection is not None and is_rejection(err):
+                            logging.error(
+                                "Discarding spooled Slack payload which was rejected",
+                                extra=dict(textPayload=repr(err)),
+                            )
+                            continue
+                        _rewrite_lines(segment, lines[index:])
+                        raise
+                    sent += 1
+
+                _remove(segment)
+
+            return sent
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> IO[bytes]:
+        if self._file is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self._path, "ab")
+        return self._file
+
+    def _sync(self) -> None:
+        if self._file is None or self._unsynced == 0:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _seal(self) -> None:
+        self._sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+            return
+
+        segments = self._segments()
+        next_number = _segment_number(segments[-1]) + 1 if segments else 1
+        os.replace(self._path, f"{self._path}.{next_number:06d}")
+        self._enforce_max_segments()
+
+    def _enforce_max_segments(self) -> None:
+        segments = self._segments()
+        for segment in segments[: max(0, len(segments) - self._max_segments)]:
+            logging.warning(
+                "Spool is full, dropping oldest spooled Slack payloads",
+                extra=dict(json_fields=dict(dropped=len(_read_lines(segment)))),
+            )
+            _remove(segment)
+
+    def _segments(self) -> List[str]:
+        prefix_length = len(self._path) + 1
+        return sorted(
+            (
+                path
+                for path in glob.glob(f"{glob.escape(self._path)}.*")
+                if path[prefix_length:].isdigit()
+            ),
+            key=_segment_number,
+        )
+
+
+def _segment_number(path: str) -> int:
+    return int(path.rsplit(".", 1)[-1])
+
+
+def _read_lines(path: str) -> List[bytes]:
+    try:
+        with open(path, "rb") as file:
+            return [line for line in file.read().split(b"\n") if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _rewrite_lines(path: str, lines: List[bytes]) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(b"".join(line + b"\n" for line in lines))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
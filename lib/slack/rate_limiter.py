@@ -0,0 +1,63 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RateLimiter:
+    """
+    Token bucket allowing rate_per_second requests on average, with bursts of up
+    to burst requests.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be greater than 0")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self._rate_per_second = rate_per_second
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated_at = clock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a token. Returns False, without waiting, when none would be
+        available within timeout seconds.
+        """
+        started_at = self._clock()
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self._rate_per_second
+            if timeout is not None and self._clock() - started_at + wait > timeout:
+                return False
+            self._sleep(wait)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(
+            float(self._burst), self._tokens + elapsed * self._rate_per_second
+        )
+        self._updated_at = now
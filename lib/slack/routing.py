@@ -0,0 +1,205 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple, cast
+
+ROUTE_KEY_FIELDS = ("project", "application", "platform", "severity", "classification")
+
+RouteKey = Tuple[
+    Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]
+]
+
+
+class InvalidRoutingConfig(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class RoutingRule:
+    """
+    Sends matching alerts to each of destinations. A field left as None matches
+    any value.
+    """
+
+    destinations: Tuple[str, ...]
+    project: Optional[str] = field(default=None)
+    application: Optional[str] = field(default=None)
+    platform: Optional[str] = field(default=None)
+    severity: Optional[str] = field(default=None)
+    classification: Optional[str] = field(default=None)
+
+    def pattern(self) -> RouteKey:
+        return (
+            self.project,
+            self.application,
+            self.platform,
+            self.severity,
+            self.classification,
+        )
+
+
+@dataclass(frozen=True)
+class SlackDestination:
+    name: str
+    url: str
+    rate_per_second: float = field(default=1.0)
+    pool_size: int = field(default=4)
+
+
+@dataclass(frozen=True)
+class RoutingConfig:
+    destinations: Dict[str, SlackDestination]
+    table: "RoutingTable"
+
+
+class RoutingTable:
+    """
+    Routing rules compiled into a hash index.
+
+    Rules are grouped by which fields they specify. Looking up a key costs one
+    dictionary lookup per group, at most 2^5, and results are memoised per key.
+    Every matching rule contributes its destinations. Keys which match no rule
+    are sent to default_destinations. It is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        rules: List[RoutingRule],
+        default_destinations: Tuple[str, ...],
+        max_cached_keys: int = 1024,
+    ):
+        self.default_destinations = default_destinations
+        self._index: Dict[RouteKey, Tuple[str, ...]] = {}
+        masks: List[Tuple[bool, ...]] = []
+
+        for rule in rules:
+            pattern = rule.pattern()
+            self._index[pattern] = _merge(
+                self._index.get(pattern, ()), rule.destinations
+            )
+            mask = tuple(value is not None for value in pattern)
+            if mask not in masks:
+                masks.append(mask)
+
+        self._masks = masks
+        self._max_cached_keys = max_cached_keys
+        self._cache: OrderedDict[RouteKey, Tuple[str, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def destinations_for(self, key: RouteKey) -> Tuple[str, ...]:
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        destinations: Tuple[str, ...] = ()
+        for mask in self._masks:
+            pattern = cast(
+                RouteKey,
+                tuple(
+                    value if specified else None for value, specified in zip(key, mask)
+                ),
+            )
+            matched = self._index.get(pattern)
+            if matched is not None:
+                destinations = _merge(destinations, matched)
+
+        result = destinations or self.default_destinations
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self._max_cached_keys:
+                self._cache.popitem(last=False)
+        return result
+
+
+def parse_routing_config(config: Mapping, environ: Mapping[str, str]) -> RoutingConfig:
+    """
+    Parse a routing config of the form:
+
+    {
+      "destinations": {
+        "prod-incidents": {"url_env": "SLACK_URL", "rate_per_second": 1},
+        "data-delivery": {"url_env": "SLACK_URL_DATA_DELIVERY", "pool_size": 2}
+      },
+      "routes": [
+        {"classification": "data-delivery", "destinations": ["data-delivery"]}
+      ],
+      "default_destinations": ["prod-incidents"]
+    }
+
+    Each destination takes its webhook from "url", or from the environment
+    variable named by "url_env".
+    """
+    raw_destinations = config.get("destinations")
+    if not isinstance(raw_destinations, dict) or not raw_destinations:
+        raise InvalidRoutingConfig("Field 'destinations' must be a non-empty object.")
+
+    destinations = {
+        name: _parse_destination(name, raw, environ)
+        for name, raw in raw_destinations.items()
+    }
+
+    rules = [_parse_rule(raw, destinations) for raw in config.get("routes", [])]
+    default_destinations = _parse_destination_names(
+        config.get("default_destinations"), destinations, "default_destinations"
+    )
+
+    return RoutingConfig(
+        destinations=destinations,
+        table=RoutingTable(rules, default_destinations),
+    )
+
+
+def _parse_destination(
+    name: str, raw: Mapping, environ: Mapping[str, str]
+) -> SlackDestination:
+    if not isinstance(raw, dict):
+        raise InvalidRoutingConfig(f"Destination '{name}' must be an object.")
+
+    url = raw.get("url")
+    if url is None and "url_env" in raw:
+        url = environ.get(raw["url_env"])
+    if not isinstance(url, str) or url == "":
+        raise InvalidRoutingConfig(f"Destination '{name}' has no webhook URL.")
+
+    return SlackDestination(
+        name=name,
+        url=url,
+        rate_per_second=float(raw.get("rate_per_second", 1.0)),
+        pool_size=int(raw.get("pool_size", 4)),
+    )
+
+
+def _parse_rule(raw: Mapping, destinations: Dict[str, SlackDestination]) -> RoutingRule:
+    if not isinstance(raw, dict):
+        raise InvalidRoutingConfig("Each route must be an object.")
+
+    unknown_fields = set(raw) - set(ROUTE_KEY_FIELDS) - {"destinations"}
+    if unknown_fields:
+        raise InvalidRoutingConfig(
+            f"Unknown route fields: {', '.join(sorted(unknown_fields))}."
+        )
+
+    return RoutingRule(
+        destinations=_parse_destination_names(
+            raw.get("destinations"), destinations, "destinations"
+        ),
+        **{name: raw.get(name) for name in ROUTE_KEY_FIELDS},
+    )
+
+
+def _parse_destination_names(
+    raw: object, destinations: Dict[str, SlackDestination], field_name: str
+) -> Tuple[str, ...]:
+    if not isinstance(raw, list) or not raw:
+        raise InvalidRoutingConfig(f"Field '{field_name}' must be a non-empty list.")
+
+    for name in raw:
+        if name not in destinations:
+            raise InvalidRoutingConfig(f"Unknown destination '{name}'.")
+
+    return tuple(raw)
+
+
+def _merge(first: Tuple[str, ...], second: Tuple[str, ...]) -> Tuple[str, ...]:
+    return first + tuple(name for name in second if name not in first)
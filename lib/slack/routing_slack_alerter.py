@@ -0,0 +1,249 @@
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lib.correlation import Incident
+from lib.deadline import Deadline
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry
+from lib.slack.circuit_breaker import CircuitBreaker
+from lib.slack.dead_letter_spool import DeadLetterSpool
+from lib.slack.rate_limiter import RateLimiter
+from lib.slack.routing import RoutingConfig, RoutingTable, SlackDestination
+from lib.slack.send_slack_message import DEFAULT_TIMEOUT
+from lib.slack.slack_alerter import SlackAlerter
+from lib.slack.slack_message import (
+    SlackMessage,
+    classify_alert,
+    create_from_classified_log_entry,
+    create_from_digest_group,
+    create_from_incident,
+    create_from_raw,
+)
+
+
+@dataclass(frozen=True)
+class RoutedSlackMessage:
+    message: SlackMessage
+    destinations: Tuple[str, ...]
+
+
+class RoutingSlackAlerter:
+    """
+    Sends each alert to the Slack destinations chosen by a RoutingTable.
+
+    Every destination has its own SlackAlerter, and so its own connection pool,
+    rate limiter, circuit breaker and spool, and an alert is sent to its
+    destinations at the same time, so a noisy destination, or one waiting on
+    its rate limiter, cannot hold up the others. A destination which cannot
+    send by the deadline spools the alert when it has a spool.
+
+    An alert is only failed, for PubSub to redeliver, when no destination
+    received it; redelivering one which reached some destinations would post it
+    to them again. The destinations it did not reach are logged, and their
+    spools, when configured, replay it.
+    """
+
+    def __init__(
+        self,
+        alerters: Dict[str, SlackAlerter],
+        routing_table: RoutingTable,
+        project_name: str,
+        playbook_url: Optional[str] = None,
+    ):
+        self._alerters = alerters
+        self._routing_table = routing_table
+        self._project_name = project_name
+        self._playbook_url = playbook_url
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(alerters), 1),
+            thread_name_prefix="slack-destination",
+        )
+
+    def send_alert(
+        self, message: RoutedSlackMessage, deadline: Optional[Deadline] = None
+    ) -> None:
+        if len(message.destinations) == 1:
+            errors = [self._send_to(message.destinations[0], message, deadline)]
+        else:
+            # Each send runs in the caller's context, so memory tracking and
+            # the like follow it into the worker thread.
+            futures = [
+                self._executor.submit(
+                    contextvars.copy_context().run,
+                    self._send_to,
+                    destination,
+                    message,
+                    deadline,
+                )
+                for destination in message.destinations
+            ]
+            errors = [future.result() for future in futures]
+
+        first_error: Optional[Exception] = None
+        failed = []
+        for destination, err in zip(message.destinations, errors):
+            if err is not None:
+                first_error = first_error or err
+                failed.append(destination)
+
+        if first_error is None:
+            return
+        if len(failed) == len(message.destinations):
+            raise first_error
+        logging.error(
+            "Alert not delivered to every Slack destination",
+            extra=dict(
+                json_fields=dict(
+                    title=message.message.title,
+                    failed_destinations=failed,
+                    delivered_destinations=[
+                        destination
+                        for destination in message.destinations
+                        if destination not in failed
+                    ],
+                )
+            ),
+        )
+
+    def _send_to(
+        self,
+        destination: str,
+        message: RoutedSlackMessage,
+        deadline: Optional[Deadline],
+    ) -> Optional[Exception]:
+        try:
+            self._alerters[destination].send_alert(message.message, deadline)
+        except Exception as err:
+            logging.error(
+                f"Failed to send alert to Slack destination '{destination}'",
+                extra=dict(textPayload=repr(err)),
+            )
+            return err
+        return None
+
+    def create_raw_alert(self, raw: Any) -> RoutedSlackMessage:
+        return RoutedSlackMessage(
+            message=create_from_raw(raw, self._project_name),
+            destinations=self._routing_table.default_destinations,
+        )
+
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> RoutedSlackMessage:
+        project_name = project_name or self._project_name
+        classification = classify_alert(entry)
+        route_key = (
+            project_name,
+            entry.application,
+            entry.platform,
+            entry.severity,
+            classification,
+        )
+        return RoutedSlackMessage(
+            message=create_from_classified_log_entry(
+                entry, classification, project_name, self._playbook_url
+            ),
+            destinations=self._routing_table.destinations_for(route_key),
+        )
+
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> RoutedSlackMessage:
+        project_name = project_name or self._project_name
+        route_key = (
+            project_name,
+            group.application,
+            group.platform,
+            group.severity,
+            group.classification,
+        )
+        return RoutedSlackMessage(
+            message=create_from_digest_group(group, project_name),
+            destinations=self._routing_table.destinations_for(route_key),
+        )
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> RoutedSlackMessage:
+        project_name = project_name or self._project_name
+        # The summary follows the first alert of the incident, which was routed
+        # by its application and classification.
+        route_key = (
+            project_name,
+            incident.applications[0] if incident.applications else None,
+            incident.platform,
+            incident.severity,
+            incident.classification,
+        )
+        return RoutedSlackMessage(
+            message=create_from_incident(incident, project_name),
+            destinations=self._routing_table.destinations_for(route_key),
+        )
+
+
+def create_routing_slack_alerter(
+    config: RoutingConfig,
+    project_name: str,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    failure_threshold: Optional[int] = None,
+    reset_timeout_seconds: float = 30.0,
+    spool_path: Optional[str] = None,
+    playbook_url: Optional[str] = None,
+    spool_replay_rate_per_second: float = 1.0,
+) -> RoutingSlackAlerter:
+    """
+    Create a RoutingSlackAlerter with an independent connection pool, rate
+    limiter, circuit breaker (when failure_threshold is set) and spool (when
+    spool_path is set), replayed at spool_replay_rate_per_second, for each
+    destination.
+    """
+    return RoutingSlackAlerter(
+        alerters={
+            name: SlackAlerter(
+                destination.url,
+                project_name,
+                spool=(
+                    DeadLetterSpool(_destination_spool_path(spool_path, name))
+                    if spool_path
+                    else None
+                ),
+                spool_replay_rate_limiter=RateLimiter(spool_replay_rate_per_second),
+                circuit_breaker=(
+                    CircuitBreaker(
+                        f"slack-webhook-{name}",
+                        failure_threshold=failure_threshold,
+                        reset_timeout_seconds=reset_timeout_seconds,
+                    )
+                    if failure_threshold is not None
+                    else None
+                ),
+                timeout=timeout,
+                session=create_destination_session(destination),
+                rate_limiter=RateLimiter(destination.rate_per_second),
+            )
+            for name, destination in config.destinations.items()
+        },
+        routing_table=config.table,
+        project_name=project_name,
+        playbook_url=playbook_url,
+    )
+
+
+def create_destination_session(destination: SlackDestination) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=destination.pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _destination_spool_path(spool_path: str, destination_name: str) -> str:
+    root, extension = os.path.splitext(spool_path)
+    return f"{root}-{destination_name}{extension}"
@@ -1,18 +1,37 @@
-import json
-import sys
+from typing import Optional, Tuple
 
 import requests
 
+from lib.profiling import memory_stage
 from lib.slack.slack_message import SlackMessage
-from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
-
-
-def send_slack_message(slack_url: str, message: SlackMessage) -> None:
-    slack_data = convert_slack_message_to_blocks(message)
-
-    byte_length = str(sys.getsizeof(slack_data))
-    headers = {"Content-Type": "application/json", "Content-Length": byte_length}
-    response = requests.post(slack_url, data=json.dumps(slack_data), headers=headers)
+from lib.slack.slack_message_formatter import convert_slack_message_to_payloads
+from lib.utilities import json_codec
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.05, 10.0)
+
+
+def send_slack_message(
+    slack_url: str,
+    message: SlackMessage,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    session: Optional[requests.Session] = None,
+) -> None:
+    for slack_data in convert_slack_message_to_payloads(message):
+        post_slack_payload(slack_url, slack_data, timeout=timeout, session=session)
+
+
+def post_slack_payload(
+    slack_url: str,
+    slack_data: dict,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    session: Optional[requests.Session] = None,
+) -> None:
+    with memory_stage("encode"):
+        body = json_codec.dumps(slack_data)
+    headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+    post = session.post if session is not None else requests.post
+    response = post(slack_url, data=body, headers=headers, timeout=timeout)
 
     if response.status_code != 200:
         raise SlackAlertFailed(response.status_code, response.text, slack_data)
@@ -20,3 +39,22 @@ def send_slack_message(slack_url: str, message: SlackMessage) -> None:
 
 class SlackAlertFailed(RuntimeError):
     pass
+
+
+class SlackCircuitOpen(SlackAlertFailed):
+    pass
+
+
+def is_slack_unavailable(err: SlackAlertFailed) -> bool:
+    if isinstance(err, SlackCircuitOpen):
+        return True
+    status_code = err.args[0]
+    return status_code == 429 or status_code >= 500
+
+
+def is_slack_rejection(err: Exception) -> bool:
+    """
+    Whether Slack refused the request itself, such as a payload with invalid
+    blocks, so sending it again would fail the same way.
+    """
+    return isinstance(err, SlackAlertFailed) and not is_slack_unavailable(err)
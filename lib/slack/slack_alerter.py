@@ -1,24 +1,184 @@
-from typing import Any
+import logging
+from typing import Any, Optional, Tuple
 
+import requests
+
+from lib.correlation import Incident
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.digest import DigestGroup
 from lib.log_processor import ProcessedLogEntry
-from lib.slack.send_slack_message import send_slack_message
+from lib.profiling import memory_stage
+from lib.slack.circuit_breaker import CircuitBreaker
+from lib.slack.dead_letter_spool import DeadLetterSpool
+from lib.slack.rate_limiter import RateLimiter
+from lib.slack.send_slack_message import (
+    DEFAULT_TIMEOUT,
+    SlackAlertFailed,
+    SlackCircuitOpen,
+    is_slack_rejection,
+    is_slack_unavailable,
+    post_slack_payload,
+)
 from lib.slack.slack_message import (
     SlackMessage,
+    create_from_digest_group,
+    create_from_incident,
     create_from_processed_log_entry,
     create_from_raw,
 )
+from lib.slack.slack_message_formatter import convert_slack_message_to_payloads
+
+SPOOL_REPLAY_BATCH_SIZE = 10
 
 
 class SlackAlerter:
-    def __init__(self, slack_url: str, project_name: str):
+    def __init__(
+        self,
+        slack_url: str,
+        project_name: str,
+        spool: Optional[DeadLetterSpool] = None,
+        spool_replay_rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        playbook_url: Optional[str] = None,
+    ):
         self._slack_url = slack_url
         self._project_name = project_name
+        self._spool = spool
+        self._spool_replay_rate_limiter = spool_replay_rate_limiter
+        self._circuit_breaker = circuit_breaker
+        self._timeout = timeout
+        self._session = session
+        self._rate_limiter = rate_limiter
+        self._playbook_url = playbook_url
+
+    def send_alert(
+        self, message: SlackMessage, deadline: Optional[Deadline] = None
+    ) -> None:
+        """
+        Send an alert, finishing by the deadline when one is given. Alerts
+        which fail while Slack is unavailable or which run out of time are
+        spooled when there is a spool, and otherwise the error is raised. Alerts
+        which Slack rejects are never spooled, since a replay would be rejected
+        too.
+        """
+        # Alerts too large for one Slack message are sent as follow-ups.
+        with memory_stage("encode"):
+            payloads = convert_slack_message_to_payloads(message)
+
+        if self._spool is None:
+            for slack_data in payloads:
+                self._post(slack_data, deadline)
+            return
+
+        for index, slack_data in enumerate(payloads):
+            try:
+                self._post(slack_data, deadline)
+            except (
+                SlackAlertFailed,
+                requests.RequestException,
+                DeadlineExceeded,
+            ) as err:
+                if is_slack_rejection(err):
+                    raise
+                for unsent in payloads[index:]:
+                    self._spool.append(unsent)
+                logging.warning(
+                    "Failed to send alert to Slack, spooled for replay",
+                    extra=dict(textPayload=repr(err)),
+                )
+                return
+
+        self.replay_spool(deadline)
+
+    def replay_spool(self, deadline: Optional[Deadline] = None) -> int:
+        if self._spool is None:
+            return 0
 
-    def send_alert(self, message: SlackMessage) -> None:
-        send_slack_message(self._slack_url, message)
+        try:
+            replayed = self._spool.drain(
+                lambda slack_data: self._post(slack_data, deadline),
+                rate_limiter=self._spool_replay_rate_limiter,
+                max_items=SPOOL_REPLAY_BATCH_SIZE,
+                deadline=deadline,
+                is_rejection=is_slack_rejection,
+            )
+        except (SlackAlertFailed, requests.RequestException, DeadlineExceeded) as err:
+            logging.warning(
+                "Failed to replay spooled Slack alerts",
+                extra=dict(textPayload=repr(err)),
+            )
+            return 0
+
+        if replayed > 0:
+            logging.info(
+                "Replayed spooled Slack alerts",
+                extra=dict(json_fields=dict(replayed=replayed)),
+            )
+        return replayed
 
     def create_raw_alert(self, raw: Any) -> SlackMessage:
         return create_from_raw(raw, self._project_name)
 
-    def create_alert(self, entry: ProcessedLogEntry) -> SlackMessage:
-        return create_from_processed_log_entry(entry, self._project_name)
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return create_from_processed_log_entry(
+            entry, project_name or self._project_name, self._playbook_url
+        )
+
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return create_from_digest_group(group, project_name or self._project_name)
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> SlackMessage:
+        return create_from_incident(incident, project_name or self._project_name)
+
+    def _post(self, slack_data: dict, deadline: Optional[Deadline] = None) -> None:
+        # Time is checked before the circuit breaker, so a half-open breaker is
+        # not left waiting for a probe which is never sent.
+        if self._rate_limiter is not None and not self._rate_limiter.acquire(
+            deadline.remaining() if deadline is not None else None
+        ):
+            raise DeadlineExceeded("No Slack rate limit token before the deadline")
+        timeout = (
+            self._timeout if deadline is None else deadline.limit_timeout(self._timeout)
+        )
+
+        if self._circuit_breaker is None:
+            self._post_now(slack_data, timeout)
+            return
+
+        if not self._circuit_breaker.allow_request():
+            raise SlackCircuitOpen("Slack circuit breaker is open", slack_data)
+
+        recorded = False
+        try:
+            self._post_now(slack_data, timeout)
+        except requests.RequestException:
+            self._circuit_breaker.record_failure()
+            recorded = True
+            raise
+        except SlackAlertFailed as err:
+            if is_slack_unavailable(err):
+                self._circuit_breaker.record_failure()
+            else:
+                self._circuit_breaker.record_success()
+            recorded = True
+            raise
+        else:
+            self._circuit_breaker.record_success()
+            recorded = True
+        finally:
+            if not recorded:
+                self._circuit_breaker.release_probe()
+
+    def _post_now(self, slack_data: dict, timeout: Tuple[float, float]) -> None:
+        post_slack_payload(
+            self._slack_url, slack_data, timeout=timeout, session=self._session
+        )
@@ -1,12 +1,20 @@
-import json
+from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple
 
 import pytz
 
 from lib.cloud_logging.log_query_link import create_log_query_link
+from lib.correlation import Incident
+from lib.digest import DigestGroup
 from lib.log_processor import ProcessedLogEntry
+from lib.utilities import json_codec
+
+# A raw event can be as large as a PubSub message, far more than is useful to
+# post; this is about forty sections.
+MAX_RAW_CONTENT_CHARS = 120_000
 
 
 @dataclass(frozen=True)
@@ -26,7 +34,9 @@ def create_from_raw(event: Any, project_name: str) -> SlackMessage:
             "Log Time": "unknown",
             "Project": project_name,
         },
-        content=json.dumps(event, indent=2),
+        content=_trim_length(
+            json_codec.dumps_indented(event), max_chars=MAX_RAW_CONTENT_CHARS
+        ),
         footnote=(
             "This message was not in an expected format; "
             "consider extending the alerting lambda to support this message type."
@@ -35,20 +45,118 @@ def create_from_raw(event: Any, project_name: str) -> SlackMessage:
 
 
 def create_from_processed_log_entry(
-    processed_log_entry: ProcessedLogEntry, project_name: str
+    processed_log_entry: ProcessedLogEntry,
+    project_name: str,
+    playbook_url: Optional[str] = None,
+) -> SlackMessage:
+    return create_from_classified_log_entry(
+        processed_log_entry,
+        classify_alert(processed_log_entry),
+        project_name,
+        playbook_url,
+    )
+
+
+def create_from_classified_log_entry(
+    processed_log_entry: ProcessedLogEntry,
+    classification: Optional[str],
+    project_name: str,
+    playbook_url: Optional[str] = None,
 ) -> SlackMessage:
+    """For callers which have already classified the entry, such as to route it."""
     title, full_message = _create_title(processed_log_entry)
 
+    fields = {
+        "Platform": processed_log_entry.platform or "unknown",
+        "Application": processed_log_entry.application or "unknown",
+        "Log Time": _create_log_time_in_local_timezone(processed_log_entry),
+        "Project": project_name,
+    }
+    if processed_log_entry.suppressed_count > 0:
+        fields["Suppressed"] = (
+            f"+{processed_log_entry.suppressed_count:,} similar suppressed"
+        )
+
+    return SlackMessage(
+        title=title,
+        fields=fields,
+        content=_create_content(processed_log_entry, full_message),
+        footnote=_create_footnote(
+            processed_log_entry, project_name, classification, playbook_url
+        ),
+    )
+
+
+def create_from_digest_group(group: DigestGroup, project_name: str) -> SlackMessage:
+    title = f":bell: {group.count} x {group.severity or 'UNKNOWN'}: {group.message}"
+    if len(title) > 150:
+        title = f"{title[:145]}..."
+
+    log_link_url = create_log_query_link(
+        fields=group.log_query,
+        severities=[group.severity] if group.severity else [],
+        cursor_timestamp=group.first_seen,
+        project_name=project_name,
+        end_timestamp=group.last_seen,
+    )
+
     return SlackMessage(
         title=title,
         fields={
-            "Platform": processed_log_entry.platform or "unknown",
-            "Application": processed_log_entry.application or "unknown",
-            "Log Time": _create_log_time_in_local_timezone(processed_log_entry),
+            "Platform": group.platform or "unknown",
+            "Application": group.application,
+            "Occurrences": str(group.count),
+            "First Seen": _convert_time_to_london_timezone(group.first_seen).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            "Last Seen": _convert_time_to_london_timezone(group.last_seen).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
             "Project": project_name,
         },
-        content=_create_content(processed_log_entry, full_message),
-        footnote=_create_footnote(processed_log_entry, project_name),
+        content="",
+        footnote=(
+            "*Digest of low-priority alerts*\n" f"<{log_link_url} | View the logs>"
+        ),
+    )
+
+
+def create_from_incident(incident: Incident, project_name: str) -> SlackMessage:
+    title = (
+        f":link: Incident on {incident.resource_type} {incident.resource}: "
+        f"{incident.count} related alerts"
+    )
+    if len(title) > 150:
+        title = f"{title[:145]}..."
+
+    log_link_url = create_log_query_link(
+        fields=incident.log_query,
+        severities=[],
+        cursor_timestamp=incident.first_seen,
+        project_name=project_name,
+        end_timestamp=incident.last_seen,
+    )
+
+    return SlackMessage(
+        title=title,
+        fields={
+            "Platform": incident.platform or "unknown",
+            "Applications": ", ".join(incident.applications),
+            "Alerts": str(incident.count),
+            "Highest Severity": incident.severity or "UNKNOWN",
+            "First Seen": _convert_time_to_london_timezone(
+                incident.first_seen
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+            "Last Seen": _convert_time_to_london_timezone(incident.last_seen).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+            "Project": project_name,
+        },
+        content=_trim_length("\n".join(incident.messages), max_chars=2900),
+        footnote=(
+            "*Summary of alerts merged into the first alert for this resource*\n"
+            f"<{log_link_url} | View the logs>"
+        ),
     )
 
 
@@ -87,11 +195,11 @@ def _create_content(
     content = (
         processed_log_entry.data
         if isinstance(processed_log_entry.data, str)
-        else json.dumps(processed_log_entry.data, indent=2)
+        else json_codec.dumps_indented(processed_log_entry.data)
     )
 
     if processed_log_entry.most_important_values and isinstance(
-        processed_log_entry.data, dict
+        processed_log_entry.data, Mapping
     ):
         important_values = [
             f"{value}: {_get_value(processed_log_entry.data, value)}"
@@ -144,79 +252,96 @@ def _populate_investigate_line(
     return f"3. <{log_link_url} | View the logs>"
 
 
-def _is_data_delivery_alert(processed_log_entry: ProcessedLogEntry) -> bool:
-    if processed_log_entry.application in (
-        "data-delivery",
-        "NiFiEncryptFunction",
-        "nifi-notify",
-        "nifi-receipt",
-    ):
-        return True
-    return False
-
+DATA_DELIVERY_ALERT = "data-delivery"
+TOTALMOBILE_ALERT = "totalmobile"
+NISRA_ALERT = "nisra"
+
+_APPLICATION_CLASSIFICATIONS = {
+    "data-delivery": DATA_DELIVERY_ALERT,
+    "NiFiEncryptFunction": DATA_DELIVERY_ALERT,
+    "nifi-notify": DATA_DELIVERY_ALERT,
+    "nifi-receipt": DATA_DELIVERY_ALERT,
+    "nisra-case-mover": NISRA_ALERT,
+    "nisra-case-mover-trigger": NISRA_ALERT,
+}
+
+# Searched for one at a time: a regex alternation of these is several times
+# slower than these substring searches on long messages.
+_TOTALMOBILE_MESSAGES = (
+    "Totalmobile",
+    "Could not find questionnaire",
+    "Could not find case",
+    "bts-create-totalmobile-jobs-processor",
+)
+
+_PLAYBOOK_INSTRUCTIONS = {
+    DATA_DELIVERY_ALERT: "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50299847/Troubleshooting+Playbook+-+Data+Delivery | View the Data Delivery Troubleshooting Playbook>",
+    TOTALMOBILE_ALERT: "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50326799/Troubleshooting+Playbook+-+BTS+Totalmobile | View the BTS/Totalmobile Troubleshooting Playbook>",
+    NISRA_ALERT: "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50326981/Troubleshooting+Playbook+-+NISRA | View the NISRA Troubleshooting Playbook>",
+}
+
+_DEFAULT_INSTRUCTIONS = "4. Follow the <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50299787/Troubleshooting+Playbook+-+Slack+Alerts | Managing Prod Alerts> process"
+
+
+def classify_alert(processed_log_entry: ProcessedLogEntry) -> Optional[str]:
+    """
+    The playbook an alert belongs to, checked in order: data delivery by
+    application, Totalmobile by message or "bts" job, then NISRA by
+    application or "nisra" job.
+    """
+    application_classification = _APPLICATION_CLASSIFICATIONS.get(
+        processed_log_entry.application or ""
+    )
+    if application_classification == DATA_DELIVERY_ALERT:
+        return DATA_DELIVERY_ALERT
 
-def _is_totalmobile_alert(processed_log_entry: ProcessedLogEntry) -> bool:
-    totalmobile_errors = [
-        "Totalmobile",
-        "Could not find questionnaire",
-        "Could not find case",
-        "bts-create-totalmobile-jobs-processor",
-    ]
+    job_name = processed_log_entry.log_query.get("jobName")
+    if not isinstance(job_name, str):
+        job_name = ""
 
     message = processed_log_entry.message or ""
-    if any(match in message for match in totalmobile_errors):
-        return True
-
-    try:
-        if "bts" in processed_log_entry.log_query["jobName"]:
-            return True
-    except KeyError:
-        return False
+    if any(match in message for match in _TOTALMOBILE_MESSAGES) or "bts" in job_name:
+        return TOTALMOBILE_ALERT
 
-    return False
+    if application_classification == NISRA_ALERT or "nisra" in job_name:
+        return NISRA_ALERT
 
-
-def _is_nisra_alert(processed_log_entry: ProcessedLogEntry) -> bool:
-    if processed_log_entry.application in (
-        "nisra-case-mover",
-        "nisra-case-mover-trigger",
-    ):
-        return True
-
-    try:
-        if "nisra" in processed_log_entry.log_query["jobName"]:
-            return True
-    except KeyError:
-        return False
-
-    return False
+    return None
 
 
-def _populate_instructions_line(processed_log_entry: ProcessedLogEntry) -> str:
-    if _is_data_delivery_alert(processed_log_entry):
-        return "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50299847/Troubleshooting+Playbook+-+Data+Delivery | View the Data Delivery Troubleshooting Playbook>"
-
-    if _is_totalmobile_alert(processed_log_entry):
-        return "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50326799/Troubleshooting+Playbook+-+BTS+Totalmobile | View the BTS/Totalmobile Troubleshooting Playbook>"
-
-    if _is_nisra_alert(processed_log_entry):
-        return "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50326981/Troubleshooting+Playbook+-+NISRA | View the NISRA Troubleshooting Playbook>"
-
-    return "4. Follow the <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50299787/Troubleshooting+Playbook+-+Slack+Alerts | Managing Prod Alerts> process"
+def _create_footnote(
+    processed_log_entry: ProcessedLogEntry,
+    project_name: str,
+    classification: Optional[str],
+    playbook_url: Optional[str] = None,
+) -> str:
+    # Only the log link differs between alerts with the same footnote.
+    steps, instructions = _footnote_template(project_name, classification, playbook_url)
+    investigate = _populate_investigate_line(processed_log_entry, project_name)
+    return f"{steps}{investigate}\n{instructions}"
 
 
-def _create_footnote(processed_log_entry: ProcessedLogEntry, project_name: str) -> str:
+@lru_cache(maxsize=256)
+def _footnote_template(
+    project_name: str, classification: Optional[str], playbook_url: Optional[str]
+) -> Tuple[str, str]:
     uptime_url = f"https://console.cloud.google.com/monitoring/uptime?referrer=search&project={project_name}"
-    investigate = _populate_investigate_line(processed_log_entry, project_name)
-    instructions = _populate_instructions_line(processed_log_entry)
-
-    return (
+    steps = (
         "*Next Steps*\n"
         "1. Add some :eyes: to show you are investigating\n"
         f"2. <{uptime_url} | Check the system is online>\n"
-        f"{investigate}\n"
-        f"{instructions}"
     )
+    return steps, _instructions_line(classification, playbook_url)
+
+
+def _instructions_line(
+    classification: Optional[str], playbook_url: Optional[str]
+) -> str:
+    if classification is None:
+        if playbook_url is not None:
+            return f"4. Follow the <{playbook_url} | Troubleshooting Playbook> process"
+        return _DEFAULT_INSTRUCTIONS
+    return _PLAYBOOK_INSTRUCTIONS[classification]
 
 
 def _trim_number_of_lines(content: str, max_lines: int) -> str:
@@ -232,9 +357,9 @@ def _trim_length(content: str, max_chars: int) -> str:
     return content
 
 
-def _get_value(dictionary: dict, path: str) -> Optional[Any]:
+def _get_value(dictionary: Mapping[str, Any], path: str) -> Optional[Any]:
     parts = path.split(".")
-    result = dictionary
+    result: Any = dictionary
     for part in parts:
         result = result.get(part, {})
-    return None if isinstance(result, dict) else result
+    return None if isinstance(result, Mapping) else result
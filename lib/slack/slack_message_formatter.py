@@ -1,31 +1,138 @@
+from typing import Any, Dict, List
+
 from lib.slack.slack_message import SlackMessage
 
+# Slack Block Kit limits
+MAX_HEADER_CHARS = 150
+MAX_SECTION_CHARS = 3000
+MAX_FIELD_CHARS = 2000
+MAX_FIELDS_PER_SECTION = 10
+MAX_BLOCKS = 50
+
+# Follow-up messages sent after the first for one alert; blocks beyond them are
+# dropped, so a huge alert cannot flood a channel or the rate limit.
+MAX_FOLLOW_UPS = 3
+
 
 def convert_slack_message_to_blocks(message: SlackMessage) -> dict:
-    blocks = [
+    """
+    Convert a message to Slack blocks within Slack's limits on each block.
+
+    Content and footnotes which are too long for one section are spread over
+    several sections rather than truncated. The result may have more blocks
+    than Slack allows in one message; see split_slack_payload.
+    """
+    blocks: List[Dict[str, Any]] = [
         dict(
             type="header",
-            text=dict(type="plain_text", text=f"{message.title}"),
-        ),
-        dict(
-            type="section",
-            fields=[
-                dict(type="mrkdwn", text=f"*{key}:*\n{value}")
-                for key, value in message.fields.items()
-            ],
+            text=dict(
+                type="plain_text", text=_limit_text(message.title, MAX_HEADER_CHARS)
+            ),
         ),
     ]
 
+    fields = [
+        dict(type="mrkdwn", text=_limit_text(f"*{key}:*\n{value}", MAX_FIELD_CHARS))
+        for key, value in message.fields.items()
+    ]
+    for start in range(0, max(len(fields), 1), MAX_FIELDS_PER_SECTION):
+        blocks.append(
+            dict(type="section", fields=fields[start : start + MAX_FIELDS_PER_SECTION])
+        )
+
     if message.content != "":
         blocks.append(dict(type="divider"))
-        blocks.append(
-            dict(
-                type="section",
-                text=dict(type="plain_text", text=message.content),
-            )
+        blocks.extend(
+            dict(type="section", text=dict(type="plain_text", text=text))
+            for text in _split_text(message.content, MAX_SECTION_CHARS)
         )
 
     blocks.append(dict(type="divider"))
-    blocks.append(dict(type="section", text=dict(type="mrkdwn", text=message.footnote)))
+    blocks.extend(
+        dict(type="section", text=dict(type="mrkdwn", text=text))
+        for text in _split_text(message.footnote, MAX_SECTION_CHARS)
+    )
 
     return dict(blocks=blocks)
+
+
+def convert_slack_message_to_payloads(message: SlackMessage) -> List[dict]:
+    return split_slack_payload(convert_slack_message_to_blocks(message))
+
+
+def split_slack_payload(
+    slack_data: dict,
+    max_blocks: int = MAX_BLOCKS,
+    max_follow_ups: int = MAX_FOLLOW_UPS,
+) -> List[dict]:
+    """
+    Split a payload with too many blocks into a message followed by at most
+    max_follow_ups follow-up messages, each of which starts with a note of its
+    position. Blocks which do not fit in those are replaced by a note of how
+    many were left out.
+    """
+    blocks = slack_data["blocks"]
+    if len(blocks) <= max_blocks:
+        return [slack_data]
+
+    capacity = max_blocks + max_follow_ups * (max_blocks - 1)
+    if len(blocks) > capacity:
+        omitted = len(blocks) - capacity + 1
+        blocks = [
+            *blocks[: capacity - 1],
+            dict(
+                type="context",
+                elements=[
+                    dict(
+                        type="mrkdwn",
+                        text=f"_Truncated: {omitted} more blocks not shown_",
+                    )
+                ],
+            ),
+        ]
+
+    chunks = [blocks[:max_blocks]]
+    remaining = blocks[max_blocks:]
+    while remaining:
+        chunks.append(remaining[: max_blocks - 1])
+        remaining = remaining[max_blocks - 1 :]
+
+    payloads = [dict(blocks=chunks[0])]
+    for number, chunk in enumerate(chunks[1:], start=2):
+        continued = dict(
+            type="context",
+            elements=[
+                dict(type="mrkdwn", text=f"_Continued ({number}/{len(chunks)})_")
+            ],
+        )
+        payloads.append(dict(blocks=[continued, *chunk]))
+    return payloads
+
+
+def _limit_text(text: str, max_chars: int) -> str:
+    if len(text) > max_chars:
+        return f"{text[:max_chars - 3]}..."
+    return text
+
+
+def _split_text(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+
+    # Split between lines where possible, so links and formatting stay intact.
+    chunks: List[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,606 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import requests
+
+from lib.correlation import Incident
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry, fingerprint
+from lib.profiling import memory_stage
+from lib.slack.circuit_breaker import CircuitBreaker
+from lib.slack.dead_letter_spool import DeadLetterSpool
+from lib.slack.rate_limiter import RateLimiter
+from lib.slack.send_slack_message import (
+    DEFAULT_TIMEOUT,
+    SlackAlertFailed,
+    SlackCircuitOpen,
+    is_slack_unavailable,
+)
+from lib.slack.slack_alerter import SPOOL_REPLAY_BATCH_SIZE
+from lib.slack.slack_message import (
+    SlackMessage,
+    create_from_digest_group,
+    create_from_incident,
+    create_from_processed_log_entry,
+    create_from_raw,
+)
+from lib.slack.slack_message_formatter import convert_slack_message_to_payloads
+from lib.utilities import json_codec
+
+SLACK_API_URL = "https://slack.com/api"
+
+# Each repeat is posted as a short reply in the parent's thread.
+REPLY_REPEATS = "reply"
+# Repeats are counted in one reply, which is updated at most once per interval.
+COUNT_REPEATS = "count"
+
+
+@dataclass(frozen=True)
+class ThreadedSlackMessage:
+    message: SlackMessage
+    # Alerts with the same thread key are threaded under the first; alerts
+    # without one are always posted to the channel.
+    thread_key: Optional[str] = field(default=None)
+
+
+# Web API errors, reported in the body of a 200 response, which say Slack is
+# busy or failing rather than that the call is wrong, and so are worth retrying.
+RETRIABLE_API_ERRORS = frozenset(
+    [
+        "ratelimited",
+        "internal_error",
+        "fatal_error",
+        "service_unavailable",
+        "request_timeout",
+    ]
+)
+
+_FAILURES = (SlackAlertFailed, requests.RequestException, DeadlineExceeded)
+
+# The columns of threads which make up a _Thread.
+_THREAD_COLUMNS = (
+    "thread_key, ts, started_at, occurrences, shown_occurrences, last_log_time, "
+    "count_ts, count_updated_at"
+)
+
+# Bumps a thread to most recently seen; takes the channel as a parameter.
+_NEXT_SEEN_ORDER = (
+    "SELECT COALESCE(MAX(seen_order), 0) + 1 FROM threads WHERE channel = ?"
+)
+
+
+def is_api_unavailable(err: SlackAlertFailed) -> bool:
+    return is_slack_unavailable(err) or (
+        isinstance(err.args[1], str) and err.args[1] in RETRIABLE_API_ERRORS
+    )
+
+
+def is_retriable(err: Exception) -> bool:
+    """
+    Whether a failed call may succeed later, so is worth spooling. Calls which
+    Slack rejected, such as to a channel the bot is not in, never will.
+    """
+    return not isinstance(err, SlackAlertFailed) or is_api_unavailable(err)
+
+
+def is_api_rejection(err: Exception) -> bool:
+    return isinstance(err, SlackAlertFailed) and not is_api_unavailable(err)
+
+
+@dataclass(frozen=True)
+class _Thread:
+    thread_key: str
+    ts: str
+    started_at: float
+    occurrences: int
+    # The parent message shows the first occurrence.
+    shown_occurrences: int
+    last_log_time: str
+    count_ts: Optional[str]
+    count_updated_at: Optional[float]
+
+
+class _ThreadStore:
+    """
+    The threads started, kept in SQLite so the instances posting to a channel,
+    and the scheduled flush of count replies, share them.
+    """
+
+    def __init__(self, path: str, channel: str) -> None:
+        self._channel = channel
+        self._lock = threading.Lock()
+        # As with IncidentCorrelator, transactions are begun explicitly so
+        # reading and updating a thread is not interleaved with another process.
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            "channel TEXT NOT NULL, "
+            "thread_key TEXT NOT NULL, "
+            "ts TEXT NOT NULL, "
+            "started_at REAL NOT NULL, "
+            "occurrences INTEGER NOT NULL, "
+            "shown_occurrences INTEGER NOT NULL, "
+            "last_log_time TEXT NOT NULL, "
+            "count_ts TEXT, "
+            "count_updated_at REAL, "
+            "seen_order INTEGER NOT NULL, "
+            "PRIMARY KEY (channel, thread_key))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS threads_seen ON threads (channel, seen_order)"
+        )
+
+    def get(self, thread_key: str, started_after: float) -> Optional[_Thread]:
+        """Return the thread for thread_key, marking it seen, unless it is too old."""
+        with self._transaction():
+            thread = self._get(thread_key)
+            if thread is None:
+                return None
+            if thread.started_at < started_after:
+                self._connection.execute(
+                    "DELETE FROM threads WHERE channel = ? AND thread_key = ?",
+                    (self._channel, thread_key),
+                )
+                return None
+            self._connection.execute(
+                f"UPDATE threads SET seen_order = ({_NEXT_SEEN_ORDER}) "
+                "WHERE channel = ? AND thread_key = ?",
+                (self._channel, self._channel, thread_key),
+            )
+            return thread
+
+    def add(self, thread_key: str, ts: str, now: float, max_threads: int) -> None:
+        with self._transaction():
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO threads (channel, {_THREAD_COLUMNS}, "
+                f"seen_order) VALUES (?, ?, ?, ?, 1, 1, 'unknown', NULL, NULL, "
+                f"({_NEXT_SEEN_ORDER}))",
+                (self._channel, thread_key, ts, now, self._channel),
+            )
+            # The least recently seen threads are forgotten first.
+            self._connection.execute(
+                "DELETE FROM threads WHERE channel = ? AND thread_key IN ("
+                "SELECT thread_key FROM threads WHERE channel = ? "
+                "ORDER BY seen_order DESC LIMIT -1 OFFSET ?)",
+                (self._channel, self._channel, max_threads),
+            )
+
+    def count(self, thread_key: str, log_time: str) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE threads SET occurrences = occurrences + 1, "
+                "last_log_time = ? WHERE channel = ? AND thread_key = ?",
+                (log_time, self._channel, thread_key),
+            )
+
+    def shown(self, thread_key: str, occurrences: int) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE threads SET shown_occurrences = MAX(shown_occurrences, ?) "
+                "WHERE channel = ? AND thread_key = ?",
+                (occurrences, self._channel, thread_key),
+            )
+
+    def set_count_ts(self, thread_key: str, count_ts: str) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE threads SET count_ts = ? WHERE channel = ? AND thread_key = ?",
+                (count_ts, self._channel, thread_key),
+            )
+
+    def claim_count_update(
+        self, thread_key: str, now: float, interval: float
+    ) -> Optional[_Thread]:
+        """
+        Claim the next update of a thread's count reply, once interval has
+        passed since the last, returning the thread as it was before the claim.
+        Only one instance gets each claim.
+        """
+        with self._transaction():
+            thread = self._get(thread_key)
+            if thread is None or not self._claim(thread, now, interval):
+                return None
+            return thread
+
+    def claim_pending_counts(self, now: float, interval: float) -> List[_Thread]:
+        """Claim the updates due of count replies which do not show every repeat."""
+        with self._transaction():
+            rows = self._connection.execute(
+                f"SELECT {_THREAD_COLUMNS} FROM threads WHERE channel = ? "
+                "AND occurrences > shown_occurrences ORDER BY seen_order",
+                (self._channel,),
+            ).fetchall()
+            return [
+                thread
+                for thread in (_Thread(*row) for row in rows)
+                if self._claim(thread, now, interval)
+            ]
+
+    def release_claim(self, thread: _Thread, claimed_at: float) -> None:
+        """Give back a claim whose update failed, so the next call can try again."""
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE threads SET count_updated_at = ? WHERE channel = ? "
+                "AND thread_key = ? AND count_updated_at = ?",
+                (thread.count_updated_at, self._channel, thread.thread_key, claimed_at),
+            )
+
+    def _get(self, thread_key: str) -> Optional[_Thread]:
+        row = self._connection.execute(
+            f"SELECT {_THREAD_COLUMNS} FROM threads "
+            "WHERE channel = ? AND thread_key = ?",
+            (self._channel, thread_key),
+        ).fetchone()
+        return _Thread(*row) if row is not None else None
+
+    def _claim(self, thread: _Thread, now: float, interval: float) -> bool:
+        if thread.count_updated_at is not None and (
+            now - thread.count_updated_at < interval
+        ):
+            return False
+        self._connection.execute(
+            "UPDATE threads SET count_updated_at = ? "
+            "WHERE channel = ? AND thread_key = ?",
+            (now, self._channel, thread.thread_key),
+        )
+        return True
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+
+class SlackWebApiAlerter:
+    """
+    Posts alerts with the Slack Web API's chat.postMessage, which, unlike an
+    incoming webhook, returns the posted message's ts so repeats of an alert
+    can be threaded under it instead of filling the channel.
+
+    The ts of each alert's parent message is kept by fingerprint for
+    thread_max_age_seconds, for at most max_threads fingerprints, least
+    recently seen first out. Repeats are posted as short thread replies, or
+    with repeats=COUNT_REPEATS counted in a single "x N" reply which is
+    updated with chat.update at most every update_interval_seconds. Repeats
+    which fall between updates are shown by flush_counts, which runs after
+    each alert sent and should also be run periodically.
+
+    Threads are kept in the SQLite database at threads_path, so instances
+    using the same file, and the scheduled flush_counts, share them. Two
+    instances handling the first occurrences of an alert at once may still
+    each start a thread.
+
+    Calls which fail because Slack is unavailable, is rate limiting or does
+    not answer in time are spooled when there is a spool, as with
+    SlackAlerter, and otherwise the error is raised. Calls which Slack
+    rejects, such as to an unknown channel, are raised, as a retry would be
+    rejected too. A repeat is only counted once it has been posted or
+    spooled, so one which is redelivered after failing is not counted twice.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        channel: str,
+        project_name: str,
+        repeats: str = REPLY_REPEATS,
+        max_threads: int = 1000,
+        thread_max_age_seconds: float = 86400,
+        update_interval_seconds: float = 60,
+        playbook_url: Optional[str] = None,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        spool: Optional[DeadLetterSpool] = None,
+        spool_replay_rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        api_url: str = SLACK_API_URL,
+        threads_path: str = ":memory:",
+        clock: Callable[[], float] = time.time,
+    ):
+        if repeats not in (REPLY_REPEATS, COUNT_REPEATS):
+            raise ValueError(f"Unknown repeats mode '{repeats}'")
+
+        self._token = token
+        self._channel = channel
+        self._project_name = project_name
+        self._repeats = repeats
+        self._max_threads = max_threads
+        self._thread_max_age_seconds = thread_max_age_seconds
+        self._update_interval_seconds = update_interval_seconds
+        self._playbook_url = playbook_url
+        self._timeout = timeout
+        self._session = session
+        self._rate_limiter = rate_limiter
+        self._spool = spool
+        self._spool_replay_rate_limiter = spool_replay_rate_limiter
+        self._circuit_breaker = circuit_breaker
+        self._api_url = api_url
+        self._clock = clock
+        self._threads = _ThreadStore(threads_path, channel)
+
+    def send_alert(
+        self, message: ThreadedSlackMessage, deadline: Optional[Deadline] = None
+    ) -> None:
+        thread = self._repeat_of(message.thread_key)
+        try:
+            if thread is not None:
+                self._send_repeat(thread, message.message, deadline)
+            else:
+                self._send_new(message, deadline)
+        except _FAILURES as err:
+            if self._spool is None or not is_retriable(err):
+                raise
+            logging.warning(
+                "Failed to send alert to Slack, spooled for replay",
+                extra=dict(textPayload=repr(err)),
+            )
+            return
+
+        self.replay_spool(deadline)
+        self.flush_counts(deadline)
+
+    def replay_spool(self, deadline: Optional[Deadline] = None) -> int:
+        if self._spool is None:
+            return 0
+
+        try:
+            replayed = self._spool.drain(
+                lambda call: self._replay(call, deadline),
+                rate_limiter=self._spool_replay_rate_limiter,
+                max_items=SPOOL_REPLAY_BATCH_SIZE,
+                deadline=deadline,
+                is_rejection=is_api_rejection,
+            )
+        except _FAILURES as err:
+            logging.warning(
+                "Failed to replay spooled Slack alerts",
+                extra=dict(textPayload=repr(err)),
+            )
+            return 0
+
+        if replayed > 0:
+            logging.info(
+                "Replayed spooled Slack alerts",
+                extra=dict(json_fields=dict(replayed=replayed)),
+            )
+        return replayed
+
+    def flush_counts(self, deadline: Optional[Deadline] = None) -> int:
+        """
+        Update the count replies which do not show every repeat, once their
+        update interval has passed. Returns the number updated.
+        """
+        now = self._clock()
+        due = self._threads.claim_pending_counts(now, self._update_interval_seconds)
+
+        updated = 0
+        for thread in due:
+            try:
+                self._update_count(
+                    thread, thread.occurrences, thread.last_log_time, deadline
+                )
+            except _FAILURES as err:
+                logging.warning(
+                    "Failed to update Slack thread counts",
+                    extra=dict(textPayload=repr(err)),
+                )
+                for unsent in due[updated:]:
+                    self._threads.release_claim(unsent, now)
+                break
+            self._threads.shown(thread.thread_key, thread.occurrences)
+            updated += 1
+        return updated
+
+    def create_raw_alert(self, raw: Any) -> ThreadedSlackMessage:
+        return ThreadedSlackMessage(create_from_raw(raw, self._project_name))
+
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> ThreadedSlackMessage:
+        return ThreadedSlackMessage(
+            create_from_processed_log_entry(
+                entry, project_name or self._project_name, self._playbook_url
+            ),
+            thread_key=fingerprint(entry),
+        )
+
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> ThreadedSlackMessage:
+        return ThreadedSlackMessage(
+            create_from_digest_group(group, project_name or self._project_name)
+        )
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> ThreadedSlackMessage:
+        return ThreadedSlackMessage(
+            create_from_incident(incident, project_name or self._project_name)
+        )
+
+    def _send_new(
+        self, message: ThreadedSlackMessage, deadline: Optional[Deadline]
+    ) -> None:
+        # Alerts too large for one Slack message continue in their own thread.
+        with memory_stage("encode"):
+            payloads = convert_slack_message_to_payloads(message.message)
+        calls = [
+            {**slack_data, "channel": self._channel, "text": message.message.title}
+            for slack_data in payloads
+        ]
+
+        try:
+            ts = self._call("chat.postMessage", calls[0], deadline)["ts"]
+        except _FAILURES as err:
+            # Without a parent the follow-ups are posted to the channel.
+            self._spool_calls("chat.postMessage", calls, err)
+            raise
+
+        if message.thread_key is not None:
+            self._threads.add(message.thread_key, ts, self._clock(), self._max_threads)
+
+        follow_ups = [{**call, "thread_ts": ts} for call in calls[1:]]
+        for index, call in enumerate(follow_ups):
+            try:
+                self._call("chat.postMessage", call, deadline)
+            except _FAILURES as err:
+                self._spool_calls("chat.postMessage", follow_ups[index:], err)
+                raise
+
+    def _repeat_of(self, thread_key: Optional[str]) -> Optional[_Thread]:
+        if thread_key is None:
+            return None
+        return self._threads.get(
+            thread_key, self._clock() - self._thread_max_age_seconds
+        )
+
+    def _send_repeat(
+        self,
+        thread: _Thread,
+        message: SlackMessage,
+        deadline: Optional[Deadline],
+    ) -> None:
+        log_time = message.fields.get("Log Time", "unknown")
+        if self._repeats == REPLY_REPEATS:
+            call = {
+                "channel": self._channel,
+                "thread_ts": thread.ts,
+                "text": f"Occurred again at {log_time}",
+            }
+            try:
+                self._call("chat.postMessage", call, deadline)
+            except _FAILURES as err:
+                self._spool_calls("chat.postMessage", [call], err)
+                raise
+            return
+
+        now = self._clock()
+        claimed = self._threads.claim_count_update(
+            thread.thread_key, now, self._update_interval_seconds
+        )
+        if claimed is None:
+            self._threads.count(thread.thread_key, log_time)
+            return
+        occurrences = claimed.occurrences + 1
+
+        try:
+            self._update_count(claimed, occurrences, log_time, deadline)
+        except _FAILURES as err:
+            self._threads.release_claim(claimed, now)
+            # A spooled repeat is not redelivered, so it is counted and shown
+            # by a later update.
+            if self._spool is not None and is_retriable(err):
+                self._threads.count(thread.thread_key, log_time)
+            raise
+
+        self._threads.count(thread.thread_key, log_time)
+        self._threads.shown(thread.thread_key, occurrences)
+
+    def _update_count(
+        self,
+        thread: _Thread,
+        occurrences: int,
+        log_time: str,
+        deadline: Optional[Deadline],
+    ) -> None:
+        text = f"x {occurrences}, most recently at {log_time}"
+        if thread.count_ts is None:
+            result = self._call(
+                "chat.postMessage",
+                {"channel": self._channel, "thread_ts": thread.ts, "text": text},
+                deadline,
+            )
+            self._threads.set_count_ts(thread.thread_key, result["ts"])
+        else:
+            self._call(
+                "chat.update",
+                {"channel": self._channel, "ts": thread.count_ts, "text": text},
+                deadline,
+            )
+
+    def _replay(self, call: dict, deadline: Optional[Deadline]) -> None:
+        self._call(call["method"], call["data"], deadline)
+
+    def _spool_calls(self, method: str, calls: List[dict], err: Exception) -> None:
+        if self._spool is None or not is_retriable(err):
+            return
+        for data in calls:
+            self._spool.append({"method": method, "data": data})
+
+    def _call(self, method: str, data: dict, deadline: Optional[Deadline]) -> dict:
+        # Time is checked before the circuit breaker, so a half-open breaker is
+        # not left waiting for a probe which is never sent.
+        if self._rate_limiter is not None and not self._rate_limiter.acquire(
+            deadline.remaining() if deadline is not None else None
+        ):
+            raise DeadlineExceeded("No Slack rate limit token before the deadline")
+        timeout = (
+            self._timeout if deadline is None else deadline.limit_timeout(self._timeout)
+        )
+
+        if self._circuit_breaker is None:
+            return self._call_now(method, data, timeout)
+
+        if not self._circuit_breaker.allow_request():
+            raise SlackCircuitOpen("Slack circuit breaker is open", data)
+
+        recorded = False
+        try:
+            result = self._call_now(method, data, timeout)
+        except requests.RequestException:
+            self._circuit_breaker.record_failure()
+            recorded = True
+            raise
+        except SlackAlertFailed as err:
+            if is_api_unavailable(err):
+                self._circuit_breaker.record_failure()
+            else:
+                self._circuit_breaker.record_success()
+            recorded = True
+            raise
+        else:
+            self._circuit_breaker.record_success()
+            recorded = True
+        finally:
+            if not recorded:
+                self._circuit_breaker.release_probe()
+        return result
+
+    def _call_now(self, method: str, data: dict, timeout: Tuple[float, float]) -> dict:
+        with memory_stage("encode"):
+            body = json_codec.dumps(data)
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Authorization": f"Bearer {self._token}",
+        }
+        post = self._session.post if self._session is not None else requests.post
+        response = post(
+            f"{self._api_url}/{method}", data=body, headers=headers, timeout=timeout
+        )
+
+        if response.status_code != 200:
+            raise SlackAlertFailed(response.status_code, response.text, data)
+        # The Web API reports errors in the body of a 200 response.
+        try:
+            result = response.json()
+        except ValueError:
+            raise SlackAlertFailed(response.status_code, response.text, data)
+        if not isinstance(result, dict) or not result.get("ok"):
+            error = result.get("error") if isinstance(result, dict) else result
+            raise SlackAlertFailed(response.status_code, error, data)
+        return result
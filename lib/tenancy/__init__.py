@@ -0,0 +1,10 @@
+from lib.tenancy.multi_project_alerter import (  # noqa: F401
+    MultiProjectAlerter,
+    ProjectAlert,
+)
+from lib.tenancy.project_configs import (  # noqa: F401
+    InvalidProjectConfig,
+    ProjectConfig,
+    ProjectConfigs,
+    parse_project_configs,
+)
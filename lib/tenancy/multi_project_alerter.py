@@ -0,0 +1,105 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from lib.alerter import Alerter
+from lib.correlation import Incident
+from lib.deadline import Deadline
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry
+from lib.tenancy.project_configs import ProjectConfig, ProjectConfigs
+
+
+@dataclass(frozen=True)
+class ProjectAlert:
+    project_id: str
+    alert: Any
+
+
+class MultiProjectAlerter:
+    """
+    Sends each alert with the alerter for the project its entry came from, so
+    it uses that project's webhook and playbook and links to its console.
+    Digests and incidents are sent for the project of the entries they were
+    built from, and raw alerts for the default project.
+
+    An alerter is created by create_alerter the first time a configured project
+    is seen and kept. Projects which are not configured share the default
+    project's alerter, and so its webhook and playbook, but their alerts still
+    link to their own project. At most one alerter is kept per configured
+    project.
+    """
+
+    def __init__(
+        self,
+        project_configs: ProjectConfigs,
+        create_alerter: Callable[[ProjectConfig], Alerter],
+    ):
+        self._project_configs = project_configs
+        self._create_alerter = create_alerter
+        self._alerters: Dict[str, Alerter] = {}
+        self._lock = threading.Lock()
+
+    def alerter_for(self, project_id: str) -> Alerter:
+        if not self._project_configs.is_configured(project_id):
+            project_id = self._project_configs.default_project_id
+        alerter = self._alerters.get(project_id)
+        if alerter is None:
+            with self._lock:
+                alerter = self._alerters.get(project_id)
+                if alerter is None:
+                    alerter = self._create_alerter(
+                        self._project_configs.config_for(project_id)
+                    )
+                    self._alerters[project_id] = alerter
+        return alerter
+
+    def alerters(self) -> List[Alerter]:
+        """The alerters created so far."""
+        with self._lock:
+            return list(self._alerters.values())
+
+    def send_alert(
+        self, message: ProjectAlert, deadline: Optional[Deadline] = None
+    ) -> None:
+        self.alerter_for(message.project_id).send_alert(message.alert, deadline)
+
+    def create_raw_alert(self, raw: Any) -> ProjectAlert:
+        return self._project_alert(
+            None, lambda alerter, _project_id: alerter.create_raw_alert(raw)
+        )
+
+    def create_alert(
+        self, entry: ProcessedLogEntry, project_name: Optional[str] = None
+    ) -> ProjectAlert:
+        return self._project_alert(
+            project_name or entry.project_id,
+            lambda alerter, project_id: alerter.create_alert(entry, project_id),
+        )
+
+    def create_digest_alert(
+        self, group: DigestGroup, project_name: Optional[str] = None
+    ) -> ProjectAlert:
+        return self._project_alert(
+            project_name or group.project_id,
+            lambda alerter, project_id: alerter.create_digest_alert(group, project_id),
+        )
+
+    def create_incident_alert(
+        self, incident: Incident, project_name: Optional[str] = None
+    ) -> ProjectAlert:
+        return self._project_alert(
+            project_name or incident.project_id,
+            lambda alerter, project_id: alerter.create_incident_alert(
+                incident, project_id
+            ),
+        )
+
+    def _project_alert(
+        self, project_id: Optional[str], create: Callable[[Alerter, str], Any]
+    ) -> ProjectAlert:
+        project_id = project_id or self._project_configs.default_project_id
+        return ProjectAlert(
+            project_id=project_id,
+            alert=create(self.alerter_for(project_id), project_id),
+        )
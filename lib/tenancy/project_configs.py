@@ -0,0 +1,271 @@
+import functools
+import re
+import threading
+import zoneinfo
+from dataclasses import dataclass, field
+from datetime import time
+from typing import Callable, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+
+from lib.filters.fluent_bit_maintenance_filter import fluent_bit_maintenance_filter
+from lib.filters.os_patch_maintenance_filter import os_patch_maintenance_filter
+from lib.log_processor import ProcessedLogEntry
+from lib.shadow_filters import LogEntryFilter
+from lib.utilities.weekly_maintenance_window import WeeklyMaintenanceWindow
+
+# The filters which take the project's maintenance windows.
+_MAINTENANCE_FILTERS = (os_patch_maintenance_filter, fluent_bit_maintenance_filter)
+
+_WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+_TIME = re.compile(r"^(\d{2}):(\d{2})$")
+
+
+class InvalidProjectConfig(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ProjectConfig:
+    """
+    The settings for alerts from one project. Settings left as None use the
+    deployment's own: its webhook, the default playbook and the Friday
+    maintenance window.
+    """
+
+    project_id: str
+    slack_url: Optional[str] = field(default=None)
+    playbook_url: Optional[str] = field(default=None)
+    disabled_filters: FrozenSet[str] = field(default=frozenset())
+    maintenance_windows: Optional[Tuple[WeeklyMaintenanceWindow, ...]] = field(
+        default=None
+    )
+
+
+class ProjectConfigs:
+    """
+    The configured projects of a deployment which alerts for several.
+
+    An entry belongs to the project named in its logName, or to the default
+    project when there is none, as for entries written by the function itself.
+    Projects which are not configured use the defaults. Each configured
+    project's filter set is built the first time it is needed and kept.
+    """
+
+    def __init__(
+        self,
+        projects: Dict[str, ProjectConfig],
+        default_project_id: str,
+        live_filters: List[LogEntryFilter],
+    ):
+        self.default_project_id = default_project_id
+        self._projects = projects
+        self._live_filters = live_filters
+        self._filters: Dict[str, List[LogEntryFilter]] = {}
+        self._lock = threading.Lock()
+
+    def project_id_for(self, log_entry: ProcessedLogEntry) -> str:
+        return log_entry.project_id or self.default_project_id
+
+    def is_configured(self, project_id: str) -> bool:
+        return project_id in self._projects
+
+    def config_for(self, project_id: str) -> ProjectConfig:
+        project = self._projects.get(project_id)
+        if project is None:
+            return ProjectConfig(project_id=project_id)
+        return project
+
+    def filters_for(self, project_id: str) -> List[LogEntryFilter]:
+        """
+        The live filters less the project's disabled ones, with the maintenance
+        filters bound to its maintenance windows. Projects without either get
+        the live filters themselves.
+        """
+        project = self._projects.get(project_id)
+        if project is None or (
+            not project.disabled_filters and project.maintenance_windows is None
+        ):
+            return self._live_filters
+
+        filters = self._filters.get(project_id)
+        if filters is None:
+            with self._lock:
+                filters = self._filters.setdefault(
+                    project_id, _create_filters(project, self._live_filters)
+                )
+        return filters
+
+
+def _create_filters(
+    project: ProjectConfig, live_filters: List[LogEntryFilter]
+) -> List[LogEntryFilter]:
+    filters = []
+    for live_filter in live_filters:
+        if _name(live_filter) in project.disabled_filters:
+            continue
+        if project.maintenance_windows is not None and any(
+            live_filter is maintenance_filter
+            for maintenance_filter in _MAINTENANCE_FILTERS
+        ):
+            live_filter = _with_maintenance_windows(
+                live_filter, project.maintenance_windows
+            )
+        filters.append(live_filter)
+    return filters
+
+
+def _with_maintenance_windows(
+    maintenance_filter: Callable[..., bool],
+    maintenance_windows: Tuple[WeeklyMaintenanceWindow, ...],
+) -> LogEntryFilter:
+    bound = functools.partial(
+        maintenance_filter, maintenance_windows=maintenance_windows
+    )
+    # Keeps the filter's name for logs which report which filter skipped.
+    return functools.update_wrapper(bound, maintenance_filter)
+
+
+def parse_project_configs(
+    config: Mapping,
+    environ: Mapping[str, str],
+    default_project_id: str,
+    live_filters: List[LogEntryFilter],
+) -> ProjectConfigs:
+    """
+    Parse a project config of the form:
+
+    {
+      "projects": {
+        "ons-blaise-v2-prod": {
+          "slack_url_env": "SLACK_URL_PROD",
+          "playbook_url": "https://example.com/playbook",
+          "disabled_filters": ["execute_sql_filter"],
+          "maintenance_windows": [
+            {"weekday": "friday", "start": "01:25", "end": "01:35"}
+          ]
+        }
+      }
+    }
+
+    Each project takes its webhook from "slack_url", or from the environment
+    variable named by "slack_url_env". Every setting is optional.
+    """
+    raw_projects = config.get("projects")
+    if not isinstance(raw_projects, dict) or not raw_projects:
+        raise InvalidProjectConfig("Field 'projects' must be a non-empty object.")
+
+    filter_names = {_name(live_filter) for live_filter in live_filters}
+    return ProjectConfigs(
+        projects={
+            project_id: _parse_project(project_id, raw, environ, filter_names)
+            for project_id, raw in raw_projects.items()
+        },
+        default_project_id=default_project_id,
+        live_filters=live_filters,
+    )
+
+
+def _parse_project(
+    project_id: str,
+    raw: Mapping,
+    environ: Mapping[str, str],
+    filter_names: Set[str],
+) -> ProjectConfig:
+    if not isinstance(raw, dict):
+        raise InvalidProjectConfig(f"Project '{project_id}' must be an object.")
+
+    slack_url = raw.get("slack_url")
+    if slack_url is None and "slack_url_env" in raw:
+        slack_url = environ.get(raw["slack_url_env"])
+        if not slack_url:
+            raise InvalidProjectConfig(f"Project '{project_id}' has no webhook URL.")
+    if slack_url is not None and (not isinstance(slack_url, str) or slack_url == ""):
+        raise InvalidProjectConfig(f"Project '{project_id}' has no webhook URL.")
+
+    playbook_url = raw.get("playbook_url")
+    if playbook_url is not None and not isinstance(playbook_url, str):
+        raise InvalidProjectConfig(
+            f"Field 'playbook_url' of project '{project_id}' must be a string."
+        )
+
+    disabled_filters = raw.get("disabled_filters", [])
+    if not isinstance(disabled_filters, list):
+        raise InvalidProjectConfig(
+            f"Field 'disabled_filters' of project '{project_id}' must be a list."
+        )
+    for name in disabled_filters:
+        if name not in filter_names:
+            raise InvalidProjectConfig(f"No live filter named '{name}'.")
+
+    raw_windows = raw.get("maintenance_windows")
+    maintenance_windows = None
+    if raw_windows is not None:
+        if not isinstance(raw_windows, list):
+            raise InvalidProjectConfig(
+                f"Field 'maintenance_windows' of project '{project_id}' must be a list."
+            )
+        maintenance_windows = tuple(
+            _parse_maintenance_window(project_id, raw_window)
+            for raw_window in raw_windows
+        )
+
+    return ProjectConfig(
+        project_id=project_id,
+        slack_url=slack_url,
+        playbook_url=playbook_url,
+        disabled_filters=frozenset(disabled_filters),
+        maintenance_windows=maintenance_windows,
+    )
+
+
+def _parse_maintenance_window(project_id: str, raw: Mapping) -> WeeklyMaintenanceWindow:
+    if not isinstance(raw, dict):
+        raise InvalidProjectConfig(
+            f"Each maintenance window of project '{project_id}' must be an object."
+        )
+
+    weekday = str(raw.get("weekday", "")).lower()
+    if weekday not in _WEEKDAYS:
+        raise InvalidProjectConfig(
+            f"Invalid maintenance window weekday '{raw.get('weekday')}'."
+        )
+
+    timezone = raw.get("timezone", "Europe/London")
+    try:
+        zoneinfo.ZoneInfo(timezone)
+    except (TypeError, ValueError, zoneinfo.ZoneInfoNotFoundError):
+        raise InvalidProjectConfig(f"Invalid maintenance window timezone '{timezone}'.")
+
+    window = WeeklyMaintenanceWindow(
+        weekday=_WEEKDAYS.index(weekday),
+        start=_parse_time(raw.get("start")),
+        end=_parse_time(raw.get("end")),
+        timezone=timezone,
+    )
+    if window.end < window.start:
+        raise InvalidProjectConfig(
+            f"Maintenance window of project '{project_id}' ends before it starts."
+        )
+    return window
+
+
+def _parse_time(raw: object) -> time:
+    matched = _TIME.match(raw) if isinstance(raw, str) else None
+    if matched is None:
+        raise InvalidProjectConfig(f"Invalid maintenance window time '{raw}'.")
+    try:
+        return time(int(matched.group(1)), int(matched.group(2)))
+    except ValueError:
+        raise InvalidProjectConfig(f"Invalid maintenance window time '{raw}'.")
+
+
+def _name(log_entry_filter: LogEntryFilter) -> str:
+    return getattr(log_entry_filter, "__name__", repr(log_entry_filter))
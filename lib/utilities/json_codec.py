@@ -0,0 +1,128 @@
+"""
+JSON encoding and decoding for the alerting hot path.
+
+orjson is used when it is installed, with the standard library json module as
+the fallback. Anything orjson cannot handle exactly as json would, such as
+invalid documents, NaN literals, integers wider than 64 bits, non-string keys
+or unknown types, is passed to json instead, so errors and results are the
+same with either backend. KeyExcludingView values are written as the dict they
+show.
+"""
+
+import json
+import re
+from typing import Any, Union
+
+from lib.utilities.key_excluding_view import KeyExcludingView
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+
+# orjson reads integers outside the 64 bit range as floats. Such integers have
+# at least 19 digits, so documents with a number that long are left to json.
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+_DIGIT_RUN = b"0" * 19
+# The run of digits may be part of a string, such as an instance ID, so only
+# one which starts a value is a number.
+_WIDE_INTEGER = re.compile(rb"(?:^|[:,\[ \t\r\n-])\d{19}")
+# Documents are scanned for runs of digits a chunk at a time, so a large one is
+# never copied whole.
+_SCAN_CHUNK_BYTES = 64 * 1024
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        try:
+            encoded = data.encode("utf-8") if isinstance(data, str) else data
+            if not _may_contain_wide_integer(encoded):
+                return orjson.loads(encoded)
+        except (UnicodeEncodeError, orjson.JSONDecodeError):
+            pass
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    """Encode value as compact UTF-8 JSON, for sending over the wire."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False, default=_default
+    ).encode("utf-8")
+
+
+def dumps_indented(value: Any) -> str:
+    """
+    Encode value exactly as json.dumps(value, indent=2) does, for showing to
+    people.
+    """
+    # orjson writes some floats, such as 1e+16 and 6e-05, differently.
+    if orjson is not None and not _contains_float(value):
+        try:
+            encoded = orjson.dumps(
+                value, default=_default, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2
+            )
+        except TypeError:
+            pass
+        else:
+            # json escapes DEL and non-ASCII characters by default.
+            if encoded.isascii() and b"\x7f" not in encoded:
+                return encoded.decode("ascii")
+    return json.dumps(value, indent=2, default=_default)
+
+
+def _default(value: Any) -> Any:
+    if type(value) is KeyExcludingView:
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _may_contain_wide_integer(data: bytes) -> bool:
+    # Translating is much faster than a regular expression search for digits,
+    # which only confirms the chunks with a long enough run. Chunks overlap by
+    # the character before a number and its digits.
+    for start in range(0, len(data), _SCAN_CHUNK_BYTES):
+        end = start + _SCAN_CHUNK_BYTES + len(_DIGIT_RUN) + 1
+        if _DIGIT_RUN in data[start:end].translate(_DIGITS_TO_ZERO) and (
+            _WIDE_INTEGER.search(data, start, end) is not None
+        ):
+            return True
+    return False
+
+
+def _contains_float(value: Any) -> bool:
+    value_type = type(value)
+    if value_type is dict or value_type is KeyExcludingView:
+        values = value.values()
+    elif value_type is list or value_type is tuple:
+        values = value
+    else:
+        return value_type is float
+
+    for item in values:
+        item_type = type(item)
+        if item_type is float:
+            return True
+        if (
+            item_type is dict
+            or item_type is list
+            or item_type is tuple
+            or item_type is KeyExcludingView
+        ) and _contains_float(item):
+            return True
+    return False
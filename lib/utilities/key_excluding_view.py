@@ -0,0 +1,37 @@
+from typing import Any, Iterable, Iterator, Mapping
+
+
+class KeyExcludingView(Mapping[str, Any]):
+    """
+    Read-only view of a mapping with some of its keys hidden.
+
+    Nothing is copied: lookups and iteration go to the underlying mapping, so
+    creating a view costs time and memory in proportion to the number of
+    hidden keys rather than the size of the mapping. json_codec serialises a
+    view as a dict with the hidden keys removed.
+    """
+
+    __slots__ = ("_mapping", "_excluded")
+
+    def __init__(self, mapping: Mapping[str, Any], excluded: Iterable[str]):
+        self._mapping = mapping
+        self._excluded = frozenset([key for key in excluded if key in mapping])
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._excluded:
+            raise KeyError(key)
+        return self._mapping[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key not in self._excluded and key in self._mapping
+
+    def __iter__(self) -> Iterator[str]:
+        if not self._excluded:
+            return iter(self._mapping)
+        return (key for key in self._mapping if key not in self._excluded)
+
+    def __len__(self) -> int:
+        return len(self._mapping) - len(self._excluded)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
@@ -1,5 +1,44 @@
 import zoneinfo
+from dataclasses import dataclass, field
 from datetime import datetime, time, timezone
+from typing import Sequence
+
+
+@dataclass(frozen=True)
+class WeeklyMaintenanceWindow:
+    """
+    A window of local time on one day of every week, inclusive of both ends.
+    weekday counts from Monday as 0. Naive timestamps are taken to be UTC.
+    """
+
+    weekday: int
+    start: time
+    end: time
+    timezone: str = field(default="Europe/London")
+
+    def contains(self, timestamp: datetime) -> bool:
+        if not isinstance(timestamp, datetime):
+            return False
+
+        local_tz = zoneinfo.ZoneInfo(self.timezone)
+
+        if timestamp.tzinfo is not None:
+            local_timestamp = timestamp.astimezone(local_tz)
+        else:
+            local_timestamp = timestamp.replace(tzinfo=timezone.utc).astimezone(
+                local_tz
+            )
+
+        return (
+            local_timestamp.weekday() == self.weekday
+            and self.start <= local_timestamp.time() <= self.end
+        )
+
+
+# Weekly maintenance window - Friday 01:25-01:35 UK time
+FRIDAY_MAINTENANCE_WINDOW = WeeklyMaintenanceWindow(
+    weekday=4, start=time(1, 25), end=time(1, 35)
+)
 
 
 def is_in_friday_maintenance_window(timestamp: datetime) -> bool:
@@ -12,24 +51,10 @@ def is_in_friday_maintenance_window(timestamp: datetime) -> bool:
     - GMT (winter): 01:25-01:35 UTC
     - BST (summer): 00:25-00:35 UTC
     """
-    if not isinstance(timestamp, datetime):
-        return False
-
-    uk_tz = zoneinfo.ZoneInfo("Europe/London")
-
-    if timestamp.tzinfo is not None:
-        uk_timestamp = timestamp.astimezone(uk_tz)
-    else:
-        uk_timestamp = timestamp.replace(tzinfo=timezone.utc).astimezone(uk_tz)
-
-    # Weekly maintenance window - Friday 01:25-01:35 UK time
-    maintenance_start = time(1, 25)
-    maintenance_end = time(1, 35)
-
-    uk_time = uk_timestamp.time()
-    uk_weekday = uk_timestamp.weekday()
+    return FRIDAY_MAINTENANCE_WINDOW.contains(timestamp)
 
-    is_friday = uk_weekday == 4
-    is_maintenance_time = maintenance_start <= uk_time <= maintenance_end
 
-    return is_friday and is_maintenance_time
+def is_in_maintenance_window(
+    timestamp: datetime, windows: Sequence[WeeklyMaintenanceWindow]
+) -> bool:
+    return any(window.contains(timestamp) for window in windows)
@@ -1,27 +1,541 @@
+import json
 import logging
 import os
+from functools import cache
+from typing import Any, Optional, Tuple
 
+import requests
 from flask import Request
 from google.cloud.logging_v2.handlers import StructuredLogHandler, setup_logging
 
-from lib import send_alerts
+from lib import send_alerts, send_digests, send_incidents
+from lib.alerter import Alerter
+from lib.cloud_run_revision import PayloadSizeLimit
+from lib.correlation import IncidentCorrelator
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.deduplication import (
+    InMemorySeenMessageIds,
+    SeenMessageIds,
+    SqliteSeenMessageIds,
+)
+from lib.digest import DigestBuffer
 from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
-from lib.slack import SlackAlerter
+from lib.profiling import InvocationProfiler, track_memory
+from lib.sampling import AlertSampler, parse_sampling_config
+from lib.shadow_filters import ShadowFilterEvaluator, parse_shadow_filters
+from lib.slack import (
+    CircuitBreaker,
+    DeadLetterSpool,
+    RateLimiter,
+    SlackAlerter,
+    SlackWebApiAlerter,
+)
+from lib.slack.routing import parse_routing_config
+from lib.slack.routing_slack_alerter import (
+    RoutingSlackAlerter,
+    create_routing_slack_alerter,
+)
+from lib.slack.slack_message import classify_alert
+from lib.slack.slack_web_api_alerter import COUNT_REPEATS, SLACK_API_URL
+from lib.tenancy import (
+    MultiProjectAlerter,
+    ProjectConfig,
+    ProjectConfigs,
+    parse_project_configs,
+)
 
 setup_logging(StructuredLogHandler())  # type: ignore
 
 
-def send_slack_alert(event: dict, _context: dict) -> str:
-    slack_url = os.environ["SLACK_URL"]
-    project_name = os.environ["GCP_PROJECT_NAME"]
-    alerter = SlackAlerter(slack_url, project_name)
-    return send_alerts.send_alerts(
-        event,
-        alerter=alerter,
-        app_log_payload_factories=APP_LOG_PAYLOAD_FACTORIES,
+def send_slack_alert(event: dict, context: Any) -> str:
+    message = _with_message_id_from_context(event, context)
+    profiler = _create_invocation_profiler()
+    if profiler is not None:
+        return profiler.run(handle_pubsub_message, message)
+    return handle_pubsub_message(message)
+
+
+def handle_pubsub_message(message: dict) -> str:
+    """
+    Send the alert for one PubSub message, using the state kept warm by this
+    process. Shared by the Cloud Functions entry point and the push server.
+    """
+    if _memory_tracking_enabled():
+        with track_memory():
+            return _handle_pubsub_message(message)
+    return _handle_pubsub_message(message)
+
+
+def _handle_pubsub_message(message: dict) -> str:
+    deadline = _create_deadline()
+    alerter = _create_alerter()
+    digest_buffer = _create_digest_buffer()
+    incident_correlator = _create_incident_correlator()
+    try:
+        result = send_alerts.send_alerts(
+            message,
+            alerter=alerter,
+            app_log_payload_factories=APP_LOG_PAYLOAD_FACTORIES,
+            seen_message_ids=_create_seen_message_ids(),
+            digest_buffer=digest_buffer,
+            incident_correlator=incident_correlator,
+            size_limit=_create_payload_size_limit(),
+            deadline=deadline,
+            sampler=_create_alert_sampler(),
+            shadow_filters=_create_shadow_filters(),
+            project_configs=_create_project_configs(),
+        )
+    except DeadlineExceeded as err:
+        # Raising fails the invocation, so PubSub redelivers the message to an
+        # instance with time to send it.
+        _log_deadline(deadline, "Alert left for redelivery")
+        logging.warning(
+            "Alert not sent before the deadline, left for redelivery",
+            extra=dict(textPayload=str(err)),
+        )
+        raise
+
+    # Digest windows which have ended are sent without waiting for the
+    # scheduled trigger. These sends are optional, so they are skipped once the
+    # time has run out.
+    if digest_buffer is not None and not deadline.expired():
+        send_digests.send_digests(alerter, digest_buffer, deadline=deadline)
+    # So are the summaries of incidents which have been quiet for the
+    # correlation window.
+    if incident_correlator is not None and not deadline.expired():
+        send_incidents.send_incidents(alerter, incident_correlator, deadline)
+
+    _log_deadline(deadline, result)
+    return result
+
+
+def send_slack_digest(_event: dict, _context: Any) -> str:
+    digest_buffer = _create_digest_buffer()
+    if digest_buffer is None:
+        return "Digest mode is disabled"
+    return send_digests.send_digests(_create_alerter(), digest_buffer)
+
+
+def send_slack_incidents(_event: dict, _context: Any) -> str:
+    incident_correlator = _create_incident_correlator()
+    if incident_correlator is None:
+        return "Incident correlation is disabled"
+    return send_incidents.send_incidents(_create_alerter(), incident_correlator)
+
+
+def send_slack_thread_counts(_event: dict, _context: Any) -> str:
+    alerter = _create_alerter()
+    alerters = (
+        alerter.alerters() if isinstance(alerter, MultiProjectAlerter) else [alerter]
+    )
+    web_api_alerters = [
+        web_api_alerter
+        for web_api_alerter in alerters
+        if isinstance(web_api_alerter, SlackWebApiAlerter)
+    ]
+    if not web_api_alerters:
+        return "Threading with the Web API is disabled"
+    # Repeats counted between updates are shown even when no alert follows.
+    updated = sum(
+        web_api_alerter.flush_counts() for web_api_alerter in web_api_alerters
     )
+    return f"{updated} thread counts updated"
+
+
+def warm_up() -> None:
+    """
+    Build the shared state once, before a server starts handling messages on
+    several threads.
+    """
+    _create_project_configs()
+    _create_alerter()
+    _create_seen_message_ids()
+    _create_digest_buffer()
+    _create_incident_correlator()
+    _create_alert_sampler()
+    _create_shadow_filters()
+    _create_payload_size_limit()
 
 
 def log_error(_request: Request) -> str:
     logging.error("Example error message", extra=dict(reason="proof_of_concept"))
     return "Error logged"
+
+
+def _create_alerter() -> Alerter:
+    project_configs = _create_project_configs()
+    if project_configs is not None:
+        return _multi_project_alerter(project_configs)
+    return _create_project_alerter(
+        ProjectConfig(project_id=os.environ["GCP_PROJECT_NAME"])
+    )
+
+
+def _create_project_alerter(project: ProjectConfig) -> Alerter:
+    spool_path = os.environ.get("SLACK_SPOOL_PATH")
+    if spool_path and project.project_id != os.environ["GCP_PROJECT_NAME"]:
+        spool_path = _project_spool_path(spool_path, project.project_id)
+    failure_threshold = int(os.environ.get("SLACK_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    reset_timeout_seconds = float(os.environ.get("SLACK_CIRCUIT_RESET_SECONDS", "30"))
+    timeout = (
+        float(os.environ.get("SLACK_CONNECT_TIMEOUT", "3.05")),
+        float(os.environ.get("SLACK_READ_TIMEOUT", "10")),
+    )
+
+    # A project with its own webhook posts to it, rather than with the Web API
+    # or by routing.
+    bot_token = os.environ.get("SLACK_BOT_TOKEN")
+    if bot_token and project.slack_url is None:
+        repeats = os.environ.get("SLACK_THREAD_REPEATS", "reply")
+        # Repeats counted by one instance are shown by another's update or by
+        # the scheduled send_slack_thread_counts, so count mode needs threads
+        # kept where every instance sees them.
+        threads_path = os.environ.get("SLACK_THREADS_DB") or ":memory:"
+        if repeats == COUNT_REPEATS and threads_path == ":memory:":
+            raise ValueError(
+                "SLACK_THREAD_REPEATS=count needs a persistent SLACK_THREADS_DB"
+            )
+        return _slack_web_api_alerter(
+            bot_token,
+            os.environ["SLACK_CHANNEL"],
+            project.project_id,
+            project.playbook_url,
+            repeats,
+            int(os.environ.get("SLACK_THREAD_MAX", "1000")),
+            float(os.environ.get("SLACK_THREAD_MAX_AGE_SECONDS", "86400")),
+            float(os.environ.get("SLACK_THREAD_UPDATE_SECONDS", "60")),
+            timeout,
+            # Web API calls are spooled apart from webhook payloads, which
+            # are replayed differently.
+            _web_api_spool_path(spool_path) if spool_path else None,
+            float(os.environ.get("SLACK_SPOOL_REPLAY_RATE", "1")),
+            failure_threshold,
+            reset_timeout_seconds,
+            threads_path,
+        )
+
+    routing_config = os.environ.get("SLACK_ROUTING_CONFIG")
+    if routing_config and project.slack_url is None:
+        return _routing_slack_alerter(
+            routing_config,
+            project.project_id,
+            timeout,
+            failure_threshold,
+            reset_timeout_seconds,
+            spool_path,
+            project.playbook_url,
+            float(os.environ.get("SLACK_SPOOL_REPLAY_RATE", "1")),
+        )
+
+    slack_url = project.slack_url or os.environ["SLACK_URL"]
+    return SlackAlerter(
+        slack_url,
+        project.project_id,
+        spool=_dead_letter_spool(spool_path) if spool_path else None,
+        spool_replay_rate_limiter=_spool_replay_rate_limiter(
+            float(os.environ.get("SLACK_SPOOL_REPLAY_RATE", "1"))
+        ),
+        circuit_breaker=_slack_circuit_breaker(
+            slack_url, failure_threshold, reset_timeout_seconds
+        ),
+        timeout=timeout,
+        playbook_url=project.playbook_url,
+    )
+
+
+def _create_project_configs() -> Optional[ProjectConfigs]:
+    projects_config = os.environ.get("PROJECTS_CONFIG")
+    if not projects_config:
+        return None
+    return _project_configs(projects_config, os.environ["GCP_PROJECT_NAME"])
+
+
+def _project_spool_path(spool_path: str, project_id: str) -> str:
+    # Alerts for other projects go to their own webhooks, so are spooled apart
+    # from the default project's.
+    root, extension = os.path.splitext(spool_path)
+    return f"{root}-{project_id}{extension}"
+
+
+def _web_api_spool_path(spool_path: str) -> str:
+    root, extension = os.path.splitext(spool_path)
+    return f"{root}-web-api{extension}"
+
+
+def _create_deadline() -> Deadline:
+    # The function context does not include the timeout, so it is configured.
+    budget_seconds = os.environ.get("ALERT_DEADLINE_SECONDS")
+    if budget_seconds:
+        return Deadline(float(budget_seconds))
+    return Deadline(
+        float(os.environ.get("FUNCTION_TIMEOUT_SEC", "60"))
+        - float(os.environ.get("DEADLINE_MARGIN_SECONDS", "5"))
+    )
+
+
+def _log_deadline(deadline: Deadline, result: str) -> None:
+    logging.info(
+        "Invocation time budget",
+        extra=dict(
+            json_fields=dict(
+                budget_seconds=deadline.budget_seconds,
+                remaining_seconds=round(deadline.remaining(), 3),
+                result=result,
+            )
+        ),
+    )
+
+
+def _create_seen_message_ids() -> SeenMessageIds:
+    return _seen_message_ids(
+        os.environ.get("SEEN_MESSAGE_IDS_DB"),
+        int(os.environ.get("SEEN_MESSAGE_IDS_MAX_SIZE", "10000")),
+    )
+
+
+def _create_digest_buffer() -> Optional[DigestBuffer]:
+    below_severity = os.environ.get("DIGEST_BELOW_SEVERITY")
+    if not below_severity:
+        return None
+    # An in-memory buffer is lost with the instance, and the scheduled
+    # send_slack_digest trigger usually lands on another instance's. Only
+    # ":memory:" is refused: a file under /tmp on Cloud Functions is just as
+    # private to the instance, so the path must be on a shared mount.
+    path = os.environ.get("DIGEST_DB")
+    if not path or path == ":memory:":
+        raise ValueError("DIGEST_BELOW_SEVERITY needs a persistent DIGEST_DB")
+    return _digest_buffer(
+        below_severity,
+        int(os.environ.get("DIGEST_WINDOW_SECONDS", "900")),
+        path,
+    )
+
+
+def _create_incident_correlator() -> Optional[IncidentCorrelator]:
+    window_seconds = os.environ.get("INCIDENT_WINDOW_SECONDS")
+    if not window_seconds:
+        return None
+    # Merged alerts have been acknowledged, so, as for digests, in-memory
+    # incidents would lose them with the instance.
+    path = os.environ.get("INCIDENT_DB")
+    if not path or path == ":memory:":
+        raise ValueError("INCIDENT_WINDOW_SECONDS needs a persistent INCIDENT_DB")
+    return _incident_correlator(
+        float(window_seconds),
+        float(os.environ.get("INCIDENT_MAX_SECONDS", "3600")),
+        int(os.environ.get("INCIDENT_MAX_OPEN", "1000")),
+        path,
+    )
+
+
+def _create_alert_sampler() -> Optional[AlertSampler]:
+    sampling_config = os.environ.get("SAMPLING_CONFIG")
+    if not sampling_config:
+        return None
+    return _alert_sampler(sampling_config)
+
+
+def _create_shadow_filters() -> Optional[ShadowFilterEvaluator]:
+    shadow_filters = os.environ.get("SHADOW_FILTERS")
+    if not shadow_filters:
+        return None
+    return _shadow_filters(
+        shadow_filters, float(os.environ.get("SHADOW_FILTER_BUDGET_MS", "2"))
+    )
+
+
+def _create_invocation_profiler() -> Optional[InvocationProfiler]:
+    every_n = os.environ.get("PROFILE_EVERY_N_INVOCATIONS")
+    slow_seconds = os.environ.get("PROFILE_SLOW_SECONDS")
+    if not every_n and not slow_seconds:
+        return None
+    return _invocation_profiler(
+        int(every_n) if every_n else None,
+        float(slow_seconds) if slow_seconds else None,
+        int(os.environ.get("PROFILE_TOP_N", "20")),
+    )
+
+
+def _memory_tracking_enabled() -> bool:
+    return os.environ.get("TRACK_MEMORY", "").lower() in ("1", "true", "yes")
+
+
+def _create_payload_size_limit() -> Optional[PayloadSizeLimit]:
+    max_data_bytes = os.environ.get("MAX_EVENT_DATA_BYTES")
+    if not max_data_bytes:
+        return None
+    return _payload_size_limit(int(max_data_bytes))
+
+
+def _with_message_id_from_context(event: dict, context: Any) -> dict:
+    # Background functions receive the PubSub message ID on the context rather
+    # than in the envelope.
+    event_id = getattr(context, "event_id", None)
+    if not isinstance(event_id, str) or "messageId" in event:
+        return event
+    return {**event, "messageId": event_id}
+
+
+@cache
+def _seen_message_ids(path: Optional[str], max_size: int) -> SeenMessageIds:
+    if path:
+        return SqliteSeenMessageIds(path, max_size=max_size)
+    return InMemorySeenMessageIds(max_size=max_size)
+
+
+@cache
+def _digest_buffer(below_severity: str, window_seconds: int, path: str) -> DigestBuffer:
+    return DigestBuffer(
+        below_severity,
+        window_seconds=window_seconds,
+        path=path,
+        classify=classify_alert,
+    )
+
+
+@cache
+def _incident_correlator(
+    window_seconds: float, max_incident_seconds: float, max_incidents: int, path: str
+) -> IncidentCorrelator:
+    return IncidentCorrelator(
+        window_seconds=window_seconds,
+        max_incident_seconds=max_incident_seconds,
+        max_incidents=max_incidents,
+        path=path,
+        classify=classify_alert,
+    )
+
+
+@cache
+def _alert_sampler(sampling_config: str) -> AlertSampler:
+    return parse_sampling_config(_load_json_config(sampling_config))
+
+
+@cache
+def _shadow_filters(shadow_filters: str, budget_ms: float) -> ShadowFilterEvaluator:
+    return ShadowFilterEvaluator(
+        send_alerts.LIVE_FILTERS,
+        parse_shadow_filters(shadow_filters, send_alerts.LIVE_FILTERS),
+        budget_seconds=budget_ms / 1000,
+    )
+
+
+@cache
+def _project_configs(projects_config: str, default_project_id: str) -> ProjectConfigs:
+    return parse_project_configs(
+        _load_json_config(projects_config),
+        os.environ,
+        default_project_id,
+        send_alerts.LIVE_FILTERS,
+    )
+
+
+@cache
+def _multi_project_alerter(project_configs: ProjectConfigs) -> MultiProjectAlerter:
+    return MultiProjectAlerter(project_configs, _create_project_alerter)
+
+
+@cache
+def _invocation_profiler(
+    every_n: Optional[int], slow_seconds: Optional[float], top_n: int
+) -> InvocationProfiler:
+    return InvocationProfiler(every_n=every_n, slow_seconds=slow_seconds, top_n=top_n)
+
+
+@cache
+def _payload_size_limit(max_data_bytes: int) -> PayloadSizeLimit:
+    return PayloadSizeLimit(max_data_bytes)
+
+
+@cache
+def _dead_letter_spool(path: str) -> DeadLetterSpool:
+    return DeadLetterSpool(path)
+
+
+@cache
+def _spool_replay_rate_limiter(rate_per_second: float) -> RateLimiter:
+    return RateLimiter(rate_per_second)
+
+
+@cache
+def _slack_circuit_breaker(
+    slack_url: str, failure_threshold: int, reset_timeout_seconds: float
+) -> CircuitBreaker:
+    return CircuitBreaker(
+        "slack-webhook",
+        failure_threshold=failure_threshold,
+        reset_timeout_seconds=reset_timeout_seconds,
+    )
+
+
+@cache
+def _slack_web_api_alerter(
+    token: str,
+    channel: str,
+    project_name: str,
+    playbook_url: Optional[str],
+    repeats: str,
+    max_threads: int,
+    thread_max_age_seconds: float,
+    update_interval_seconds: float,
+    timeout: Tuple[float, float],
+    spool_path: Optional[str],
+    spool_replay_rate: float,
+    failure_threshold: int,
+    reset_timeout_seconds: float,
+    threads_path: str,
+) -> SlackWebApiAlerter:
+    # Kept for the life of the instance, as with ":memory:" it holds the
+    # threads started.
+    return SlackWebApiAlerter(
+        token,
+        channel,
+        project_name,
+        repeats=repeats,
+        max_threads=max_threads,
+        thread_max_age_seconds=thread_max_age_seconds,
+        update_interval_seconds=update_interval_seconds,
+        playbook_url=playbook_url,
+        timeout=timeout,
+        session=requests.Session(),
+        # Slack allows about one message per second to a channel.
+        rate_limiter=RateLimiter(1.0),
+        spool=_dead_letter_spool(spool_path) if spool_path else None,
+        spool_replay_rate_limiter=_spool_replay_rate_limiter(spool_replay_rate),
+        circuit_breaker=_slack_circuit_breaker(
+            SLACK_API_URL, failure_threshold, reset_timeout_seconds
+        ),
+        threads_path=threads_path,
+    )
+
+
+@cache
+def _routing_slack_alerter(
+    routing_config: str,
+    project_name: str,
+    timeout: Tuple[float, float],
+    failure_threshold: int,
+    reset_timeout_seconds: float,
+    spool_path: Optional[str],
+    playbook_url: Optional[str] = None,
+    spool_replay_rate: float = 1.0,
+) -> RoutingSlackAlerter:
+    return create_routing_slack_alerter(
+        parse_routing_config(_load_json_config(routing_config), os.environ),
+        project_name,
+        timeout=timeout,
+        failure_threshold=failure_threshold,
+        reset_timeout_seconds=reset_timeout_seconds,
+        spool_path=spool_path,
+        playbook_url=playbook_url,
+        spool_replay_rate_per_second=spool_replay_rate,
+    )
+
+
+def _load_json_config(config: str) -> Any:
+    # Config variables hold either the JSON config or the path to a file
+    # containing it.
+    if config.lstrip().startswith("{"):
+        return json.loads(config)
+    with open(config) as file:
+        return json.load(file)
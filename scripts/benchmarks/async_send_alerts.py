@@ -0,0 +1,125 @@
+"""
+Compare the throughput of the sync and async alert pipelines against a local
+fake Slack webhook which adds latency to every response, and can also rate
+limit, fail or reset a share of requests.
+
+Usage: python -m scripts.benchmarks.async_send_alerts [--events N] [--latency S]
+           [--rate-limit N] [--error-rate R] [--reset-rate R]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import List
+
+import requests
+
+from lib import send_alerts
+from lib.async_send_alerts import async_send_alerts
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
+from lib.slack import AsyncSlackAlerter, SlackAlerter
+from lib.slack.send_slack_message import SlackAlertFailed
+from scripts.fake_slack_webhook import FakeSlackWebhook
+
+
+def create_events(count: int) -> List[dict]:
+    return [
+        {
+            "@type": "type.googleapis.com/google.pubsub.v1.PubsubMessage",
+            "messageId": str(number),
+            "data": base64.b64encode(
+                json.dumps(
+                    {
+                        "jsonPayload": {
+                            "computer_name": "vm-mgmt",
+                            "description": "Error description from VM",
+                            "event_type": "error",
+                            "message": f"Error message {number} from VM",
+                        },
+                        "logName": "projects/ons-blaise-v2-prod/logs/winevt.raw",
+                        "receiveTimestamp": "2022-08-02T19:06:42.275819947Z",
+                        "resource": {
+                            "labels": {"instance_id": "89453598437598"},
+                            "type": "gce_instance",
+                        },
+                        "severity": "ERROR",
+                    }
+                ).encode("ascii")
+            ),
+        }
+        for number in range(count)
+    ]
+
+
+def run_sync(events: List[dict], slack_url: str) -> float:
+    alerter = SlackAlerter(slack_url, "ons-blaise-v2-prod")
+    started = time.perf_counter()
+    for event in events:
+        try:
+            send_alerts.send_alerts(
+                event,
+                alerter=alerter,
+                app_log_payload_factories=APP_LOG_PAYLOAD_FACTORIES,
+            )
+        except (SlackAlertFailed, requests.RequestException):
+            pass
+    return time.perf_counter() - started
+
+
+def run_async(events: List[dict], slack_url: str, concurrency: int) -> float:
+    alerter = AsyncSlackAlerter(
+        SlackAlerter(slack_url, "ons-blaise-v2-prod"),
+        max_concurrent_sends=concurrency,
+    )
+    started = time.perf_counter()
+    asyncio.run(
+        async_send_alerts(
+            events, alerter=alerter, app_log_payload_factories=APP_LOG_PAYLOAD_FACTORIES
+        )
+    )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    events = create_events(args.events)
+
+    def fake_webhook() -> FakeSlackWebhook:
+        return FakeSlackWebhook(
+            latency_seconds=args.latency,
+            rate_limit_per_second=args.rate_limit,
+            error_rate=args.error_rate,
+            reset_rate=args.reset_rate,
+            seed=0,
+        )
+
+    with fake_webhook() as sync_webhook:
+        sync_seconds = run_sync(events, sync_webhook.url)
+    with fake_webhook() as async_webhook:
+        async_seconds = run_async(events, async_webhook.url, args.concurrency)
+
+    print(
+        f"events={args.events} latency={args.latency}s rate_limit={args.rate_limit} "
+        f"error_rate={args.error_rate} reset_rate={args.reset_rate}"
+    )
+    print(f"sync:  {args.events / sync_seconds:8.1f} alerts/s {sync_webhook.counts}")
+    print(
+        f"async: {args.events / async_seconds:8.1f} alerts/s {async_webhook.counts} "
+        f"(max {args.concurrency} concurrent sends)"
+    )
+
+
+if __name__ == "__main__":
+    main()
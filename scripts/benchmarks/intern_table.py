@@ -0,0 +1,110 @@
+"""
+Measure the memory saved by interning repeated log metadata in parse_log_entry.
+
+A replay file holds one log entry per line, as exported from Cloud Logging. Each
+line is decoded, parsed and processed, and the processed entries are kept, as
+they are while a batch is being sent. The memory held is compared with and
+without an InternTable.
+
+Without --replay, a replay of log entries based on the examples used in
+tests/test_main.py is generated, with the resource names, log names and
+messages varied as they are in production.
+
+Usage: python -m scripts.benchmarks.intern_table [--replay FILE] [--entries N]
+"""
+
+import argparse
+import copy
+import gc
+import itertools
+import json
+import logging
+import tracemalloc
+from typing import Any, List, Optional
+
+from lib.cloud_logging import InternTable, parse_log_entry
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES, process_log_entry
+from lib.log_processor.process_log_entry import NoMatchingLogTypeFound
+from lib.utilities import json_codec
+from scripts.benchmarks.json_codec import LOG_ENTRIES
+
+LOG_NAMES = [
+    "projects/ons-blaise-v2-prod/logs/winevt.raw",
+    "projects/ons-blaise-v2-prod/logs/GCEGuestAgent",
+    "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Fstderr",
+    "projects/ons-blaise-v2-prod/logs/cloudfunctions.googleapis.com%2Fcloud-functions",
+    "projects/ons-blaise-v2-prod/logs/appengine.googleapis.com%2Frequest_log",
+    "projects/ons-blaise-v2-prod/logs/cloudaudit.googleapis.com%2Factivity",
+]
+SEVERITIES = ["ERROR", "ERROR", "ERROR", "WARNING", "CRITICAL"]
+
+
+def generate_replay(count: int) -> List[bytes]:
+    templates = [
+        entry for name, entry in LOG_ENTRIES.items() if name != "large_audit_log"
+    ]
+    lines = []
+    for number, template in zip(range(count), itertools.cycle(templates)):
+        entry: Any = copy.deepcopy(template)
+        entry["logName"] = LOG_NAMES[number % len(LOG_NAMES)]
+        entry["severity"] = SEVERITIES[number % len(SEVERITIES)]
+        entry["receiveTimestamp"] = (
+            f"2022-08-02T19:{number // 60 % 60:02}:{number % 60:02}.{number:09}Z"
+        )
+        entry["labels"] = {
+            "compute.googleapis.com/resource_name": f"vm-{number % 20}",
+            "execution_id": f"exec-{number}",
+        }
+        labels = entry["resource"].setdefault("labels", {})
+        for label in labels:
+            labels[label] = f"{labels[label]}-{number % 15}"
+        labels["project_id"] = "ons-blaise-v2-prod"
+        labels["zone"] = "europe-west2-a"
+        if "textPayload" in entry:
+            entry["textPayload"] = f"Example error message {number}"
+        lines.append(json.dumps(entry).encode("utf-8"))
+    return lines
+
+
+def measure(lines: List[bytes], intern_table: Optional[InternTable]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    processed: List[Any] = []
+    for line in lines:
+        log_entry = parse_log_entry(json_codec.loads(line), intern_table)
+        try:
+            processed.append(process_log_entry(log_entry, APP_LOG_PAYLOAD_FACTORIES))
+        except NoMatchingLogTypeFound:
+            processed.append(log_entry)
+    gc.collect()
+    held, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--replay", help="File with one JSON log entry per line")
+    parser.add_argument("--entries", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.replay:
+        with open(args.replay, "rb") as file:
+            lines = [line for line in file if line.strip()]
+    else:
+        lines = generate_replay(args.entries)
+
+    intern_table = InternTable()
+    plain_bytes = measure(lines, None)
+    interned_bytes = measure(lines, intern_table)
+
+    print(f"entries={len(lines)} interned_strings={len(intern_table)}")
+    print(f"{'':<10} {'held (KiB)':>11} {'bytes/entry':>12}")
+    for name, held in [("plain", plain_bytes), ("interned", interned_bytes)]:
+        print(f"{name:<10} {held / 1024:>11.1f} {held / len(lines):>12.1f}")
+    print(f"saved: {(plain_bytes - interned_bytes) / plain_bytes:.1%}")
+
+
+if __name__ == "__main__":
+    main()
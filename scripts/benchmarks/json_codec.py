@@ -0,0 +1,146 @@
+"""
+Compare the standard library json module with lib.utilities.json_codec on the
+three JSON steps of the alerting pipeline: decoding the log entry, formatting
+the Slack content and encoding the Slack payload.
+
+The log entries are the examples used in tests/test_main.py, plus a large
+AuditLog entry. Install orjson to see the difference; without it both columns
+use json.
+
+Usage: python -m scripts.benchmarks.json_codec [--repeat N]
+"""
+
+import argparse
+import json
+import timeit
+from typing import Any, Callable, Dict
+
+from lib.cloud_logging import parse_log_entry
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES, process_log_entry
+from lib.slack.slack_message import create_from_processed_log_entry
+from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
+from lib.utilities import json_codec
+
+LOG_ENTRIES: Dict[str, Dict[str, Any]] = {
+    "gce_instance": {
+        "jsonPayload": {
+            "computer_name": "vm-mgmt",
+            "description": "Error description from VM",
+            "event_type": "error",
+            "message": "Error message from VM",
+        },
+        "receiveTimestamp": "2022-08-02T19:06:42.275819947Z",
+        "resource": {
+            "labels": {"instance_id": "89453598437598"},
+            "type": "gce_instance",
+        },
+        "severity": "ERROR",
+    },
+    "cloud_run_revision": {
+        "receiveTimestamp": "2022-07-22T20:36:22.219592062Z",
+        "resource": {
+            "labels": {"service_name": "log-error"},
+            "type": "cloud_run_revision",
+        },
+        "severity": "ERROR",
+        "textPayload": "Example error message",
+    },
+    "gae_app": {
+        "protoPayload": {
+            "host": "0.20220803t140821.app-name.project-name.nw.r.appspot.com",
+            "httpVersion": "HTTP/1.1",
+            "ip": "203.0.113.1",
+            "latency": "0.004229s",
+            "line": [{"logMessage": "Example GAE Error"}],
+            "method": "GET",
+            "resource": "/_ah/stop",
+            "responseSize": "3013",
+            "status": 500,
+        },
+        "receiveTimestamp": "2022-08-03T14:48:46.538301573Z",
+        "resource": {"labels": {"module_id": "app-name"}, "type": "gae_app"},
+        "severity": "ERROR",
+    },
+    "audit_log": {
+        "protoPayload": {
+            "@type": "type.googleapis.com/google.cloud.audit.AuditLog",
+            "status": {
+                "message": "serving status cannot be changed for Automatic Scaling versions",
+            },
+            "requestMetadata": {
+                "callerIp": "gce-internal-ip",
+                "requestAttributes": {"time": "2022-09-06T21:32:11.279689Z"},
+            },
+            "serviceName": "appengine.googleapis.com",
+            "methodName": "google.appengine.v1.Versions.UpdateVersion",
+        },
+        "resource": {"type": "gae_app"},
+        "severity": "ERROR",
+        "receiveTimestamp": "2022-09-06T21:32:11.332410850Z",
+    },
+}
+
+LOG_ENTRIES["large_audit_log"] = {
+    **LOG_ENTRIES["audit_log"],
+    "protoPayload": {
+        **LOG_ENTRIES["audit_log"]["protoPayload"],
+        "request": {
+            "items": [
+                {"name": f"item-{number}", "labels": {"index": str(number)}}
+                for number in range(2000)
+            ]
+        },
+    },
+}
+
+
+def seconds_per_call(function: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(function, number=repeat, repeat=5)) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"json_codec backend: {json_codec.backend()}")
+    print(
+        f"{'payload':<20} {'step':<8} {'json (us)':>10} {'codec (us)':>11} {'speedup':>8}"
+    )
+    for name, log_entry in LOG_ENTRIES.items():
+        data = json.dumps(log_entry).encode("utf-8")
+        processed_log_entry = process_log_entry(
+            parse_log_entry(log_entry), APP_LOG_PAYLOAD_FACTORIES
+        )
+        content = processed_log_entry.data
+        blocks = convert_slack_message_to_blocks(
+            create_from_processed_log_entry(processed_log_entry, "example-project")
+        )
+
+        steps: Dict[str, tuple] = {
+            "decode": (
+                lambda: json.loads(data),
+                lambda: json_codec.loads(data),
+            ),
+            "format": (
+                # Payload views are Mappings, which json only encodes with
+                # a default, as json_codec does.
+                lambda: json.dumps(content, indent=2, default=dict),
+                lambda: json_codec.dumps_indented(content),
+            ),
+            "encode": (
+                lambda: json.dumps(blocks).encode("utf-8"),
+                lambda: json_codec.dumps(blocks),
+            ),
+        }
+        for step, (stdlib, codec) in steps.items():
+            stdlib_seconds = seconds_per_call(stdlib, args.repeat)
+            codec_seconds = seconds_per_call(codec, args.repeat)
+            print(
+                f"{name:<20} {step:<8} {stdlib_seconds * 1e6:>10.1f} "
+                f"{codec_seconds * 1e6:>11.1f} {stdlib_seconds / codec_seconds:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Compare matching the filters' message patterns one filter at a time, as the
+filters did with chained `in` checks and a re.search per call, with the single
+combined program in lib.log_processor.message_patterns and with
+matched_message_patterns, which uses the combined program for messages up to
+LONG_MESSAGE_CHARS and prefixed `in` checks for longer ones.
+
+Each message is checked against every rule, as it is when no filter skips it.
+The combined program is timed without the per-thread cache of the last result,
+which would make every call after the first free.
+
+Usage: python -m scripts.benchmarks.message_patterns [--repeat N]
+"""
+
+import argparse
+import re
+from typing import Callable, Dict, FrozenSet
+
+from lib.log_processor.message_patterns import _PROGRAM, matched_message_patterns
+from scripts.benchmarks.json_codec import seconds_per_call
+
+UUID_PATTERN = (
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+
+# The message checks the filters made before the combined program.
+PER_FILTER_CHECKS: Dict[str, Callable[[str], bool]] = {
+    "generic_not_found": lambda message: (
+        'generic::not_found: Failed to fetch "latest' in message
+        or 'generic::not_found: Failed to fetch "version_' in message
+        or re.search(rf'generic::not_found: Failed to fetch "{UUID_PATTERN}"', message)
+        is not None
+    ),
+    "bootstrapper": lambda message: (
+        "Failed to execute job MTLS_MDS_Credential_Boostrapper with error:" in message
+        or "Failed to schedule job MTLS_MDS_Credential_Boostrapper with error:"
+        in message
+    ),
+    "get_role": lambda message: "You don't have permission to get the role at"
+    in message,
+    "invalid_login_attempt": lambda message: 'Required "container.clusters.list" permission(s)'
+    in message,
+    "ip_space_exhausted": lambda message: "IP_SPACE_EXHAUSTED" in message,
+    "no_available_instance": lambda message: "The request was aborted because there was no available instance"
+    in message,
+    "unexpected_end_of_json": lambda message: "unexpected end of JSON input" in message,
+    "osconfig_agent_error": lambda message: "OSConfigAgent Error" in message,
+    "paramiko_sftp_file": lambda message: "site-packages/paramiko/sftp_file.py"
+    in message,
+    "io_on_closed_file": lambda message: "ValueError: I/O operation on closed file."
+    in message,
+    "permission_denied_by_iam": lambda message: "[AuditLog] permission denied by IAM"
+    in message,
+    "requested_entity_was_not_found": lambda message: "generic::not_found: Requested entity was not found."
+    in message,
+    "rproxy_lookup_effective_guest_policies": lambda message: 'Error running LookupEffectiveGuestPolicies: error calling LookupEffectiveGuestPolicies: code: "NotFound", message: "Requested entity was not found.", details: []'
+    in message,
+    "socket_connection_reset": lambda message: "Socket exception: Connection reset by peer (104)"
+    in message,
+    "watching_metadata_invalid_character": lambda message: "Error watching metadata: invalid character '<' looking for beginning of value"
+    in message,
+}
+
+TRACEBACK = "\n".join(
+    f'  File "/workspace/app/module_{number}.py", line {number}, in handler_{number}\n'
+    f"    result = process(request_{number})"
+    for number in range(30)
+)
+
+MESSAGES: Dict[str, str] = {
+    "short miss": "Error message from VM",
+    "short hit": 'generic::not_found: Failed to fetch "6568e9ec-3d4a-4778-a1d3-af58553134d3"',
+    "traceback miss": f"Traceback (most recent call last):\n{TRACEBACK}\nKeyError: 'id'",
+    "traceback hit": (
+        f"Traceback (most recent call last):\n{TRACEBACK}\n"
+        '  File "/usr/lib/site-packages/paramiko/sftp_file.py", line 66\n'
+        "ValueError: I/O operation on closed file."
+    ),
+    "16 KiB miss": "Questionnaire data failed validation for case 1234. " * 320,
+}
+
+
+def per_filter(message: str) -> FrozenSet[str]:
+    return frozenset(
+        rule_id for rule_id, check in PER_FILTER_CHECKS.items() if check(message)
+    )
+
+
+def combined(message: str) -> FrozenSet[str]:
+    return frozenset(
+        match.lastgroup for match in _PROGRAM.finditer(message) if match.lastgroup
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"rules={len(PER_FILTER_CHECKS)}")
+    print(
+        f"{'message':<16} {'bytes':>6} {'per filter (us)':>16} "
+        f"{'combined (us)':>14} {'matched (us)':>13} {'speedup':>8}"
+    )
+    for name, message in MESSAGES.items():
+        assert per_filter(message) == combined(message), name
+        assert per_filter(message) == matched_message_patterns(message), name
+        per_filter_seconds = seconds_per_call(lambda: per_filter(message), args.repeat)
+        combined_seconds = seconds_per_call(lambda: combined(message), args.repeat)
+        matched_seconds = seconds_per_call(
+            lambda: matched_message_patterns(message), args.repeat
+        )
+        print(
+            f"{name:<16} {len(message):>6} {per_filter_seconds * 1e6:>16.2f} "
+            f"{combined_seconds * 1e6:>14.2f} {matched_seconds * 1e6:>13.2f} "
+            f"{per_filter_seconds / matched_seconds:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test the PubSub push server against a local fake Slack webhook.
+
+The push server runs in a thread-per-request WSGI server in this process, with
+the same warm pipeline as the Cloud Functions entry point. Push requests are
+built from the log entries used in tests/test_main.py, each with a new message
+ID, and sent at increasing concurrency levels. Requests per second and latency
+percentiles are reported for each level.
+
+Usage: python -m scripts.benchmarks.push_server [--requests N] [--latency S]
+           [--concurrency 1 4 16 32]
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+from werkzeug.serving import make_server
+
+from scripts.benchmarks.json_codec import LOG_ENTRIES
+from scripts.fake_slack_webhook import FakeSlackWebhook
+
+SUBSCRIPTION = "projects/ons-blaise-v2-prod/subscriptions/slack-alerts"
+
+
+def create_push_requests(count: int, run: int) -> List[bytes]:
+    log_entries = itertools.cycle(LOG_ENTRIES.values())
+    return [
+        json.dumps(
+            {
+                "message": {
+                    "data": base64.b64encode(
+                        json.dumps(next(log_entries)).encode("utf-8")
+                    ).decode("ascii"),
+                    "messageId": f"load-test-{run}-{number}",
+                },
+                "subscription": SUBSCRIPTION,
+            }
+        ).encode("utf-8")
+        for number in range(count)
+    ]
+
+
+def run_level(url: str, push_requests: List[bytes], concurrency: int) -> None:
+    local = threading.local()
+
+    def send(body: bytes) -> float:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.post(
+            url, data=body, headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(send, push_requests))
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{concurrency:>11} {len(push_requests) / elapsed:>8.1f} "
+        f"{percentiles[49] * 1000:>8.1f} {percentiles[94] * 1000:>8.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    with FakeSlackWebhook(latency_seconds=args.latency) as webhook:
+        os.environ["GCP_PROJECT_NAME"] = "ons-blaise-v2-prod"
+        os.environ["SLACK_URL"] = webhook.url
+
+        import main as pipeline
+        from lib.push_server import create_app
+
+        logging.disable(logging.WARNING)
+        pipeline.warm_up()
+        server = make_server(
+            "127.0.0.1",
+            0,
+            create_app(pipeline.handle_pubsub_message, subscription=SUBSCRIPTION),
+            threaded=True,
+        )
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+        print(f"requests={args.requests} slack_latency={args.latency}s")
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        try:
+            for run, concurrency in enumerate(args.concurrency):
+                run_level(url, create_push_requests(args.requests, run), concurrency)
+        finally:
+            server.shutdown()
+            server_thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Slack rejects messages with more blocks than this.
+MAX_BLOCKS = 50
+
+
+class FakeSlackWebhook:
+    """
+    Local stand-in for a Slack incoming webhook.
+
+    Records the JSON payloads it accepts and responds with "ok" after
+    latency_seconds, plus up to latency_jitter_seconds more. Use as a context
+    manager and point SLACK_URL at url.
+
+    Like Slack, it answers 429 with a Retry-After header once more than
+    rate_limit_per_second requests arrive within a second, and 400 for
+    payloads without text or blocks or with too many blocks. A share of
+    requests can also be failed on purpose: error_rate of them get a 500
+    response and reset_rate of them have their connection reset. seed makes
+    the failures repeatable. counts records the outcome of every request.
+    """
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        port: int = 0,
+        rate_limit_per_second: Optional[int] = None,
+        error_rate: float = 0.0,
+        reset_rate: float = 0.0,
+        latency_jitter_seconds: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.rate_limit_per_second = rate_limit_per_second
+        self.error_rate = error_rate
+        self.reset_rate = reset_rate
+        self.payloads: List[Any] = []
+        self.counts: Dict[str, int] = dict(
+            ok=0, rate_limited=0, invalid=0, error=0, reset=0
+        )
+        self._random = random.Random(seed)
+        self._window_start = 0
+        self._window_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/services/fake/webhook"
+
+    def start(self) -> "FakeSlackWebhook":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSlackWebhook":
+        return self.start()
+
+    def __exit__(self, *_: Any) -> None:
+        self.stop()
+
+    def _record(self, payload: Any) -> None:
+        with self._lock:
+            self.payloads.append(payload)
+            self.counts["ok"] += 1
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _retry_after(self) -> Optional[int]:
+        """Count a request against the rate limit, returning seconds to wait."""
+        if self.rate_limit_per_second is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            window_start = math.floor(now)
+            if window_start != self._window_start:
+                self._window_start = window_start
+                self._window_requests = 0
+            self._window_requests += 1
+            if self._window_requests <= self.rate_limit_per_second:
+                return None
+        return max(1, math.ceil(window_start + 1 - now))
+
+    def _choose_failure(self) -> Optional[str]:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.reset_rate:
+            return "reset"
+        if roll < self.reset_rate + self.error_rate:
+            return "error"
+        return None
+
+    def _latency(self) -> float:
+        if self.latency_jitter_seconds <= 0:
+            return self.latency_seconds
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter_seconds)
+        return self.latency_seconds + jitter
+
+    def _handler(self) -> type:
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+                retry_after = webhook._retry_after()
+                if retry_after is not None:
+                    webhook._count("rate_limited")
+                    self._respond(
+                        429, b"rate_limited", {"Retry-After": str(retry_after)}
+                    )
+                    return
+
+                latency = webhook._latency()
+                if latency > 0:
+                    time.sleep(latency)
+
+                failure = webhook._choose_failure()
+                if failure == "reset":
+                    webhook._count("reset")
+                    self._reset()
+                    return
+                if failure == "error":
+                    webhook._count("error")
+                    self._respond(500, b"internal_error")
+                    return
+
+                error = _invalid_payload_error(body)
+                if error is not None:
+                    webhook._count("invalid")
+                    self._respond(400, error)
+                    return
+
+                webhook._record(json.loads(body))
+                self._respond(200, b"ok")
+
+            def _respond(
+                self, status: int, body: bytes, headers: Optional[dict] = None
+            ) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _reset(self) -> None:
+                # Closing with a zero linger time sends a TCP reset rather than
+                # a normal close.
+                self.request.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+                )
+                self.close_connection = True
+                self.request.close()
+
+            def log_message(self, *_: Any) -> None:
+                pass
+
+        return Handler
+
+
+def _invalid_payload_error(body: bytes) -> Optional[bytes]:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return b"invalid_payload"
+    if not isinstance(payload, dict) or not (
+        payload.get("text") or payload.get("blocks")
+    ):
+        return b"no_text"
+    if len(payload.get("blocks") or []) > MAX_BLOCKS:
+        return b"invalid_blocks"
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=FakeSlackWebhook.__doc__)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    with FakeSlackWebhook(
+        latency_seconds=args.latency,
+        port=args.port,
+        rate_limit_per_second=args.rate_limit,
+        error_rate=args.error_rate,
+        reset_rate=args.reset_rate,
+        latency_jitter_seconds=args.latency_jitter,
+        seed=args.seed,
+    ) as fake_webhook:
+        print(f"Fake Slack webhook listening on {fake_webhook.url}")
+        print(f"export SLACK_URL={fake_webhook.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print(f"Requests: {fake_webhook.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""
+Synthetic Cloud Logging traffic for load and soak testing.
+
+Generates log entries shaped like the ones the alerter receives in production,
+based on the examples in tests/test_main.py, and wraps them in base64 PubSub
+envelopes. Entries are generated one at a time, so millions can be streamed to
+the replay and benchmark tools without being held in memory.
+
+Usage: python -m scripts.traffic_generator [--events N] [--format envelope|log-entry]
+           [--noise-ratio R] [--payload-bytes N] [--burst-factor F] [--seed S]
+           [--mix category=weight ...] [--output FILE]
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+PROJECT = "ons-blaise-v2-prod"
+
+# A Tuesday afternoon, well away from the weekly maintenance windows.
+DEFAULT_START = datetime(2025, 7, 15, 12, 0, tzinfo=timezone.utc)
+
+INSTANCES = [
+    (str(4503599627370000 + number * 7919), name)
+    for number, name in enumerate(
+        [
+            "blaise-gusty-mgmt",
+            "blaise-gusty-data-entry-1",
+            "blaise-gusty-data-entry-2",
+            "blaise-cma-1",
+            "data-delivery",
+            "restapi-1",
+            "restapi-2",
+            "vm-mgmt",
+        ]
+    )
+]
+CLOUD_RUN_SERVICES = [
+    "log-error",
+    "bus-ui",
+    "totalmobile-client",
+    "nifi-checksum",
+    "dqs-ui",
+]
+GAE_MODULES = ["default", "cati-dashboard", "bus", "dqs-ui"]
+GAE_PATHS = ["/api/instruments", "/api/cases", "/_ah/start", "/_ah/stop", "/health"]
+
+
+@dataclass
+class Resources:
+    """The resources events are drawn from, and the one currently bursting."""
+
+    random: random.Random
+    burst_instance: Optional[Tuple[str, str]] = field(default=None)
+
+    def instance(self) -> Tuple[str, str]:
+        if self.burst_instance is not None and self.random.random() < 0.8:
+            return self.burst_instance
+        return self.random.choice(INSTANCES)
+
+
+LogEntryBuilder = Callable[[Resources, int, str], Dict[str, Any]]
+
+
+def windows_event(resources: Resources, number: int, timestamp: str) -> dict:
+    instance_id, computer_name = resources.instance()
+    message = resources.random.choice(
+        [
+            f"The Blaise service terminated unexpectedly. It has done this {number % 9 + 1} time(s).",
+            f"Application error in process {number % 30000}: access denied to C:\\Blaise\\Surveys",
+            f"The description for Event ID {number % 9000} from source Blaise cannot be found.",
+        ]
+    )
+    return {
+        "insertId": f"winevt{number:012x}",
+        "jsonPayload": {
+            "event_id": str(number % 9000),
+            "event_category": "0",
+            "time_generated": timestamp,
+            "time_written": timestamp,
+            "message": f"{message}\r\n",
+            "channel": "application",
+            "computer_name": computer_name,
+            "event_type": "error",
+            "string_inserts": [message],
+            "description": f"{message}\r\n",
+            "record_number": str(1800000 + number),
+            "source_name": "Blaise",
+        },
+        "resource": _gce_resource(instance_id),
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "labels": {"compute.googleapis.com/resource_name": computer_name},
+        "logName": f"projects/{PROJECT}/logs/winevt.raw",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def guest_agent(resources: Resources, number: int, timestamp: str) -> dict:
+    instance_id, computer_name = resources.instance()
+    return {
+        "insertId": f"agent{number:012x}",
+        "jsonPayload": {
+            "localTimestamp": timestamp,
+            "message": resources.random.choice(
+                [
+                    "Error watching metadata: context canceled",
+                    f"Error running windows update check: exit status {number % 5 + 1}",
+                    "Failed to update ssh keys: invalid ssh key entry",
+                ]
+            ),
+            "omitempty": None,
+        },
+        "resource": _gce_resource(instance_id),
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "labels": {"instance_name": computer_name},
+        "logName": f"projects/{PROJECT}/logs/GCEGuestAgent",
+        "sourceLocation": {
+            "file": "metadata.go",
+            "line": "68",
+            "function": "github.com/GoogleCloudPlatform/guest-agent/google_guest_agent/events/metadata.(*Watcher).Run",
+        },
+        "receiveTimestamp": timestamp,
+    }
+
+
+def fluent_bit(resources: Resources, number: int, timestamp: str) -> dict:
+    instance_id, _ = resources.instance()
+    return {
+        "insertId": f"fluent{number:012x}",
+        "jsonPayload": {
+            "message": resources.random.choice(
+                [
+                    f"[{timestamp}] [error] [output:stackdriver:stackdriver.0] http_status={500 + number % 4}",
+                    f"[{timestamp}] [error] [tls] syscall error: error:00000005:lib(0):func(0):DH lib",
+                ]
+            )
+        },
+        "resource": _gce_resource(instance_id),
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "logName": f"projects/{PROJECT}/logs/ops-agent-fluent-bit",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def cloud_run(resources: Resources, number: int, timestamp: str) -> dict:
+    service_name = resources.random.choice(CLOUD_RUN_SERVICES)
+    return {
+        "insertId": f"{number:024x}",
+        "textPayload": resources.random.choice(
+            [
+                f"Function execution took {540000 + number % 1000} ms. Finished with status: timeout",
+                f"Error: connect ECONNREFUSED 10.0.{number % 255}.{number % 7}:443",
+                f"Traceback (most recent call last):\n  File \"main.py\", line {number % 400}, in handler\nKeyError: 'questionnaire_name'",
+            ]
+        ),
+        "resource": {
+            "type": "cloud_run_revision",
+            "labels": {
+                "project_id": PROJECT,
+                "region": "europe-west2",
+                "service_name": service_name,
+                "revision_name": f"{service_name}-00042-abc",
+            },
+        },
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "labels": {"instanceId": f"00bf4bf02d{number % 97:04}"},
+        "logName": f"projects/{PROJECT}/logs/run.googleapis.com%2Fstderr",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def gae_request(resources: Resources, number: int, timestamp: str) -> dict:
+    module_id = resources.random.choice(GAE_MODULES)
+    return {
+        "protoPayload": {
+            "@type": "type.googleapis.com/google.appengine.logging.v1.RequestLog",
+            "host": f"0.20250715t120000.{module_id}.{PROJECT}.nw.r.appspot.com",
+            "httpVersion": "HTTP/1.1",
+            "ip": f"203.0.113.{number % 255}",
+            "latency": f"{resources.random.uniform(0.001, 30):.6f}s",
+            "line": [{"logMessage": f"Request {number} failed with status 500"}],
+            "method": resources.random.choice(["GET", "POST"]),
+            "resource": resources.random.choice(GAE_PATHS),
+            "responseSize": str(number % 5000),
+            "status": 500,
+        },
+        "resource": {
+            "type": "gae_app",
+            "labels": {"module_id": module_id, "project_id": PROJECT},
+        },
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "logName": f"projects/{PROJECT}/logs/appengine.googleapis.com%2Frequest_log",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def audit_log(resources: Resources, number: int, timestamp: str) -> dict:
+    return {
+        "protoPayload": {
+            "@type": "type.googleapis.com/google.cloud.audit.AuditLog",
+            "status": {
+                "code": 9,
+                "message": "serving status cannot be changed for Automatic Scaling versions",
+            },
+            "requestMetadata": {
+                "callerIp": "gce-internal-ip",
+                "requestAttributes": {"time": timestamp},
+            },
+            "serviceName": "appengine.googleapis.com",
+            "methodName": "google.appengine.v1.Versions.UpdateVersion",
+            "resourceName": f"apps/{PROJECT}/services/default/versions/v{number % 50}",
+        },
+        "insertId": f"audit{number:012x}",
+        "resource": {"type": "gae_app", "labels": {"project_id": PROJECT}},
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "logName": f"projects/{PROJECT}/logs/cloudaudit.googleapis.com%2Factivity",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def orgpolicy_error(resources: Resources, number: int, timestamp: str) -> dict:
+    return _orgpolicy_entry(
+        number,
+        timestamp,
+        f"generic::PERMISSION_DENIED: Permission 'orgpolicy.policy.get' denied on resource 'projects/{PROJECT}/policies/compute.vmExternalIpAccess'.",
+        "compute.vmExternalIpAccess",
+    )
+
+
+# Entries which the filters skip.
+
+
+def agent_connect_noise(resources: Resources, number: int, timestamp: str) -> dict:
+    entry = windows_event(resources, number, timestamp)
+    message = f"{timestamp}: Agent connect error: The HTTP request timed out after 00:01:00.. Retrying until reconnected."
+    entry["jsonPayload"].update(
+        message=f"{message}\r\n",
+        description=f"{message}\r\n",
+        string_inserts=[message],
+        source_name="VstsAgentService",
+    )
+    return entry
+
+
+def no_instance_noise(resources: Resources, number: int, timestamp: str) -> dict:
+    entry = cloud_run(resources, number, timestamp)
+    entry["textPayload"] = (
+        "The request was aborted because there was no available instance. "
+        "Additional troubleshooting documentation can be found at: "
+        "https://cloud.google.com/functions/docs/troubleshooting#scalability"
+    )
+    entry["resource"]["labels"]["service_name"] = resources.random.choice(
+        ["nifi-notify", "bert-call-history", "daybatch-create"]
+    )
+    entry["logName"] = (
+        f"projects/{PROJECT}/logs/cloudfunctions.googleapis.com%2Fcloud-functions"
+    )
+    return entry
+
+
+def orgpolicy_noise(resources: Resources, number: int, timestamp: str) -> dict:
+    return _orgpolicy_entry(
+        number,
+        timestamp,
+        "com.google.apps.framework.request.StatusException: <eye3 title='NOT_FOUND'/> "
+        "generic::NOT_FOUND: No constraint found with name "
+        "'constraints/gcp.requiresPhysicalZoneSeparation'.",
+        "gcp.requiresPhysicalZoneSeparation",
+    )
+
+
+def osconfig_noise(resources: Resources, number: int, timestamp: str) -> dict:
+    instance_id, computer_name = resources.instance()
+    return {
+        "insertId": f"osconfig{number:012x}",
+        "jsonPayload": {
+            "message": "OSConfigAgent Error main.go:88: unexpected end of JSON input",
+            "localTimestamp": timestamp,
+        },
+        "resource": _gce_resource(instance_id),
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "labels": {"instance_name": computer_name},
+        "logName": f"projects/{PROJECT}/logs/OSConfigAgent",
+        "receiveTimestamp": timestamp,
+    }
+
+
+CATEGORIES: Dict[str, LogEntryBuilder] = {
+    "windows_event": windows_event,
+    "guest_agent": guest_agent,
+    "fluent_bit": fluent_bit,
+    "cloud_run": cloud_run,
+    "gae_request": gae_request,
+    "audit_log": audit_log,
+    "orgpolicy_error": orgpolicy_error,
+}
+NOISE_CATEGORIES: Dict[str, LogEntryBuilder] = {
+    "agent_connect_noise": agent_connect_noise,
+    "no_instance_noise": no_instance_noise,
+    "orgpolicy_noise": orgpolicy_noise,
+    "osconfig_noise": osconfig_noise,
+}
+DEFAULT_MIX = {
+    "windows_event": 30.0,
+    "guest_agent": 10.0,
+    "fluent_bit": 10.0,
+    "cloud_run": 25.0,
+    "gae_request": 15.0,
+    "audit_log": 5.0,
+    "orgpolicy_error": 5.0,
+}
+
+
+@dataclass(frozen=True)
+class TrafficProfile:
+    """
+    Shape of the generated traffic.
+
+    mix weights the alerting categories, and noise_ratio is the share of
+    events drawn from entries which the filters skip. Entries are padded to at
+    least payload_bytes of JSON. Events arrive at rate_per_second on average;
+    every burst_every_seconds the rate rises by burst_factor for
+    burst_seconds, with most of the burst coming from one GCE instance.
+    """
+
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    noise_ratio: float = field(default=0.3)
+    payload_bytes: int = field(default=0)
+    rate_per_second: float = field(default=20.0)
+    burst_every_seconds: float = field(default=600.0)
+    burst_seconds: float = field(default=30.0)
+    burst_factor: float = field(default=1.0)
+    start: datetime = field(default=DEFAULT_START)
+
+    def __post_init__(self) -> None:
+        unknown = set(self.mix) - set(CATEGORIES)
+        if unknown:
+            raise ValueError(f"Unknown categories: {', '.join(sorted(unknown))}")
+        if not any(weight > 0 for weight in self.mix.values()):
+            raise ValueError("At least one category needs a positive weight")
+        if not 0 <= self.noise_ratio <= 1:
+            raise ValueError("noise_ratio must be between 0 and 1")
+        if self.rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+
+
+def generate_log_entries(
+    profile: TrafficProfile, count: Optional[int] = None, seed: int = 0
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Yield (category, log entry) pairs, forever when count is None. The same
+    profile and seed always give the same entries.
+    """
+    rng = random.Random(seed)
+    resources = Resources(rng)
+    categories = [name for name, weight in profile.mix.items() if weight > 0]
+    weights = [profile.mix[name] for name in categories]
+    noise_categories = list(NOISE_CATEGORIES)
+    elapsed = 0.0
+
+    numbers = itertools.count() if count is None else iter(range(count))
+    for number in numbers:
+        in_burst = (
+            profile.burst_factor > 1
+            and elapsed % profile.burst_every_seconds < profile.burst_seconds
+        )
+        if in_burst and resources.burst_instance is None:
+            resources.burst_instance = rng.choice(INSTANCES)
+        elif not in_burst:
+            resources.burst_instance = None
+
+        rate = profile.rate_per_second * (profile.burst_factor if in_burst else 1)
+        elapsed += rng.expovariate(rate)
+        timestamp = _format_timestamp(profile.start + timedelta(seconds=elapsed))
+
+        if rng.random() < profile.noise_ratio:
+            category = rng.choice(noise_categories)
+            entry = NOISE_CATEGORIES[category](resources, number, timestamp)
+        else:
+            category = rng.choices(categories, weights)[0]
+            entry = CATEGORIES[category](resources, number, timestamp)
+
+        if profile.payload_bytes > 0:
+            _pad(entry, profile.payload_bytes)
+        yield category, entry
+
+
+def generate_envelopes(
+    profile: TrafficProfile, count: Optional[int] = None, seed: int = 0
+) -> Iterator[dict]:
+    """Yield PubSub envelopes, as passed to send_slack_alert, for each entry."""
+    for number, (_category, entry) in enumerate(
+        generate_log_entries(profile, count, seed)
+    ):
+        yield create_envelope(entry, f"synthetic-{seed}-{number}")
+
+
+def create_envelope(entry: dict, message_id: str) -> dict:
+    return {
+        "@type": "type.googleapis.com/google.pubsub.v1.PubsubMessage",
+        "attributes": {"logging.googleapis.com/timestamp": entry["timestamp"]},
+        "data": base64.b64encode(json.dumps(entry).encode("utf-8")).decode("ascii"),
+        "messageId": message_id,
+        "publishTime": entry["receiveTimestamp"],
+    }
+
+
+def write_events(
+    output: TextIO,
+    profile: TrafficProfile,
+    count: Optional[int],
+    seed: int,
+    envelopes: bool,
+) -> None:
+    events: Iterator[dict] = (
+        generate_envelopes(profile, count, seed)
+        if envelopes
+        else (entry for _category, entry in generate_log_entries(profile, count, seed))
+    )
+    for event in events:
+        output.write(json.dumps(event))
+        output.write("\n")
+
+
+def _gce_resource(instance_id: str) -> dict:
+    return {
+        "type": "gce_instance",
+        "labels": {
+            "instance_id": instance_id,
+            "project_id": PROJECT,
+            "zone": "europe-west2-a",
+        },
+    }
+
+
+def _orgpolicy_entry(number: int, timestamp: str, message: str, policy: str) -> dict:
+    return {
+        "protoPayload": {
+            "@type": "type.googleapis.com/google.cloud.audit.AuditLog",
+            "status": {"code": 5, "message": message},
+            "authenticationInfo": {"principalEmail": "j.blaise@example.com"},
+            "requestMetadata": {
+                "callerIp": "2001:db8::1",
+                "requestAttributes": {"time": timestamp, "auth": {}},
+                "destinationAttributes": {},
+            },
+            "serviceName": "orgpolicy.googleapis.com",
+            "methodName": "google.cloud.orgpolicy.v2.OrgPolicy.GetEffectivePolicy",
+            "resourceName": f"projects/{PROJECT}/policies/{policy}",
+        },
+        "insertId": f"orgpolicy{number:012x}",
+        "resource": {
+            "type": "audited_resource",
+            "labels": {
+                "method": "google.cloud.orgpolicy.v2.OrgPolicy.GetEffectivePolicy",
+                "service": "orgpolicy.googleapis.com",
+                "project_id": PROJECT,
+            },
+        },
+        "timestamp": timestamp,
+        "severity": "ERROR",
+        "logName": f"projects/{PROJECT}/logs/cloudaudit.googleapis.com%2Fdata_access",
+        "receiveTimestamp": timestamp,
+    }
+
+
+def _pad(entry: dict, payload_bytes: int) -> None:
+    missing = payload_bytes - len(json.dumps(entry))
+    if missing <= 0:
+        return
+
+    padding = "x" * missing
+    if "textPayload" in entry:
+        entry["textPayload"] = f"{entry['textPayload']}\n{padding}"
+    else:
+        payload = entry.get("jsonPayload") or entry["protoPayload"]
+        payload["details"] = padding
+
+
+def _format_timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_mix(values: List[str]) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for value in values:
+        name, _, weight = value.partition("=")
+        mix[name] = float(weight)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--events", type=int, default=1000, help="Number of events, or 0 for no end"
+    )
+    parser.add_argument(
+        "--format", choices=["envelope", "log-entry"], default="envelope"
+    )
+    parser.add_argument("--noise-ratio", type=float, default=0.3)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--burst-factor", type=float, default=1.0)
+    parser.add_argument("--mix", nargs="*", default=[], metavar="CATEGORY=WEIGHT")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write to instead of stdout")
+    args = parser.parse_args()
+
+    profile = TrafficProfile(
+        mix=_parse_mix(args.mix),
+        noise_ratio=args.noise_ratio,
+        payload_bytes=args.payload_bytes,
+        rate_per_second=args.rate,
+        burst_factor=args.burst_factor,
+    )
+    envelopes = args.format == "envelope"
+    if args.output:
+        with open(args.output, "w") as output:
+            write_events(output, profile, args.events or None, args.seed, envelopes)
+    else:
+        write_events(sys.stdout, profile, args.events or None, args.seed, envelopes)
+
+
+if __name__ == "__main__":
+    main()
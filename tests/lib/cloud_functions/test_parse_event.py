@@ -3,7 +3,11 @@ import json
 
 import pytest
 
-from lib.cloud_run_revision import InvalidCloudRunRevisionEvent, parse_event
+from lib.cloud_run_revision import (
+    InvalidCloudRunRevisionEvent,
+    PayloadSizeLimit,
+    parse_event,
+)
 
 
 @pytest.fixture
@@ -49,3 +53,131 @@ def test_parse_event_fails_when_data_is_not_valid_json(event):
 def test_parse_event_decodes_the_data(event):
     result = parse_event(event)
     assert result.data == dict(value="example-json-payload")
+
+
+def test_parse_event_keeps_the_envelope_metadata(event):
+    event["messageId"] = "2070443601311540"
+    event["publishTime"] = "2022-07-22T20:36:22.019Z"
+
+    result = parse_event(event)
+
+    assert result.message_id == "2070443601311540"
+    assert result.publish_time == "2022-07-22T20:36:22.019Z"
+    assert result.attributes == {
+        "logging.googleapis.com/timestamp": "2022-07-22T20:36:21.891133Z"
+    }
+
+
+def test_parse_event_accepts_snake_case_envelope_metadata(event):
+    event["message_id"] = "2070443601311540"
+    event["publish_time"] = "2022-07-22T20:36:22.019Z"
+
+    result = parse_event(event)
+
+    assert result.message_id == "2070443601311540"
+    assert result.publish_time == "2022-07-22T20:36:22.019Z"
+
+
+def test_parse_event_defaults_missing_envelope_metadata(event):
+    del event["attributes"]
+
+    result = parse_event(event)
+
+    assert result.message_id is None
+    assert result.publish_time is None
+    assert result.attributes == {}
+
+
+def create_audit_log_event() -> dict:
+    entry = {
+        "protoPayload": {
+            "@type": "type.googleapis.com/google.cloud.audit.AuditLog",
+            "status": {"message": "Permission denied"},
+            "serviceName": "compute.googleapis.com",
+            "request": {
+                "body": "x" * 5000,
+                "items": list(range(100)),
+                "httpRequest": {"url": "https://example.com/api"},
+            },
+            "response": {"body": "y" * 5000},
+        },
+        "insertId": "abc123",
+        "resource": {"type": "gce_instance", "labels": {"instance_id": "123"}},
+        "severity": "ERROR",
+        "logName": "projects/example/logs/cloudaudit.googleapis.com%2Factivity",
+        "receiveTimestamp": "2022-08-01T11:25:38.670159583Z",
+        "operation": {"id": "o" * 5000},
+    }
+    return {
+        "messageId": "123",
+        "data": base64.b64encode(json.dumps(entry).encode("ascii")),
+    }
+
+
+def test_parse_event_keeps_data_within_the_size_limit(event):
+    size_limit = PayloadSizeLimit(max_data_bytes=1000)
+
+    result = parse_event(event, size_limit)
+
+    assert result.data == dict(value="example-json-payload")
+    assert result.truncated is False
+    assert size_limit.oversized_count == 0
+
+
+def test_parse_event_shrinks_oversized_data(caplog):
+    size_limit = PayloadSizeLimit(
+        max_data_bytes=1000, max_string_chars=10, max_list_items=3
+    )
+
+    result = parse_event(create_audit_log_event(), size_limit)
+
+    assert result.truncated is True
+    assert result.data == {
+        "resource": {"type": "gce_instance", "labels": {"instance_id": "123"}},
+        "severity": "ERROR",
+        "logName": "projects/example/logs/cloudaudit.googleapis.com%2Factivity",
+        "receiveTimestamp": "2022-08-01T11:25:38.670159583Z",
+        "insertId": "abc123",
+        "protoPayload": {
+            "@type": "type.googl...[truncated]",
+            "status": {"message": "Permission...[truncated]"},
+            "serviceName": "compute.go...[truncated]",
+            "request": {"httpRequest": {"url": "https://ex...[truncated]"}},
+        },
+    }
+    assert size_limit.oversized_count == 1
+    [record] = [record for record in caplog.records if record.levelname == "WARNING"]
+    assert record.json_fields["messageId"] == "123"
+    assert record.json_fields["max_data_bytes"] == 1000
+
+
+def test_parse_event_keeps_the_fields_used_for_alerting_with_the_default_limits():
+    size_limit = PayloadSizeLimit(max_data_bytes=1000)
+
+    result = parse_event(create_audit_log_event(), size_limit)
+
+    assert "operation" not in result.data
+    assert result.data["protoPayload"]["status"]["message"] == "Permission denied"
+    assert len(json.dumps(result.data)) < 3000
+
+
+def test_payload_size_limit_cuts_long_lists_and_objects():
+    size_limit = PayloadSizeLimit(max_data_bytes=1, max_list_items=2, max_dict_keys=2)
+
+    assert size_limit.shrink(
+        {"jsonPayload": {"items": [1, 2, 3], "a": 1, "b": 2, "c": 3}}
+    ) == {
+        "jsonPayload": {
+            "items": [1, 2, "[truncated]"],
+            "a": 1,
+            "[truncated]": "2 more fields",
+        }
+    }
+
+
+def test_payload_size_limit_cuts_deeply_nested_values():
+    size_limit = PayloadSizeLimit(max_data_bytes=1, max_depth=3)
+
+    assert size_limit.shrink({"jsonPayload": {"a": {"b": {"c": 1}}}}) == {
+        "jsonPayload": {"a": {"b": "[truncated]"}}
+    }
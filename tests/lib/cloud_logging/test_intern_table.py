@@ -0,0 +1,61 @@
+import pytest
+
+from lib.cloud_logging import InternTable
+
+
+def fresh(value: str) -> str:
+    # Build an equal string which is a separate object.
+    return "".join(list(value))
+
+
+def test_it_returns_the_first_equal_string_seen():
+    table = InternTable()
+    first = fresh("projects/ons-blaise-v2-prod/logs/stdout")
+    second = fresh("projects/ons-blaise-v2-prod/logs/stdout")
+
+    assert first is not second
+    assert table.intern(first) is first
+    assert table.intern(second) is first
+    assert len(table) == 1
+
+
+def test_it_returns_other_values_unchanged():
+    table = InternTable()
+    labels = {"zone": "europe-west2-a"}
+
+    assert table.intern(None) is None
+    assert table.intern(42) == 42
+    assert table.intern(labels) is labels
+    assert len(table) == 0
+
+
+def test_it_starts_again_once_full():
+    table = InternTable(max_size=2)
+    error = table.intern(fresh("ERROR"))
+    table.intern(fresh("WARNING"))
+    info = table.intern(fresh("INFO"))
+    second_error = table.intern(fresh("ERROR"))
+
+    assert len(table) == 2
+    assert table.intern(fresh("INFO")) is info
+    assert second_error is not error
+    assert table.intern(fresh("ERROR")) is second_error
+
+
+def test_it_interns_the_keys_and_values_of_a_dict():
+    table = InternTable()
+    first = table.intern_values({fresh("zone"): fresh("europe-west2-a"), "port": 80})
+    second = table.intern_values({fresh("zone"): fresh("europe-west2-a"), "port": 80})
+
+    assert first == second == {"zone": "europe-west2-a", "port": 80}
+    assert first["zone"] is second["zone"]
+    assert next(iter(first)) is next(iter(second))
+
+
+def test_it_leaves_values_which_are_not_dicts_alone():
+    assert InternTable().intern_values(["a", "b"]) == ["a", "b"]
+
+
+def test_it_requires_room_for_one_string():
+    with pytest.raises(ValueError):
+        InternTable(max_size=0)
@@ -0,0 +1,73 @@
+import pytest
+
+from lib.cloud_logging import Environment, LogName, parse_log_name
+from lib.log_processor import ProcessedLogEntry
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        (
+            "projects/ons-blaise-v2-prod/logs/cloudaudit.googleapis.com%2Fdata_access",
+            LogName(
+                project_id="ons-blaise-v2-prod",
+                log_id="cloudaudit.googleapis.com/data_access",
+                environment=Environment.PROD,
+            ),
+        ),
+        (
+            "projects/ons-blaise-v2-preprod/logs/stdout",
+            LogName("ons-blaise-v2-preprod", "stdout", Environment.PREPROD),
+        ),
+        (
+            "projects/ons-blaise-v2-dev-training/logs/winevt.raw",
+            LogName("ons-blaise-v2-dev-training", "winevt.raw", Environment.TRAINING),
+        ),
+        (
+            "projects/ons-blaise-v2-dev/logs/GCEGuestAgent",
+            LogName("ons-blaise-v2-dev", "GCEGuestAgent", Environment.DEV),
+        ),
+        (
+            "projects/ons-blaise-v2-dev-jw09/logs/stdout",
+            LogName("ons-blaise-v2-dev-jw09", "stdout", Environment.SANDBOX),
+        ),
+    ],
+)
+def test_it_parses_project_log_names(raw: str, expected: LogName):
+    assert parse_log_name(raw) == expected
+
+
+@pytest.mark.parametrize(
+    "raw,log_id",
+    [
+        ("/logs/cloudfunctions", "cloudfunctions"),
+        (
+            "logs/cloudaudit.googleapis.com/data_access",
+            "cloudaudit.googleapis.com/data_access",
+        ),
+        ("organizations/1234/logs/policy", "policy"),
+        ("not_valid_value", "not_valid_value"),
+        ("", ""),
+    ],
+)
+def test_it_treats_other_log_names_as_sandbox_logs(raw: str, log_id: str):
+    assert parse_log_name(raw) == LogName(None, log_id, Environment.SANDBOX)
+
+
+def test_it_parses_each_log_name_once():
+    raw = "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Fstderr"
+
+    assert parse_log_name(raw) is parse_log_name(raw)
+
+
+def test_processed_log_entries_share_the_parsed_log_name():
+    raw = "projects/ons-blaise-v2-prod/logs/OSConfigAgent"
+
+    parsed_log_name = ProcessedLogEntry(message="a", log_name=raw).parsed_log_name
+
+    assert parsed_log_name is not None
+    assert parsed_log_name.log_id == "OSConfigAgent"
+    assert (
+        parsed_log_name is ProcessedLogEntry(message="b", log_name=raw).parsed_log_name
+    )
+    assert ProcessedLogEntry(message="c").parsed_log_name is None
@@ -84,3 +84,20 @@ def test_create_log_query_link_with_at_symbol():
         f"timeRange=2022-10-24T00:00:00.000000Z%2F2022-10-24T00:00:00.000000Z--PT1M"
         f"?referrer=search&project={project_name}"
     )
+
+
+def test_create_log_query_link_with_an_end_timestamp():
+    link = create_log_query_link(
+        {},
+        [],
+        datetime(2022, 10, 24, 9),
+        "example-project",
+        end_timestamp=datetime(2022, 10, 24, 9, 15),
+    )
+
+    assert (
+        link == "https://console.cloud.google.com/logs/query;"
+        "query=;"
+        "timeRange=2022-10-24T09:00:00.000000Z%2F2022-10-24T09:15:00.000000Z"
+        "?referrer=search&project=example-project"
+    )
@@ -1,3 +1,6 @@
+import json
+
+from lib.cloud_logging import InternTable
 from lib.cloud_logging.log_entry import LogEntry, PayloadType
 from lib.cloud_logging.parse_log_entry import parse_log_entry
 
@@ -204,3 +207,35 @@ def test_parse_log_entry_with_labels_that_are_not_a_dict():
         timestamp=None,
         labels=dict(),
     )
+
+
+def test_parse_log_entry_shares_repeated_metadata_through_an_intern_table():
+    table = InternTable()
+
+    def create_entry() -> dict:
+        return json.loads(
+            json.dumps(
+                dict(
+                    textPayload="example value",
+                    severity="ERROR",
+                    logName="projects/ons-blaise-v2-prod/logs/stdout",
+                    resource=dict(
+                        type="cloud_run_revision",
+                        labels=dict(service_name="log-error"),
+                    ),
+                    labels=dict(instanceId="00bf4bf02d"),
+                )
+            )
+        )
+
+    first = parse_log_entry(create_entry(), table)
+    second = parse_log_entry(create_entry(), table)
+
+    assert first == second
+    assert second.log_name is first.log_name
+    assert second.severity is first.severity
+    assert second.resource_type is first.resource_type
+    assert (
+        second.resource_labels["service_name"] is first.resource_labels["service_name"]
+    )
+    assert second.labels["instanceId"] is first.labels["instanceId"]
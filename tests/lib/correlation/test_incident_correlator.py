@@ -0,0 +1,271 @@
+import pytest
+from dateutil.parser import parse
+
+from lib.correlation import IncidentCorrelator
+from lib.correlation.incident_correlator import resource_key_for
+from lib.log_processor import ProcessedLogEntry
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def correlator(clock) -> IncidentCorrelator:
+    return IncidentCorrelator(window_seconds=60, max_incidents=3, clock=clock)
+
+
+def create_entry(
+    instance_id="vm-1",
+    application="GCEGuestAgent",
+    severity="ERROR",
+    message="Something went wrong",
+    timestamp="2022-08-02T19:06:42Z",
+    log_name=None,
+) -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message=message,
+        log_name=log_name,
+        severity=severity,
+        platform="gce_instance",
+        application=application,
+        timestamp=parse(timestamp),
+        log_query={"resource.labels.instance_id": instance_id},
+    )
+
+
+def test_the_first_alert_for_a_resource_is_not_merged(correlator):
+    assert correlator.correlate(create_entry()) is False
+    assert len(correlator) == 1
+
+
+def test_alerts_for_the_same_resource_within_the_window_are_merged(correlator, clock):
+    correlator.correlate(create_entry(application="GCEGuestAgent"))
+    clock.now += 30
+    assert correlator.correlate(create_entry(application="OSConfigAgent")) is True
+    clock.now += 59
+    assert correlator.correlate(create_entry(application="fluent-bit")) is True
+
+
+def test_a_more_severe_alert_is_sent_and_opens_a_new_incident(correlator, clock):
+    correlator.correlate(create_entry(severity="WARNING"))
+    correlator.correlate(create_entry(severity="WARNING"))
+
+    assert correlator.correlate(create_entry(severity="ERROR")) is False
+    assert correlator.correlate(create_entry(severity="WARNING")) is True
+    assert correlator.correlate(create_entry(severity="ERROR")) is True
+    assert [incident.count for incident in correlator.take_closed()] == [2]
+    clock.now += 60
+    [incident] = correlator.take_closed()
+    assert incident.count == 3
+    assert incident.severity == "ERROR"
+
+
+def test_alerts_for_other_resources_are_not_merged(correlator):
+    correlator.correlate(create_entry(instance_id="vm-1"))
+
+    assert correlator.correlate(create_entry(instance_id="vm-2")) is False
+
+
+def test_alerts_for_the_same_resource_in_other_projects_are_not_merged(
+    correlator, clock
+):
+    for project_id in ["project-a", "project-b", "project-a"]:
+        correlator.correlate(
+            create_entry(log_name=f"projects/{project_id}/logs/GCEGuestAgent")
+        )
+    clock.now += 60
+
+    [incident] = correlator.take_closed()
+
+    assert incident.project_id == "project-a"
+    assert incident.count == 2
+
+
+def test_alerts_without_a_resource_are_not_correlated(correlator):
+    entry = ProcessedLogEntry(message="Something went wrong", severity="ERROR")
+
+    assert correlator.correlate(entry) is False
+    assert correlator.correlate(entry) is False
+    assert len(correlator) == 0
+
+
+def test_a_quiet_incident_is_closed_with_a_summary(correlator, clock):
+    correlator.correlate(
+        create_entry(
+            application="GCEGuestAgent",
+            severity="ERROR",
+            message="Agent stopped\nstack",
+            timestamp="2022-08-02T19:06:42Z",
+        )
+    )
+    correlator.correlate(
+        create_entry(
+            application="OSConfigAgent",
+            severity="ERROR",
+            message="Connection refused",
+            timestamp="2022-08-02T19:06:50Z",
+        )
+    )
+    correlator.correlate(
+        create_entry(
+            application="OSConfigAgent",
+            severity="ERROR",
+            message="Connection refused",
+            timestamp="2022-08-02T19:06:45Z",
+        )
+    )
+
+    assert correlator.take_closed() == []
+
+    clock.now += 60
+    [incident] = correlator.take_closed()
+
+    assert incident.resource_type == "instance_id"
+    assert incident.resource == "vm-1"
+    assert incident.log_query == {"resource.labels.instance_id": "vm-1"}
+    assert incident.count == 3
+    assert incident.severity == "ERROR"
+    assert incident.platform == "gce_instance"
+    assert incident.applications == ["GCEGuestAgent", "OSConfigAgent"]
+    assert incident.messages == ["Agent stopped", "Connection refused"]
+    assert incident.first_seen == parse("2022-08-02T19:06:42Z")
+    assert incident.last_seen == parse("2022-08-02T19:06:50Z")
+    assert len(correlator) == 0
+    assert correlator.take_closed() == []
+
+
+def test_an_incident_without_merged_alerts_has_no_summary(correlator, clock):
+    correlator.correlate(create_entry())
+    clock.now += 60
+
+    assert correlator.take_closed() == []
+    assert len(correlator) == 0
+
+
+def test_an_alert_after_the_window_opens_a_new_incident(correlator, clock):
+    correlator.correlate(create_entry())
+    correlator.correlate(create_entry())
+    clock.now += 61
+
+    assert correlator.correlate(create_entry()) is False
+    assert [incident.count for incident in correlator.take_closed()] == [2]
+
+
+def test_a_long_running_incident_is_closed_after_the_maximum_duration(clock):
+    correlator = IncidentCorrelator(
+        window_seconds=60, max_incident_seconds=120, clock=clock
+    )
+    correlator.correlate(create_entry())
+    for _ in range(4):
+        clock.now += 30
+        correlator.correlate(create_entry())
+
+    assert [incident.count for incident in correlator.take_closed()] == [4]
+    assert len(correlator) == 1
+
+
+def test_the_least_recently_active_incident_is_closed_when_full(correlator, clock):
+    for instance_id in ["vm-1", "vm-2", "vm-3"]:
+        correlator.correlate(create_entry(instance_id=instance_id))
+        correlator.correlate(create_entry(instance_id=instance_id))
+    correlator.correlate(create_entry(instance_id="vm-1"))
+
+    correlator.correlate(create_entry(instance_id="vm-4"))
+
+    assert len(correlator) == 3
+    assert [incident.resource for incident in correlator.take_closed()] == ["vm-2"]
+
+
+def test_only_a_few_distinct_messages_are_kept(correlator, clock):
+    for index in range(10):
+        correlator.correlate(create_entry(message=f"Error {index}"))
+    clock.now += 60
+
+    [incident] = correlator.take_closed()
+
+    assert incident.count == 10
+    assert len(incident.messages) == 5
+
+
+def test_incidents_are_shared_through_the_database(clock, tmp_path):
+    path = str(tmp_path / "incidents.db")
+    first = IncidentCorrelator(window_seconds=60, path=path, clock=clock)
+    second = IncidentCorrelator(window_seconds=60, path=path, clock=clock)
+
+    first.correlate(create_entry(application="GCEGuestAgent"))
+    assert second.correlate(create_entry(application="OSConfigAgent")) is True
+    clock.now += 60
+
+    [incident] = first.take_closed()
+    assert incident.count == 2
+    assert incident.applications == ["GCEGuestAgent", "OSConfigAgent"]
+    assert second.take_closed() == []
+
+
+def test_a_restored_incident_is_taken_again(correlator, clock):
+    correlator.correlate(create_entry())
+    correlator.correlate(create_entry())
+    clock.now += 60
+    [incident] = correlator.take_closed()
+
+    correlator.restore(incident)
+
+    assert correlator.take_closed() == [incident]
+
+
+def test_an_incident_keeps_the_classification_of_its_opening_alert(clock):
+    correlator = IncidentCorrelator(
+        window_seconds=60, classify=lambda entry: entry.application, clock=clock
+    )
+    correlator.correlate(create_entry(application="nifi-notify"))
+    correlator.correlate(create_entry(application="OSConfigAgent"))
+    clock.now += 60
+
+    [incident] = correlator.take_closed()
+    assert incident.classification == "nifi-notify"
+
+    correlator.restore(incident)
+
+    assert correlator.take_closed() == [incident]
+
+
+@pytest.mark.parametrize(
+    "log_query,expected",
+    [
+        (
+            {"resource.labels.instance_id": "123"},
+            ("resource.labels.instance_id", "123"),
+        ),
+        (
+            {"resource.labels.service_name": "bts"},
+            ("resource.labels.service_name", "bts"),
+        ),
+        (
+            {"resource.labels.module_id": "default"},
+            ("resource.labels.module_id", "default"),
+        ),
+        ({"resource.labels.function_name": "nifi"}, None),
+        ({}, None),
+    ],
+)
+def test_resource_key_for(log_query, expected):
+    assert resource_key_for(ProcessedLogEntry(message="", log_query=log_query)) == (
+        expected
+    )
+
+
+def test_it_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        IncidentCorrelator(window_seconds=0)
+    with pytest.raises(ValueError):
+        IncidentCorrelator(max_incidents=0)
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+from lib.deduplication import InMemorySeenMessageIds, SqliteSeenMessageIds
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def create_seen_message_ids(request, tmp_path):
+    def create(max_size: int):
+        if request.param == "sqlite":
+            return SqliteSeenMessageIds(str(tmp_path / "seen.db"), max_size=max_size)
+        return InMemorySeenMessageIds(max_size=max_size)
+
+    return create
+
+
+def test_it_does_not_contain_unseen_ids(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+
+    assert seen.contains("message-1") is False
+
+
+def test_it_contains_added_ids(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+
+    seen.add("message-1")
+
+    assert seen.contains("message-1") is True
+    assert seen.contains("message-2") is False
+
+
+def test_it_evicts_the_oldest_ids_when_full(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=2)
+
+    seen.add("message-1")
+    seen.add("message-2")
+    seen.add("message-3")
+
+    assert seen.contains("message-1") is False
+    assert seen.contains("message-2") is True
+    assert seen.contains("message-3") is True
+    assert len(seen) == 2
+
+
+def test_re_adding_an_id_refreshes_it(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=2)
+
+    seen.add("message-1")
+    seen.add("message-2")
+    seen.add("message-1")
+    seen.add("message-3")
+
+    assert seen.contains("message-1") is True
+    assert seen.contains("message-2") is False
+
+
+def test_an_id_is_reserved_once(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+
+    assert seen.reserve("message-1") is True
+    assert seen.reserve("message-1") is False
+    assert seen.contains("message-1") is False
+
+
+def test_a_seen_id_cannot_be_reserved(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+
+    assert seen.reserve("message-1") is True
+    seen.add("message-1")
+
+    assert seen.reserve("message-1") is False
+    assert seen.contains("message-1") is True
+
+
+def test_a_released_id_can_be_reserved_again(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+
+    seen.reserve("message-1")
+    seen.release("message-1")
+
+    assert seen.reserve("message-1") is True
+
+
+def test_only_one_thread_reserves_an_id(create_seen_message_ids):
+    seen = create_seen_message_ids(max_size=10)
+    start = threading.Barrier(8)
+    reserved = []
+
+    def reserve() -> None:
+        start.wait()
+        reserved.append(seen.reserve("message-1"))
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(reserved) == [False] * 7 + [True]
+
+
+def test_it_rejects_an_invalid_max_size(create_seen_message_ids):
+    with pytest.raises(ValueError):
+        create_seen_message_ids(max_size=0)
+
+
+def test_sqlite_ids_survive_reopening(tmp_path):
+    path = str(tmp_path / "seen.db")
+    seen = SqliteSeenMessageIds(path, max_size=2)
+    seen.add("message-1")
+    seen.add("message-2")
+    seen.close()
+
+    reopened = SqliteSeenMessageIds(path, max_size=2)
+    reopened.add("message-3")
+
+    assert reopened.contains("message-1") is False
+    assert reopened.contains("message-2") is True
+    assert reopened.contains("message-3") is True
@@ -0,0 +1,162 @@
+from datetime import datetime, timezone
+
+import pytest
+from dateutil.parser import parse
+
+from lib.digest import DigestBuffer, DigestGroup
+from lib.log_processor import ProcessedLogEntry, fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture()
+def buffer(clock) -> DigestBuffer:
+    return DigestBuffer("ERROR", window_seconds=600, clock=clock)
+
+
+def create_entry(message: str, timestamp: str, **changes) -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message=message,
+        severity=changes.get("severity", "WARNING"),
+        platform="cloud_run_revision",
+        application=changes.get("application", "bert-call-history"),
+        log_name=changes.get("log_name"),
+        timestamp=parse(timestamp),
+        log_query={"resource.type": "cloud_run_revision"},
+    )
+
+
+@pytest.mark.parametrize(
+    "severity,deferred",
+    [
+        ("DEBUG", True),
+        ("WARNING", True),
+        ("ERROR", False),
+        ("CRITICAL", False),
+        (None, False),
+        ("NOT_A_SEVERITY", False),
+    ],
+)
+def test_should_defer(buffer, severity, deferred):
+    assert buffer.should_defer(ProcessedLogEntry(message="", severity=severity)) is (
+        deferred
+    )
+
+
+def test_it_rejects_an_unknown_severity():
+    with pytest.raises(ValueError):
+        DigestBuffer("SEVERE")
+
+
+def test_it_groups_entries_by_application_and_fingerprint(buffer, clock):
+    first = create_entry("Call 1 timed out", "2022-08-02T19:06:00Z")
+    buffer.add(first)
+    buffer.add(create_entry("Call 2 timed out\ntrace", "2022-08-02T19:08:00Z"))
+    buffer.add(create_entry("Call 3 timed out", "2022-08-02T19:07:00Z"))
+    buffer.add(
+        create_entry("Call 4 timed out", "2022-08-02T19:07:00Z", application="other")
+    )
+    clock.now += 600
+
+    groups = buffer.take_ready()
+
+    assert groups[0] == DigestGroup(
+        application="bert-call-history",
+        fingerprint=fingerprint(first),
+        window_start=datetime(1970, 1, 12, 13, 40, tzinfo=timezone.utc),
+        count=3,
+        first_seen=datetime(2022, 8, 2, 19, 6, tzinfo=timezone.utc),
+        last_seen=datetime(2022, 8, 2, 19, 8, tzinfo=timezone.utc),
+        severity="WARNING",
+        platform="cloud_run_revision",
+        message="Call 1 timed out",
+        log_query={"resource.type": "cloud_run_revision"},
+    )
+    assert [(group.application, group.count) for group in groups] == [
+        ("bert-call-history", 3),
+        ("other", 1),
+    ]
+
+
+def test_it_only_returns_groups_whose_window_has_ended(buffer, clock):
+    buffer.add(create_entry("Call timed out", "2022-08-02T19:06:00Z"))
+
+    assert buffer.take_ready() == []
+
+    clock.now += 600
+
+    assert len(buffer.take_ready()) == 1
+    assert buffer.take_ready() == []
+
+
+def test_it_starts_a_new_group_in_the_next_window(buffer, clock):
+    buffer.add(create_entry("Call timed out", "2022-08-02T19:06:00Z"))
+    clock.now += 600
+    buffer.add(create_entry("Call timed out", "2022-08-02T19:16:00Z"))
+
+    assert [group.count for group in buffer.take_all()] == [1, 1]
+    assert buffer.take_all() == []
+
+
+def test_a_restored_group_is_merged_with_entries_added_since(buffer, clock):
+    buffer.add(create_entry("Call 1 timed out", "2022-08-02T19:06:00Z"))
+    [group] = buffer.take_all()
+    buffer.add(create_entry("Call 2 timed out", "2022-08-02T19:09:00Z"))
+
+    buffer.restore(group)
+
+    [restored] = buffer.take_all()
+    assert restored.count == 2
+    assert restored.first_seen == datetime(2022, 8, 2, 19, 6, tzinfo=timezone.utc)
+    assert restored.last_seen == datetime(2022, 8, 2, 19, 9, tzinfo=timezone.utc)
+
+
+def test_it_groups_entries_by_project(buffer):
+    for project_id in ["project-a", "project-b", "project-a"]:
+        buffer.add(
+            create_entry(
+                "Call timed out",
+                "2022-08-02T19:06:00Z",
+                log_name=f"projects/{project_id}/logs/stdout",
+            )
+        )
+    buffer.add(create_entry("Call timed out", "2022-08-02T19:06:00Z"))
+
+    groups = buffer.take_all()
+
+    assert sorted((str(group.project_id), group.count) for group in groups) == [
+        ("None", 1),
+        ("project-a", 2),
+        ("project-b", 1),
+    ]
+
+
+def test_it_keeps_the_classification_of_each_group(clock):
+    buffer = DigestBuffer(
+        "ERROR",
+        window_seconds=600,
+        classify=lambda entry: "nisra" if entry.application == "nisra-case" else None,
+        clock=clock,
+    )
+    buffer.add(create_entry("Call timed out", "2022-08-02T19:06:00Z"))
+    buffer.add(
+        create_entry("Call timed out", "2022-08-02T19:06:00Z", application="nisra-case")
+    )
+    [unclassified, classified] = buffer.take_all()
+    assert (unclassified.classification, classified.classification) == (None, "nisra")
+
+    buffer.restore(classified)
+
+    [restored] = buffer.take_all()
+    assert restored.classification == "nisra"
@@ -7,6 +7,7 @@ import pytest
 
 from lib.filters.os_patch_maintenance_filter import os_patch_maintenance_filter
 from lib.log_processor.processed_log_entry import ProcessedLogEntry
+from lib.utilities.weekly_maintenance_window import WeeklyMaintenanceWindow
 
 
 @pytest.fixture()
@@ -228,3 +229,28 @@ def test_specific_field_combinations_are_not_skipped(
         )
         is False
     )
+
+
+def test_patterns_are_skipped_during_the_given_maintenance_windows(
+    base_non_maintenance_log: ProcessedLogEntry,
+) -> None:
+    # 10:30 UTC on a Tuesday = 11:30 BST
+    tuesday_window = WeeklyMaintenanceWindow(
+        weekday=1, start=datetime.time(11, 0), end=datetime.time(12, 0)
+    )
+
+    assert os_patch_maintenance_filter(
+        base_non_maintenance_log, maintenance_windows=(tuesday_window,)
+    )
+
+
+def test_patterns_are_not_skipped_in_the_friday_window_when_it_is_replaced(
+    base_maintenance_log: ProcessedLogEntry,
+) -> None:
+    tuesday_window = WeeklyMaintenanceWindow(
+        weekday=1, start=datetime.time(11, 0), end=datetime.time(12, 0)
+    )
+
+    assert not os_patch_maintenance_filter(
+        base_maintenance_log, maintenance_windows=(tuesday_window,)
+    )
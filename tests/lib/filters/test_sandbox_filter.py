@@ -91,3 +91,18 @@ def test_log_is_not_skipped_for_formal_environment(
 
     # assert
     assert log_is_skipped is False
+
+
+def test_log_is_skipped_when_its_log_name_has_no_project(
+    processed_log_entry: ProcessedLogEntry,
+) -> None:
+    # arrange
+    processed_log_entry_without_project = dataclasses.replace(
+        processed_log_entry, log_name="not_valid_value"
+    )
+
+    # act
+    log_is_skipped = sandbox_filter(processed_log_entry_without_project)
+
+    # assert
+    assert log_is_skipped is True
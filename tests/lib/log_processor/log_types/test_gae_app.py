@@ -155,3 +155,14 @@ def test_attempt_create_succeeds_if_payload_type_is_text(log_entry):
     instance = attempt_create(log_entry)
     assert instance.message == "Error message"
     assert instance.data == ""
+
+
+def test_attempt_create_does_not_change_the_payload(log_entry):
+    log_entry.payload["message"] = "Error message"
+
+    instance = attempt_create(log_entry)
+
+    assert instance.data == dict(extra="something")
+    assert log_entry.payload == dict(
+        moduleId="app-name", extra="something", message="Error message"
+    )
@@ -87,3 +87,25 @@ def test_attempt_create_returns_none_if_payload_type_is_text(log_entry):
     )
     instance = attempt_create(log_entry)
     assert instance.message == "Error message"
+
+
+def test_attempt_create_includes_instance_id_for_text_payloads(log_entry):
+    log_entry = dataclasses.replace(
+        log_entry, payload_type=PayloadType.TEXT, payload="Agent stopped"
+    )
+    instance = attempt_create(log_entry)
+
+    assert instance.message == "Agent stopped"
+    assert instance.log_query == {
+        "resource.type": "gce_instance",
+        "resource.labels.instance_id": "123123123",
+    }
+
+
+def test_attempt_create_does_not_change_the_payload(log_entry):
+    instance = attempt_create(log_entry)
+
+    assert instance.data == dict(extra="example extra")
+    assert log_entry.payload == dict(
+        message="GCE Error", extra="example extra", computer_name="my-instance"
+    )
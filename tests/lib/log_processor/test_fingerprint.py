@@ -0,0 +1,47 @@
+from dataclasses import replace
+
+import pytest
+
+from lib.log_processor import ProcessedLogEntry, fingerprint
+
+
+@pytest.fixture()
+def processed_log_entry() -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message="Failed to fetch case 1234 for questionnaire 8c9a0f0e-8b0a-4f9e-9c43-4b0d5e1f2a3b",
+        severity="WARNING",
+        platform="cloud_run_revision",
+        application="bts-create-totalmobile-jobs-processor",
+    )
+
+
+def test_it_ignores_ids_and_numbers(processed_log_entry):
+    other = replace(
+        processed_log_entry,
+        message="Failed to fetch case 98 for questionnaire 11111111-2222-3333-4444-555555555555",
+    )
+
+    assert fingerprint(processed_log_entry) == fingerprint(other)
+
+
+def test_it_only_uses_the_first_line_of_the_message(processed_log_entry):
+    other = replace(
+        processed_log_entry, message=f"{processed_log_entry.message}\nstack trace"
+    )
+
+    assert fingerprint(processed_log_entry) == fingerprint(other)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        dict(message="Another error"),
+        dict(severity="ERROR"),
+        dict(platform="gae_app"),
+        dict(application="another-app"),
+    ],
+)
+def test_it_differs_for_different_problems(processed_log_entry, changes):
+    assert fingerprint(processed_log_entry) != fingerprint(
+        replace(processed_log_entry, **changes)
+    )
@@ -0,0 +1,116 @@
+from typing import FrozenSet
+
+import pytest
+
+from lib.log_processor import ProcessedLogEntry, processed_log_entry
+from lib.log_processor.message_patterns import (
+    LONG_MESSAGE_CHARS,
+    MESSAGE_PATTERNS,
+    _compile,
+    _literal_prefix,
+    matched_message_patterns,
+)
+
+EXAMPLES = {
+    "generic_not_found": 'generic::not_found: Failed to fetch "6568e9ec-3d4a-4778-a1d3-af58553134d3"',
+    "bootstrapper": "Failed to schedule job MTLS_MDS_Credential_Boostrapper with error: x",
+    "get_role": "You don't have permission to get the role at projects/x",
+    "invalid_login_attempt": 'Required "container.clusters.list" permission(s) for x',
+    "ip_space_exhausted": "Error: IP_SPACE_EXHAUSTED in region",
+    "no_available_instance": "The request was aborted because there was no available instance.",
+    "unexpected_end_of_json": "unexpected end of JSON input",
+    "osconfig_agent_error": "OSConfigAgent Error main.go:1",
+    "paramiko_sftp_file": 'File "/usr/lib/site-packages/paramiko/sftp_file.py", line 1',
+    "io_on_closed_file": "ValueError: I/O operation on closed file.",
+    "permission_denied_by_iam": "[AuditLog] permission denied by IAM",
+    "requested_entity_was_not_found": "generic::not_found: Requested entity was not found.",
+    "rproxy_lookup_effective_guest_policies": 'Error running LookupEffectiveGuestPolicies: error calling LookupEffectiveGuestPolicies: code: "NotFound", message: "Requested entity was not found.", details: []',
+    "socket_connection_reset": "Socket exception: Connection reset by peer (104)",
+    "watching_metadata_invalid_character": "Error watching metadata: invalid character '<' looking for beginning of value",
+}
+
+
+def test_every_rule_has_an_example():
+    assert set(EXAMPLES) == set(MESSAGE_PATTERNS)
+
+
+@pytest.mark.parametrize("rule_id", sorted(EXAMPLES))
+def test_it_matches_only_the_rule_of_each_example(rule_id: str):
+    assert matched_message_patterns(f"prefix {EXAMPLES[rule_id]} suffix") == {rule_id}
+
+
+@pytest.mark.parametrize("rule_id", sorted(EXAMPLES))
+def test_it_matches_the_rule_of_each_example_in_a_long_message(rule_id: str):
+    padding = "x" * LONG_MESSAGE_CHARS
+
+    assert matched_message_patterns(f"{padding} {EXAMPLES[rule_id]}") == {rule_id}
+
+
+def test_it_matches_nothing_in_a_long_message_with_only_a_prefix():
+    message = "Failed to run job MTLS_MDS_Credential_Boostrapper with error:" * 50
+
+    assert len(message) > LONG_MESSAGE_CHARS
+    assert matched_message_patterns(message) == frozenset()
+
+
+@pytest.mark.parametrize(
+    "pattern,prefix",
+    [
+        (r"Failed to (?:execute|schedule) job", "Failed to "),
+        (r"Error: \[x\] done", "Error: [x] done"),
+        (r"versions? found", "version"),
+        (r"fetch \d+ rows", "fetch "),
+    ],
+)
+def test_literal_prefix(pattern: str, prefix: str):
+    assert _literal_prefix(pattern) == prefix
+
+
+def test_it_matches_several_rules_in_one_message():
+    message = (
+        'Traceback:\n  File "/app/site-packages/paramiko/sftp_file.py", line 66\n'
+        "ValueError: I/O operation on closed file."
+    )
+
+    assert matched_message_patterns(message) == {
+        "paramiko_sftp_file",
+        "io_on_closed_file",
+    }
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "",
+        'generic::not_found: Failed to fetch "6568e9ec"',
+        "ip_space_exhausted",
+        "Failed to run job MTLS_MDS_Credential_Boostrapper with error:",
+    ],
+)
+def test_it_matches_nothing_in_other_messages(message: str):
+    assert matched_message_patterns(message) == frozenset()
+
+
+def test_each_entry_is_matched_once(monkeypatch):
+    calls = []
+    match = processed_log_entry.matched_message_patterns
+
+    def counting_match(message: str) -> FrozenSet[str]:
+        calls.append(message)
+        return match(message)
+
+    monkeypatch.setattr(processed_log_entry, "matched_message_patterns", counting_match)
+    entry = ProcessedLogEntry(message="unexpected end of JSON input")
+
+    assert entry.matched_message_patterns == {"unexpected_end_of_json"}
+    assert entry.matched_message_patterns == {"unexpected_end_of_json"}
+    assert calls == ["unexpected end of JSON input"]
+
+
+def test_entries_without_a_message_match_nothing():
+    assert ProcessedLogEntry(message=None).matched_message_patterns == frozenset()
+
+
+def test_patterns_must_start_with_a_literal():
+    with pytest.raises(ValueError):
+        _compile({"wildcard": r".*error"})
@@ -0,0 +1,93 @@
+import logging
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from lib.profiling import InvocationProfiler
+
+
+def profiles(caplog: Any) -> List[Dict[str, Any]]:
+    return [
+        record.json_fields
+        for record in caplog.records
+        if record.getMessage() == "Invocation profile"
+    ]
+
+
+def busy_work(seconds: float) -> str:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+    return "done"
+
+
+def test_it_does_not_profile_between_samples(caplog: Any) -> None:
+    profiler = InvocationProfiler(every_n=3)
+
+    with caplog.at_level(logging.INFO):
+        results = [profiler.run(busy_work, 0) for _ in range(2)]
+
+    assert results == ["done", "done"]
+    assert profiles(caplog) == []
+
+
+def test_it_profiles_every_nth_invocation_with_cprofile(caplog: Any) -> None:
+    profiler = InvocationProfiler(every_n=2, top_n=3)
+
+    with caplog.at_level(logging.INFO):
+        for _ in range(4):
+            assert profiler.run(busy_work, 0.01) == "done"
+
+    logged = profiles(caplog)
+    assert [profile["invocation"] for profile in logged] == [2, 4]
+    assert all(profile["mode"] == "cprofile" for profile in logged)
+    top = logged[0]["top"]
+    assert len(top) == 3
+    assert "busy_work" in top[0]["function"]
+    assert top[0]["calls"] == 1
+    assert top[0]["cumulative_seconds"] >= top[-1]["cumulative_seconds"]
+
+
+def test_it_logs_the_profile_when_the_invocation_fails(caplog: Any) -> None:
+    def fail() -> None:
+        raise RuntimeError("Boom")
+
+    profiler = InvocationProfiler(every_n=1)
+
+    with caplog.at_level(logging.INFO), pytest.raises(RuntimeError):
+        profiler.run(fail)
+
+    assert len(profiles(caplog)) == 1
+
+
+def test_it_samples_the_stack_of_slow_invocations(caplog: Any) -> None:
+    profiler = InvocationProfiler(
+        slow_seconds=0.02, top_n=50, sample_interval_seconds=0.001
+    )
+
+    with caplog.at_level(logging.INFO):
+        assert profiler.run(busy_work, 0.1) == "done"
+
+    [profile] = profiles(caplog)
+    assert profile["mode"] == "stack_sampler"
+    assert profile["duration_seconds"] >= 0.1
+    busy_work_rows = [row for row in profile["top"] if "busy_work" in row["function"]]
+    assert busy_work_rows[0]["share"] == 1.0
+    assert busy_work_rows[0]["function"].startswith(
+        "tests/lib/profiling/test_invocation_profiler.py:"
+    )
+
+
+def test_it_does_not_log_fast_invocations_when_sampling(caplog: Any) -> None:
+    profiler = InvocationProfiler(slow_seconds=1)
+
+    with caplog.at_level(logging.INFO):
+        assert profiler.run(busy_work, 0) == "done"
+
+    assert profiles(caplog) == []
+
+
+def test_it_rejects_an_invalid_interval() -> None:
+    with pytest.raises(ValueError):
+        InvocationProfiler(every_n=0)
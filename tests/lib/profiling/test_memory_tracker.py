@@ -0,0 +1,108 @@
+import base64
+import json
+import logging
+import tracemalloc
+from typing import Any, Dict, List
+
+import requests_mock
+
+from lib import send_alerts
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
+from lib.profiling import MemoryTracker, memory_stage, track_memory
+from lib.slack import SlackAlerter
+
+ONE_MB = 1024 * 1024
+# Cloud Functions instances have 256 MB by default; one alert should use a
+# small part of it, however large its log entry.
+PEAK_BUDGET_BYTES = 48 * ONE_MB
+FORMAT_BUDGET_BYTES = 16 * ONE_MB
+
+
+def memory_logs(caplog: Any) -> List[Dict[str, Any]]:
+    return [
+        record.json_fields
+        for record in caplog.records
+        if record.getMessage() == "Invocation memory"
+    ]
+
+
+def create_large_event(data_bytes: int) -> dict:
+    items: List[dict] = []
+    log_entry = {
+        "jsonPayload": {"message": "Export failed", "items": items},
+        "logName": "projects/ons-blaise-v2-prod/logs/export",
+        "resource": {"type": "cloud_function", "labels": {"function_name": "export"}},
+        "severity": "ERROR",
+        "receiveTimestamp": "2022-09-06T21:32:11.332410850Z",
+    }
+    while len(json.dumps(log_entry)) < data_bytes:
+        items.extend(
+            {"name": f"item-{number}", "labels": {"index": str(number)}}
+            for number in range(len(items), len(items) + 1000)
+        )
+    data = json.dumps(log_entry).encode("utf-8")
+    return {"data": base64.b64encode(data).decode("ascii"), "messageId": "1"}
+
+
+def test_it_records_the_peak_of_each_stage(caplog: Any) -> None:
+    with caplog.at_level(logging.INFO), track_memory() as tracker:
+        with memory_stage("decode"):
+            buffer = bytearray(ONE_MB)
+            del buffer
+        with memory_stage("format"):
+            kept = bytearray(ONE_MB // 4)
+
+    assert tracker is not None
+    assert tracker.stages["decode"] >= ONE_MB
+    assert ONE_MB // 4 <= tracker.stages["format"] < ONE_MB
+    assert tracker.peak_bytes >= ONE_MB
+    assert memory_logs(caplog) == [
+        dict(peak_bytes=tracker.peak_bytes, stages=tracker.stages)
+    ]
+    assert not tracemalloc.is_tracing()
+    del kept
+
+
+def test_it_keeps_the_largest_peak_of_a_repeated_stage() -> None:
+    with track_memory() as tracker:
+        with memory_stage("encode"):
+            bytearray(ONE_MB)
+        with memory_stage("encode"):
+            bytearray(1024)
+
+    assert tracker is not None
+    assert tracker.stages["encode"] >= ONE_MB
+
+
+def test_it_only_tracks_one_context_at_a_time(caplog: Any) -> None:
+    with caplog.at_level(logging.INFO), track_memory() as outer:
+        with track_memory() as inner:
+            with memory_stage("parse"):
+                bytearray(1024)
+
+    assert isinstance(outer, MemoryTracker)
+    assert inner is None
+    assert len(memory_logs(caplog)) == 1
+
+
+def test_stages_do_nothing_when_memory_is_not_tracked() -> None:
+    with memory_stage("decode"):
+        pass
+
+    assert not tracemalloc.is_tracing()
+
+
+def test_a_1mb_log_entry_is_alerted_within_the_memory_budget() -> None:
+    event = create_large_event(ONE_MB)
+
+    with requests_mock.Mocker() as http_mock:
+        http_mock.post("https://slack.co/webhook/1234")
+        alerter = SlackAlerter("https://slack.co/webhook/1234", "project-dev")
+        with track_memory() as tracker:
+            result = send_alerts.send_alerts(event, alerter, APP_LOG_PAYLOAD_FACTORIES)
+
+    assert result == "Alert sent"
+    assert tracker is not None
+    assert set(tracker.stages) == {"decode", "parse", "process", "format", "encode"}
+    assert tracker.stages["format"] < FORMAT_BUDGET_BYTES
+    assert tracker.peak_bytes < PEAK_BUDGET_BYTES
@@ -0,0 +1,220 @@
+import pytest
+
+from lib.log_processor import ProcessedLogEntry
+from lib.sampling import (
+    AlertSampler,
+    InvalidSamplingConfig,
+    SamplingRule,
+    parse_sampling_config,
+)
+
+NO_INSTANCE_MESSAGE = "The request was aborted because there was no available instance."
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 7200.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def create_entry(
+    application="nifi-notify", message=NO_INSTANCE_MESSAGE
+) -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message=message,
+        severity="ERROR",
+        platform="cloud_run_revision",
+        application=application,
+        log_name="projects/ons-blaise-v2-prod/logs/cloudfunctions.googleapis.com%2Fcloud-functions",
+    )
+
+
+def no_instance_rule(**options) -> SamplingRule:
+    return SamplingRule(
+        name="no-instance-aborts",
+        platform="cloud_run_revision",
+        message_contains="no available instance",
+        **options,
+    )
+
+
+def sample_many(sampler, count, prefix="message"):
+    return [
+        sampler.sample(create_entry(), f"{prefix}-{index}") for index in range(count)
+    ]
+
+
+def test_it_passes_alerts_which_match_no_rule(clock):
+    sampler = AlertSampler([no_instance_rule(one_in=1000)], clock=clock)
+    entry = create_entry(message="Something else went wrong")
+
+    assert sampler.sample(entry, "message-1") is entry
+
+
+def test_it_sends_about_one_in_n(clock):
+    sampler = AlertSampler([no_instance_rule(one_in=10)], clock=clock)
+
+    sent = [entry for entry in sample_many(sampler, 10000) if entry is not None]
+
+    assert 850 <= len(sent) <= 1150
+
+
+def test_the_decision_is_the_same_for_a_redelivered_message(clock):
+    first = AlertSampler([no_instance_rule(one_in=10)], clock=clock)
+    second = AlertSampler([no_instance_rule(one_in=10)], clock=clock)
+
+    first_decisions = [entry is None for entry in sample_many(first, 200)]
+    second_decisions = [entry is None for entry in sample_many(second, 200)]
+
+    assert first_decisions == second_decisions
+
+
+def test_it_samples_alerts_without_a_message_id(clock):
+    sampler = AlertSampler([no_instance_rule(one_in=10)], clock=clock)
+
+    sent = [sampler.sample(create_entry()) for _ in range(10000)]
+
+    assert 850 <= len([entry for entry in sent if entry is not None]) <= 1150
+
+
+def test_it_sends_at_most_k_per_window(clock):
+    sampler = AlertSampler(
+        [no_instance_rule(max_per_window=3, window_seconds=60)], clock=clock
+    )
+
+    first_window = sample_many(sampler, 10, "first")
+    clock.now += 60
+    second_window = sample_many(sampler, 10, "second")
+
+    assert [entry is not None for entry in first_window] == [True] * 3 + [False] * 7
+    assert [entry is not None for entry in second_window] == [True] * 3 + [False] * 7
+
+
+def test_it_adds_the_suppressed_count_to_the_next_alert_sent(clock):
+    sampler = AlertSampler(
+        [no_instance_rule(max_per_window=1, window_seconds=60)], clock=clock
+    )
+
+    first = sampler.sample(create_entry(), "first")
+    sample_many(sampler, 1234)
+    clock.now += 60
+    next_sent = sampler.sample(create_entry(), "next")
+    after_that = sampler.sample(create_entry(), "after")
+
+    assert first is not None and first.suppressed_count == 0
+    assert next_sent is not None and next_sent.suppressed_count == 1234
+    assert after_that is None
+
+
+def test_the_suppressed_count_is_reset_once_its_alert_is_sent(clock):
+    sampler = AlertSampler(
+        [no_instance_rule(max_per_window=1, window_seconds=60)], clock=clock
+    )
+    sampler.sample(create_entry(), "first")
+    sample_many(sampler, 5)
+    clock.now += 60
+
+    next_sent = sampler.sample(create_entry(), "next")
+    assert next_sent is not None
+    sampler.sent(next_sent)
+    clock.now += 60
+    after_that = sampler.sample(create_entry(), "after")
+
+    assert next_sent.suppressed_count == 5
+    assert after_that is not None and after_that.suppressed_count == 0
+
+
+def test_the_suppressed_count_of_a_failed_alert_is_carried_by_the_next(clock):
+    sampler = AlertSampler(
+        [no_instance_rule(max_per_window=1, window_seconds=60)], clock=clock
+    )
+    sampler.sample(create_entry(), "first")
+    sample_many(sampler, 5)
+    clock.now += 60
+
+    failed = sampler.sample(create_entry(), "failed")
+    assert failed is not None
+    sampler.failed(failed)
+    sample_many(sampler, 2, "more")
+    clock.now += 60
+    next_sent = sampler.sample(create_entry(), "next")
+
+    assert failed.suppressed_count == 5
+    assert next_sent is not None and next_sent.suppressed_count == 7
+
+
+def test_a_count_being_sent_is_not_carried_by_another_alert(clock):
+    sampler = AlertSampler(
+        [no_instance_rule(max_per_window=1, window_seconds=60)], clock=clock
+    )
+    sampler.sample(create_entry(), "first")
+    sample_many(sampler, 5)
+    clock.now += 60
+
+    sending = sampler.sample(create_entry(), "sending")
+    clock.now += 60
+    alongside = sampler.sample(create_entry(), "alongside")
+
+    assert sending is not None and sending.suppressed_count == 5
+    assert alongside is not None and alongside.suppressed_count == 0
+
+
+def test_the_first_matching_rule_decides(clock):
+    sampler = AlertSampler(
+        [
+            no_instance_rule(one_in=1),
+            SamplingRule(
+                name="everything-on-cloud-run",
+                platform="cloud_run_revision",
+                max_per_window=0,
+            ),
+        ],
+        clock=clock,
+    )
+
+    assert sampler.sample(create_entry(), "message-1") is not None
+    assert sampler.sample(create_entry(message="Other error"), "message-2") is None
+
+
+def test_parse_sampling_config():
+    sampler = parse_sampling_config(
+        {
+            "rules": [
+                {
+                    "name": "no-instance-aborts",
+                    "platform": "cloud_run_revision",
+                    "message_contains": "no available instance",
+                    "one_in": 100,
+                    "max_per_window": 5,
+                    "window_seconds": 600,
+                }
+            ]
+        }
+    )
+
+    assert sampler.rules == [
+        no_instance_rule(one_in=100, max_per_window=5, window_seconds=600)
+    ]
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {},
+        {"rules": []},
+        {"rules": [{"platform": "gce_instance"}]},
+        {"rules": [{"name": "everything", "one_in": 10}]},
+        {"rules": [{"name": "noisy", "platform": "gce_instance", "one_in": 0}]},
+        {"rules": [{"name": "noisy", "platform": "gce_instance", "color": "red"}]},
+    ],
+)
+def test_parse_sampling_config_rejects_invalid_config(config):
+    with pytest.raises(InvalidSamplingConfig):
+        parse_sampling_config(config)
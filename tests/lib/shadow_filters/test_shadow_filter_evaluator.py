@@ -0,0 +1,206 @@
+import logging
+from typing import Any, List
+
+import pytest
+
+from lib.log_processor import ProcessedLogEntry
+from lib.shadow_filters import (
+    InvalidShadowFilterConfig,
+    ShadowFilterEvaluator,
+    parse_shadow_filters,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingFilter:
+    def __init__(self, name: str, matches: str, calls: List[str]) -> None:
+        self.__name__ = name
+        self._matches = matches
+        self._calls = calls
+
+    def __call__(self, log_entry: ProcessedLogEntry) -> bool:
+        self._calls.append(self.__name__)
+        logging.info(f"Skipping {self.__name__} alert")
+        return self._matches in (log_entry.message or "")
+
+
+@pytest.fixture
+def calls() -> List[str]:
+    return []
+
+
+@pytest.fixture
+def sandbox(calls):
+    return RecordingFilter("sandbox_filter", "sandbox", calls)
+
+
+@pytest.fixture
+def maintenance(calls):
+    return RecordingFilter("maintenance_filter", "maintenance", calls)
+
+
+@pytest.fixture
+def candidate(calls):
+    return RecordingFilter("candidate_filter", "noisy", calls)
+
+
+def disagreements(caplog: Any) -> List[dict]:
+    return [
+        record.json_fields
+        for record in caplog.records
+        if record.getMessage() == "Shadow filter disagreement"
+    ]
+
+
+def test_it_logs_entries_a_new_filter_would_skip(
+    caplog, calls, sandbox, maintenance, candidate
+):
+    evaluator = ShadowFilterEvaluator(
+        [sandbox, maintenance], [sandbox, maintenance, candidate]
+    )
+    log_entry = ProcessedLogEntry(message="A noisy error", severity="ERROR")
+
+    with caplog.at_level(logging.INFO):
+        evaluator.evaluate(log_entry, None)
+
+    # The live filters are known not to match, so only the new one runs.
+    assert calls == ["candidate_filter"]
+    [disagreement] = disagreements(caplog)
+    assert disagreement["decision"] == "candidate_skips"
+    assert disagreement["filter"] == "candidate_filter"
+    assert len(disagreement["fingerprint"]) == 16
+    assert disagreement["count"] == 1
+
+
+def test_it_does_not_run_filters_when_the_live_decision_is_shared(
+    caplog, calls, sandbox, maintenance, candidate
+):
+    evaluator = ShadowFilterEvaluator(
+        [sandbox, maintenance], [sandbox, maintenance, candidate]
+    )
+
+    with caplog.at_level(logging.INFO):
+        evaluator.evaluate(ProcessedLogEntry(message="sandbox"), sandbox)
+
+    assert calls == []
+    assert disagreements(caplog) == []
+
+
+def test_it_logs_entries_which_would_alert_without_a_removed_filter(
+    caplog, calls, sandbox, maintenance
+):
+    evaluator = ShadowFilterEvaluator([sandbox, maintenance], [sandbox])
+
+    with caplog.at_level(logging.INFO):
+        evaluator.evaluate(ProcessedLogEntry(message="maintenance"), maintenance)
+
+    # sandbox_filter ran before maintenance_filter in the live set and did not
+    # match, so nothing needs to run.
+    assert calls == []
+    [disagreement] = disagreements(caplog)
+    assert disagreement["decision"] == "candidate_alerts"
+    assert disagreement["filter"] == "maintenance_filter"
+
+
+def test_it_drops_the_log_messages_of_filters_run_in_shadow(caplog, sandbox, candidate):
+    evaluator = ShadowFilterEvaluator([sandbox], [sandbox, candidate])
+
+    with caplog.at_level(logging.INFO):
+        evaluator.evaluate(ProcessedLogEntry(message="A noisy error"), None)
+        logging.info("Skipping example alert")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Skipping candidate_filter alert" not in messages
+    assert "Skipping example alert" in messages
+
+
+def test_it_logs_repeated_disagreements_at_powers_of_ten(caplog, sandbox, candidate):
+    evaluator = ShadowFilterEvaluator([sandbox], [sandbox, candidate])
+
+    with caplog.at_level(logging.INFO):
+        for _ in range(100):
+            evaluator.evaluate(ProcessedLogEntry(message="A noisy error"), None)
+
+    assert [d["count"] for d in disagreements(caplog)] == [1, 10, 100]
+
+
+def test_it_stops_evaluating_once_over_budget(caplog, calls, sandbox):
+    clock = Clock()
+
+    def slow_filter(log_entry: ProcessedLogEntry) -> bool:
+        calls.append("slow_filter")
+        clock.now += 0.005
+        return False
+
+    evaluator = ShadowFilterEvaluator(
+        [sandbox],
+        [sandbox, slow_filter, _always_skip(calls)],
+        budget_seconds=0.002,
+        clock=clock,
+    )
+
+    with caplog.at_level(logging.INFO):
+        evaluator.evaluate(ProcessedLogEntry(message="An error"), None)
+
+    assert calls == ["slow_filter"]
+    assert evaluator.over_budget_count == 1
+    assert disagreements(caplog) == []
+    assert (
+        "root",
+        logging.WARNING,
+        "Shadow filter evaluation over budget",
+    ) in caplog.record_tuples
+
+
+def test_it_logs_and_ignores_failing_candidate_filters(caplog, sandbox):
+    def failing_filter(log_entry: ProcessedLogEntry) -> bool:
+        raise KeyError("platform")
+
+    evaluator = ShadowFilterEvaluator([sandbox], [sandbox, failing_filter])
+
+    evaluator.evaluate(ProcessedLogEntry(message="An error"), None)
+
+    assert ("root", logging.WARNING, "Shadow filter failed") in caplog.record_tuples
+
+
+def _always_skip(calls: List[str]):
+    def always_skip_filter(log_entry: ProcessedLogEntry) -> bool:
+        calls.append("always_skip_filter")
+        return True
+
+    return always_skip_filter
+
+
+class TestParseShadowFilters:
+    def test_it_adds_and_removes_filters(self, sandbox, maintenance):
+        from lib.filters.gcp_constraint_not_found_filter import (
+            physical_zone_separation_constraint_filter,
+        )
+        from lib.filters.paramiko_filter import paramiko_filter
+
+        candidate_filters = parse_shadow_filters(
+            "paramiko_filter, -sandbox_filter,"
+            "+gcp_constraint_not_found_filter.physical_zone_separation_constraint_filter",
+            [sandbox, maintenance],
+        )
+
+        assert candidate_filters == [
+            maintenance,
+            paramiko_filter,
+            physical_zone_separation_constraint_filter,
+        ]
+
+    @pytest.mark.parametrize(
+        "config",
+        ["-unknown_filter", "unknown_filter", "paramiko_filter.missing", "../os"],
+    )
+    def test_it_rejects_unknown_filters(self, sandbox, config):
+        with pytest.raises(InvalidShadowFilterConfig):
+            parse_shadow_filters(config, [sandbox])
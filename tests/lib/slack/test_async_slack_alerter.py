@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+from unittest.mock import Mock
+
+import pytest
+
+from lib.deadline import Deadline
+from lib.slack import AsyncSlackAlerter, SlackAlerter, SlackMessage
+
+
+class SlowSlackAlerter:
+    def __init__(self):
+        self.send_alert = Mock(side_effect=self._send)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _send(
+        self, _message: SlackMessage, _deadline: Optional[Deadline] = None
+    ) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+
+
+@pytest.fixture()
+def message() -> SlackMessage:
+    return SlackMessage(title="hello world", fields={}, content="", footnote="")
+
+
+async def send_many(alerter: AsyncSlackAlerter, message: SlackMessage, count: int):
+    await asyncio.gather(*(alerter.send_alert(message) for _ in range(count)))
+
+
+def test_it_sends_concurrently_up_to_the_limit(message):
+    slow_alerter = SlowSlackAlerter()
+    alerter = AsyncSlackAlerter(slow_alerter, max_concurrent_sends=3)
+
+    asyncio.run(send_many(alerter, message, 9))
+
+    assert slow_alerter.send_alert.call_count == 9
+    assert slow_alerter.max_in_flight == 3
+
+
+def test_it_can_be_used_from_several_event_loops(message):
+    slow_alerter = SlowSlackAlerter()
+    alerter = AsyncSlackAlerter(slow_alerter, max_concurrent_sends=2)
+
+    asyncio.run(send_many(alerter, message, 2))
+    asyncio.run(send_many(alerter, message, 2))
+
+    assert slow_alerter.send_alert.call_count == 4
+
+
+def test_it_creates_alerts_with_the_wrapped_alerter(message):
+    wrapped = Mock(spec=SlackAlerter)
+    wrapped.create_raw_alert.return_value = message
+
+    alerter = AsyncSlackAlerter(wrapped)
+
+    assert alerter.create_raw_alert({"raw": "event"}) == message
+    wrapped.create_raw_alert.assert_called_once_with({"raw": "event"})
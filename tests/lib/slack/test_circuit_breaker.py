@@ -0,0 +1,109 @@
+import logging
+
+import pytest
+
+from lib.slack.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture()
+def breaker(clock) -> CircuitBreaker:
+    return CircuitBreaker(
+        "slack-webhook", failure_threshold=2, reset_timeout_seconds=30, clock=clock
+    )
+
+
+def test_it_allows_requests_while_closed(breaker):
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_it_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.allow_request() is False
+
+
+def test_a_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_it_allows_a_single_probe_once_the_reset_timeout_passes(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.allow_request() is True
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow_request() is False
+
+
+def test_a_successful_probe_closes_the_circuit(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    breaker.record_success()
+
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow_request() is True
+
+
+def test_a_failed_probe_opens_the_circuit_again(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.OPEN
+    clock.now += 29
+    assert breaker.allow_request() is False
+
+
+def test_a_released_probe_lets_the_next_request_probe(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow_request()
+
+    breaker.release_probe()
+
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow_request() is True
+
+
+def test_it_logs_state_transitions(breaker, caplog, log_matching):
+    with caplog.at_level(logging.INFO):
+        breaker.record_failure()
+        breaker.record_failure()
+
+    record = log_matching(logging.WARNING, "Circuit breaker 'slack-webhook' is open")
+    assert record.json_fields == dict(
+        circuit="slack-webhook",
+        previous_state="closed",
+        state="open",
+        consecutive_failures=2,
+    )
@@ -0,0 +1,162 @@
+import logging
+
+import pytest
+
+from lib.deadline import Deadline
+from lib.slack.dead_letter_spool import DeadLetterSpool
+from lib.slack.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture()
+def spool_path(tmp_path) -> str:
+    return str(tmp_path / "spool" / "slack.jsonl")
+
+
+def drain_all(spool: DeadLetterSpool) -> list:
+    sent: list = []
+    spool.drain(sent.append)
+    return sent
+
+
+def test_it_replays_payloads_in_order(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    spool.append({"blocks": [1]})
+    spool.append({"blocks": [2]})
+    spool.append({"blocks": [3]})
+
+    assert drain_all(spool) == [{"blocks": [1]}, {"blocks": [2]}, {"blocks": [3]}]
+    assert spool.pending() == 0
+
+
+def test_it_replays_payloads_across_segments_in_order(spool_path):
+    spool = DeadLetterSpool(spool_path, max_segment_bytes=1)
+    for number in range(4):
+        spool.append({"blocks": [number]})
+
+    assert drain_all(spool) == [{"blocks": [number]} for number in range(4)]
+
+
+def test_it_keeps_unsent_payloads_when_sending_fails(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    for number in range(3):
+        spool.append({"blocks": [number]})
+
+    sent = []
+
+    def send(payload: dict) -> None:
+        if payload == {"blocks": [1]}:
+            raise RuntimeError("Slack is down")
+        sent.append(payload)
+
+    with pytest.raises(RuntimeError):
+        spool.drain(send)
+
+    assert sent == [{"blocks": [0]}]
+    assert drain_all(spool) == [{"blocks": [1]}, {"blocks": [2]}]
+
+
+def test_it_drops_rejected_payloads_and_carries_on(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    for number in range(3):
+        spool.append({"blocks": [number]})
+
+    sent = []
+
+    def send(payload: dict) -> None:
+        if payload == {"blocks": [1]}:
+            raise ValueError("invalid_blocks")
+        sent.append(payload)
+
+    replayed = spool.drain(send, is_rejection=lambda err: isinstance(err, ValueError))
+
+    assert replayed == 2
+    assert sent == [{"blocks": [0]}, {"blocks": [2]}]
+    assert spool.pending() == 0
+
+
+def test_it_stops_after_max_items(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    for number in range(3):
+        spool.append({"blocks": [number]})
+
+    sent = []
+    replayed = spool.drain(sent.append, max_items=2)
+
+    assert replayed == 2
+    assert sent == [{"blocks": [0]}, {"blocks": [1]}]
+    assert spool.pending() == 1
+
+
+def test_it_stops_when_the_deadline_passes_before_the_next_token(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    for number in range(3):
+        spool.append({"blocks": [number]})
+    clock = FakeClock()
+    rate_limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+    deadline = Deadline(0.5, clock=clock)
+
+    sent: list = []
+    replayed = spool.drain(sent.append, rate_limiter=rate_limiter, deadline=deadline)
+
+    assert replayed == 1
+    assert sent == [{"blocks": [0]}]
+    assert spool.pending() == 2
+
+
+def test_it_stops_once_the_deadline_has_passed(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    spool.append({"blocks": [1]})
+
+    assert spool.drain(lambda _: None, deadline=Deadline(0)) == 0
+    assert spool.pending() == 1
+
+
+def test_each_append_is_written_before_it_returns(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    spool.append({"blocks": [1]})
+
+    with open(spool_path, "rb") as file:
+        assert file.read() == b'{"blocks": [1]}\n'
+
+
+def test_it_drops_the_oldest_segments_when_full(spool_path, caplog):
+    spool = DeadLetterSpool(spool_path, max_segment_bytes=1, max_segments=2)
+
+    with caplog.at_level(logging.WARNING):
+        for number in range(4):
+            spool.append({"blocks": [number]})
+
+    assert drain_all(spool) == [{"blocks": [2]}, {"blocks": [3]}]
+    assert "Spool is full, dropping oldest spooled Slack payloads" in caplog.messages
+
+
+def test_spooled_payloads_survive_reopening(spool_path):
+    spool = DeadLetterSpool(spool_path, fsync_every=100)
+    spool.append({"blocks": [1]})
+    spool.close()
+
+    reopened = DeadLetterSpool(spool_path)
+    reopened.append({"blocks": [2]})
+
+    assert drain_all(reopened) == [{"blocks": [1]}, {"blocks": [2]}]
+
+
+def test_it_skips_corrupt_lines(spool_path):
+    spool = DeadLetterSpool(spool_path)
+    spool.append({"blocks": [1]})
+    spool.close()
+    with open(spool_path, "ab") as file:
+        file.write(b'{"blocks": [\n')
+
+    assert drain_all(DeadLetterSpool(spool_path)) == [{"blocks": [1]}]
@@ -0,0 +1,64 @@
+import pytest
+
+from lib.slack.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def test_it_allows_a_burst(clock):
+    limiter = RateLimiter(1, burst=2, clock=clock, sleep=clock.sleep)
+
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is False
+
+
+def test_it_refills_over_time(clock):
+    limiter = RateLimiter(2, clock=clock, sleep=clock.sleep)
+
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is False
+
+    clock.now += 0.5
+
+    assert limiter.try_acquire() is True
+
+
+def test_acquire_waits_for_a_token(clock):
+    limiter = RateLimiter(4, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert clock.sleeps == [0.25]
+
+
+def test_it_rejects_an_invalid_rate(clock):
+    with pytest.raises(ValueError):
+        RateLimiter(0, clock=clock, sleep=clock.sleep)
+
+
+def test_acquire_gives_up_when_no_token_is_available_within_the_timeout(clock):
+    limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+
+    assert limiter.acquire(timeout=0.5) is False
+    assert clock.sleeps == []
+    assert limiter.acquire(timeout=2) is True
+    assert clock.sleeps == [1.0]
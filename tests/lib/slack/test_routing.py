@@ -0,0 +1,135 @@
+import pytest
+
+from lib.slack.routing import (
+    InvalidRoutingConfig,
+    RoutingRule,
+    RoutingTable,
+    SlackDestination,
+    parse_routing_config,
+)
+
+
+@pytest.fixture()
+def table() -> RoutingTable:
+    return RoutingTable(
+        rules=[
+            RoutingRule(
+                destinations=("data-delivery",), classification="data-delivery"
+            ),
+            RoutingRule(
+                destinations=("prod-incidents", "on-call"),
+                project="ons-blaise-v2-prod",
+                severity="CRITICAL",
+            ),
+            RoutingRule(destinations=("on-call",), application="bert-call-history"),
+        ],
+        default_destinations=("prod-incidents",),
+    )
+
+
+def test_it_routes_unmatched_alerts_to_the_default_destinations(table):
+    key = ("ons-blaise-v2-prod", "my-app", "gce_instance", "ERROR", None)
+
+    assert table.destinations_for(key) == ("prod-incidents",)
+
+
+def test_it_routes_on_a_single_field(table):
+    key = (
+        "ons-blaise-v2-prod",
+        "data-delivery",
+        "cloud_function",
+        "ERROR",
+        "data-delivery",
+    )
+
+    assert table.destinations_for(key) == ("data-delivery",)
+
+
+def test_it_routes_on_several_fields(table):
+    key = ("ons-blaise-v2-prod", "my-app", "gce_instance", "CRITICAL", None)
+
+    assert table.destinations_for(key) == ("prod-incidents", "on-call")
+
+
+def test_it_fans_out_to_every_matching_rule_once(table):
+    key = ("ons-blaise-v2-prod", "bert-call-history", "cloud_run", "CRITICAL", None)
+
+    assert table.destinations_for(key) == ("prod-incidents", "on-call")
+
+
+def test_it_returns_the_same_result_for_a_cached_key(table):
+    key = ("ons-blaise-v2-prod", "my-app", "gce_instance", "CRITICAL", None)
+
+    assert table.destinations_for(key) == table.destinations_for(key)
+
+
+def test_parse_routing_config():
+    config = parse_routing_config(
+        {
+            "destinations": {
+                "prod-incidents": {"url_env": "SLACK_URL"},
+                "data-delivery": {
+                    "url": "https://hooks.slack.com/data-delivery",
+                    "rate_per_second": 0.5,
+                    "pool_size": 2,
+                },
+            },
+            "routes": [
+                {"classification": "data-delivery", "destinations": ["data-delivery"]}
+            ],
+            "default_destinations": ["prod-incidents"],
+        },
+        {"SLACK_URL": "https://hooks.slack.com/prod-incidents"},
+    )
+
+    assert config.destinations == {
+        "prod-incidents": SlackDestination(
+            name="prod-incidents", url="https://hooks.slack.com/prod-incidents"
+        ),
+        "data-delivery": SlackDestination(
+            name="data-delivery",
+            url="https://hooks.slack.com/data-delivery",
+            rate_per_second=0.5,
+            pool_size=2,
+        ),
+    }
+    assert config.table.destinations_for((None, None, None, None, "data-delivery")) == (
+        "data-delivery",
+    )
+    assert config.table.default_destinations == ("prod-incidents",)
+
+
+@pytest.mark.parametrize(
+    "config,error",
+    [
+        ({}, "Field 'destinations' must be a non-empty object."),
+        (
+            {"destinations": {"a": {}}, "default_destinations": ["a"]},
+            "Destination 'a' has no webhook URL.",
+        ),
+        (
+            {"destinations": {"a": {"url": "https://a"}}, "default_destinations": []},
+            "Field 'default_destinations' must be a non-empty list.",
+        ),
+        (
+            {
+                "destinations": {"a": {"url": "https://a"}},
+                "default_destinations": ["b"],
+            },
+            "Unknown destination 'b'.",
+        ),
+        (
+            {
+                "destinations": {"a": {"url": "https://a"}},
+                "routes": [{"team": "x", "destinations": ["a"]}],
+                "default_destinations": ["a"],
+            },
+            "Unknown route fields: team.",
+        ),
+    ],
+)
+def test_parse_routing_config_rejects_invalid_config(config, error):
+    with pytest.raises(InvalidRoutingConfig) as err:
+        parse_routing_config(config, {})
+
+    assert err.value.args[0] == error
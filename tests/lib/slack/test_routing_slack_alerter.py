@@ -0,0 +1,198 @@
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+
+import pytest
+import requests_mock
+
+from lib.correlation import Incident
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry
+from lib.slack import routing_slack_alerter, slack_message
+from lib.slack.routing import parse_routing_config
+from lib.slack.routing_slack_alerter import (
+    RoutedSlackMessage,
+    RoutingSlackAlerter,
+    create_routing_slack_alerter,
+)
+from lib.slack.send_slack_message import SlackAlertFailed
+
+PROD_URL = "https://hooks.slack.com/prod-incidents"
+DATA_DELIVERY_URL = "https://hooks.slack.com/data-delivery"
+
+
+@pytest.fixture()
+def alerter():
+    config = parse_routing_config(
+        {
+            "destinations": {
+                "prod-incidents": {"url": PROD_URL, "rate_per_second": 100},
+                "data-delivery": {"url": DATA_DELIVERY_URL, "rate_per_second": 100},
+            },
+            "routes": [
+                {"classification": "data-delivery", "destinations": ["data-delivery"]},
+                {
+                    "severity": "CRITICAL",
+                    "destinations": ["prod-incidents", "data-delivery"],
+                },
+            ],
+            "default_destinations": ["prod-incidents"],
+        },
+        {},
+    )
+    return create_routing_slack_alerter(config, "ons-blaise-v2-prod")
+
+
+def test_it_routes_by_classification(alerter):
+    alert = alerter.create_alert(
+        ProcessedLogEntry(message="Failed", application="nifi-notify", severity="ERROR")
+    )
+
+    assert alert.destinations == ("data-delivery",)
+
+
+def test_it_routes_digests_by_their_classification(alerter):
+    group = DigestGroup(
+        application="nifi-notify",
+        fingerprint="abc123",
+        window_start=datetime(2022, 8, 2, 19, 0, tzinfo=timezone.utc),
+        count=3,
+        first_seen=datetime(2022, 8, 2, 19, 1, tzinfo=timezone.utc),
+        last_seen=datetime(2022, 8, 2, 19, 5, tzinfo=timezone.utc),
+        severity="WARNING",
+        platform="cloud_run_revision",
+        message="Failed",
+        log_query={},
+        classification="data-delivery",
+    )
+
+    assert alerter.create_digest_alert(group).destinations == ("data-delivery",)
+
+
+def test_it_routes_incidents_by_their_classification(alerter):
+    incident = Incident(
+        resource_field="resource.labels.instance_id",
+        resource="vm-1",
+        count=2,
+        first_seen=datetime(2022, 8, 2, 19, 1, tzinfo=timezone.utc),
+        last_seen=datetime(2022, 8, 2, 19, 5, tzinfo=timezone.utc),
+        severity="ERROR",
+        platform="gce_instance",
+        applications=["nifi-notify", "OSConfigAgent"],
+        messages=["Failed"],
+        classification="data-delivery",
+    )
+
+    assert alerter.create_incident_alert(incident).destinations == ("data-delivery",)
+
+
+def test_it_classifies_each_alert_once(alerter, monkeypatch):
+    classified = []
+    original_classify_alert = slack_message.classify_alert
+
+    def classify_alert(entry):
+        classified.append(entry)
+        return original_classify_alert(entry)
+
+    monkeypatch.setattr(routing_slack_alerter, "classify_alert", classify_alert)
+    monkeypatch.setattr(slack_message, "classify_alert", classify_alert)
+
+    alert = alerter.create_alert(
+        ProcessedLogEntry(message="Failed", application="nifi-notify", severity="ERROR")
+    )
+
+    assert len(classified) == 1
+    assert "Data Delivery Troubleshooting Playbook" in alert.message.footnote
+
+
+def test_it_routes_raw_alerts_to_the_default_destinations(alerter):
+    alert = alerter.create_raw_alert({"bad": "envelope"})
+
+    assert alert.destinations == ("prod-incidents",)
+    assert alert.message.title == "Error with bad format received"
+
+
+def test_it_sends_to_every_destination(alerter):
+    alert = alerter.create_alert(
+        ProcessedLogEntry(message="Failed", application="my-app", severity="CRITICAL")
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(PROD_URL)
+        mock.post(DATA_DELIVERY_URL)
+        alerter.send_alert(alert)
+
+    # Destinations are sent to at the same time, so in no particular order.
+    assert sorted(request.url for request in mock.request_history) == [
+        DATA_DELIVERY_URL,
+        PROD_URL,
+    ]
+    assert json.loads(mock.request_history[0].text)["blocks"][0]["text"]["text"] == (
+        ":alert: CRITICAL: Failed"
+    )
+
+
+def test_a_waiting_destination_does_not_delay_the_others():
+    fast_sent = threading.Event()
+    waited = []
+
+    class SlowAlerter:
+        def send_alert(self, message, deadline=None):
+            # Stands in for a destination waiting on its rate limiter.
+            waited.append(fast_sent.wait(timeout=5))
+
+    class FastAlerter:
+        def send_alert(self, message, deadline=None):
+            fast_sent.set()
+
+    alerter = RoutingSlackAlerter(
+        {"slow": SlowAlerter(), "fast": FastAlerter()},
+        parse_routing_config(
+            {
+                "destinations": {
+                    "slow": {"url": PROD_URL},
+                    "fast": {"url": DATA_DELIVERY_URL},
+                },
+                "default_destinations": ["slow", "fast"],
+            },
+            {},
+        ).table,
+        "ons-blaise-v2-prod",
+    )
+
+    alerter.send_alert(alerter.create_raw_alert({}))
+
+    assert waited == [True]
+
+
+def test_a_failing_destination_does_not_stop_the_others(alerter, log_matching):
+    alert = RoutedSlackMessage(
+        message=alerter.create_raw_alert({}).message,
+        destinations=("prod-incidents", "data-delivery"),
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(PROD_URL, status_code=500)
+        mock.post(DATA_DELIVERY_URL)
+        alerter.send_alert(alert)
+
+    assert mock.call_count == 2
+    record = log_matching(
+        logging.ERROR, "Alert not delivered to every Slack destination"
+    )
+    assert record.json_fields["failed_destinations"] == ["prod-incidents"]
+    assert record.json_fields["delivered_destinations"] == ["data-delivery"]
+
+
+def test_it_fails_when_no_destination_received_the_alert(alerter):
+    alert = RoutedSlackMessage(
+        message=alerter.create_raw_alert({}).message,
+        destinations=("prod-incidents", "data-delivery"),
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(PROD_URL, status_code=500)
+        mock.post(DATA_DELIVERY_URL, status_code=500)
+        with pytest.raises(SlackAlertFailed):
+            alerter.send_alert(alert)
@@ -3,7 +3,11 @@ import json
 import pytest
 import requests_mock
 
-from lib.slack.send_slack_message import SlackAlertFailed, send_slack_message
+from lib.slack.send_slack_message import (
+    SlackAlertFailed,
+    post_slack_payload,
+    send_slack_message,
+)
 from lib.slack.slack_message import SlackMessage
 from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
 
@@ -64,3 +68,43 @@ def test_error_occurred_sending_message():
     assert err.value.args[0] == 500
     assert err.value.args[1] == "example response"
     assert err.value.args[2] == convert_slack_message_to_blocks(message)
+
+
+def test_posting_a_formatted_payload():
+    slack_data = {"blocks": [{"type": "divider"}]}
+
+    with requests_mock.Mocker() as mock:
+        mock.post("https://slack.com/example/web-hook")
+
+        post_slack_payload("https://slack.com/example/web-hook", slack_data)
+
+    assert json.loads(mock.request_history[0].text) == slack_data
+
+
+def test_the_content_length_is_the_byte_length_of_the_body():
+    slack_data = {"blocks": [{"type": "section", "text": {"text": "café ☕"}}]}
+
+    with requests_mock.Mocker() as mock:
+        mock.post("https://slack.com/example/web-hook")
+
+        post_slack_payload("https://slack.com/example/web-hook", slack_data)
+
+    request = mock.request_history[0]
+    assert request.headers["Content-Length"] == str(len(request.body))
+    assert json.loads(request.body) == slack_data
+
+
+def test_sending_an_oversized_message_as_several_messages():
+    message = SlackMessage(
+        title="hello world",
+        fields={},
+        content="\n".join("x" * 2999 for _ in range(60)),
+        footnote="",
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post("https://slack.com/example/web-hook")
+
+        send_slack_message("https://slack.com/example/web-hook", message)
+
+    assert mock.call_count == 2
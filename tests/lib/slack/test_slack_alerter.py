@@ -0,0 +1,274 @@
+import json
+import logging
+
+import pytest
+import requests
+import requests_mock
+
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.log_processor import ProcessedLogEntry
+from lib.slack import CircuitBreaker, DeadLetterSpool, SlackAlerter, SlackMessage
+from lib.slack.circuit_breaker import CircuitState
+from lib.slack.send_slack_message import SlackAlertFailed, SlackCircuitOpen
+from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
+
+SLACK_URL = "https://slack.com/example/web-hook"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def message() -> SlackMessage:
+    return SlackMessage(title="hello world", fields={}, content="", footnote="")
+
+
+@pytest.fixture()
+def spool(tmp_path) -> DeadLetterSpool:
+    return DeadLetterSpool(str(tmp_path / "slack.jsonl"))
+
+
+def test_it_raises_when_sending_fails_without_a_spool(message):
+    alerter = SlackAlerter(SLACK_URL, "example-project")
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=500)
+        with pytest.raises(SlackAlertFailed):
+            alerter.send_alert(message)
+
+
+def test_it_spools_the_payload_when_sending_fails(message, spool, caplog):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=500)
+        with caplog.at_level(logging.WARNING):
+            alerter.send_alert(message)
+
+    assert spool.pending() == 1
+    assert "Failed to send alert to Slack, spooled for replay" in caplog.messages
+
+
+def test_it_replays_spooled_payloads_after_a_successful_send(message, spool):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+    spooled_message = SlackMessage(title="spooled", fields={}, content="", footnote="")
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=500)
+        alerter.send_alert(spooled_message)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL)
+        alerter.send_alert(message)
+
+    assert [json.loads(request.text) for request in mock.request_history] == [
+        convert_slack_message_to_blocks(message),
+        convert_slack_message_to_blocks(spooled_message),
+    ]
+    assert spool.pending() == 0
+
+
+def test_it_raises_rejected_alerts_instead_of_spooling_them(message, spool):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=400, text="invalid_blocks")
+        with pytest.raises(SlackAlertFailed):
+            alerter.send_alert(message)
+
+    assert spool.pending() == 0
+
+
+def test_replay_drops_payloads_which_slack_rejects(message, spool, caplog):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+    spool.append({"text": "rejected"})
+    spool.append(convert_slack_message_to_blocks(message))
+
+    with requests_mock.Mocker() as mock:
+        mock.post(
+            SLACK_URL,
+            additional_matcher=lambda request: "rejected" in request.text,
+            status_code=400,
+            text="invalid_blocks",
+        )
+        mock.post(
+            SLACK_URL,
+            additional_matcher=lambda request: "rejected" not in request.text,
+        )
+        with caplog.at_level(logging.ERROR):
+            replayed = alerter.replay_spool()
+
+    assert replayed == 1
+    assert spool.pending() == 0
+    assert "Discarding spooled Slack payload which was rejected" in caplog.messages
+
+
+def test_replay_stops_when_slack_fails_again(message, spool):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+    spool.append(convert_slack_message_to_blocks(message))
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=500)
+        replayed = alerter.replay_spool()
+
+    assert replayed == 0
+    assert spool.pending() == 1
+
+
+@pytest.fixture()
+def circuit_breaker() -> CircuitBreaker:
+    return CircuitBreaker("slack-webhook", failure_threshold=1)
+
+
+def test_it_sends_with_the_configured_timeout(message):
+    alerter = SlackAlerter(SLACK_URL, "example-project", timeout=(1.0, 2.0))
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL)
+        alerter.send_alert(message)
+
+    assert mock.request_history[0].timeout == (1.0, 2.0)
+
+
+def test_it_limits_the_timeout_to_the_deadline(message):
+    alerter = SlackAlerter(SLACK_URL, "example-project", timeout=(3.05, 10.0))
+    deadline = Deadline(2, clock=lambda: 0.0)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL)
+        alerter.send_alert(message, deadline)
+
+    assert mock.request_history[0].timeout == (2.0, 2.0)
+
+
+def test_it_raises_after_the_deadline_without_a_spool(message):
+    alerter = SlackAlerter(SLACK_URL, "example-project")
+
+    with requests_mock.Mocker() as mock:
+        with pytest.raises(DeadlineExceeded):
+            alerter.send_alert(message, Deadline(0))
+
+    assert mock.request_history == []
+
+
+def test_it_spools_alerts_after_the_deadline(message, spool):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+
+    with requests_mock.Mocker() as mock:
+        alerter.send_alert(message, Deadline(0))
+
+    assert mock.request_history == []
+    assert spool.pending() == 1
+
+
+def test_it_fails_fast_while_the_circuit_is_open(message, circuit_breaker):
+    alerter = SlackAlerter(
+        SLACK_URL, "example-project", circuit_breaker=circuit_breaker
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, exc=requests.exceptions.ConnectTimeout)
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            alerter.send_alert(message)
+        with pytest.raises(SlackCircuitOpen):
+            alerter.send_alert(message)
+
+    assert mock.call_count == 1
+    assert circuit_breaker.state is CircuitState.OPEN
+
+
+def test_it_spools_while_the_circuit_is_open(message, circuit_breaker, spool):
+    alerter = SlackAlerter(
+        SLACK_URL, "example-project", spool=spool, circuit_breaker=circuit_breaker
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=503)
+        alerter.send_alert(message)
+        alerter.send_alert(message)
+
+    assert mock.call_count == 1
+    assert spool.pending() == 2
+
+
+def test_client_errors_do_not_open_the_circuit(message, circuit_breaker):
+    alerter = SlackAlerter(
+        SLACK_URL, "example-project", circuit_breaker=circuit_breaker
+    )
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, status_code=400, text="invalid_blocks")
+        with pytest.raises(SlackAlertFailed):
+            alerter.send_alert(message)
+
+    assert circuit_breaker.state is CircuitState.CLOSED
+
+
+def test_an_unexpected_error_releases_the_probe(message):
+    clock = FakeClock()
+    circuit_breaker = CircuitBreaker(
+        "slack-webhook", failure_threshold=1, reset_timeout_seconds=30, clock=clock
+    )
+    alerter = SlackAlerter(
+        SLACK_URL, "example-project", circuit_breaker=circuit_breaker
+    )
+    circuit_breaker.record_failure()
+    clock.now += 30
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, exc=ValueError("unexpected"))
+        with pytest.raises(ValueError):
+            alerter.send_alert(message)
+        mock.post(SLACK_URL)
+        alerter.send_alert(message)
+
+    assert mock.call_count == 2
+    assert circuit_breaker.state is CircuitState.CLOSED
+
+
+def create_oversized_message() -> SlackMessage:
+    # 60 sections of content, more than Slack allows in one message.
+    return SlackMessage(
+        title="large",
+        fields={},
+        content="\n".join("x" * 2999 for _ in range(60)),
+        footnote="",
+    )
+
+
+def test_it_sends_oversized_alerts_as_follow_up_messages():
+    alerter = SlackAlerter(SLACK_URL, "example-project")
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL)
+        alerter.send_alert(create_oversized_message())
+
+    payloads = [json.loads(request.text) for request in mock.request_history]
+    assert [len(payload["blocks"]) for payload in payloads] == [50, 16]
+    assert payloads[1]["blocks"][0]["type"] == "context"
+
+
+def test_it_spools_the_unsent_follow_up_messages(spool):
+    alerter = SlackAlerter(SLACK_URL, "example-project", spool=spool)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(SLACK_URL, [dict(status_code=200), dict(status_code=500)])
+        alerter.send_alert(create_oversized_message())
+
+    assert mock.call_count == 2
+    assert spool.pending() == 1
+
+
+def test_alerts_can_link_to_another_project():
+    alerter = SlackAlerter(SLACK_URL, "example-project")
+    entry = ProcessedLogEntry(message="An error", severity="ERROR")
+
+    message = alerter.create_alert(entry, "other-project")
+
+    assert message.fields["Project"] == "other-project"
+    assert "project=other-project" in message.footnote
@@ -6,11 +6,19 @@ import pytest
 from dateutil.parser import parse
 
 from lib.cloud_logging.log_query_link import create_log_query_link
+from lib.correlation import Incident
+from lib.digest import DigestGroup
 from lib.log_processor.processed_log_entry import ProcessedLogEntry
 from lib.slack.slack_message import (
+    MAX_RAW_CONTENT_CHARS,
     SlackMessage,
     _create_footnote,
+    _footnote_template,
+    classify_alert,
+    create_from_digest_group,
+    create_from_incident,
     create_from_processed_log_entry,
+    create_from_raw,
 )
 
 
@@ -277,6 +285,23 @@ def test_create_from_processed_log_with_no_application(processed_log_entry):
     assert message.fields["Application"] == "unknown"
 
 
+def test_create_from_processed_log_with_suppressed_alerts(processed_log_entry):
+    message = create_from_processed_log_entry(
+        replace(processed_log_entry, suppressed_count=1234),
+        project_name="example-gcp-project",
+    )
+
+    assert message.fields["Suppressed"] == "+1,234 similar suppressed"
+
+
+def test_create_from_processed_log_without_suppressed_alerts(processed_log_entry):
+    message = create_from_processed_log_entry(
+        processed_log_entry, project_name="example-gcp-project"
+    )
+
+    assert "Suppressed" not in message.fields
+
+
 def test_create_from_processed_log_with_no_timestamp(processed_log_entry):
     message = create_from_processed_log_entry(
         replace(processed_log_entry, timestamp=None), project_name="example-gcp-project"
@@ -492,7 +517,9 @@ def test_create_footnote_returns_default_instructions_with_view_the_logs_line(
     project_name = "foobar"
 
     # act
-    result = _create_footnote(processed_log_entry, project_name)
+    result = _create_footnote(
+        processed_log_entry, project_name, classify_alert(processed_log_entry)
+    )
 
     # assert
     assert result == (
@@ -514,7 +541,11 @@ def test_create_footnote_returns_default_instructions_without_view_the_logs_line
     )
 
     # act
-    result = _create_footnote(processed_log_entry_without_timestamp, project_name)
+    result = _create_footnote(
+        processed_log_entry_without_timestamp,
+        project_name,
+        classify_alert(processed_log_entry_without_timestamp),
+    )
 
     # assert
     assert result == (
@@ -526,6 +557,47 @@ def test_create_footnote_returns_default_instructions_without_view_the_logs_line
     )
 
 
+def test_create_footnote_returns_the_projects_playbook(processed_log_entry):
+    # arrange
+    project_name = "foobar"
+
+    # act
+    result = _create_footnote(
+        processed_log_entry,
+        project_name,
+        classify_alert(processed_log_entry),
+        "https://example.com/playbook",
+    )
+
+    # assert
+    assert result.endswith(
+        "4. Follow the <https://example.com/playbook | Troubleshooting Playbook> process"
+    )
+
+
+def test_create_footnote_keeps_classified_playbooks_over_the_projects(
+    processed_log_entry,
+):
+    # arrange
+    project_name = "foobar"
+    processed_data_delivery_log_entry = dataclasses.replace(
+        processed_log_entry, application="nifi-notify"
+    )
+
+    # act
+    result = _create_footnote(
+        processed_data_delivery_log_entry,
+        project_name,
+        classify_alert(processed_data_delivery_log_entry),
+        "https://example.com/playbook",
+    )
+
+    # assert
+    assert result.endswith(
+        "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50299847/Troubleshooting+Playbook+-+Data+Delivery | View the Data Delivery Troubleshooting Playbook>"
+    )
+
+
 @pytest.mark.parametrize(
     "data_delivery_application",
     [
@@ -545,7 +617,11 @@ def test_create_footnote_returns_data_delivery_instructions_with_view_the_logs_l
     )
 
     # act
-    result = _create_footnote(processed_data_delivery_log_entry, project_name)
+    result = _create_footnote(
+        processed_data_delivery_log_entry,
+        project_name,
+        classify_alert(processed_data_delivery_log_entry),
+    )
 
     # assert
     assert result == (
@@ -576,7 +652,11 @@ def test_create_footnote_returns_data_delivery_instructions_without_view_the_log
     )
 
     # act
-    result = _create_footnote(processed_data_delivery_log_entry, project_name)
+    result = _create_footnote(
+        processed_data_delivery_log_entry,
+        project_name,
+        classify_alert(processed_data_delivery_log_entry),
+    )
 
     # assert
     assert result == (
@@ -607,7 +687,11 @@ def test_create_footnote_returns_totalmobile_instructions_with_view_the_logs_lin
     )
 
     # act
-    result = _create_footnote(processed_totalmobile_log_entry, project_name)
+    result = _create_footnote(
+        processed_totalmobile_log_entry,
+        project_name,
+        classify_alert(processed_totalmobile_log_entry),
+    )
 
     # assert
     assert result == (
@@ -638,7 +722,11 @@ def test_create_footnote_returns_totalmobile_instructions_without_view_the_logs_
     )
 
     # act
-    result = _create_footnote(processed_totalmobile_log_entry, project_name)
+    result = _create_footnote(
+        processed_totalmobile_log_entry,
+        project_name,
+        classify_alert(processed_totalmobile_log_entry),
+    )
 
     # assert
     assert result == (
@@ -667,7 +755,11 @@ def test_create_footnote_returns_totalmobile_instructions_from_cloud_scheduler_j
     )
 
     # act
-    result = _create_footnote(processed_totalmobile_log_entry, project_name)
+    result = _create_footnote(
+        processed_totalmobile_log_entry,
+        project_name,
+        classify_alert(processed_totalmobile_log_entry),
+    )
 
     # assert
     assert result == (
@@ -696,7 +788,11 @@ def test_create_footnote_returns_nisra_instructions_from_nisra_application_with_
     )
 
     # act
-    result = _create_footnote(processed_nisra_log_entry, project_name)
+    result = _create_footnote(
+        processed_nisra_log_entry,
+        project_name,
+        classify_alert(processed_nisra_log_entry),
+    )
 
     # assert
     assert result == (
@@ -725,7 +821,11 @@ def test_create_footnote_returns_nisra_instructions_from_nisra_application_witho
     )
 
     # act
-    result = _create_footnote(processed_nisra_log_entry, project_name)
+    result = _create_footnote(
+        processed_nisra_log_entry,
+        project_name,
+        classify_alert(processed_nisra_log_entry),
+    )
 
     # assert
     assert result == (
@@ -754,7 +854,11 @@ def test_create_footnote_returns_nisra_instructions_from_cloud_scheduler_job_wit
     )
 
     # act
-    result = _create_footnote(processed_data_delivery_log_entry, project_name)
+    result = _create_footnote(
+        processed_data_delivery_log_entry,
+        project_name,
+        classify_alert(processed_data_delivery_log_entry),
+    )
 
     # assert
     assert result == (
@@ -784,7 +888,11 @@ def test_create_footnote_returns_nisra_instructions_from_cloud_scheduler_job_wit
     )
 
     # act
-    result = _create_footnote(processed_data_delivery_log_entry, project_name)
+    result = _create_footnote(
+        processed_data_delivery_log_entry,
+        project_name,
+        classify_alert(processed_data_delivery_log_entry),
+    )
 
     # assert
     assert result == (
@@ -794,3 +902,148 @@ def test_create_footnote_returns_nisra_instructions_from_cloud_scheduler_job_wit
         "3. Determine the cause of the error\n"
         "4. <https://officefornationalstatistics.atlassian.net/wiki/spaces/QSS/pages/50326981/Troubleshooting+Playbook+-+NISRA | View the NISRA Troubleshooting Playbook>"
     )
+
+
+@pytest.mark.parametrize(
+    "application,message,log_query,classification",
+    [
+        ("nifi-notify", "Failed", {}, "data-delivery"),
+        ("my-app", "Could not find case", {}, "totalmobile"),
+        ("my-app", "Failed", {"jobName": "bts-job"}, "totalmobile"),
+        ("nisra-case-mover", "Failed", {}, "nisra"),
+        ("nisra-case-mover", "Totalmobile failed", {}, "totalmobile"),
+        ("my-app", "Failed", {"jobName": "nisra-job"}, "nisra"),
+        ("nifi-notify", "Totalmobile failed", {}, "data-delivery"),
+        ("my-app", "Failed", {}, None),
+        (None, None, {}, None),
+    ],
+)
+def test_classify_alert(
+    processed_log_entry: ProcessedLogEntry,
+    application: str,
+    message: str,
+    log_query: dict,
+    classification: str,
+) -> None:
+    entry = replace(
+        processed_log_entry,
+        application=application,
+        message=message,
+        log_query=log_query,
+    )
+
+    assert classify_alert(entry) == classification
+
+
+def test_footnotes_only_differ_by_log_link(
+    processed_log_entry: ProcessedLogEntry,
+) -> None:
+    later_entry = replace(
+        processed_log_entry, timestamp=parse("2022-08-10T15:00:00.000000Z")
+    )
+
+    first = _create_footnote(processed_log_entry, "foobar", None)
+    second = _create_footnote(later_entry, "foobar", None)
+
+    assert first != second
+    assert first.split("\n")[:3] == second.split("\n")[:3]
+    assert first.split("\n")[4] == second.split("\n")[4]
+
+
+def test_footnote_template_is_built_once_per_project_and_classification(
+    processed_log_entry: ProcessedLogEntry,
+) -> None:
+    _footnote_template.cache_clear()
+
+    for project_name in ["foobar", "foobar", "bazqux", "foobar"]:
+        _create_footnote(
+            processed_log_entry, project_name, classify_alert(processed_log_entry)
+        )
+
+    assert _footnote_template.cache_info().misses == 2
+
+
+def test_create_from_digest_group() -> None:
+    group = DigestGroup(
+        application="bert-call-history",
+        fingerprint="0123456789abcdef",
+        window_start=parse("2022-08-10T14:45:00Z"),
+        count=42,
+        first_seen=parse("2022-08-10T14:46:03Z"),
+        last_seen=parse("2022-08-10T14:58:10Z"),
+        severity="WARNING",
+        platform="cloud_run_revision",
+        message="Call history took longer than expected",
+        log_query={"resource.labels.service_name": "bert-call-history"},
+    )
+
+    message = create_from_digest_group(group, "example-gcp-project")
+
+    log_link = create_log_query_link(
+        fields={"resource.labels.service_name": "bert-call-history"},
+        severities=["WARNING"],
+        cursor_timestamp=parse("2022-08-10T14:46:03Z"),
+        project_name="example-gcp-project",
+        end_timestamp=parse("2022-08-10T14:58:10Z"),
+    )
+    assert message == SlackMessage(
+        title=":bell: 42 x WARNING: Call history took longer than expected",
+        fields={
+            "Platform": "cloud_run_revision",
+            "Application": "bert-call-history",
+            "Occurrences": "42",
+            "First Seen": "2022-08-10 15:46:03",
+            "Last Seen": "2022-08-10 15:58:10",
+            "Project": "example-gcp-project",
+        },
+        content="",
+        footnote=f"*Digest of low-priority alerts*\n<{log_link} | View the logs>",
+    )
+
+
+def test_create_from_incident() -> None:
+    incident = Incident(
+        resource_field="resource.labels.instance_id",
+        resource="1234567890",
+        count=4,
+        first_seen=parse("2022-08-10T14:46:03Z"),
+        last_seen=parse("2022-08-10T14:46:20Z"),
+        severity="ERROR",
+        platform="gce_instance",
+        applications=["GCEGuestAgent", "OSConfigAgent"],
+        messages=["Agent stopped", "Connection refused"],
+    )
+
+    message = create_from_incident(incident, "example-gcp-project")
+
+    log_link = create_log_query_link(
+        fields={"resource.labels.instance_id": "1234567890"},
+        severities=[],
+        cursor_timestamp=parse("2022-08-10T14:46:03Z"),
+        project_name="example-gcp-project",
+        end_timestamp=parse("2022-08-10T14:46:20Z"),
+    )
+    assert message == SlackMessage(
+        title=":link: Incident on instance_id 1234567890: 4 related alerts",
+        fields={
+            "Platform": "gce_instance",
+            "Applications": "GCEGuestAgent, OSConfigAgent",
+            "Alerts": "4",
+            "Highest Severity": "ERROR",
+            "First Seen": "2022-08-10 15:46:03",
+            "Last Seen": "2022-08-10 15:46:20",
+            "Project": "example-gcp-project",
+        },
+        content="Agent stopped\nConnection refused",
+        footnote=(
+            "*Summary of alerts merged into the first alert for this resource*\n"
+            f"<{log_link} | View the logs>"
+        ),
+    )
+
+
+def test_create_from_raw_trims_a_huge_event():
+    message = create_from_raw({"data": "x" * 500_000}, "example-project")
+
+    assert len(message.content) < MAX_RAW_CONTENT_CHARS + 20
+    assert message.content.endswith("...\n[truncated]")
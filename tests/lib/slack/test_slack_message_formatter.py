@@ -1,7 +1,10 @@
 import json
 
 from lib.slack.slack_message import SlackMessage
-from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
+from lib.slack.slack_message_formatter import (
+    convert_slack_message_to_blocks,
+    split_slack_payload,
+)
 
 
 def test_successfully_converting_a_message_to_blocks():
@@ -118,3 +121,96 @@ def test_successfully_converting_a_message_to_blocks_with_no_content():
             ),
         ]
     )
+
+
+def test_the_header_is_limited_to_slacks_maximum_length():
+    blocks = convert_slack_message_to_blocks(
+        SlackMessage(title="x" * 200, fields={}, content="", footnote="")
+    )
+
+    assert blocks["blocks"][0]["text"]["text"] == "x" * 147 + "..."
+
+
+def test_long_content_is_split_between_lines_into_several_sections():
+    lines = [f"{index:04}" + "y" * 995 for index in range(7)]
+
+    blocks = convert_slack_message_to_blocks(
+        SlackMessage(title="title", fields={}, content="\n".join(lines), footnote="")
+    )
+
+    content_sections = [block["text"]["text"] for block in blocks["blocks"][3:6]]
+    assert content_sections == [
+        "\n".join(lines[0:3]) + "\n",
+        "\n".join(lines[3:6]) + "\n",
+        lines[6],
+    ]
+    assert "".join(content_sections) == "\n".join(lines)
+
+
+def test_a_line_longer_than_a_section_is_split():
+    blocks = convert_slack_message_to_blocks(
+        SlackMessage(title="title", fields={}, content="z" * 7000, footnote="")
+    )
+
+    assert [len(block["text"]["text"]) for block in blocks["blocks"][3:6]] == [
+        3000,
+        3000,
+        1000,
+    ]
+
+
+def test_fields_are_spread_over_sections_of_ten():
+    blocks = convert_slack_message_to_blocks(
+        SlackMessage(
+            title="title",
+            fields={f"Field {index}": "value" for index in range(12)},
+            content="",
+            footnote="",
+        )
+    )
+
+    assert [len(block["fields"]) for block in blocks["blocks"][1:3]] == [10, 2]
+
+
+def test_a_payload_within_the_block_limit_is_not_split():
+    payload = dict(blocks=[dict(type="divider")] * 50)
+
+    assert split_slack_payload(payload) == [payload]
+
+
+def test_a_payload_over_the_block_limit_is_split_into_follow_ups():
+    blocks = [
+        dict(type="section", text=dict(type="mrkdwn", text=str(index)))
+        for index in range(120)
+    ]
+
+    payloads = split_slack_payload(dict(blocks=blocks))
+
+    assert [payload["blocks"][1:] for payload in payloads[1:]] == [
+        blocks[50:99],
+        blocks[99:],
+    ]
+    assert payloads[0] == dict(blocks=blocks[:50])
+    assert [payload["blocks"][0] for payload in payloads[1:]] == [
+        dict(type="context", elements=[dict(type="mrkdwn", text="_Continued (2/3)_")]),
+        dict(type="context", elements=[dict(type="mrkdwn", text="_Continued (3/3)_")]),
+    ]
+    assert all(len(payload["blocks"]) <= 50 for payload in payloads)
+
+
+def test_blocks_beyond_the_last_follow_up_are_truncated():
+    blocks = [
+        dict(type="section", text=dict(type="mrkdwn", text=str(index)))
+        for index in range(300)
+    ]
+
+    payloads = split_slack_payload(dict(blocks=blocks), max_follow_ups=3)
+
+    assert len(payloads) == 4
+    assert all(len(payload["blocks"]) <= 50 for payload in payloads)
+    assert payloads[3]["blocks"][1:-1] == blocks[148:196]
+    assert payloads[3]["blocks"][-1] == dict(
+        type="context",
+        elements=[dict(type="mrkdwn", text="_Truncated: 104 more blocks not shown_")],
+    )
+    assert payloads[1]["blocks"][0]["elements"][0]["text"] == "_Continued (2/4)_"
@@ -0,0 +1,349 @@
+from typing import Any, Iterator, List
+
+import pytest
+import requests_mock
+
+from lib.log_processor import ProcessedLogEntry
+from lib.slack import CircuitBreaker, DeadLetterSpool, SlackMessage, SlackWebApiAlerter
+from lib.slack.send_slack_message import SlackAlertFailed, SlackCircuitOpen
+from lib.slack.slack_web_api_alerter import COUNT_REPEATS, ThreadedSlackMessage
+
+API_URL = "https://slack.example/api"
+
+
+class FakeSlackApi:
+    """Stands in for chat.postMessage and chat.update, keeping what was posted."""
+
+    def __init__(self, mock: requests_mock.Mocker) -> None:
+        self.messages: List[dict] = []
+        self.updates: List[dict] = []
+        self.error: Any = None
+        self.status_code = 200
+        mock.post(f"{API_URL}/chat.postMessage", json=self._post_message)
+        mock.post(f"{API_URL}/chat.update", json=self._update)
+
+    def _post_message(self, request: Any, context: Any) -> dict:
+        context.status_code = self.status_code
+        if self.error is not None:
+            return {"ok": False, "error": self.error}
+        assert request.headers["Authorization"] == "Bearer xoxb-token"
+        message = {**request.json(), "ts": f"1700000000.{len(self.messages):06d}"}
+        self.messages.append(message)
+        return {"ok": True, "channel": message["channel"], "ts": message["ts"]}
+
+    def _update(self, request: Any, _context: Any) -> dict:
+        update = request.json()
+        self.updates.append(update)
+        return {"ok": True, "channel": update["channel"], "ts": update["ts"]}
+
+    def top_level(self) -> List[dict]:
+        return [message for message in self.messages if "thread_ts" not in message]
+
+    def replies(self, ts: str) -> List[dict]:
+        return [message for message in self.messages if message.get("thread_ts") == ts]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def slack_api() -> Iterator[FakeSlackApi]:
+    with requests_mock.Mocker() as mock:
+        yield FakeSlackApi(mock)
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+def create_alerter(clock: Clock, **kwargs: Any) -> SlackWebApiAlerter:
+    return SlackWebApiAlerter(
+        "xoxb-token",
+        "C0123",
+        "example-project",
+        api_url=API_URL,
+        clock=clock,
+        **kwargs,
+    )
+
+
+def create_entry(message: str = "Failed to connect to 10.0.0.1") -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message=message,
+        severity="ERROR",
+        platform="cloud_run_revision",
+        application="example-service",
+    )
+
+
+def test_the_first_occurrence_is_posted_to_the_channel(slack_api, clock):
+    alerter = create_alerter(clock)
+
+    alerter.send_alert(alerter.create_alert(create_entry()))
+
+    [message] = slack_api.messages
+    assert message["channel"] == "C0123"
+    assert message["text"] == ":alert: ERROR: Failed to connect to 10.0.0.1"
+    assert message["blocks"]
+
+
+def test_repeats_are_posted_as_thread_replies(slack_api, clock):
+    alerter = create_alerter(clock)
+
+    for address in ["10.0.0.1", "10.0.0.2", "10.0.0.3"]:
+        alerter.send_alert(alerter.create_alert(create_entry(f"Failed to {address}")))
+
+    [parent] = slack_api.top_level()
+    replies = slack_api.replies(parent["ts"])
+    assert [reply["text"] for reply in replies] == [
+        "Occurred again at unknown",
+        "Occurred again at unknown",
+    ]
+    assert all("blocks" not in reply for reply in replies)
+
+
+def test_different_alerts_start_their_own_threads(slack_api, clock):
+    alerter = create_alerter(clock)
+
+    alerter.send_alert(alerter.create_alert(create_entry("Failed to connect")))
+    alerter.send_alert(alerter.create_alert(create_entry("Disk full")))
+
+    assert len(slack_api.top_level()) == 2
+
+
+def test_count_mode_updates_a_single_reply_at_most_once_per_interval(slack_api, clock):
+    alerter = create_alerter(clock, repeats=COUNT_REPEATS, update_interval_seconds=60)
+
+    for now in [0, 1, 2, 3, 70]:
+        clock.now = now
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    [parent] = slack_api.top_level()
+    [count_reply] = slack_api.replies(parent["ts"])
+    assert count_reply["text"] == "x 2, most recently at unknown"
+    assert slack_api.updates == [
+        {
+            "channel": "C0123",
+            "ts": count_reply["ts"],
+            "text": "x 5, most recently at unknown",
+        }
+    ]
+
+
+def test_a_new_thread_is_started_once_the_old_one_is_too_old(slack_api, clock):
+    alerter = create_alerter(clock, thread_max_age_seconds=3600)
+
+    alerter.send_alert(alerter.create_alert(create_entry()))
+    clock.now = 3601
+    alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert len(slack_api.top_level()) == 2
+
+
+def test_the_least_recently_seen_thread_is_forgotten(slack_api, clock):
+    alerter = create_alerter(clock, max_threads=2)
+
+    for message in ["First", "Second", "First", "Third", "First", "Second"]:
+        alerter.send_alert(alerter.create_alert(create_entry(message)))
+
+    assert [m["text"] for m in slack_api.top_level()] == [
+        ":alert: ERROR: First",
+        ":alert: ERROR: Second",
+        ":alert: ERROR: Third",
+        ":alert: ERROR: Second",
+    ]
+
+
+def test_raw_alerts_are_never_threaded(slack_api, clock):
+    alerter = create_alerter(clock)
+
+    for _ in range(2):
+        alerter.send_alert(alerter.create_raw_alert("A raw message"))
+
+    assert len(slack_api.top_level()) == 2
+
+
+def test_long_alerts_continue_in_their_thread(slack_api, clock):
+    alerter = create_alerter(clock)
+    # 60 sections of content, more than Slack allows in one message.
+    message = SlackMessage(
+        title="large",
+        fields={},
+        content="\n".join("x" * 2999 for _ in range(60)),
+        footnote="",
+    )
+
+    alerter.send_alert(ThreadedSlackMessage(message))
+
+    [parent] = slack_api.top_level()
+    [follow_up] = slack_api.replies(parent["ts"])
+    assert len(parent["blocks"]) == 50
+    assert follow_up["blocks"][0]["type"] == "context"
+
+
+def test_api_errors_are_raised(slack_api, clock):
+    alerter = create_alerter(clock)
+    slack_api.error = "channel_not_found"
+
+    with pytest.raises(SlackAlertFailed) as err:
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert err.value.args[1] == "channel_not_found"
+
+
+def test_a_failed_first_occurrence_does_not_start_a_thread(slack_api, clock):
+    alerter = create_alerter(clock)
+    slack_api.error = "ratelimited"
+    with pytest.raises(SlackAlertFailed):
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    slack_api.error = None
+    alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert len(slack_api.top_level()) == 1
+
+
+def test_a_non_json_response_is_raised_as_a_failure(clock):
+    alerter = create_alerter(clock)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(f"{API_URL}/chat.postMessage", text="<html>Bad gateway</html>")
+        with pytest.raises(SlackAlertFailed) as err:
+            alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert err.value.args[:2] == (200, "<html>Bad gateway</html>")
+
+
+def test_a_redelivered_repeat_is_counted_once(slack_api, clock):
+    alerter = create_alerter(clock, repeats=COUNT_REPEATS)
+    alerter.send_alert(alerter.create_alert(create_entry()))
+
+    slack_api.error = "ratelimited"
+    with pytest.raises(SlackAlertFailed):
+        alerter.send_alert(alerter.create_alert(create_entry()))
+    slack_api.error = None
+    alerter.send_alert(alerter.create_alert(create_entry()))
+
+    [parent] = slack_api.top_level()
+    [count_reply] = slack_api.replies(parent["ts"])
+    assert count_reply["text"] == "x 2, most recently at unknown"
+
+
+def test_repeats_between_updates_are_shown_by_flush_counts(slack_api, clock):
+    alerter = create_alerter(clock, repeats=COUNT_REPEATS, update_interval_seconds=60)
+    for now in [0, 1, 2, 3]:
+        clock.now = now
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert alerter.flush_counts() == 0
+    clock.now = 61
+    assert alerter.flush_counts() == 1
+    assert alerter.flush_counts() == 0
+
+    assert [update["text"] for update in slack_api.updates] == [
+        "x 4, most recently at unknown"
+    ]
+
+
+def test_other_alerts_flush_pending_counts(slack_api, clock):
+    alerter = create_alerter(clock, repeats=COUNT_REPEATS, update_interval_seconds=60)
+    for now in [0, 1, 2]:
+        clock.now = now
+        alerter.send_alert(alerter.create_alert(create_entry("Disk full")))
+
+    clock.now = 61
+    alerter.send_alert(alerter.create_alert(create_entry("Out of memory")))
+
+    assert [update["text"] for update in slack_api.updates] == [
+        "x 3, most recently at unknown"
+    ]
+
+
+def test_failed_calls_are_spooled_and_replayed(slack_api, clock, tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / "slack.jsonl"))
+    alerter = create_alerter(clock, spool=spool)
+
+    slack_api.error = "ratelimited"
+    alerter.send_alert(alerter.create_alert(create_entry("Disk full")))
+    assert spool.pending() == 1
+
+    slack_api.error = None
+    alerter.send_alert(alerter.create_alert(create_entry("Out of memory")))
+
+    assert spool.pending() == 0
+    assert [message["text"] for message in slack_api.top_level()] == [
+        ":alert: ERROR: Out of memory",
+        ":alert: ERROR: Disk full",
+    ]
+
+
+def test_rejected_calls_are_raised_instead_of_spooled(slack_api, clock, tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / "slack.jsonl"))
+    alerter = create_alerter(clock, spool=spool)
+    slack_api.error = "not_in_channel"
+
+    with pytest.raises(SlackAlertFailed):
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    assert spool.pending() == 0
+
+
+def test_replay_drops_calls_which_slack_rejects(slack_api, clock, tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / "slack.jsonl"))
+    spool.append({"method": "chat.postMessage", "data": {"channel": "C-GONE"}})
+    alerter = create_alerter(clock, spool=spool)
+
+    with requests_mock.Mocker() as mock:
+        mock.post(
+            f"{API_URL}/chat.postMessage",
+            json={"ok": False, "error": "channel_not_found"},
+        )
+        assert alerter.replay_spool() == 0
+
+    assert spool.pending() == 0
+
+
+def test_threads_are_shared_through_the_database(slack_api, clock, tmp_path):
+    threads_path = str(tmp_path / "threads.db")
+    alerter = create_alerter(clock, repeats=COUNT_REPEATS, threads_path=threads_path)
+    for now in [0, 1, 2]:
+        clock.now = now
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    # Another instance sees the thread and the repeats it has not shown yet.
+    other = create_alerter(clock, repeats=COUNT_REPEATS, threads_path=threads_path)
+    clock.now = 61
+    assert other.flush_counts() == 1
+    other.send_alert(other.create_alert(create_entry()))
+
+    assert len(slack_api.top_level()) == 1
+    assert [update["text"] for update in slack_api.updates] == [
+        "x 3, most recently at unknown",
+    ]
+
+
+def test_it_fails_fast_while_the_circuit_is_open(slack_api, clock):
+    alerter = create_alerter(
+        clock, circuit_breaker=CircuitBreaker("slack-web-api", failure_threshold=1)
+    )
+
+    slack_api.status_code = 503
+    with pytest.raises(SlackAlertFailed):
+        alerter.send_alert(alerter.create_alert(create_entry()))
+    slack_api.status_code = 200
+    with pytest.raises(SlackCircuitOpen):
+        alerter.send_alert(alerter.create_alert(create_entry()))
+
+    # Only the first call reached Slack.
+    assert len(slack_api.messages) == 1
+
+
+def test_unknown_repeats_mode_is_rejected(clock):
+    with pytest.raises(ValueError):
+        create_alerter(clock, repeats="sometimes")
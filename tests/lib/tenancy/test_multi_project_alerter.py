@@ -0,0 +1,125 @@
+from typing import List
+from unittest.mock import Mock
+
+import pytest
+
+from lib.alerter import Alerter
+from lib.correlation import Incident
+from lib.digest import DigestGroup
+from lib.log_processor import ProcessedLogEntry
+from lib.send_alerts import LIVE_FILTERS
+from lib.tenancy import (
+    MultiProjectAlerter,
+    ProjectAlert,
+    ProjectConfig,
+    ProjectConfigs,
+)
+
+
+@pytest.fixture
+def created() -> List[ProjectConfig]:
+    return []
+
+
+@pytest.fixture
+def alerter(created) -> MultiProjectAlerter:
+    def create_alerter(project: ProjectConfig) -> Alerter:
+        created.append(project)
+        project_alerter = Mock(spec=Alerter)
+        project_alerter.create_alert.return_value = f"alert for {project.project_id}"
+        project_alerter.create_digest_alert.return_value = (
+            f"digest for {project.project_id}"
+        )
+        project_alerter.create_incident_alert.return_value = (
+            f"incident for {project.project_id}"
+        )
+        return project_alerter
+
+    return MultiProjectAlerter(
+        ProjectConfigs(
+            projects={
+                "project-a": ProjectConfig(
+                    project_id="project-a", slack_url="https://slack.co/webhook/a"
+                )
+            },
+            default_project_id="project-default",
+            live_filters=LIVE_FILTERS,
+        ),
+        create_alerter,
+    )
+
+
+def test_alerts_are_created_by_the_entrys_project(alerter, created):
+    entry = ProcessedLogEntry(
+        message="An error", log_name="projects/project-a/logs/run.googleapis.com"
+    )
+
+    alert = alerter.create_alert(entry)
+
+    assert alert == ProjectAlert(project_id="project-a", alert="alert for project-a")
+    assert created == [
+        ProjectConfig(project_id="project-a", slack_url="https://slack.co/webhook/a")
+    ]
+
+
+def test_alerts_are_sent_by_their_projects_alerter(alerter):
+    alerter.send_alert(ProjectAlert(project_id="project-a", alert="an alert"))
+
+    alerter.alerter_for("project-a").send_alert.assert_called_once_with(
+        "an alert", None
+    )
+    alerter.alerter_for("project-default").send_alert.assert_not_called()
+
+
+def test_unconfigured_projects_use_the_default_projects_alerter(alerter, created):
+    for project_id in ["project-b", "project-c", "project-default"]:
+        assert alerter.alerter_for(project_id) is alerter.alerter_for("project-default")
+
+    assert created == [ProjectConfig(project_id="project-default")]
+
+
+def test_unconfigured_projects_alerts_link_to_their_own_project(alerter):
+    entry = ProcessedLogEntry(
+        message="An error", log_name="projects/project-b/logs/run.googleapis.com"
+    )
+
+    alert = alerter.create_alert(entry)
+
+    default_alerter = alerter.alerter_for("project-default")
+    default_alerter.create_alert.assert_called_once_with(entry, "project-b")
+    assert alert.project_id == "project-b"
+
+
+def test_each_projects_alerter_is_created_once(alerter, created):
+    for _ in range(3):
+        alerter.alerter_for("project-a")
+        alerter.alerter_for("project-default")
+
+    assert [project.project_id for project in created] == [
+        "project-a",
+        "project-default",
+    ]
+
+
+def test_digests_are_sent_for_their_entries_project(alerter):
+    group = Mock(spec=DigestGroup, project_id="project-a")
+
+    alert = alerter.create_digest_alert(group)
+
+    assert alert == ProjectAlert(project_id="project-a", alert="digest for project-a")
+
+
+def test_digests_without_a_project_are_sent_for_the_default_project(alerter):
+    alert = alerter.create_digest_alert(Mock(spec=DigestGroup, project_id=None))
+
+    assert alert == ProjectAlert(
+        project_id="project-default", alert="digest for project-default"
+    )
+
+
+def test_incidents_are_sent_for_their_entries_project(alerter):
+    incident = Mock(spec=Incident, project_id="project-a")
+
+    alert = alerter.create_incident_alert(incident)
+
+    assert alert == ProjectAlert(project_id="project-a", alert="incident for project-a")
@@ -0,0 +1,196 @@
+import datetime
+from datetime import time, timezone
+
+import pytest
+
+from lib.filters.os_patch_maintenance_filter import os_patch_maintenance_filter
+from lib.filters.sandbox_filter import sandbox_filter
+from lib.log_processor import ProcessedLogEntry
+from lib.send_alerts import LIVE_FILTERS
+from lib.tenancy import (
+    InvalidProjectConfig,
+    ProjectConfig,
+    ProjectConfigs,
+    parse_project_configs,
+)
+from lib.utilities.weekly_maintenance_window import WeeklyMaintenanceWindow
+
+TUESDAY_WINDOW = WeeklyMaintenanceWindow(weekday=1, start=time(11, 0), end=time(12, 0))
+
+
+def create_entry(log_name: str, message: str = "An error") -> ProcessedLogEntry:
+    return ProcessedLogEntry(
+        message=message,
+        severity="ERROR",
+        platform="gce_instance",
+        application="restapi-1",
+        log_name=log_name,
+        # 10:30 UTC on a Tuesday = 11:30 BST
+        timestamp=datetime.datetime(2025, 7, 15, 10, 30, tzinfo=timezone.utc),
+    )
+
+
+@pytest.fixture
+def project_configs() -> ProjectConfigs:
+    return ProjectConfigs(
+        projects={
+            "project-a": ProjectConfig(
+                project_id="project-a",
+                slack_url="https://slack.co/webhook/a",
+                disabled_filters=frozenset({"sandbox_filter"}),
+                maintenance_windows=(TUESDAY_WINDOW,),
+            ),
+            "project-b": ProjectConfig(
+                project_id="project-b", slack_url="https://slack.co/webhook/b"
+            ),
+        },
+        default_project_id="project-default",
+        live_filters=LIVE_FILTERS,
+    )
+
+
+def test_the_project_comes_from_the_log_name(project_configs):
+    entry = create_entry("projects/project-a/logs/windows_event_log")
+
+    assert project_configs.project_id_for(entry) == "project-a"
+
+
+@pytest.mark.parametrize("log_name", [None, "logs/windows_event_log"])
+def test_entries_without_a_project_belong_to_the_default_project(
+    project_configs, log_name
+):
+    entry = create_entry(log_name)
+
+    assert project_configs.project_id_for(entry) == "project-default"
+
+
+def test_unconfigured_projects_use_the_defaults(project_configs):
+    assert project_configs.config_for("project-c") == ProjectConfig(
+        project_id="project-c"
+    )
+    assert project_configs.filters_for("project-c") is LIVE_FILTERS
+
+
+def test_projects_without_filter_settings_use_the_live_filters(project_configs):
+    assert project_configs.filters_for("project-b") is LIVE_FILTERS
+
+
+def test_disabled_filters_are_left_out(project_configs):
+    filters = project_configs.filters_for("project-a")
+
+    assert sandbox_filter not in filters
+    assert len(filters) == len(LIVE_FILTERS) - 1
+
+
+def test_maintenance_filters_use_the_projects_windows(project_configs):
+    entry = create_entry(
+        "projects/project-a/logs/windows_event_log",
+        "The Google Compute Engine Agent Manager service terminated unexpectedly.",
+    )
+    [maintenance_filter] = [
+        f
+        for f in project_configs.filters_for("project-a")
+        if f.__name__ == "os_patch_maintenance_filter"
+    ]
+
+    assert maintenance_filter(entry)
+    assert not os_patch_maintenance_filter(entry)
+
+
+def test_the_filters_are_built_once(project_configs):
+    assert project_configs.filters_for("project-a") is project_configs.filters_for(
+        "project-a"
+    )
+
+
+def test_parse_project_configs():
+    project_configs = parse_project_configs(
+        {
+            "projects": {
+                "project-a": {
+                    "slack_url_env": "SLACK_URL_A",
+                    "playbook_url": "https://example.com/playbook",
+                    "disabled_filters": ["sandbox_filter"],
+                    "maintenance_windows": [
+                        {"weekday": "Tuesday", "start": "11:00", "end": "12:00"}
+                    ],
+                },
+                "project-b": {},
+            }
+        },
+        {"SLACK_URL_A": "https://slack.co/webhook/a"},
+        "project-default",
+        LIVE_FILTERS,
+    )
+
+    assert project_configs.default_project_id == "project-default"
+    assert project_configs.config_for("project-a") == ProjectConfig(
+        project_id="project-a",
+        slack_url="https://slack.co/webhook/a",
+        playbook_url="https://example.com/playbook",
+        disabled_filters=frozenset({"sandbox_filter"}),
+        maintenance_windows=(TUESDAY_WINDOW,),
+    )
+    assert project_configs.config_for("project-b") == ProjectConfig(
+        project_id="project-b"
+    )
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {},
+        {"projects": {}},
+        {"projects": {"project-a": []}},
+        {"projects": {"project-a": {"slack_url": ""}}},
+        {"projects": {"project-a": {"slack_url_env": "MISSING"}}},
+        {"projects": {"project-a": {"playbook_url": 1}}},
+        {"projects": {"project-a": {"disabled_filters": "sandbox_filter"}}},
+        {"projects": {"project-a": {"disabled_filters": ["unknown_filter"]}}},
+        {"projects": {"project-a": {"maintenance_windows": {}}}},
+        {
+            "projects": {
+                "project-a": {
+                    "maintenance_windows": [
+                        {"weekday": "someday", "start": "11:00", "end": "12:00"}
+                    ]
+                }
+            }
+        },
+        {
+            "projects": {
+                "project-a": {
+                    "maintenance_windows": [
+                        {"weekday": "friday", "start": "25:00", "end": "26:00"}
+                    ]
+                }
+            }
+        },
+        {
+            "projects": {
+                "project-a": {
+                    "maintenance_windows": [
+                        {"weekday": "friday", "start": "12:00", "end": "11:00"}
+                    ]
+                }
+            }
+        },
+        {
+            "projects": {
+                "project-a": {
+                    "maintenance_windows": [
+                        {
+                            "weekday": "friday",
+                            "start": "11:00",
+                            "end": "12:00",
+                            "timezone": "Nowhere/Special",
+                        }
+                    ]
+                }
+            }
+        },
+    ],
+)
+def test_parse_project_configs_rejects_invalid_config(config):
+    with pytest.raises(InvalidProjectConfig):
+        parse_project_configs(config, {}, "project-default", LIVE_FILTERS)
@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from lib.alerter import AsyncAlerter
+from lib.async_send_alerts import async_send_alerts
+from lib.deadline import Deadline, DeadlineExceeded
+from lib.deduplication import InMemorySeenMessageIds
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
+from lib.sampling import AlertSampler, SamplingRule
+from lib.slack.slack_message import SlackMessage
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 7200.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def message():
+    return SlackMessage(title="example message", fields={}, content="", footnote="")
+
+
+@pytest.fixture
+def alerter(message) -> Mock:
+    alerter = Mock(spec=AsyncAlerter)
+    alerter.send_alert = AsyncMock()
+    alerter.create_alert.return_value = message
+    alerter.create_raw_alert.return_value = message
+    return alerter
+
+
+def create_event(data, message_id=None) -> dict:
+    event = {
+        "@type": "type.googleapis.com/google.pubsub.v1.PubsubMessage",
+        "data": base64.b64encode(json.dumps(data).encode("ascii")),
+    }
+    if message_id is not None:
+        event["messageId"] = message_id
+    return event
+
+
+def run(events, alerter, seen_message_ids=None, deadline=None, sampler=None):
+    return asyncio.run(
+        async_send_alerts(
+            events,
+            alerter=alerter,
+            app_log_payload_factories=APP_LOG_PAYLOAD_FACTORIES,
+            seen_message_ids=seen_message_ids,
+            deadline=deadline,
+            sampler=sampler,
+        )
+    )
+
+
+def test_it_returns_a_result_per_event(alerter):
+    sandbox_entry = dict(
+        textPayload="sandbox error",
+        logName="projects/ons-blaise-v2-dev-jw09/logs/stdout",
+    )
+    events = [create_event("raw message"), create_event(sandbox_entry), {}]
+
+    results = run(events, alerter)
+
+    assert results == ["Alert sent", "Alert skipped", "Alert sent (invalid envelope)"]
+    assert alerter.send_alert.await_count == 2
+
+
+def test_a_failed_send_does_not_affect_the_other_events(alerter, message):
+    alerter.send_alert.side_effect = [RuntimeError("Slack is down"), None]
+
+    results = run([create_event("first"), create_event("second")], alerter)
+
+    assert results == ["Alert failed", "Alert sent"]
+
+
+def test_it_sends_a_message_id_once_per_batch(alerter):
+    seen_message_ids = InMemorySeenMessageIds()
+    events = [create_event("message", "id-1"), create_event("message", "id-1")]
+
+    results = run(events, alerter, seen_message_ids)
+
+    assert results == ["Alert sent", "Alert deferred (in flight)"]
+    assert seen_message_ids.contains("id-1")
+
+
+def test_it_does_not_remember_a_failed_send(alerter):
+    alerter.send_alert.side_effect = RuntimeError("Slack is down")
+    seen_message_ids = InMemorySeenMessageIds()
+
+    run([create_event("message", "id-1")], alerter, seen_message_ids)
+
+    assert not seen_message_ids.contains("id-1")
+
+
+def test_a_failed_send_leaves_its_suppressed_count_for_the_next(alerter):
+    clock = FakeClock()
+    sampler = AlertSampler(
+        [SamplingRule(name="aborts", message_contains="aborted", max_per_window=1)],
+        clock=clock,
+    )
+    run(
+        [create_event("aborted", "id-1"), create_event("aborted", "id-2")],
+        alerter,
+        sampler=sampler,
+    )
+    clock.now += 3600
+    alerter.send_alert.side_effect = RuntimeError("Slack is down")
+    run([create_event("aborted", "id-3")], alerter, sampler=sampler)
+    clock.now += 3600
+    alerter.send_alert.side_effect = None
+    run([create_event("aborted", "id-4")], alerter, sampler=sampler)
+
+    entries = [call.args[0] for call in alerter.create_alert.call_args_list]
+    assert [entry.suppressed_count for entry in entries] == [0, 1, 1]
+
+
+def test_a_failed_send_can_be_redelivered(alerter):
+    seen_message_ids = InMemorySeenMessageIds()
+    alerter.send_alert.side_effect = RuntimeError("Slack is down")
+    run([create_event("message", "id-1")], alerter, seen_message_ids)
+    alerter.send_alert.side_effect = None
+
+    results = run([create_event("message", "id-1")], alerter, seen_message_ids)
+
+    assert results == ["Alert sent"]
+
+
+def test_it_stops_taking_events_after_the_deadline(alerter):
+    seen_message_ids = InMemorySeenMessageIds()
+    events = [create_event("message", "id-1"), create_event("message", "id-2")]
+
+    results = run(events, alerter, seen_message_ids, Deadline(0))
+
+    assert results == ["Alert deferred (deadline)", "Alert deferred (deadline)"]
+    alerter.send_alert.assert_not_awaited()
+    assert not seen_message_ids.contains("id-1")
+
+
+def test_it_defers_sends_which_run_out_of_time(alerter):
+    alerter.send_alert.side_effect = [DeadlineExceeded("out of time"), None]
+    deadline = Deadline(60)
+
+    results = run(
+        [create_event("first"), create_event("second")], alerter, None, deadline
+    )
+
+    assert results == ["Alert deferred (deadline)", "Alert sent"]
+    assert alerter.send_alert.await_args.args[1] is deadline
@@ -0,0 +1,51 @@
+import pytest
+
+from lib.deadline import Deadline, DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_it_counts_down_the_budget():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+
+    clock.now += 4
+
+    assert deadline.remaining() == 6
+    assert not deadline.expired()
+
+
+def test_it_expires_once_the_budget_is_used():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+
+    clock.now += 12
+
+    assert deadline.remaining() == 0
+    assert deadline.expired()
+
+
+def test_it_shortens_timeouts_to_the_remaining_time():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+
+    clock.now += 8
+
+    assert deadline.limit_timeout((3.05, 10)) == (2, 2)
+    assert deadline.limit_timeout((1, 1.5)) == (1, 1.5)
+
+
+def test_it_raises_when_limiting_a_timeout_after_the_deadline():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+
+    clock.now += 10
+
+    with pytest.raises(DeadlineExceeded):
+        deadline.limit_timeout((3.05, 10))
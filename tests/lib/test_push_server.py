@@ -0,0 +1,105 @@
+import base64
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from lib.push_server import create_app
+
+SUBSCRIPTION = "projects/ons-blaise-v2-prod/subscriptions/slack-alerts"
+
+
+@pytest.fixture
+def handle_message() -> Mock:
+    return Mock(return_value="Alert sent")
+
+
+@pytest.fixture
+def client(handle_message):
+    return create_app(handle_message, subscription=SUBSCRIPTION).test_client()
+
+
+def create_push_request(subscription=SUBSCRIPTION) -> dict:
+    return {
+        "message": {
+            "data": base64.b64encode(json.dumps("example").encode("ascii")).decode(),
+            "messageId": "2070443601311540",
+            "publishTime": "2022-07-22T20:36:21.891Z",
+        },
+        "subscription": subscription,
+    }
+
+
+def test_it_handles_the_pushed_message(client, handle_message):
+    push_request = create_push_request()
+
+    response = client.post("/", json=push_request)
+
+    assert response.status_code == 200
+    assert response.text == "Alert sent"
+    handle_message.assert_called_once_with(push_request["message"])
+
+
+def test_it_rejects_a_request_which_is_not_json(client, handle_message):
+    response = client.post("/", data="not json", content_type="text/plain")
+
+    assert response.status_code == 400
+    handle_message.assert_not_called()
+
+
+def test_it_rejects_a_request_without_a_message(client, handle_message):
+    response = client.post("/", json={"subscription": SUBSCRIPTION})
+
+    assert response.status_code == 400
+    assert response.text == "Field 'message' must be an object."
+    handle_message.assert_not_called()
+
+
+def test_it_rejects_a_request_from_another_subscription(client, handle_message):
+    response = client.post(
+        "/", json=create_push_request("projects/other/subscriptions/other")
+    )
+
+    assert response.status_code == 403
+    handle_message.assert_not_called()
+
+
+def test_it_accepts_any_subscription_when_none_is_configured(handle_message):
+    client = create_app(handle_message).test_client()
+
+    response = client.post("/", json=create_push_request("projects/a/subscriptions/b"))
+
+    assert response.status_code == 200
+
+
+def test_it_returns_an_error_when_handling_fails(client, handle_message, caplog):
+    handle_message.side_effect = RuntimeError("Slack is down")
+
+    response = client.post("/", json=create_push_request())
+
+    assert response.status_code == 500
+    assert (
+        "Failed to handle PubSub push message, left for redelivery" in caplog.messages
+    )
+
+
+def test_it_only_accepts_posts(client):
+    assert client.get("/").status_code == 405
+
+
+def test_it_runs_scheduled_tasks():
+    task = Mock(return_value="2 digests sent")
+    client = create_app(Mock(), tasks={"send-slack-digest": task}).test_client()
+
+    response = client.post("/tasks/send-slack-digest")
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "2 digests sent"
+    assert client.post("/tasks/unknown").status_code == 404
+
+
+def test_it_returns_an_error_when_a_task_fails():
+    task = Mock(side_effect=RuntimeError("Slack is down"))
+    client = create_app(Mock(), tasks={"send-slack-digest": task}).test_client()
+
+    assert client.post("/tasks/send-slack-digest").status_code == 500
@@ -9,9 +9,24 @@ from dateutil.parser import parse
 
 from lib import send_alerts
 from lib.alerter import Alerter
+from lib.correlation import IncidentCorrelator
+from lib.deduplication import InMemorySeenMessageIds
+from lib.digest import DigestBuffer
 from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
 from lib.log_processor.processed_log_entry import ProcessedLogEntry
+from lib.sampling import AlertSampler, SamplingRule
+from lib.shadow_filters import ShadowFilterEvaluator
+from lib.slack.send_slack_message import SlackAlertFailed
 from lib.slack.slack_message import SlackMessage
+from lib.tenancy import ProjectConfig, ProjectConfigs
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 7200.0
+
+    def __call__(self) -> float:
+        return self.now
 
 
 @pytest.fixture
@@ -48,7 +63,7 @@ class TestWithBadPubSubEnvelope:
         )
 
         alerter.create_raw_alert.assert_called_with(event)
-        alerter.send_alert.assert_called_with(message)
+        alerter.send_alert.assert_called_with(message, None)
 
     def test_it_returns_string(self, event, alerter, factories):
         response = send_alerts.send_alerts(
@@ -107,7 +122,7 @@ class TestWithRawStringLog:
                 log_query={},
             )
         )
-        alerter.send_alert.assert_called_with(message)
+        alerter.send_alert.assert_called_with(message, None)
 
     def test_it_returns_a_string(self, event, alerter, factories):
         response = send_alerts.send_alerts(
@@ -205,7 +220,7 @@ class TestWithStructuredLog:
                 most_important_values=["description", "event_type"],
             )
         )
-        alerter.send_alert.assert_called_with(message)
+        alerter.send_alert.assert_called_with(message, None)
 
     def test_it_returns_a_string(self, event, alerter, factories):
         response = send_alerts.send_alerts(
@@ -223,3 +238,410 @@ class TestWithStructuredLog:
 
         info = log_matching(logging.INFO, "Sending message to Slack")
         assert info.textPayload == "Error message from VM"
+
+
+class TestWithRedeliveredMessage:
+    @pytest.fixture()
+    def event(self):
+        return {
+            "@type": "type.googleapis.com/google.pubsub.v1.PubsubMessage",
+            "attributes": {
+                "logging.googleapis.com/timestamp": "2022-07-22T20:36:21.891133Z"
+            },
+            "messageId": "2070443601311540",
+            "data": base64.b64encode(
+                json.dumps("This is a raw string message").encode("ascii")
+            ),
+        }
+
+    @pytest.fixture()
+    def seen_message_ids(self):
+        return InMemorySeenMessageIds(max_size=10)
+
+    def test_it_sends_the_first_delivery(
+        self, event, alerter, message, factories, seen_message_ids
+    ):
+        response = send_alerts.send_alerts(
+            event,
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            seen_message_ids=seen_message_ids,
+        )
+
+        assert response == "Alert sent"
+        alerter.send_alert.assert_called_once_with(message, None)
+        assert seen_message_ids.contains("2070443601311540")
+
+    def test_it_skips_a_redelivery(
+        self, event, alerter, factories, seen_message_ids, caplog, log_matching
+    ):
+        send_alerts.send_alerts(
+            event,
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            seen_message_ids=seen_message_ids,
+        )
+        with caplog.at_level(logging.INFO):
+            response = send_alerts.send_alerts(
+                event,
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                seen_message_ids=seen_message_ids,
+            )
+
+        assert response == "Alert skipped (duplicate)"
+        assert alerter.send_alert.call_count == 1
+        info = log_matching(logging.INFO, "Skipping redelivered PubSub message")
+        assert info.messageId == "2070443601311540"
+
+    def test_it_does_not_remember_a_failed_delivery(
+        self, event, alerter, factories, seen_message_ids
+    ):
+        alerter.send_alert.side_effect = RuntimeError("Slack is down")
+
+        with pytest.raises(RuntimeError):
+            send_alerts.send_alerts(
+                event,
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                seen_message_ids=seen_message_ids,
+            )
+
+        assert not seen_message_ids.contains("2070443601311540")
+
+    def test_it_fails_a_redelivery_which_arrives_during_the_send(
+        self, event, alerter, factories, seen_message_ids
+    ):
+        def redeliver(*_args):
+            with pytest.raises(send_alerts.MessageInFlight):
+                send_alerts.send_alerts(
+                    event,
+                    alerter=alerter,
+                    app_log_payload_factories=factories,
+                    seen_message_ids=seen_message_ids,
+                )
+
+        alerter.send_alert.side_effect = redeliver
+
+        response = send_alerts.send_alerts(
+            event,
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            seen_message_ids=seen_message_ids,
+        )
+
+        assert response == "Alert sent"
+        assert alerter.send_alert.call_count == 1
+
+    @pytest.mark.parametrize("failing_call", ["create_alert", "send_alert"])
+    def test_it_sends_a_redelivery_of_a_failed_delivery(
+        self, event, alerter, factories, seen_message_ids, failing_call
+    ):
+        getattr(alerter, failing_call).side_effect = RuntimeError("Slack is down")
+        with pytest.raises(RuntimeError):
+            send_alerts.send_alerts(
+                event,
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                seen_message_ids=seen_message_ids,
+            )
+        getattr(alerter, failing_call).side_effect = None
+
+        response = send_alerts.send_alerts(
+            event,
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            seen_message_ids=seen_message_ids,
+        )
+
+        assert response == "Alert sent"
+
+    def test_it_sends_every_message_without_a_message_id(
+        self, event, alerter, factories, seen_message_ids
+    ):
+        del event["messageId"]
+
+        for _ in range(2):
+            send_alerts.send_alerts(
+                event,
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                seen_message_ids=seen_message_ids,
+            )
+
+        assert alerter.send_alert.call_count == 2
+
+
+class TestWithDigestMode:
+    @pytest.fixture()
+    def digest_buffer(self):
+        return DigestBuffer("ERROR")
+
+    def create_event(self, severity: str) -> dict:
+        payload = {
+            "textPayload": "Request took longer than expected",
+            "logName": "projects/ons-blaise-v2-prod/logs/stdout",
+            "resource": {"type": "cloud_run_revision", "labels": {}},
+            "severity": severity,
+        }
+        return {"data": base64.b64encode(json.dumps(payload).encode("ascii"))}
+
+    def test_it_adds_low_severity_alerts_to_the_digest(
+        self, alerter, factories, digest_buffer
+    ):
+        response = send_alerts.send_alerts(
+            self.create_event("WARNING"),
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            digest_buffer=digest_buffer,
+        )
+
+        assert response == "Alert added to digest"
+        alerter.send_alert.assert_not_called()
+        assert [group.count for group in digest_buffer.take_all()] == [1]
+
+    def test_it_sends_alerts_at_or_above_the_threshold(
+        self, alerter, factories, digest_buffer
+    ):
+        response = send_alerts.send_alerts(
+            self.create_event("ERROR"),
+            alerter=alerter,
+            app_log_payload_factories=factories,
+            digest_buffer=digest_buffer,
+        )
+
+        assert response == "Alert sent"
+        assert digest_buffer.take_all() == []
+
+
+class TestWithIncidentCorrelation:
+    @pytest.fixture()
+    def incident_correlator(self):
+        return IncidentCorrelator(window_seconds=60)
+
+    def create_event(self, instance_id: str, log_name: str) -> dict:
+        payload = {
+            "textPayload": "Agent stopped unexpectedly",
+            "logName": f"projects/ons-blaise-v2-prod/logs/{log_name}",
+            "resource": {
+                "type": "gce_instance",
+                "labels": {"instance_id": instance_id, "zone": "europe-west2-a"},
+            },
+            "severity": "ERROR",
+        }
+        return {"data": base64.b64encode(json.dumps(payload).encode("ascii"))}
+
+    def test_it_merges_alerts_for_the_same_instance(
+        self, alerter, factories, incident_correlator
+    ):
+        responses = [
+            send_alerts.send_alerts(
+                self.create_event("123", log_name),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                incident_correlator=incident_correlator,
+            )
+            for log_name in ["GCEGuestAgent", "OSConfigAgent", "winevt.raw"]
+        ]
+
+        assert responses == [
+            "Alert sent",
+            "Alert merged into incident",
+            "Alert merged into incident",
+        ]
+        assert alerter.send_alert.call_count == 1
+
+    def test_it_sends_alerts_for_other_instances(
+        self, alerter, factories, incident_correlator
+    ):
+        for instance_id in ["123", "456"]:
+            response = send_alerts.send_alerts(
+                self.create_event(instance_id, "GCEGuestAgent"),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                incident_correlator=incident_correlator,
+            )
+            assert response == "Alert sent"
+
+        assert alerter.send_alert.call_count == 2
+
+
+class TestWithSampling:
+    @pytest.fixture()
+    def sampler(self):
+        return AlertSampler(
+            [
+                SamplingRule(
+                    name="no-instance-aborts",
+                    message_contains="no available instance",
+                    max_per_window=1,
+                )
+            ]
+        )
+
+    def create_event(self, message_id: str) -> dict:
+        payload = {
+            "textPayload": "The request was aborted because there was no available instance.",
+            "logName": "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Frequests",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "example-service"},
+            },
+            "severity": "ERROR",
+        }
+        return {
+            "data": base64.b64encode(json.dumps(payload).encode("ascii")),
+            "messageId": message_id,
+        }
+
+    def test_it_suppresses_alerts_outside_the_sample(self, alerter, factories, sampler):
+        responses = [
+            send_alerts.send_alerts(
+                self.create_event(message_id),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                sampler=sampler,
+            )
+            for message_id in ["id-1", "id-2"]
+        ]
+
+        assert responses == ["Alert sent", "Alert suppressed (sampled)"]
+        assert alerter.send_alert.call_count == 1
+
+    def test_a_failed_alert_leaves_its_suppressed_count_for_the_next(
+        self, alerter, factories
+    ):
+        clock = FakeClock()
+        sampler = AlertSampler(
+            [
+                SamplingRule(
+                    name="no-instance-aborts",
+                    message_contains="no available instance",
+                    max_per_window=1,
+                    window_seconds=60,
+                )
+            ],
+            clock=clock,
+        )
+
+        def send(message_id: str) -> str:
+            return send_alerts.send_alerts(
+                self.create_event(message_id),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                sampler=sampler,
+            )
+
+        send("id-1")
+        send("id-2")
+        clock.now += 60
+        alerter.send_alert.side_effect = SlackAlertFailed(503, "unavailable", None)
+        with pytest.raises(SlackAlertFailed):
+            send("id-3")
+        alerter.send_alert.side_effect = None
+        clock.now += 60
+        send("id-4")
+
+        entries = [call.args[0] for call in alerter.create_alert.call_args_list]
+        assert [entry.suppressed_count for entry in entries] == [0, 1, 1]
+
+
+class TestWithShadowFilters:
+    def create_event(self, message: str) -> dict:
+        payload = {
+            "textPayload": message,
+            "logName": "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Frequests",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "example-service"},
+            },
+            "severity": "ERROR",
+        }
+        return {"data": base64.b64encode(json.dumps(payload).encode("ascii"))}
+
+    def test_only_the_live_decision_is_acted_on(self, alerter, factories, caplog):
+        def candidate_filter(log_entry: ProcessedLogEntry) -> bool:
+            return "expected" in (log_entry.message or "")
+
+        shadow_filters = ShadowFilterEvaluator(
+            send_alerts.LIVE_FILTERS, send_alerts.LIVE_FILTERS + [candidate_filter]
+        )
+
+        with caplog.at_level(logging.INFO):
+            response = send_alerts.send_alerts(
+                self.create_event("An expected error"),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                shadow_filters=shadow_filters,
+            )
+
+        assert response == "Alert sent"
+        alerter.send_alert.assert_called_once()
+        assert (
+            "root",
+            logging.INFO,
+            "Shadow filter disagreement",
+        ) in caplog.record_tuples
+
+
+class TestWithProjectConfigs:
+    def create_event(self, project_id: str) -> dict:
+        payload = {
+            "textPayload": "An error",
+            "logName": f"projects/{project_id}/logs/run.googleapis.com%2Frequests",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "example-service"},
+            },
+            "severity": "ERROR",
+        }
+        return {"data": base64.b64encode(json.dumps(payload).encode("ascii"))}
+
+    @pytest.fixture
+    def project_configs(self) -> ProjectConfigs:
+        return ProjectConfigs(
+            projects={
+                "sandbox-with-alerts": ProjectConfig(
+                    project_id="sandbox-with-alerts",
+                    disabled_filters=frozenset(
+                        {
+                            "sandbox_filter",
+                            "all_preprod_and_training_alerts_except_erroneous_questionnaire_filter",
+                        }
+                    ),
+                )
+            },
+            default_project_id="ons-blaise-v2-prod",
+            live_filters=send_alerts.LIVE_FILTERS,
+        )
+
+    def test_it_uses_the_filters_of_the_entrys_project(
+        self, alerter, factories, project_configs
+    ):
+        responses = [
+            send_alerts.send_alerts(
+                self.create_event(project_id),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                project_configs=project_configs,
+            )
+            for project_id in ["sandbox-with-alerts", "another-sandbox"]
+        ]
+
+        assert responses == ["Alert sent", "Alert skipped"]
+
+    def test_it_does_not_shadow_projects_with_their_own_filters(
+        self, alerter, factories, project_configs
+    ):
+        shadow_filters = Mock(spec=ShadowFilterEvaluator)
+
+        for project_id in ["sandbox-with-alerts", "another-sandbox"]:
+            send_alerts.send_alerts(
+                self.create_event(project_id),
+                alerter=alerter,
+                app_log_payload_factories=factories,
+                shadow_filters=shadow_filters,
+                project_configs=project_configs,
+            )
+
+        assert shadow_filters.evaluate.call_count == 1
@@ -0,0 +1,65 @@
+from unittest.mock import Mock
+
+import pytest
+from dateutil.parser import parse
+
+from lib.alerter import Alerter
+from lib.digest import DigestBuffer
+from lib.log_processor import ProcessedLogEntry
+from lib.send_digests import send_digests
+from lib.slack.slack_message import SlackMessage
+
+
+@pytest.fixture
+def message():
+    return SlackMessage(title="digest", fields={}, content="", footnote="")
+
+
+@pytest.fixture
+def alerter(message) -> Mock:
+    alerter = Mock(spec=Alerter)
+    alerter.create_digest_alert.return_value = message
+    return alerter
+
+
+@pytest.fixture
+def digest_buffer() -> DigestBuffer:
+    digest_buffer = DigestBuffer("ERROR")
+    for application in ["app-1", "app-2"]:
+        digest_buffer.add(
+            ProcessedLogEntry(
+                message="Slow response",
+                severity="WARNING",
+                application=application,
+                timestamp=parse("2022-08-02T19:06:42Z"),
+            )
+        )
+    return digest_buffer
+
+
+def test_it_does_not_send_open_windows(alerter, digest_buffer):
+    assert send_digests(alerter, digest_buffer) == "0 digests sent"
+    alerter.send_alert.assert_not_called()
+
+
+def test_it_sends_one_alert_per_group(alerter, digest_buffer, message):
+    response = send_digests(alerter, digest_buffer, flush_all=True)
+
+    assert response == "2 digests sent"
+    assert [
+        call.args[0].application for call in alerter.create_digest_alert.call_args_list
+    ] == ["app-1", "app-2"]
+    assert alerter.send_alert.call_count == 2
+
+
+def test_a_failed_digest_does_not_stop_the_others(alerter, digest_buffer):
+    alerter.send_alert.side_effect = [RuntimeError("Slack is down"), None, None]
+
+    response = send_digests(alerter, digest_buffer, flush_all=True)
+
+    assert response == "1 digests sent, 1 failed"
+    assert send_digests(alerter, digest_buffer, flush_all=True) == "1 digests sent"
+    assert [
+        call.args[0].application for call in alerter.create_digest_alert.call_args_list
+    ] == ["app-1", "app-2", "app-1"]
+    assert alerter.create_digest_alert.call_args_list[2].args[0].count == 1
@@ -0,0 +1,92 @@
+from unittest.mock import Mock
+
+import pytest
+from dateutil.parser import parse
+
+from lib.alerter import Alerter
+from lib.correlation import IncidentCorrelator
+from lib.log_processor import ProcessedLogEntry
+from lib.send_incidents import send_incidents
+from lib.slack.slack_message import SlackMessage
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def alerter() -> Mock:
+    alerter = Mock(spec=Alerter)
+    alerter.create_incident_alert.return_value = SlackMessage(
+        title="incident", fields={}, content="", footnote=""
+    )
+    return alerter
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def incident_correlator(clock) -> IncidentCorrelator:
+    incident_correlator = IncidentCorrelator(window_seconds=60, clock=clock)
+    for instance_id in ["vm-1", "vm-2"]:
+        for application in ["GCEGuestAgent", "OSConfigAgent"]:
+            incident_correlator.correlate(
+                ProcessedLogEntry(
+                    message="Agent stopped",
+                    severity="ERROR",
+                    application=application,
+                    timestamp=parse("2022-08-02T19:06:42Z"),
+                    log_query={"resource.labels.instance_id": instance_id},
+                )
+            )
+    return incident_correlator
+
+
+def test_it_does_not_send_open_incidents(alerter, incident_correlator):
+    assert send_incidents(alerter, incident_correlator) == "0 incidents sent"
+    alerter.send_alert.assert_not_called()
+
+
+def test_it_sends_one_alert_per_closed_incident(alerter, incident_correlator, clock):
+    clock.now += 60
+
+    response = send_incidents(alerter, incident_correlator)
+
+    assert response == "2 incidents sent"
+    assert [
+        call.args[0].resource for call in alerter.create_incident_alert.call_args_list
+    ] == ["vm-1", "vm-2"]
+    assert alerter.send_alert.call_count == 2
+
+
+def test_a_failed_incident_does_not_stop_the_others(
+    alerter, incident_correlator, clock
+):
+    alerter.send_alert.side_effect = [RuntimeError("Slack is down"), None]
+    clock.now += 60
+
+    response = send_incidents(alerter, incident_correlator)
+
+    assert response == "1 incidents sent, 1 failed"
+
+
+def test_a_failed_incident_is_retried_by_the_next_call(
+    alerter, incident_correlator, clock
+):
+    alerter.send_alert.side_effect = [RuntimeError("Slack is down"), None, None]
+    clock.now += 60
+    send_incidents(alerter, incident_correlator)
+
+    response = send_incidents(alerter, incident_correlator)
+
+    assert response == "1 incidents sent"
+    assert [
+        call.args[0].resource for call in alerter.create_incident_alert.call_args_list
+    ] == ["vm-1", "vm-2", "vm-1"]
@@ -0,0 +1,141 @@
+import json
+import math
+from dataclasses import dataclass
+from datetime import datetime
+
+import pytest
+
+from lib.utilities import json_codec
+from lib.utilities.key_excluding_view import KeyExcludingView
+
+
+@pytest.fixture(params=["orjson", "json"], autouse=True)
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_codec, "orjson", None)
+    return request.param
+
+
+@dataclass
+class Example:
+    value: str
+
+
+LOG_ENTRY = {
+    "protoPayload": {
+        "@type": "type.googleapis.com/google.cloud.audit.AuditLog",
+        "status": {"message": "serving status cannot be changed"},
+        "line": [{"logMessage": "Example GAE Error"}],
+        "status_code": 500,
+        "latency": 0.004229,
+        "retried": False,
+        "trace": None,
+        "empty": {},
+        "items": [],
+    },
+    "resource": {"labels": {"instance_id": "8945359843759812345"}},
+    "severity": "ERROR",
+}
+
+
+def test_it_reports_the_backend(backend):
+    assert json_codec.backend() == backend
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        json.dumps(LOG_ENTRY),
+        json.dumps(LOG_ENTRY).encode("utf-8"),
+        '{"big": 123456789012345678901234, "negative": -9223372036854775809}',
+        '"caf\\u00e9 ☕"',
+        json.dumps({"value": "café"}).encode("utf-16"),
+    ],
+)
+def test_loads_matches_json(data):
+    assert json_codec.loads(data) == json.loads(data)
+
+
+def test_loads_accepts_nan():
+    assert math.isnan(json_codec.loads('{"value": NaN}')["value"])
+
+
+def test_loads_keeps_wide_integers_exact():
+    assert json_codec.loads(b"[18446744073709551616, -9223372036854775809]") == [
+        18446744073709551616,
+        -9223372036854775809,
+    ]
+
+
+@pytest.mark.parametrize("padding", range(65520, 65540))
+def test_loads_finds_wide_integers_across_scan_chunks(padding):
+    data = f'["{"x" * padding}", 18446744073709551616]'.encode()
+
+    assert json_codec.loads(data)[1] == 18446744073709551616
+
+
+def test_loads_raises_json_errors():
+    with pytest.raises(json.decoder.JSONDecodeError) as err:
+        json_codec.loads(b"{not-json}")
+    assert str(err.value) == (
+        "Expecting property name enclosed in double quotes: line 1 column 2 (char 1)"
+    )
+
+
+def test_dumps_round_trips():
+    assert json.loads(json_codec.dumps(LOG_ENTRY)) == LOG_ENTRY
+
+
+def test_dumps_encodes_utf8():
+    assert json_codec.dumps({"value": "café"}) == '{"value":"café"}'.encode("utf-8")
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        json_codec.dumps({"value": Example("example")})
+    with pytest.raises(TypeError):
+        json_codec.dumps({"value": datetime(2022, 8, 2)})
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        LOG_ENTRY,
+        {"value": "café ☕", "control": '\x00\x1f\x7f"\\/\n\t'},
+        {"small": 6.5e-05, "large": 1e16, "list": [0.1, -2.5, 1e-07]},
+        {"ratio: 1.5": "ratio: 1.5"},
+        {"big": 123456789012345678901234},
+        {1: "non-string key", None: "null key"},
+        [[], {}, [[]], [{}]],
+        "plain string",
+        12,
+        None,
+    ],
+)
+def test_dumps_indented_matches_json(value):
+    assert json_codec.dumps_indented(value) == json.dumps(value, indent=2)
+
+
+def test_dumps_indented_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        json_codec.dumps_indented({"value": Example("example")})
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"payload": {"message": "hidden", "status": 500, "latency": 0.5}},
+        {"payload": {"message": "hidden", "status": 500}},
+    ],
+)
+def test_key_excluding_views_are_written_as_dicts(value):
+    view = KeyExcludingView(value["payload"], ["message"])
+    copied = {
+        name: item for name, item in value["payload"].items() if name != "message"
+    }
+
+    assert json_codec.dumps_indented(view) == json.dumps(copied, indent=2)
+    assert json_codec.dumps_indented([view]) == json.dumps([copied], indent=2)
+    assert json.loads(json_codec.dumps({"data": view})) == {"data": copied}
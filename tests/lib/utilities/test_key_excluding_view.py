@@ -0,0 +1,48 @@
+import pytest
+
+from lib.utilities.key_excluding_view import KeyExcludingView
+
+
+@pytest.fixture
+def payload() -> dict:
+    return dict(message="GCE Error", extra="example extra", computer_name="vm-1")
+
+
+def test_it_hides_the_excluded_keys(payload):
+    view = KeyExcludingView(payload, ["message", "computer_name"])
+
+    assert dict(view) == dict(extra="example extra")
+    assert list(view) == ["extra"]
+    assert len(view) == 1
+    assert "message" not in view
+    assert "extra" in view
+    assert view.get("message") is None
+    with pytest.raises(KeyError):
+        view["message"]
+
+
+def test_it_ignores_excluded_keys_which_are_not_present(payload):
+    view = KeyExcludingView(payload, ["moduleId", "line"])
+
+    assert len(view) == 3
+    assert list(view) == ["message", "extra", "computer_name"]
+
+
+def test_it_does_not_copy_or_change_the_mapping(payload):
+    nested = dict(a=1)
+    payload["nested"] = nested
+
+    view = KeyExcludingView(payload, ["message"])
+
+    assert view["nested"] is nested
+    assert payload["message"] == "GCE Error"
+
+
+def test_it_equals_the_dict_without_the_excluded_keys(payload):
+    view = KeyExcludingView(payload, ["message"])
+
+    assert view == dict(extra="example extra", computer_name="vm-1")
+    assert view != payload
+    assert repr(view) == (
+        "KeyExcludingView({'extra': 'example extra', 'computer_name': 'vm-1'})"
+    )
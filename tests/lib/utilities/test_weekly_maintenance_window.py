@@ -1,10 +1,13 @@
 import zoneinfo
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, time, timedelta, timezone
 from typing import Any
 
 import pytest
 
-from lib.utilities.weekly_maintenance_window import is_in_friday_maintenance_window
+from lib.utilities.weekly_maintenance_window import (
+    WeeklyMaintenanceWindow,
+    is_in_friday_maintenance_window,
+)
 
 # Test constants
 UK_TZ = zoneinfo.ZoneInfo("Europe/London")
@@ -153,3 +156,14 @@ def test_fixtures_work_correctly(
 ) -> None:
     assert is_in_friday_maintenance_window(maintenance_friday) is True
     assert is_in_friday_maintenance_window(non_maintenance_tuesday) is False
+
+
+def test_weekly_maintenance_window_in_another_timezone() -> None:
+    window = WeeklyMaintenanceWindow(
+        weekday=0, start=time(9, 0), end=time(10, 0), timezone="America/New_York"
+    )
+
+    # 13:30 UTC on Monday 21 July 2025 = 09:30 EDT
+    assert window.contains(datetime(2025, 7, 21, 13, 30, tzinfo=timezone.utc))
+    assert not window.contains(datetime(2025, 7, 21, 9, 30, tzinfo=timezone.utc))
+    assert not window.contains(datetime(2025, 7, 22, 13, 30, tzinfo=timezone.utc))
@@ -0,0 +1,86 @@
+import pytest
+import requests
+
+from lib.slack import SlackAlerter, SlackMessage
+from lib.slack.send_slack_message import SlackAlertFailed
+from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
+from scripts.fake_slack_webhook import FakeSlackWebhook
+
+PAYLOAD = {"blocks": [{"type": "divider"}]}
+
+
+def test_it_records_accepted_payloads():
+    with FakeSlackWebhook() as webhook:
+        response = requests.post(webhook.url, json=PAYLOAD)
+
+    assert response.status_code == 200
+    assert response.text == "ok"
+    assert webhook.payloads == [PAYLOAD]
+    assert webhook.counts["ok"] == 1
+
+
+def test_it_receives_alerts_end_to_end():
+    message = SlackMessage(title="hello world", fields={}, content="", footnote="")
+
+    with FakeSlackWebhook() as webhook:
+        SlackAlerter(webhook.url, "example-project").send_alert(message)
+
+    assert webhook.payloads == [convert_slack_message_to_blocks(message)]
+
+
+def test_it_rate_limits_with_retry_after():
+    with FakeSlackWebhook(rate_limit_per_second=2) as webhook:
+        responses = [requests.post(webhook.url, json=PAYLOAD) for _ in range(10)]
+
+    limited = [response for response in responses if response.status_code == 429]
+    assert limited
+    assert limited[0].headers["Retry-After"] == "1"
+    assert webhook.counts["rate_limited"] == len(limited)
+
+
+@pytest.mark.parametrize(
+    "payload, error",
+    [
+        ({}, "no_text"),
+        ({"blocks": [{"type": "divider"}] * 51}, "invalid_blocks"),
+    ],
+)
+def test_it_rejects_payloads_slack_would_reject(payload, error):
+    with FakeSlackWebhook() as webhook:
+        response = requests.post(webhook.url, json=payload)
+
+    assert response.status_code == 400
+    assert response.text == error
+    assert webhook.payloads == []
+
+
+def test_it_injects_server_errors():
+    with FakeSlackWebhook(error_rate=1) as webhook:
+        with pytest.raises(SlackAlertFailed) as failed:
+            SlackAlerter(webhook.url, "example-project").send_alert(
+                SlackMessage(title="hello", fields={}, content="", footnote="")
+            )
+
+    assert failed.value.args[0] == 500
+    assert webhook.counts["error"] == 1
+
+
+def test_it_injects_connection_resets():
+    with FakeSlackWebhook(reset_rate=1) as webhook:
+        with pytest.raises(requests.ConnectionError):
+            requests.post(webhook.url, json=PAYLOAD)
+
+    assert webhook.counts["reset"] == 1
+
+
+def test_failures_are_repeatable_for_a_seed():
+    def outcomes() -> list:
+        with FakeSlackWebhook(error_rate=0.5, seed=3) as webhook:
+            return [
+                requests.post(webhook.url, json=PAYLOAD).status_code for _ in range(20)
+            ]
+
+    first = outcomes()
+
+    assert first == outcomes()
+    assert {200, 500} == set(first)
@@ -0,0 +1,116 @@
+import base64
+import io
+import json
+from collections import Counter
+from unittest.mock import Mock
+
+import pytest
+
+from lib.alerter import Alerter
+from lib.log_processor import APP_LOG_PAYLOAD_FACTORIES
+from lib.send_alerts import prepare_alert
+from scripts.traffic_generator import (
+    CATEGORIES,
+    NOISE_CATEGORIES,
+    TrafficProfile,
+    generate_envelopes,
+    generate_log_entries,
+    write_events,
+)
+
+
+def test_it_generates_the_requested_number_of_entries():
+    assert len(list(generate_log_entries(TrafficProfile(), 50))) == 50
+
+
+def test_it_is_repeatable_for_a_seed():
+    first = list(generate_log_entries(TrafficProfile(), 20, seed=7))
+    second = list(generate_log_entries(TrafficProfile(), 20, seed=7))
+
+    assert first == second
+
+
+def test_it_streams_without_an_end():
+    entries = generate_log_entries(TrafficProfile())
+
+    assert [next(entries) for _ in range(3)]
+
+
+def test_it_follows_the_mix_and_noise_ratio():
+    profile = TrafficProfile(
+        mix={"cloud_run": 3, "gae_request": 1, "windows_event": 0}, noise_ratio=0.2
+    )
+
+    counts = Counter(
+        category for category, _entry in generate_log_entries(profile, 10000)
+    )
+    noise = sum(counts[category] for category in NOISE_CATEGORIES)
+
+    assert 1800 <= noise <= 2200
+    assert 5700 <= counts["cloud_run"] <= 6300
+    assert 1800 <= counts["gae_request"] <= 2200
+    assert counts["windows_event"] == 0
+
+
+@pytest.mark.parametrize("category", [*CATEGORIES, *NOISE_CATEGORIES])
+def test_noise_is_skipped_and_other_entries_are_sent(category):
+    alerter = Mock(spec=Alerter)
+    profile = TrafficProfile(
+        mix={category: 1} if category in CATEGORIES else {"cloud_run": 1},
+        noise_ratio=1 if category in NOISE_CATEGORIES else 0,
+    )
+
+    results = {
+        prepare_alert(envelope, alerter, APP_LOG_PAYLOAD_FACTORIES).result
+        for envelope, (generated_category, _entry) in zip(
+            generate_envelopes(profile, 200),
+            generate_log_entries(profile, 200),
+        )
+        if generated_category == category
+    }
+
+    expected = "Alert skipped" if category in NOISE_CATEGORIES else "Alert sent"
+    assert results == {expected}
+
+
+def test_bursts_come_mostly_from_one_instance():
+    profile = TrafficProfile(
+        mix={"windows_event": 1},
+        noise_ratio=0,
+        rate_per_second=1,
+        burst_every_seconds=1000,
+        burst_seconds=100,
+        burst_factor=50,
+    )
+
+    instances = Counter(
+        entry["resource"]["labels"]["instance_id"]
+        for _category, entry in generate_log_entries(profile, 500)
+    )
+
+    assert instances.most_common(1)[0][1] > 300
+
+
+def test_entries_are_padded_to_the_payload_size():
+    profile = TrafficProfile(payload_bytes=4096, noise_ratio=0.5)
+
+    for _category, entry in generate_log_entries(profile, 100):
+        assert len(json.dumps(entry)) >= 4096
+
+
+def test_envelopes_hold_the_entry_as_base64_json():
+    envelope = next(generate_envelopes(TrafficProfile(), 1, seed=3))
+    _category, entry = next(generate_log_entries(TrafficProfile(), 1, seed=3))
+
+    assert json.loads(base64.b64decode(envelope["data"])) == entry
+    assert envelope["messageId"] == "synthetic-3-0"
+
+
+def test_write_events_writes_one_event_per_line():
+    output = io.StringIO()
+
+    write_events(output, TrafficProfile(), 5, seed=0, envelopes=False)
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 5
+    assert all("resource" in json.loads(line) for line in lines)
@@ -2,6 +2,7 @@ import base64
 import json
 import logging
 import os
+import time
 from typing import Any, Callable, Union
 
 import pytest
@@ -10,10 +11,20 @@ import requests_mock
 from dateutil.parser import parse
 from flask import Request
 
+import main
 from lib.cloud_logging.log_query_link import create_log_query_link
+from lib.deadline import DeadlineExceeded
+from lib.push_server import create_app
 from lib.slack import SlackMessage
 from lib.slack.slack_message_formatter import convert_slack_message_to_blocks
-from main import log_error, send_slack_alert
+from main import (
+    handle_pubsub_message,
+    log_error,
+    send_slack_alert,
+    send_slack_digest,
+    send_slack_incidents,
+    send_slack_thread_counts,
+)
 
 
 def test_log_error(caplog, log_matching):
@@ -2911,3 +2922,412 @@ def test_skip_get_role_alerts_latest(
     assert response == "Alert skipped"
     assert number_of_http_calls() == 0
     assert ("root", logging.INFO, "Skipping get role alert") in caplog.record_tuples
+
+
+def test_redelivered_message_is_only_sent_once(
+    http_mock: requests_mock.mocker.Mocker,
+    number_of_http_calls: Callable,
+) -> None:
+    class BackgroundContext:
+        event_id = "test-main-redelivery-4411"
+
+    http_mock.post("https://slack.co/webhook/1234")
+    event = create_event("This is a raw string message")
+
+    first_response = send_slack_alert(event, BackgroundContext())
+    second_response = send_slack_alert(event, BackgroundContext())
+
+    assert first_response == "Alert sent"
+    assert second_response == "Alert skipped (duplicate)"
+    assert number_of_http_calls() == 1
+
+
+def test_alert_is_sent_to_the_routed_destination(
+    http_mock: requests_mock.mocker.Mocker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv(
+        "SLACK_ROUTING_CONFIG",
+        json.dumps(
+            {
+                "destinations": {
+                    "prod-incidents": {"url_env": "SLACK_URL"},
+                    "data-delivery": {"url": "https://slack.co/webhook/data-delivery"},
+                },
+                "routes": [
+                    {
+                        "application": "nifi-notify",
+                        "destinations": ["data-delivery"],
+                    }
+                ],
+                "default_destinations": ["prod-incidents"],
+            }
+        ),
+    )
+    http_mock.post("https://slack.co/webhook/data-delivery")
+    event = create_event(
+        {
+            "textPayload": "Failed to notify",
+            "logName": "projects/ons-blaise-v2-prod/logs/cloudfunctions.googleapis.com%2Fcloud-functions",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "nifi-notify"},
+            },
+            "severity": "ERROR",
+            "receiveTimestamp": "2022-08-02T19:06:42.275819947Z",
+        }
+    )
+
+    response = send_slack_alert(event, dict())
+
+    assert response == "Alert sent"
+    assert [request.url for request in http_mock.request_history] == [
+        "https://slack.co/webhook/data-delivery"
+    ]
+
+
+def test_low_severity_alert_is_added_to_the_digest(
+    http_mock: requests_mock.mocker.Mocker,
+    number_of_http_calls: Callable,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    monkeypatch.setenv("DIGEST_BELOW_SEVERITY", "ERROR")
+    monkeypatch.setenv("DIGEST_DB", str(tmp_path / "digest.db"))
+    http_mock.post("https://slack.co/webhook/1234")
+    event = create_event(
+        {
+            "textPayload": "Request took longer than expected",
+            "logName": "projects/ons-blaise-v2-prod/logs/stdout",
+            "resource": {"type": "cloud_run_revision", "labels": {}},
+            "severity": "WARNING",
+        }
+    )
+
+    response = send_slack_alert(event, dict())
+
+    assert response == "Alert added to digest"
+    assert number_of_http_calls() == 0
+    assert send_slack_digest(dict(), dict()) == "0 digests sent"
+
+
+def test_digest_is_disabled_by_default() -> None:
+    assert send_slack_digest(dict(), dict()) == "Digest mode is disabled"
+
+
+def test_incident_summaries_are_sent_by_the_scheduled_trigger(
+    http_mock: requests_mock.mocker.Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    monkeypatch.setenv("INCIDENT_WINDOW_SECONDS", "0.3")
+    monkeypatch.setenv("INCIDENT_DB", str(tmp_path / "incidents.db"))
+    http_mock.post("https://slack.co/webhook/1234")
+    for message in ["Agent stopped", "Connection refused"]:
+        event = create_event(
+            {
+                "textPayload": message,
+                "logName": "projects/ons-blaise-v2-prod/logs/GCEGuestAgent",
+                "resource": {
+                    "type": "gce_instance",
+                    "labels": {"instance_id": "458491889528639951"},
+                },
+                "severity": "ERROR",
+            }
+        )
+        send_slack_alert(event, dict())
+    assert http_mock.call_count == 1
+
+    time.sleep(0.3)
+    # The trigger usually runs on another instance, with a correlator of its own.
+    main._incident_correlator.cache_clear()
+
+    assert send_slack_incidents(dict(), dict()) == "1 incidents sent"
+    assert http_mock.call_count == 2
+
+
+def test_incident_correlation_is_disabled_by_default() -> None:
+    assert send_slack_incidents(dict(), dict()) == "Incident correlation is disabled"
+
+
+@pytest.mark.parametrize("path", [None, ":memory:"])
+def test_incident_correlation_needs_a_persistent_database(
+    monkeypatch: pytest.MonkeyPatch, path
+) -> None:
+    monkeypatch.setenv("INCIDENT_WINDOW_SECONDS", "60")
+    if path is None:
+        monkeypatch.delenv("INCIDENT_DB", raising=False)
+    else:
+        monkeypatch.setenv("INCIDENT_DB", path)
+
+    with pytest.raises(ValueError, match="INCIDENT_DB"):
+        send_slack_incidents(dict(), dict())
+
+
+@pytest.mark.parametrize("path", [None, ":memory:"])
+def test_digest_mode_needs_a_persistent_buffer(
+    monkeypatch: pytest.MonkeyPatch, path
+) -> None:
+    monkeypatch.setenv("DIGEST_BELOW_SEVERITY", "ERROR")
+    if path is None:
+        monkeypatch.delenv("DIGEST_DB", raising=False)
+    else:
+        monkeypatch.setenv("DIGEST_DB", path)
+
+    with pytest.raises(ValueError, match="DIGEST_DB"):
+        send_slack_digest(dict(), dict())
+
+
+def test_alert_is_left_for_redelivery_when_the_deadline_has_passed(
+    number_of_http_calls: Callable,
+    monkeypatch: pytest.MonkeyPatch,
+    log_matching: Callable,
+) -> None:
+    monkeypatch.setenv("ALERT_DEADLINE_SECONDS", "0")
+    event = create_event("This is a raw string message")
+
+    with pytest.raises(DeadlineExceeded):
+        send_slack_alert(event, dict())
+
+    assert number_of_http_calls() == 0
+    assert log_matching(
+        logging.WARNING, "Alert not sent before the deadline, left for redelivery"
+    )
+
+
+def test_push_message_is_handled_by_the_shared_pipeline(
+    http_mock: requests_mock.mocker.Mocker,
+    number_of_http_calls: Callable,
+) -> None:
+    http_mock.post("https://slack.co/webhook/1234")
+    push_request = {
+        "message": {
+            "data": base64.b64encode(
+                json.dumps("This is a raw string message").encode("ascii")
+            ).decode("ascii"),
+            "messageId": "test-main-push-7731",
+        },
+        "subscription": "projects/project-dev/subscriptions/slack-alerts",
+    }
+
+    response = (
+        create_app(handle_pubsub_message).test_client().post("/", json=push_request)
+    )
+    redelivery = (
+        create_app(handle_pubsub_message).test_client().post("/", json=push_request)
+    )
+
+    assert response.text == "Alert sent"
+    assert redelivery.text == "Alert skipped (duplicate)"
+    assert number_of_http_calls() == 1
+
+
+def test_invocations_are_profiled_when_enabled(
+    http_mock: requests_mock.mocker.Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: Any,
+) -> None:
+    monkeypatch.setenv("PROFILE_EVERY_N_INVOCATIONS", "1")
+    monkeypatch.setenv("PROFILE_TOP_N", "5")
+    http_mock.post("https://slack.co/webhook/1234")
+    event = create_event("This is a raw string message")
+
+    with caplog.at_level(logging.INFO):
+        assert send_slack_alert(event, dict()) == "Alert sent"
+
+    [profile] = [
+        record.json_fields
+        for record in caplog.records
+        if record.getMessage() == "Invocation profile"
+    ]
+    assert profile["mode"] == "cprofile"
+    assert len(profile["top"]) == 5
+
+
+def test_memory_is_tracked_when_enabled(
+    http_mock: requests_mock.mocker.Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: Any,
+) -> None:
+    monkeypatch.setenv("TRACK_MEMORY", "true")
+    http_mock.post("https://slack.co/webhook/1234")
+    event = create_event("This is a raw string message")
+
+    with caplog.at_level(logging.INFO):
+        assert send_slack_alert(event, dict()) == "Alert sent"
+
+    [memory] = [
+        record.json_fields
+        for record in caplog.records
+        if record.getMessage() == "Invocation memory"
+    ]
+    assert set(memory["stages"]) == {"decode", "format", "encode"}
+    assert memory["peak_bytes"] > 0
+
+
+def test_alerts_use_the_settings_of_the_entrys_project(
+    http_mock: requests_mock.mocker.Mocker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("SLACK_URL_PROD", "https://slack.co/webhook/prod")
+    monkeypatch.setenv(
+        "PROJECTS_CONFIG",
+        json.dumps(
+            {
+                "projects": {
+                    "ons-blaise-v2-prod": {
+                        "slack_url_env": "SLACK_URL_PROD",
+                        "playbook_url": "https://example.com/prod-playbook",
+                    },
+                    "ons-blaise-v2-dev": {
+                        "disabled_filters": [
+                            "all_preprod_and_training_alerts_except_erroneous_questionnaire_filter"
+                        ]
+                    },
+                }
+            }
+        ),
+    )
+    http_mock.post("https://slack.co/webhook/prod")
+    http_mock.post("https://slack.co/webhook/1234")
+
+    for project_id in ["ons-blaise-v2-prod", "ons-blaise-v2-dev"]:
+        event = create_event(
+            {
+                "textPayload": "An error",
+                "logName": f"projects/{project_id}/logs/run.googleapis.com%2Frequests",
+                "resource": {
+                    "type": "cloud_run_revision",
+                    "labels": {"service_name": "example-service"},
+                },
+                "severity": "ERROR",
+                "receiveTimestamp": "2022-08-02T19:06:42.275819947Z",
+            }
+        )
+        assert send_slack_alert(event, dict()) == "Alert sent"
+
+    prod_request, dev_request = http_mock.request_history
+    assert prod_request.url == "https://slack.co/webhook/prod"
+    assert "project=ons-blaise-v2-prod" in prod_request.text
+    assert "https://example.com/prod-playbook" in prod_request.text
+    assert dev_request.url == "https://slack.co/webhook/1234"
+    assert "project=ons-blaise-v2-dev" in dev_request.text
+    assert "Managing Prod Alerts" in dev_request.text
+
+
+def test_repeated_alerts_are_threaded_with_the_web_api(
+    http_mock: requests_mock.mocker.Mocker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("SLACK_BOT_TOKEN", "xoxb-token")
+    monkeypatch.setenv("SLACK_CHANNEL", "C-THREADS")
+    http_mock.post(
+        "https://slack.com/api/chat.postMessage",
+        [
+            dict(json={"ok": True, "ts": "1700000000.000001"}),
+            dict(json={"ok": True, "ts": "1700000000.000002"}),
+        ],
+    )
+    event = create_event(
+        {
+            "textPayload": "Failed to connect",
+            "logName": "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Frequests",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "example-service"},
+            },
+            "severity": "ERROR",
+            "receiveTimestamp": "2022-08-02T19:06:42.275819947Z",
+        }
+    )
+
+    assert send_slack_alert(event, dict()) == "Alert sent"
+    assert send_slack_alert(event, dict()) == "Alert sent"
+
+    parent, reply = [request.json() for request in http_mock.request_history]
+    assert parent["channel"] == "C-THREADS"
+    assert "thread_ts" not in parent
+    assert reply["thread_ts"] == "1700000000.000001"
+    assert reply["text"].startswith("Occurred again at ")
+
+
+def test_thread_counts_are_updated_by_the_scheduled_trigger(
+    http_mock: requests_mock.mocker.Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    monkeypatch.setenv("SLACK_BOT_TOKEN", "xoxb-token")
+    monkeypatch.setenv("SLACK_CHANNEL", "C-COUNTS")
+    monkeypatch.setenv("SLACK_THREAD_REPEATS", "count")
+    monkeypatch.setenv("SLACK_THREADS_DB", str(tmp_path / "threads.db"))
+    # Sends to the channel are a second apart, so the third alert falls
+    # within the interval of the second's update.
+    monkeypatch.setenv("SLACK_THREAD_UPDATE_SECONDS", "1.5")
+    http_mock.post(
+        "https://slack.com/api/chat.postMessage",
+        [
+            dict(json={"ok": True, "ts": "1700000000.000001"}),
+            dict(json={"ok": True, "ts": "1700000000.000002"}),
+        ],
+    )
+    http_mock.post(
+        "https://slack.com/api/chat.update",
+        json={"ok": True, "ts": "1700000000.000002"},
+    )
+    event = create_event(
+        {
+            "textPayload": "Disk full",
+            "logName": "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Frequests",
+            "resource": {
+                "type": "cloud_run_revision",
+                "labels": {"service_name": "example-service"},
+            },
+            "severity": "ERROR",
+        }
+    )
+    for _ in range(3):
+        send_slack_alert(event, dict())
+    time.sleep(1.5)
+    # The scheduled trigger usually lands on another instance.
+    main._slack_web_api_alerter.cache_clear()
+
+    assert send_slack_thread_counts(dict(), dict()) == "1 thread counts updated"
+    update = http_mock.request_history[-1].json()
+    assert update["text"].startswith("x 3, most recently at ")
+
+
+def test_thread_counts_need_a_persistent_database(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("SLACK_BOT_TOKEN", "xoxb-token")
+    monkeypatch.setenv("SLACK_CHANNEL", "C-COUNTS")
+    monkeypatch.setenv("SLACK_THREAD_REPEATS", "count")
+
+    with pytest.raises(ValueError):
+        send_slack_thread_counts(dict(), dict())
+
+
+def test_thread_counts_are_disabled_without_the_web_api() -> None:
+    assert (
+        send_slack_thread_counts(dict(), dict())
+        == "Threading with the Web API is disabled"
+    )
+
+
+def test_web_api_calls_are_spooled_when_slack_fails(
+    http_mock: requests_mock.mocker.Mocker,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    monkeypatch.setenv("SLACK_BOT_TOKEN", "xoxb-token")
+    monkeypatch.setenv("SLACK_CHANNEL", "C-SPOOL")
+    monkeypatch.setenv("SLACK_SPOOL_PATH", str(tmp_path / "slack.jsonl"))
+    http_mock.post("https://slack.com/api/chat.postMessage", status_code=503)
+    event = create_event(
+        {
+            "textPayload": "Out of memory",
+            "logName": "projects/ons-blaise-v2-prod/logs/run.googleapis.com%2Frequests",
+            "resource": {"type": "cloud_run_revision", "labels": {}},
+            "severity": "ERROR",
+        }
+    )
+
+    assert send_slack_alert(event, dict()) == "Alert sent"
+    assert (tmp_path / "slack-web-api.jsonl").read_text().count("\n") == 1
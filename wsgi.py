@@ -0,0 +1,24 @@
+import os
+
+from lib.push_server import create_app
+from main import (
+    handle_pubsub_message,
+    send_slack_digest,
+    send_slack_incidents,
+    send_slack_thread_counts,
+    warm_up,
+)
+
+# Entry point for running as a PubSub push endpoint, for example on Cloud Run:
+# gunicorn --workers 1 --threads 16 --bind :$PORT wsgi:app
+# Use one worker: the spool and dedup cache are shared by threads, not processes.
+warm_up()
+app = create_app(
+    handle_pubsub_message,
+    subscription=os.environ.get("PUSH_SUBSCRIPTION") or None,
+    tasks={
+        "send-slack-digest": lambda: send_slack_digest({}, None),
+        "send-slack-incidents": lambda: send_slack_incidents({}, None),
+        "send-slack-thread-counts": lambda: send_slack_thread_counts({}, None),
+    },
+)